@@ -0,0 +1,29 @@
+"""Operator API routes (admin only)"""
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Any
+from app.core.security import require_admin
+from app.core.resilience import circuit_breakers
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/circuit-breakers")
+async def list_circuit_breakers(admin: dict = Depends(require_admin)) -> Dict[str, Any]:
+    """State of every circuit breaker key (shared across replicas when Redis is up)"""
+    return {
+        name: {"config": breaker.get_config(), "keys": await breaker.get_states()}
+        for name, breaker in circuit_breakers.items()
+    }
+
+
+@router.post("/circuit-breakers/{name}/{key}/reset")
+async def reset_circuit_breaker(name: str, key: str, admin: dict = Depends(require_admin)):
+    """Force a breaker key back to CLOSED"""
+    breaker = circuit_breakers.get(name)
+    if breaker is None:
+        raise HTTPException(status_code=404, detail=f"Unknown circuit breaker: {name}")
+    await breaker.reset(key)
+    logger.warning(f"Circuit breaker {name}:{key} reset by {admin.get('id')}")
+    return {"name": name, "key": key, "state": "CLOSED"}
@@ -16,6 +16,7 @@ from app.schemas import (
 from app.core.database import get_supabase_admin
 from app.core.security import get_current_customer_id
 from app.core.config import settings
+from app.services.customer_agent_service import invalidate_customer_agent_context, refresh_running_task_teams
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -118,6 +119,10 @@ async def hire_ve(
         # Fetch the inserted record to return
         new_ve = insert_response.data[0]
         
+        # Team changed: drop cached agent context for this customer
+        await invalidate_customer_agent_context(customer_id)
+        await refresh_running_task_teams(customer_id)
+        
         # Return with details
         return CustomerVEResponse(
             **new_ve,
@@ -169,6 +174,9 @@ async def unhire_ve(
              # But if we are here, we verified it existed at step 1.
              # Let's assume success if we get here to avoid blocking the user.
              pass
+        
+        await invalidate_customer_agent_context(customer_id)
+        await refresh_running_task_teams(customer_id)
              
         return None
         
@@ -216,6 +224,10 @@ async def update_ve(
              
         updated_ve = response.data[0]
         
+        # Persona names are part of the cached agent context
+        await invalidate_customer_agent_context(customer_id)
+        await refresh_running_task_teams(customer_id)
+        
         # 4. Fetch details to return complete object (consistent with list/get)
         ve_details = None
         if updated_ve.get("marketplace_agent_id"):
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import Optional, List
 from app.services.kagent_service import kagent_service
 from app.core.database import get_supabase_admin
+from app.services.customer_agent_service import invalidate_all_agent_context
 import logging
 import uuid
 from datetime import datetime
@@ -142,52 +143,53 @@ async def list_mcps(
 async def list_tools(
     search: Optional[str] = None,
     mcp_server: Optional[str] = None,
+    agent: Optional[str] = None,
+    fuzzy: bool = True,
+    cursor: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100)
 ):
     """
     List all available tools from all MCP servers.
     
+    Served from the inverted tool index (app/services/tool_index.py).
+    
     Query Parameters:
-    - search: Search in tool name
+    - search: Words matched by prefix against tool name and description
+      (close spellings too, unless fuzzy=false)
     - mcp_server: Filter by MCP server name
+    - agent: Only tools used by this agent ("namespace/name", or a bare
+      name for same-named agents in any namespace)
+    - cursor: next_cursor of the previous page (stable while tools change);
+      takes precedence over page
     - page: Page number
     - page_size: Items per page
     """
     try:
-        tools = await kagent_service.list_tools()
-        
-        # Apply filters
-        if search:
-            search_lower = search.lower()
-            tools = [
-                t for t in tools
-                if search_lower in t.get("name", "").lower()
-            ]
-        
-        if mcp_server:
-            tools = [
-                t for t in tools
-                if t.get("mcp_server") == mcp_server
-            ]
-        
-        # Pagination
-        total = len(tools)
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_tools = tools[start:end]
-        
-        return {
-            "items": paginated_tools,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size
-        }
-        
+        result = await kagent_service.search_tools(
+            query=search,
+            mcp_server=mcp_server,
+            agent=agent,
+            fuzzy=fuzzy,
+            cursor=cursor,
+            limit=page_size,
+            offset=(page - 1) * page_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing tools: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    total = result["total"]
+    return {
+        "items": result["items"],
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size,
+        "next_cursor": result["next_cursor"]
+    }
 
 
 @router.post("/import/agent/{agent_id}")
@@ -257,6 +259,9 @@ async def import_agent(
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to import agent")
         
+        # Agent catalog changed: cached team contexts may list stale tools
+        await invalidate_all_agent_context()
+        
         # Create HTTPRoute in Agent Gateway for this agent
         from app.services.gateway_config_service import get_gateway_config_service
         
@@ -320,6 +325,7 @@ async def delete_agent(ve_id: str):
         # Delete from database
         supabase.table("virtual_employees").delete().eq("id", ve_id).execute()
         logger.info(f"Deleted VE record {ve_id}")
+        await invalidate_all_agent_context()
         
         # Delete HTTPRoute and TrafficPolicy from Agent Gateway
         from app.services.gateway_config_service import get_gateway_config_service
@@ -1,11 +1,16 @@
 """Knowledge Base API routes"""
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List
-from app.schemas import KnowledgeBaseItemCreate, KnowledgeBaseItemResponse, KnowledgeSearchRequest, KnowledgeSearchResponse
+from app.schemas import (
+    KnowledgeBaseItemCreate, KnowledgeBaseItemResponse, KnowledgeBulkIngestRequest,
+    KnowledgeSearchRequest, KnowledgeSearchResponse
+)
 from app.core.database import get_supabase_admin
 from app.core.security import get_current_customer_id
 from app.services.embeddings_service import get_embeddings_service
 from datetime import datetime
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,6 +39,40 @@ async def add_knowledge_item(
         logger.error(f"Failed to add knowledge item: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to add knowledge item: {str(e)}")
 
+@router.post("/bulk")
+async def bulk_ingest_knowledge(
+    request: KnowledgeBulkIngestRequest,
+    stream: bool = Query(True, description="Stream progress as SSE; otherwise return the final summary"),
+    customer_id: str = Depends(get_current_customer_id)
+):
+    """
+    Bulk-ingest documents into the knowledge base.
+    Documents are chunked, embedded in provider batches and inserted with
+    multi-row inserts; progress events are streamed as they happen.
+    """
+    embeddings_service = get_embeddings_service()
+    events = embeddings_service.ingest_knowledge(
+        customer_id=customer_id,
+        items=[item.model_dump() for item in request.items],
+        chunk_size=request.chunk_size,
+        chunk_overlap=request.chunk_overlap
+    )
+    
+    if not stream:
+        final = None
+        async for event in events:
+            final = event
+        if not final or final["type"] == "error":
+            raise HTTPException(status_code=500, detail=f"Bulk ingestion failed: {(final or {}).get('content')}")
+        return final
+    
+    async def event_stream():
+        async for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @router.get("", response_model=List[KnowledgeBaseItemResponse])
 async def list_knowledge_items(
     customer_id: str = Depends(get_current_customer_id)
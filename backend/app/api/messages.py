@@ -3,7 +3,7 @@ from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from pydantic import BaseModel
 from ..core.security import get_current_user, verify_service_token
-from ..core.database import get_supabase_admin
+from ..core.database import get_async_supabase_admin
 from ..services.message_service import MessageService
 
 router = APIRouter(prefix="/api/messages", tags=["messages"])
@@ -25,7 +25,7 @@ async def delegate_task(
     Delegate a task to another agent.
     Called by Delegation MCP Server.
     """
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     message_service = MessageService(supabase)
     
     # Send message to target agent
@@ -55,7 +55,7 @@ async def send_message(
     Send a message to a VE.
     If to_ve_id is 'orchestrator', a new task is created and routed.
     """
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     message_service = MessageService(supabase)
     
     # Handle Orchestrator Routing (Create Task)
@@ -106,7 +106,7 @@ async def send_message_stream(
     """
     Send a message and stream the response (SSE).
     """
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     message_service = MessageService(supabase)
     
     # For now, orchestrator routing doesn't support streaming, so we handle it normally
@@ -117,15 +117,17 @@ async def send_message_stream(
         # For this phase, we focus on Agent streaming.
         pass
 
+    from app.services.stream_coalescer import sse_encode
+    
     return StreamingResponse(
-        message_service.send_message_stream(
+        sse_encode(message_service.send_message_stream(
             customer_id=user["id"],
             to_ve_id=message.to_ve_id,
             subject=message.subject,
             content=message.content,
             thread_id=message.thread_id,
             replied_to_id=message.replied_to_id
-        ),
+        )),
         media_type="text/event-stream"
     )
 
@@ -135,7 +137,7 @@ async def get_inbox(
     user = Depends(get_current_user)
 ):
     """Get messages inbox"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = MessageService(supabase)
     
     messages = await service.get_inbox(
@@ -151,7 +153,7 @@ async def get_thread(
     user = Depends(get_current_user)
 ):
     """Get messages in a thread"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = MessageService(supabase)
     
     messages = await service.get_thread(
@@ -167,7 +169,7 @@ async def mark_as_read(
     user = Depends(get_current_user)
 ):
     """Mark message as read"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = MessageService(supabase)
     
     result = await service.mark_as_read(
@@ -213,7 +215,7 @@ async def chat_with_ve(
         thread_id: str,
         channel: str
     ):
-        supabase = get_supabase_admin()
+        supabase = await get_async_supabase_admin()
         message_service = MessageService(supabase)
         centrifugo = get_centrifugo_client()
         
@@ -257,12 +259,12 @@ async def get_chat_history(
     user = Depends(get_current_user)
 ):
     """Get chat history with a specific VE"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     
     # Fetch messages where (from_ve_id = ve_id OR to_ve_id = ve_id) AND customer_id = user.id
     # Ordered by created_at ASC
     
-    response = supabase.table("messages")\
+    response = await supabase.table("messages")\
         .select("*")\
         .eq("customer_id", user["id"])\
         .or_(f"from_ve_id.eq.{ve_id},to_ve_id.eq.{ve_id}")\
@@ -296,11 +298,11 @@ async def delegate_to_agent(
     import logging
     logger = logging.getLogger(__name__)
     
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     
     try:
         # 1. Verify target agent exists and belongs to customer
-        ve_record = supabase.table("customer_ves")\
+        ve_record = await supabase.table("customer_ves")\
             .select("id, persona_name, agent_type")\
             .eq("id", request.target_agent_id)\
             .eq("customer_id", request.customer_id)\
@@ -3,7 +3,7 @@ from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from ..core.security import get_current_user
-from ..core.database import get_supabase_admin
+from ..core.database import get_async_supabase_admin
 from ..services.task_service import TaskService
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
@@ -16,7 +16,7 @@ async def create_task(
     user = Depends(get_current_user)
 ):
     """Create a new task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     result = await service.create_task(
@@ -35,7 +35,7 @@ async def create_task(
     if task.assigned_to_ve:
         try:
             # 1. Get VE details to find agent_type
-            ve_response = supabase.table("customer_ves")\
+            ve_response = await supabase.table("customer_ves")\
                 .select("agent_type, persona_name")\
                 .eq("id", task.assigned_to_ve)\
                 .single()\
@@ -104,7 +104,7 @@ async def get_tasks(
     user = Depends(get_current_user)
 ):
     """Get tasks with optional filters"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     tasks = await service.get_tasks(
@@ -122,7 +122,7 @@ async def update_task(
     user = Depends(get_current_user)
 ):
     """Update a task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     update_data = {k: v for k, v in updates.dict().items() if v is not None}
@@ -150,7 +150,7 @@ from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from ..core.security import get_current_user
-from ..core.database import get_supabase_admin
+from ..core.database import get_async_supabase_admin
 from ..services.task_service import TaskService
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
@@ -163,7 +163,7 @@ async def create_task(
     user = Depends(get_current_user)
 ):
     """Create a new task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     result = await service.create_task(
@@ -182,7 +182,7 @@ async def create_task(
     if task.assigned_to_ve:
         try:
             # 1. Get VE details to find agent_type
-            ve_response = supabase.table("customer_ves")\
+            ve_response = await supabase.table("customer_ves")\
                 .select("agent_type, persona_name")\
                 .eq("id", task.assigned_to_ve)\
                 .single()\
@@ -251,7 +251,7 @@ async def get_tasks(
     user = Depends(get_current_user)
 ):
     """Get tasks with optional filters"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     tasks = await service.get_tasks(
@@ -269,7 +269,7 @@ async def update_task(
     user = Depends(get_current_user)
 ):
     """Update a task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     update_data = {k: v for k, v in updates.dict().items() if v is not None}
@@ -292,7 +292,7 @@ async def add_comment(
     user = Depends(get_current_user)
 ):
     """Add a comment to a task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     result = await service.add_comment(
@@ -313,7 +313,7 @@ async def get_task_comments(
     user = Depends(get_current_user)
 ):
     """Get all comments/results for a task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     return await service.get_comments(task_id, user["id"])
@@ -351,8 +351,12 @@ async def delete_task(
         logger = logging.getLogger(__name__)
         logger.error(f"Error terminating workflows for task {task_id}: {e}")
 
-    # 2. Delete from Database
-    supabase = get_supabase_admin()
+    # 2. Free its admission slot, or drop it from the backlog so it never starts
+    from app.services.admission_control import get_admission_controller
+    await get_admission_controller().cancel(user["id"], task_id)
+
+    # 3. Delete from Database
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     result = await service.delete_task(
@@ -371,7 +375,7 @@ async def provide_task_feedback(
     user = Depends(get_current_user)
 ):
     """Provide feedback to a task (sends signal to workflow)"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     # We use CommentCreate schema for simplicity as it has 'content' field
@@ -389,7 +393,7 @@ async def approve_task_plan(
     user = Depends(get_current_user)
 ):
     """Approve the execution plan for a task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     success = await service.approve_plan(
@@ -405,7 +409,7 @@ async def get_task_plan(
     user = Depends(get_current_user)
 ):
     """Get the latest plan for a task"""
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = TaskService(supabase)
     
     plan = await service.get_task_plan(
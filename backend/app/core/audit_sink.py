@@ -0,0 +1,172 @@
+"""
+Security Audit Sink
+Buffered, batched writer for security_audit_log.
+
+Request handlers only append to an in-memory ring buffer; a background task
+writes multi-row INSERTs every AUDIT_FLUSH_INTERVAL or as soon as
+AUDIT_BATCH_SIZE records are waiting.
+
+Audit records must not be lost, so anything that can't reach the database -
+a failed insert, or the oldest records when the buffer is full - is appended
+to a local JSON-lines spill file (AUDIT_SPILL_PATH). The spill file is
+replayed into the database after the next successful flush.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = "security_audit_log"
+
+
+class AuditSink:
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_buffer: Optional[int] = None,
+        spill_path: Optional[str] = None
+    ):
+        self.batch_size = batch_size or settings.AUDIT_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.AUDIT_FLUSH_INTERVAL
+        self.max_buffer = max_buffer or settings.AUDIT_BUFFER_MAXSIZE
+        self.spill_path = spill_path or settings.AUDIT_SPILL_PATH
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._last_replay = 0.0
+        self.stats = {"recorded": 0, "written": 0, "spilled": 0, "replayed": 0, "flushes": 0}
+
+    def record(self, entry: Dict[str, Any]):
+        """Queue an audit record (never blocks on I/O in the common case)"""
+        self.stats["recorded"] += 1
+        if len(self._buffer) >= self.max_buffer:
+            # Database can't keep up: move the oldest half to disk
+            overflow = [self._buffer.popleft() for _ in range(max(1, self.max_buffer // 2))]
+            self._spill(overflow)
+        self._buffer.append(entry)
+        self._ensure_flusher()
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_flusher(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._buffer:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+
+    async def flush(self):
+        """Write everything buffered now, in batches; spill what fails"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            ok = True
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not await self._insert(batch):
+                    self._spill(batch)
+                    ok = False
+                    break
+            if not ok:
+                # Database down: park the rest on disk too
+                rest = list(self._buffer)
+                self._buffer.clear()
+                if rest:
+                    self._spill(rest)
+            elif self._has_spill() and time.monotonic() - self._last_replay > self.flush_interval:
+                await self._replay_spill()
+
+    def _has_spill(self) -> bool:
+        # ".replaying" is left behind if a replay was interrupted
+        return os.path.exists(self.spill_path) or os.path.exists(f"{self.spill_path}.replaying")
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> bool:
+        from app.core.database import get_async_supabase_admin
+        from app.core.telemetry import record_audit_flush
+
+        start = time.perf_counter()
+        try:
+            supabase = await get_async_supabase_admin()
+            await supabase.table(AUDIT_TABLE).insert(rows).execute()
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} audit records: {e}")
+            return False
+        self.stats["written"] += len(rows)
+        self.stats["flushes"] += 1
+        record_audit_flush(time.perf_counter() - start, len(rows))
+        return True
+
+    def _spill(self, rows: List[Dict[str, Any]]):
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+                f.flush()
+                os.fsync(f.fileno())
+            self.stats["spilled"] += len(rows)
+            logger.warning(f"Spilled {len(rows)} audit records to {self.spill_path}")
+        except Exception as e:
+            # Last resort: the records still reach the application log
+            logger.critical(f"Audit records could not be persisted ({e}): {rows}")
+
+    async def _replay_spill(self):
+        """Move spilled records back into the database"""
+        self._last_replay = time.monotonic()
+        replaying = f"{self.spill_path}.replaying"
+        try:
+            # Rename first so new spills go to a fresh file while we read
+            if not os.path.exists(replaying):
+                os.replace(self.spill_path, replaying)
+            with open(replaying, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            logger.error(f"Failed to read audit spill file: {e}")
+            return
+
+        replayed = 0
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if not await self._insert(batch):
+                self._spill(rows[start:])
+                break
+            replayed += len(batch)
+        os.remove(replaying)
+        self.stats["replayed"] += replayed
+        logger.info(f"Replayed {replayed}/{len(rows)} spilled audit records")
+
+    async def close(self):
+        """Flush on shutdown (whatever fails stays in the spill file)"""
+        if self._buffer:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queue_depth": len(self._buffer)}
+
+
+audit_sink = AuditSink()
+
+
+def get_audit_sink() -> AuditSink:
+    return audit_sink
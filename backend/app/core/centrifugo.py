@@ -1,47 +1,200 @@
 """
 Centrifugo Client
 Handles real-time publishing to Centrifugo
+
+Publishing never blocks the caller: events go into a bounded in-process
+queue and a background sender drains it every CENTRIFUGO_FRAME_INTERVAL
+(~50ms) into a single call to Centrifugo's batch API over the shared
+keep-alive HTTP pool.
+
+- Token events ("message" / "artifact" chunks) published back to back on the
+  same channel are merged into one frame per interval.
+- When the queue is full, token frames are dropped first (the final saved
+  message still reaches the client); otherwise the oldest event is evicted.
+- Publish latency (enqueue -> Centrifugo reply) and dropped frames are
+  exported as OTel metrics and kept in get_stats().
 """
+import asyncio
 import logging
-from cent import Client
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Streamed chunk events whose "content" can be concatenated
+TOKEN_EVENT_TYPES = {"message", "artifact"}
+
+
 class CentrifugoClient:
-    def __init__(self):
-        self.client = Client(
-            settings.CENTRIFUGO_API_URL,
-            api_key=settings.CENTRIFUGO_API_KEY,
-            timeout=5.0
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        frame_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_queue: Optional[int] = None
+    ):
+        self.api_url = api_url or settings.CENTRIFUGO_API_URL
+        self.api_key = api_key or settings.CENTRIFUGO_API_KEY
+        self.frame_interval = frame_interval if frame_interval is not None else settings.CENTRIFUGO_FRAME_INTERVAL
+        self.batch_size = batch_size or settings.CENTRIFUGO_BATCH_SIZE
+        self.max_queue = max_queue or settings.CENTRIFUGO_QUEUE_MAXSIZE
+
+        # Entries: {"command": {...}, "enqueued_at": float, "token": bool}
+        self._queue: Deque[Dict[str, Any]] = deque()
+        # channel -> queued token frame still open for merging
+        self._open_frames: Dict[str, Dict[str, Any]] = {}
+        self._sender: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"published": 0, "merged": 0, "dropped": 0, "batches": 0, "failed": 0}
+        logger.info(f"Centrifugo client initialized: {self.api_url}")
+
+    def _http(self):
+        from app.core.http_pool import get_http_pool
+        return get_http_pool().get_client(
+            self.api_url,
+            timeout=settings.CENTRIFUGO_TIMEOUT,
+            headers={"X-API-Key": self.api_key}
         )
-        logger.info(f"Centrifugo client initialized: {settings.CENTRIFUGO_API_URL}")
 
-    def publish(self, channel: str, data: dict):
+    async def publish(self, channel: str, data: dict):
         """
-        Publish data to a channel (synchronous)
+        Publish data to a channel (non-blocking: queued and sent in the next batch)
         """
-        try:
-            # cent library API: client.publish(channel, data)
-            result = self.client.publish(channel, data)
-            logger.info(f"✅ Published to Centrifugo channel: {channel}")
-            return result
-        except AttributeError as e:
-            # If publish doesn't exist, try the HTTP API directly
-            logger.warning(f"Centrifugo publish method not available: {e}")
-            logger.info("Real-time updates disabled - Centrifugo not configured")
-        except Exception as e:
-            logger.error(f"Failed to publish to Centrifugo channel {channel}: {e}")
-            # Don't raise, just log. Real-time delivery is best-effort.
+        self.publish_nowait(channel, data)
 
-    def broadcast(self, channels: list[str], data: dict):
+    async def broadcast(self, channels: list[str], data: dict):
         """
-        Broadcast data to multiple channels (synchronous)
+        Broadcast data to multiple channels (non-blocking)
         """
+        self._enqueue({"broadcast": {"channels": list(channels), "data": data}}, channel=None, token=False)
+
+    def publish_nowait(self, channel: str, data: dict):
+        """Synchronous variant of publish() for code that isn't awaiting"""
+        if self._is_token(data):
+            frame = self._open_frames.get(channel)
+            if frame is not None and frame["command"]["publish"]["data"]["type"] == data["type"]:
+                frame["command"]["publish"]["data"]["content"] += data["content"]
+                self.stats["merged"] += 1
+                return
+            # Copy: the frame's content is appended to in place
+            self._enqueue({"publish": {"channel": channel, "data": dict(data)}}, channel=channel, token=True)
+        else:
+            self._enqueue({"publish": {"channel": channel, "data": data}}, channel=channel, token=False)
+
+    @staticmethod
+    def _is_token(data: Any) -> bool:
+        return (
+            isinstance(data, dict)
+            and data.get("type") in TOKEN_EVENT_TYPES
+            and isinstance(data.get("content"), str)
+        )
+
+    def _enqueue(self, command: Dict[str, Any], channel: Optional[str], token: bool):
+        if len(self._queue) >= self.max_queue and not self._make_room(token):
+            self._record_drop("queue_full")
+            return
+
+        entry = {"command": command, "enqueued_at": time.monotonic(), "token": token}
+        self._queue.append(entry)
+        if channel is not None:
+            # Any event on a channel closes its open token frame (keeps ordering)
+            if token:
+                self._open_frames[channel] = entry
+            else:
+                self._open_frames.pop(channel, None)
+        self._ensure_sender()
+
+    def _make_room(self, incoming_token: bool) -> bool:
+        """Backpressure: shed a queued token frame, or the oldest event"""
+        if incoming_token:
+            # New tokens are the cheapest thing to lose
+            return False
+        for entry in self._queue:
+            if entry["token"]:
+                self._queue.remove(entry)
+                self._forget_frame(entry)
+                self._record_drop("backpressure")
+                return True
+        oldest = self._queue.popleft()
+        self._forget_frame(oldest)
+        self._record_drop("backpressure")
+        return True
+
+    def _forget_frame(self, entry: Dict[str, Any]):
+        publish = entry["command"].get("publish")
+        if publish and self._open_frames.get(publish["channel"]) is entry:
+            del self._open_frames[publish["channel"]]
+
+    def _record_drop(self, reason: str):
+        self.stats["dropped"] += 1
         try:
-            return self.client.broadcast(channels, data)
+            from app.core.telemetry import record_centrifugo_dropped
+            record_centrifugo_dropped(reason)
+        except Exception:
+            pass
+
+    def _ensure_sender(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (sync caller): the next publish from async code sends it
+            return
+        if self._sender is None or self._sender.done() or self._loop is not loop:
+            self._loop = loop
+            self._sender = loop.create_task(self._send_loop())
+
+    async def _send_loop(self):
+        while self._queue:
+            # Wait one frame so tokens and bursts coalesce
+            await asyncio.sleep(self.frame_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Send everything queued right now (one batch request per batch_size)"""
+        # Frames handed to the sender can no longer grow
+        self._open_frames.clear()
+        while self._queue:
+            batch: List[Dict[str, Any]] = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            await self._send_batch(batch)
+
+    async def _send_batch(self, batch: List[Dict[str, Any]]):
+        from app.core.telemetry import record_centrifugo_publish
+
+        try:
+            response = await self._http().post(
+                "/batch",
+                json={"commands": [entry["command"] for entry in batch], "parallel": False}
+            )
+            response.raise_for_status()
+            replies = response.json().get("replies", [])
+            errors = [r["error"] for r in replies if isinstance(r, dict) and r.get("error")]
+            if errors:
+                self.stats["failed"] += len(errors)
+                logger.warning(f"Centrifugo rejected {len(errors)}/{len(batch)} commands: {errors[0]}")
+            self.stats["published"] += len(batch) - len(errors)
+            self.stats["batches"] += 1
+
+            now = time.monotonic()
+            for entry in batch:
+                record_centrifugo_publish(now - entry["enqueued_at"])
         except Exception as e:
-            logger.error(f"Failed to broadcast to Centrifugo: {e}")
+            # Real-time delivery is best-effort: log and move on
+            self.stats["failed"] += len(batch)
+            logger.error(f"Failed to publish batch of {len(batch)} to Centrifugo: {e}")
+
+    async def close(self):
+        """Send whatever is still queued (call on shutdown)"""
+        if self._queue:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queued": len(self._queue)}
 
 centrifugo_client = CentrifugoClient()
 
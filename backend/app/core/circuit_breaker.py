@@ -1,34 +1,83 @@
 """
 Circuit Breaker for Intelligent Delegation
 Prevents infinite recursion and resource exhaustion
+
+Rate limits are true sliding windows shared by every API replica and
+Temporal worker: each delegation is a member of a Redis sorted set scored by
+its timestamp, and one Lua script prunes, counts and records atomically for
+both the customer and the agent window (O(log n) per check, no global reset).
+If Redis is unreachable the breaker falls back to an in-process window.
+"""
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# KEYS: customer window, agent window
+# ARGV: now_ms, window_ms, customer_limit, agent_limit, member
+# Returns {allowed, blocked_by (0 none / 1 customer / 2 agent), count}
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cutoff = now - window
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', cutoff)
+local customer_count = redis.call('ZCARD', KEYS[1])
+if customer_count >= tonumber(ARGV[3]) then
+    return {0, 1, customer_count}
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', cutoff)
+local agent_count = redis.call('ZCARD', KEYS[2])
+if agent_count >= tonumber(ARGV[4]) then
+    return {0, 2, agent_count}
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[5])
+redis.call('ZADD', KEYS[2], now, ARGV[5])
+redis.call('PEXPIRE', KEYS[1], window)
+redis.call('PEXPIRE', KEYS[2], window)
+return {1, 0, customer_count + 1}
 """
-from datetime import datetime, timedelta
-from typing import Dict, Optional
-import asyncio
 
 
 class DelegationCircuitBreaker:
     """
     Circuit breaker to prevent runaway delegation.
-    
+
     Tracks:
     - Delegation depth per workflow
-    - Total delegations per customer
-    - Delegation rate per agent type
+    - Total delegations per customer (sliding window)
+    - Delegation rate per agent type (sliding window)
     """
-    
+
+    KEY_PREFIX = "delegation_cb"
+
     def __init__(self):
-        self.workflow_depths: Dict[str, int] = {}
-        self.customer_counts: Dict[str, int] = {}
-        self.agent_rates: Dict[str, list] = {}
-        self.reset_time = datetime.now()
-        
         # Thresholds
         self.MAX_DEPTH = 5
-        self.MAX_CUSTOMER_DELEGATIONS = 100  # Per hour
-        self.MAX_AGENT_RATE = 50  # Per agent per hour
-        self.RESET_INTERVAL = timedelta(hours=1)
-    
+        self.MAX_CUSTOMER_DELEGATIONS = 100  # Per window
+        self.MAX_AGENT_RATE = 50  # Per agent per window
+        self.WINDOW_SECONDS = 3600
+
+        self._script = None
+        # Fallback windows when Redis is unavailable (this process only)
+        self._local_windows: Dict[str, Deque[float]] = {}
+
+    def _customer_key(self, customer_id: str) -> str:
+        return f"{self.KEY_PREFIX}:customer:{customer_id}"
+
+    def _agent_key(self, agent_type: str) -> str:
+        return f"{self.KEY_PREFIX}:agent:{agent_type}"
+
+    async def _redis_client(self):
+        from app.services.redis_queue_service import get_redis_queue_service
+        redis_service = await get_redis_queue_service()
+        return redis_service.redis_client
+
     async def check_and_record(
         self,
         workflow_id: str,
@@ -38,60 +87,97 @@ class DelegationCircuitBreaker:
     ) -> tuple[bool, Optional[str]]:
         """
         Check if delegation should be allowed.
-        
+
         Returns:
             (allowed: bool, reason: Optional[str])
         """
-        # Reset counters if interval passed
-        if datetime.now() - self.reset_time > self.RESET_INTERVAL:
-            self._reset_counters()
-        
         # Check 1: Depth limit
         if delegation_depth > self.MAX_DEPTH:
             return False, f"Max delegation depth ({self.MAX_DEPTH}) exceeded"
-        
-        # Check 2: Customer delegation limit
-        customer_count = self.customer_counts.get(customer_id, 0)
-        if customer_count >= self.MAX_CUSTOMER_DELEGATIONS:
+
+        customer_key = self._customer_key(customer_id)
+        agent_key = self._agent_key(agent_type)
+
+        # Checks 2 + 3: customer and agent sliding windows (atomic, shared)
+        try:
+            blocked_by = await self._check_redis(customer_key, agent_key, workflow_id)
+        except Exception as e:
+            logger.warning(f"Delegation limiter falling back to local window: {e}")
+            blocked_by = self._check_local(customer_key, agent_key)
+
+        if blocked_by == 1:
             return False, f"Customer delegation limit ({self.MAX_CUSTOMER_DELEGATIONS}/hour) exceeded"
-        
-        # Check 3: Agent rate limit
-        agent_delegations = self.agent_rates.get(agent_type, [])
-        recent_delegations = [
-            ts for ts in agent_delegations
-            if datetime.now() - ts < self.RESET_INTERVAL
-        ]
-        if len(recent_delegations) >= self.MAX_AGENT_RATE:
+        if blocked_by == 2:
             return False, f"Agent rate limit ({self.MAX_AGENT_RATE}/hour) exceeded for {agent_type}"
-        
-        # Record delegation
-        self.workflow_depths[workflow_id] = delegation_depth
-        self.customer_counts[customer_id] = customer_count + 1
-        
-        if agent_type not in self.agent_rates:
-            self.agent_rates[agent_type] = []
-        self.agent_rates[agent_type].append(datetime.now())
-        
         return True, None
-    
-    def _reset_counters(self):
-        """Reset all counters"""
-        self.workflow_depths.clear()
-        self.customer_counts.clear()
-        self.agent_rates.clear()
-        self.reset_time = datetime.now()
-    
-    def get_stats(self) -> Dict:
-        """Get current circuit breaker statistics"""
-        return {
-            "active_workflows": len(self.workflow_depths),
-            "customer_counts": dict(self.customer_counts),
-            "agent_rates": {
-                agent: len([ts for ts in times if datetime.now() - ts < self.RESET_INTERVAL])
-                for agent, times in self.agent_rates.items()
-            },
-            "reset_time": self.reset_time.isoformat()
+
+    async def _check_redis(self, customer_key: str, agent_key: str, workflow_id: str) -> int:
+        client = await self._redis_client()
+        if client is None:
+            raise ConnectionError("Redis not connected")
+        if self._script is None:
+            self._script = client.register_script(SLIDING_WINDOW_LUA)
+
+        # Unique member: the same workflow may delegate more than once
+        member = f"{workflow_id}:{uuid.uuid4().hex}"
+        allowed, blocked_by, _ = await self._script(
+            keys=[customer_key, agent_key],
+            args=[
+                int(time.time() * 1000),
+                self.WINDOW_SECONDS * 1000,
+                self.MAX_CUSTOMER_DELEGATIONS,
+                self.MAX_AGENT_RATE,
+                member
+            ]
+        )
+        return int(blocked_by)
+
+    def _window(self, key: str, now: float) -> Deque[float]:
+        window = self._local_windows.setdefault(key, deque())
+        cutoff = now - self.WINDOW_SECONDS
+        while window and window[0] <= cutoff:
+            window.popleft()
+        return window
+
+    def _check_local(self, customer_key: str, agent_key: str) -> int:
+        now = time.time()
+        customer_window = self._window(customer_key, now)
+        if len(customer_window) >= self.MAX_CUSTOMER_DELEGATIONS:
+            return 1
+        agent_window = self._window(agent_key, now)
+        if len(agent_window) >= self.MAX_AGENT_RATE:
+            return 2
+        customer_window.append(now)
+        agent_window.append(now)
+        return 0
+
+    async def get_stats(self, customer_id: Optional[str] = None, agent_type: Optional[str] = None) -> Dict:
+        """Get current sliding-window counts for a customer and/or agent type"""
+        keys = {}
+        if customer_id:
+            keys["customer_count"] = self._customer_key(customer_id)
+        if agent_type:
+            keys["agent_count"] = self._agent_key(agent_type)
+
+        stats: Dict = {
+            "window_seconds": self.WINDOW_SECONDS,
+            "max_customer_delegations": self.MAX_CUSTOMER_DELEGATIONS,
+            "max_agent_rate": self.MAX_AGENT_RATE
         }
+        now = time.time()
+        try:
+            client = await self._redis_client()
+            if client is None:
+                raise ConnectionError("Redis not connected")
+            cutoff_ms = int((now - self.WINDOW_SECONDS) * 1000)
+            for name, key in keys.items():
+                stats[name] = await client.zcount(key, f"({cutoff_ms}", "+inf")
+            stats["backend"] = "redis"
+        except Exception:
+            for name, key in keys.items():
+                stats[name] = len(self._window(key, now))
+            stats["backend"] = "local"
+        return stats
 
 
 # Global circuit breaker instance
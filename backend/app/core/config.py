@@ -2,7 +2,7 @@
 Application configuration
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -27,29 +27,110 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_HTTP_TIMEOUT: float = 30.0  # PostgREST request timeout for async clients
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Task queue (Redis Streams, one per priority)
+    TASK_QUEUE_VISIBILITY_TIMEOUT: float = 300.0  # seconds unacked before another worker reclaims a task
+    TASK_QUEUE_HEARTBEAT_INTERVAL: float = 60.0  # seconds between idle-time resets of held tasks; < visibility timeout
+    TASK_QUEUE_MAX_ATTEMPTS: int = 3  # deliveries before a task goes to the dead-letter stream
+    TASK_QUEUE_MAXLEN: int = 100000  # approximate cap per stream
+    TASK_QUEUE_BATCH_SIZE: int = 10  # max tasks per read (also capped by free executor slots)
+    TASK_QUEUE_CONSUMER_NAME: str = ""  # defaults to hostname:pid
+    
+    # Task worker scheduling
+    TASK_WORKER_CONCURRENCY: int = 16  # tasks in flight per worker process
+    TASK_CUSTOMER_CONCURRENCY: int = 4  # per customer, per worker process
+    TASK_SCHEDULER_MODE: str = "weighted"  # "weighted" (fair share by weight) or "strict" priority
+    TASK_PRIORITY_WEIGHTS: Dict[str, int] = {"urgent": 8, "high": 4, "medium": 2, "low": 1}
+    TASK_WORKER_DRAIN_TIMEOUT: float = 30.0  # seconds to let in-flight tasks finish on shutdown
+    
     # JWT
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
+    JWT_AUDIENCE: str = "authenticated"  # Supabase access tokens; "" skips the aud check
+    JWT_SECRET_ENCODING: str = "auto"  # "raw", "base64", or "auto" (pinned on first valid token)
+    SUPABASE_JWKS_URL: str = ""  # defaults to {SUPABASE_URL}/auth/v1/.well-known/jwks.json
+    JWKS_CACHE_TTL: float = 600.0  # seconds
+    JWKS_MIN_REFRESH_INTERVAL: float = 30.0  # unknown "kid" refetch limit
+    JWT_CLAIMS_CACHE_TTL: float = 60.0  # validated token -> claims
+    JWT_CLAIMS_CACHE_MAXSIZE: int = 10000
+    JWT_REMOTE_FALLBACK_ENABLED: bool = False  # verify via supabase.auth.get_user when local fails
+    JWT_REMOTE_FALLBACK_PER_MINUTE: int = 30  # per process
     
     # Kubernetes
     K8S_API_URL: str = "https://localhost:6443"
     K8S_NAMESPACE_PREFIX: str = "customer-"
+    KAGENT_NAMESPACE: str = "kagent"  # shared agents
+    K8S_WATCH_TIMEOUT: int = 300  # seconds per watch request; resumed from the last resourceVersion
+    K8S_RESYNC_INTERVAL: float = 1800.0  # seconds between full relists
+    KAGENT_INDEX_SYNC_TIMEOUT: float = 10.0  # seconds a read waits for the first CRD list
+    TOOL_SEARCH_FUZZY_CUTOFF: float = 0.75  # difflib similarity for misspelled tool search terms
+    AGENT_HEALTH_FLUSH_INTERVAL: float = 5.0  # seconds; agent readiness changes are written in bulk
     
     # Agent Gateway
     # Agent Gateway
     AGENT_GATEWAY_URL: str = os.getenv("AGENT_GATEWAY_URL", "http://localhost:8080")
     AGENT_GATEWAY_AUTH_TOKEN: str = os.getenv("AGENT_GATEWAY_AUTH_TOKEN", "dev-token")
+
+    # Agent Gateway circuit breakers (one per agent type, state shared via Redis)
+    GATEWAY_BREAKER_FAILURE_RATE: float = 0.5  # failure share over the window that opens it
+    GATEWAY_BREAKER_MIN_CALLS: int = 5  # calls in the window before the rate counts
+    GATEWAY_BREAKER_WINDOW: int = 60  # seconds
+    GATEWAY_BREAKER_RECOVERY_TIMEOUT: int = 30  # seconds OPEN before probing
+    GATEWAY_BREAKER_HALF_OPEN_PROBES: int = 1
+    GATEWAY_BREAKER_PER_CUSTOMER: bool = False  # key by agent type + customer
+
+    # API key verification cache (agent / MCP auth)
+    API_KEY_CACHE_TTL: float = 60.0  # seconds a verified key is trusted without a lookup
+    API_KEY_NEGATIVE_CACHE_TTL: float = 10.0  # seconds an unknown key is rejected without a lookup
+    API_KEY_CACHE_MAXSIZE: int = 10000
+    API_KEY_LAST_USED_FLUSH_INTERVAL: float = 30.0  # last_used_at write-behind
+
+    # Leakage enforcement on streamed agent output: "redact", "abort" or "off"
+    LEAKAGE_STREAM_MODE: str = "redact"
+
+    # Security audit log sink (ContextEnforcementMiddleware)
+    AUDIT_BATCH_SIZE: int = 200  # rows per insert
+    AUDIT_FLUSH_INTERVAL: float = 1.0  # seconds
+    AUDIT_BUFFER_MAXSIZE: int = 10000  # in memory; overflow spills to disk
+    AUDIT_SPILL_PATH: str = "/tmp/ve-security-audit-spill.jsonl"  # mount a volume in production
+
+    # Users allowed on /api/admin (in addition to app_metadata.role == "admin")
+    ADMIN_USER_IDS: List[str] = []
+
+    # Shared HTTP connection pools (Agent Gateway and other upstreams)
+    HTTP_POOL_HTTP2: bool = True
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept per host
+    HTTP_POOL_TIMEOUT: float = 60.0
+    HTTP_POOL_CONNECT_TIMEOUT: float = 5.0
+    HTTP_POOL_ACQUIRE_TIMEOUT: float = 10.0  # max wait for a free connection
+    
+    # Agent team-context cache (injected into every agent prompt)
+    AGENT_CONTEXT_CACHE_TTL: int = 300  # Redis tier, seconds
+    AGENT_CONTEXT_LOCAL_TTL: float = 30.0  # in-process tier, seconds
     
     # LLM Providers (API-agnostic)
     GOOGLE_API_KEY: str = ""  # For Gemini embeddings and LLM
     OPENAI_API_KEY: str = ""  # For OpenAI embeddings and LLM
     ANTHROPIC_API_KEY: str = ""  # For Claude LLM
     
+    # Embeddings / bulk knowledge ingestion
+    EMBEDDING_DIMENSIONS: int = 768  # requested from every provider; must match vector(N) in migration 007
+    EMBEDDING_BATCH_CONCURRENCY: int = 4  # provider batch requests in flight
+    KNOWLEDGE_CHUNK_SIZE: int = 2000  # characters per chunk
+    KNOWLEDGE_CHUNK_OVERLAP: int = 200
+    KNOWLEDGE_INSERT_BATCH_SIZE: int = 200  # rows per multi-row insert
+    EMBEDDING_CACHE_TTL: int = 604800  # Redis tier, seconds (7 days)
+    EMBEDDING_CACHE_LOCAL_MAXSIZE: int = 10000  # vectors held in-process
+    EMBEDDING_CACHE_LOCAL_TTL: float = 3600.0
+    EMBEDDING_CACHE_DTYPE: str = "float32"  # or "float16" to halve storage
+    
     # Token Pricing (per 1K tokens)
     GPT4_INPUT_PRICE: float = 0.03
     GPT4_OUTPUT_PRICE: float = 0.06
@@ -66,10 +147,46 @@ class Settings(BaseSettings):
     # Centrifugo
     CENTRIFUGO_API_URL: str = "http://localhost:8000/api"
     CENTRIFUGO_API_KEY: str = "centrifugo-api-key"
+    CENTRIFUGO_TIMEOUT: float = 5.0
+    CENTRIFUGO_FRAME_INTERVAL: float = 0.05  # seconds; tokens are merged into one frame per interval
+    CENTRIFUGO_BATCH_SIZE: int = 100  # commands per batch API call
+    CENTRIFUGO_QUEUE_MAXSIZE: int = 10000
+    
+    # Agent token streams: coalesce chunks into frames, bounded read-ahead
+    STREAM_FRAME_MAX_CHARS: int = 512
+    STREAM_FRAME_MAX_DELAY: float = 0.05  # seconds
+    STREAM_BUFFER_MAX_EVENTS: int = 256
 
     # Temporal
     TEMPORAL_HOST: str = "localhost:7233"
     TEMPORAL_NAMESPACE: str = "default"
+    TEMPORAL_TASK_QUEUE: str = "campaign-queue"  # default queue; also the one this worker polls
+    
+    # Orchestrator workflow admission: per-customer in-flight quotas and fair-share weights by tier
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_TIER_QUOTAS: Dict[str, int] = {"free": 2, "starter": 5, "pro": 10, "enterprise": 25}
+    ADMISSION_DEFAULT_QUOTA: int = 3
+    ADMISSION_TIER_WEIGHTS: Dict[str, int] = {"free": 1, "starter": 2, "pro": 4, "enterprise": 8}
+    ADMISSION_GLOBAL_LIMIT: int = 200  # workflows in flight across all customers
+    ADMISSION_SLOT_TTL: float = 3600.0  # seconds without a status update; frees slots of crashed workflows
+    ADMISSION_PUMP_INTERVAL: float = 30.0  # seconds between periodic backlog pumps
+    ADMISSION_TIER_TASK_QUEUES: Dict[str, str] = {}  # e.g. {"enterprise": "campaign-queue-premium"}
+    ADMISSION_POSITION_UPDATES: int = 50  # queued tasks per customer notified when the queue moves
+    
+    # Parallel delegation: max concurrent branches per customer, by subscription tier
+    PARALLEL_BRANCH_LIMITS: Dict[str, int] = {"free": 2, "starter": 3, "pro": 5, "enterprise": 8}
+    PARALLEL_BRANCH_DEFAULT_LIMIT: int = 3
+    
+    # Delegation decisions: cache + local fast-path classifier before the LLM
+    DELEGATION_DECISION_CACHE_TTL: int = 3600  # Redis tier, seconds
+    DELEGATION_DECISION_LOCAL_TTL: float = 300.0
+    DELEGATION_FAST_PATH_ENABLED: bool = True
+    DELEGATION_FAST_PATH_CONFIDENCE: float = 0.8  # below this, ask the LLM
+    
+    # Task status writer: coalesce per-task updates and flush in batches
+    TASK_STATUS_COALESCE_WINDOW: float = 0.25  # seconds
+    TASK_STATUS_BATCH_SIZE: int = 100
+    TASK_STATUS_VE_MAP_TTL: float = 60.0  # agent_type -> customer_ves.id, per customer
     
     class Config:
         env_file = [".env", "../.env"]
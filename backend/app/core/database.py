@@ -1,28 +1,87 @@
 """
 Database connection and session management
+
+Two flavours of Supabase client are exposed:
+- Async clients (get_async_supabase / get_async_supabase_admin): PostgREST
+  calls are awaited over a shared, keep-alive httpx pool, so queries never
+  block the event loop. Use these from any `async def` code path.
+- Sync clients (get_supabase / get_supabase_admin): kept for scripts and
+  routes that have not been migrated yet. Created lazily on first use.
 """
-from supabase import create_client, Client
+import asyncio
+from typing import Optional
+from supabase import create_client, Client, acreate_client, AsyncClient, AsyncClientOptions
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Supabase client (for auth and real-time)
-supabase: Client = create_client(
-    settings.SUPABASE_URL,
-    settings.SUPABASE_ANON_KEY
-)
+_supabase: Optional[Client] = None
+_supabase_admin: Optional[Client] = None
+
+_async_supabase: Optional[AsyncClient] = None
+_async_supabase_admin: Optional[AsyncClient] = None
+_async_init_lock = asyncio.Lock()
 
-# Supabase admin client (for service operations)
-supabase_admin: Client = create_client(
-    settings.SUPABASE_URL,
-    settings.SUPABASE_SERVICE_KEY
-)
 
 def get_supabase() -> Client:
-    """Get Supabase client"""
-    return supabase
+    """Get Supabase client (sync, for auth and real-time)"""
+    global _supabase
+    if _supabase is None:
+        _supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+    return _supabase
+
 
 def get_supabase_admin() -> Client:
-    """Get Supabase admin client"""
-    return supabase_admin
+    """Get Supabase admin client (sync, for service operations)"""
+    global _supabase_admin
+    if _supabase_admin is None:
+        _supabase_admin = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    return _supabase_admin
+
+
+async def _create_async_client(key: str) -> AsyncClient:
+    from app.core.http_pool import get_http_pool
+
+    # All PostgREST traffic shares one pooled keep-alive client per process
+    http_client = get_http_pool().get_client(
+        settings.SUPABASE_URL,
+        timeout=settings.DB_HTTP_TIMEOUT
+    )
+    return await acreate_client(
+        settings.SUPABASE_URL,
+        key,
+        options=AsyncClientOptions(httpx_client=http_client)
+    )
+
+
+async def get_async_supabase() -> AsyncClient:
+    """Get async Supabase client (anon key)"""
+    global _async_supabase
+    if _async_supabase is None:
+        async with _async_init_lock:
+            if _async_supabase is None:
+                _async_supabase = await _create_async_client(settings.SUPABASE_ANON_KEY)
+                logger.info("Async Supabase client initialized")
+    return _async_supabase
+
+
+async def get_async_supabase_admin() -> AsyncClient:
+    """Get async Supabase admin client (service key)"""
+    global _async_supabase_admin
+    if _async_supabase_admin is None:
+        async with _async_init_lock:
+            if _async_supabase_admin is None:
+                _async_supabase_admin = await _create_async_client(settings.SUPABASE_SERVICE_KEY)
+                logger.info("Async Supabase admin client initialized")
+    return _async_supabase_admin
+
+
+def reset_async_clients():
+    """
+    Drop cached async clients (their pooled httpx client is closed by
+    HTTPClientPool.close_all on shutdown)
+    """
+    global _async_supabase, _async_supabase_admin
+    _async_supabase = None
+    _async_supabase_admin = None
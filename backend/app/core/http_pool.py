@@ -0,0 +1,190 @@
+"""
+Shared HTTP Connection Pools
+Lifecycle-managed, keep-alive (and HTTP/2 where available) httpx clients,
+one per upstream base URL, so hot paths such as the Agent Gateway don't pay
+a TCP/TLS handshake on every call.
+"""
+import importlib.util
+import logging
+import time
+from typing import Dict, Any, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional 'h2' package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body wrapper that fires a callback exactly once on close"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps httpx.AsyncHTTPTransport to track in-flight requests and the time
+    spent waiting for response headers (pool acquire + upstream TTFB).
+    """
+
+    def __init__(self, name: str, transport: httpx.AsyncHTTPTransport):
+        self.name = name
+        self._transport = transport
+        self.in_flight = 0
+        self.total_requests = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.total_requests += 1
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        self._record_wait(time.perf_counter() - start)
+
+        # Streams stay in flight until the body is closed
+        response.stream = _TrackedStream(response.stream, self._release)
+        return response
+
+    def _release(self):
+        self.in_flight -= 1
+
+    def _record_wait(self, elapsed: float):
+        self.total_wait_seconds += elapsed
+        self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+
+        from app.core.telemetry import record_http_pool_wait
+        record_http_pool_wait(self.name, elapsed)
+
+    def connection_counts(self) -> Dict[str, int]:
+        """Count open connections in the underlying httpcore pool"""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HTTPClientPool:
+    """
+    Registry of shared AsyncClients keyed by base URL.
+
+    Clients are created lazily on first use and closed together on
+    FastAPI / worker shutdown via close_all().
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, InstrumentedTransport] = {}
+
+    def get_client(
+        self,
+        base_url: str,
+        timeout: Optional[float] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.AsyncClient:
+        """
+        Get (or create) the shared client for a base URL.
+
+        Args:
+            base_url: Upstream base URL, e.g. http://agent-gateway:8080
+            timeout: Read timeout in seconds (defaults to HTTP_POOL_TIMEOUT)
+            headers: Default headers applied to every request
+        """
+        client = self._clients.get(base_url)
+        if client is not None and not client.is_closed:
+            return client
+
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY
+        )
+        http2 = settings.HTTP_POOL_HTTP2 and HTTP2_AVAILABLE
+        if settings.HTTP_POOL_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but 'h2' is not installed; falling back to HTTP/1.1")
+
+        transport = InstrumentedTransport(
+            base_url,
+            httpx.AsyncHTTPTransport(limits=limits, http2=http2, retries=1)
+        )
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            transport=transport,
+            timeout=httpx.Timeout(
+                timeout or settings.HTTP_POOL_TIMEOUT,
+                connect=settings.HTTP_POOL_CONNECT_TIMEOUT,
+                pool=settings.HTTP_POOL_ACQUIRE_TIMEOUT
+            )
+        )
+        self._clients[base_url] = client
+        self._transports[base_url] = transport
+        logger.info(
+            f"HTTP pool created for {base_url} (http2={http2}, "
+            f"max_connections={limits.max_connections}, keepalive={limits.max_keepalive_connections})"
+        )
+        return client
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-pool metrics: in-flight requests, open/idle connections, wait time"""
+        stats = {}
+        for base_url, transport in self._transports.items():
+            counts = transport.connection_counts()
+            avg_wait = (
+                transport.total_wait_seconds / transport.total_requests
+                if transport.total_requests else 0.0
+            )
+            stats[base_url] = {
+                "in_use": transport.in_flight,
+                "idle": counts["idle"],
+                "open_connections": counts["open"],
+                "total_requests": transport.total_requests,
+                "avg_wait_ms": round(avg_wait * 1000, 2),
+                "max_wait_ms": round(transport.max_wait_seconds * 1000, 2)
+            }
+        return stats
+
+    async def close_all(self):
+        """Gracefully close every pooled client (call on shutdown)"""
+        for base_url, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+                logger.info(f"HTTP pool closed for {base_url}")
+            except Exception as e:
+                logger.warning(f"Error closing HTTP pool for {base_url}: {e}")
+        self._clients.clear()
+        self._transports.clear()
+
+
+# Global pool registry
+_http_pool = HTTPClientPool()
+
+
+def get_http_pool() -> HTTPClientPool:
+    """Get the global HTTP client pool registry"""
+    return _http_pool
@@ -0,0 +1,215 @@
+"""
+Kubernetes Informer
+List + watch cache for one custom resource type.
+
+The informer lists the resource once, then follows a watch from the list's
+resourceVersion and keeps every object in memory keyed by "namespace/name".
+Handlers are called with ("ADDED" | "MODIFIED" | "DELETED", obj, old) for
+each change, on the event loop.
+
+The Kubernetes client is synchronous, so the list and the watch stream run
+in a daemon thread (a watch blocks for up to K8S_WATCH_TIMEOUT and must not
+hold up interpreter exit); events are handed to the loop with
+call_soon_threadsafe. Each watch request ends after K8S_WATCH_TIMEOUT and
+is resumed from the last resourceVersion; if that version is too old
+(410 Gone) the informer relists. A full relist also runs every
+K8S_RESYNC_INTERVAL, and the differences are delivered as ordinary events,
+so handlers never miss a deletion that happened while disconnected.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, Dict[str, Any], Optional[Dict[str, Any]]], None]
+
+
+def object_key(obj: Dict[str, Any]) -> str:
+    metadata = obj.get("metadata") or {}
+    return f"{metadata.get('namespace', '')}/{metadata.get('name', '')}"
+
+
+class ResourceGone(Exception):
+    """The watch resourceVersion expired (410): relist"""
+
+
+class ResourceInformer:
+    def __init__(
+        self,
+        custom_api,
+        group: str,
+        version: str,
+        plural: str,
+        namespace: Optional[str] = None,
+        watch_timeout: Optional[int] = None,
+        resync_interval: Optional[float] = None
+    ):
+        self.custom_api = custom_api
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self.namespace = namespace
+        self.watch_timeout = watch_timeout or settings.K8S_WATCH_TIMEOUT
+        self.resync_interval = resync_interval or settings.K8S_RESYNC_INTERVAL
+        self.resource_version: Optional[str] = None
+        self.running = False
+        self.synced = asyncio.Event()
+        self._objects: Dict[str, Dict[str, Any]] = {}
+        self._handlers: List[Handler] = []
+        self._watch = None
+        self.stats = {"lists": 0, "watches": 0, "events": 0, "relists_gone": 0}
+
+    @property
+    def resource(self) -> str:
+        return f"{self.plural}.{self.group}"
+
+    def add_handler(self, handler: Handler):
+        self._handlers.append(handler)
+
+    def get(self, namespace: str, name: str) -> Optional[Dict[str, Any]]:
+        return self._objects.get(f"{namespace}/{name}")
+
+    def items(self) -> List[Dict[str, Any]]:
+        return list(self._objects.values())
+
+    async def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        try:
+            await asyncio.wait_for(self.synced.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _list_call(self):
+        if self.namespace:
+            return self.custom_api.list_namespaced_custom_object, (self.group, self.version, self.namespace, self.plural)
+        return self.custom_api.list_cluster_custom_object, (self.group, self.version, self.plural)
+
+    async def run(self):
+        """List, then watch until stop(); relists on 410 and every resync interval"""
+        self.running = True
+        backoff = 1.0
+        while self.running:
+            try:
+                await self._relist()
+                backoff = 1.0
+                listed_at = time.monotonic()
+                while self.running and time.monotonic() - listed_at < self.resync_interval:
+                    await self._in_thread(self._watch_blocking, asyncio.get_running_loop())
+                    self.stats["watches"] += 1
+            except ResourceGone:
+                self.stats["relists_gone"] += 1
+                logger.info(f"Watch on {self.resource} expired, relisting")
+            except Exception as e:
+                logger.error(f"Informer for {self.resource} failed: {e}; retrying in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    async def _in_thread(self, fn, *args):
+        """Run a blocking call in a daemon thread and await its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(result=None, error=None):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def target():
+            try:
+                result = fn(*args)
+            except Exception as e:
+                loop.call_soon_threadsafe(resolve, None, e)
+            else:
+                loop.call_soon_threadsafe(resolve, result)
+
+        threading.Thread(target=target, name=f"informer-{self.plural}", daemon=True).start()
+        return await future
+
+    def stop(self):
+        self.running = False
+        if self._watch is not None:
+            self._watch.stop()
+
+    async def _relist(self):
+        func, args = self._list_call()
+        response = await self._in_thread(func, *args)
+        self.stats["lists"] += 1
+        current = {object_key(obj): obj for obj in response.get("items", [])}
+
+        # Deliver the difference to the cached state as events
+        for key, old in list(self._objects.items()):
+            if key not in current:
+                self._apply("DELETED", old)
+        for key, obj in current.items():
+            old = self._objects.get(key)
+            if old is None:
+                self._apply("ADDED", obj)
+            elif (old.get("metadata") or {}).get("resourceVersion") != (obj.get("metadata") or {}).get("resourceVersion"):
+                self._apply("MODIFIED", obj)
+
+        self.resource_version = (response.get("metadata") or {}).get("resourceVersion")
+        self.synced.set()
+        logger.info(f"Listed {len(current)} {self.resource} (resourceVersion {self.resource_version})")
+
+    def _watch_blocking(self, loop: asyncio.AbstractEventLoop):
+        """One watch request (runs in a worker thread)"""
+        from kubernetes import watch
+        from kubernetes.client.rest import ApiException
+
+        func, args = self._list_call()
+        self._watch = watch.Watch()
+        try:
+            for event in self._watch.stream(
+                func, *args,
+                resource_version=self.resource_version,
+                timeout_seconds=self.watch_timeout,
+                allow_watch_bookmarks=True
+            ):
+                event_type, obj = event.get("type"), event.get("object") or {}
+                if event_type == "ERROR":
+                    if obj.get("code") == 410:
+                        raise ResourceGone()
+                    raise Exception(f"watch error: {obj.get('message')}")
+                version = (obj.get("metadata") or {}).get("resourceVersion")
+                if version:
+                    self.resource_version = version
+                if event_type in ("ADDED", "MODIFIED", "DELETED"):
+                    loop.call_soon_threadsafe(self._apply, event_type, obj)
+                if not self.running:
+                    break
+        except ApiException as e:
+            if e.status == 410:
+                raise ResourceGone()
+            raise
+        finally:
+            self._watch.stop()
+
+    def _apply(self, event_type: str, obj: Dict[str, Any]):
+        key = object_key(obj)
+        old = self._objects.get(key)
+        if event_type == "DELETED":
+            self._objects.pop(key, None)
+        else:
+            self._objects[key] = obj
+        self.stats["events"] += 1
+        for handler in self._handlers:
+            try:
+                handler(event_type, obj, old)
+            except Exception as e:
+                logger.error(f"Informer handler error for {self.resource} {key}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "objects": len(self._objects),
+            "resource_version": self.resource_version,
+            "synced": self.synced.is_set()
+        }
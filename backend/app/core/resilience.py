@@ -2,60 +2,439 @@
 Resilience Utilities
 - Circuit Breaker
 - Retry Decorators
+
+Circuit breakers are keyed (e.g. per agent type, optionally per customer) so
+one failing agent doesn't cut off every other one. State lives in Redis and
+is shared by all API replicas and workers; transitions are atomic Lua
+scripts. Without Redis each process keeps its own state.
+
+- CLOSED: calls pass; outcomes are counted in rolling time buckets and the
+  breaker opens when the failure rate over the window crosses the threshold
+  (after at least min_calls calls)
+- OPEN: calls fail fast until recovery_timeout has passed
+- HALF_OPEN: at most half_open_max_calls probe calls pass; a successful
+  probe closes the breaker, a failed one re-opens it
 """
+import inspect
 import logging
+import math
 import time
 from functools import wraps
-from typing import Callable, Any
+from typing import Any, Callable, Dict, List, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+CLOSED, OPEN, HALF_OPEN = "CLOSED", "OPEN", "HALF_OPEN"
+
+# KEYS: state hash
+# ARGV: now, recovery_timeout, half_open_max_calls
+# Returns {allowed (0/1), state}
+ACQUIRE_LUA = """
+local now = tonumber(ARGV[1])
+local state = redis.call('HGET', KEYS[1], 'state') or 'CLOSED'
+if state == 'OPEN' then
+    local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at') or '0')
+    if now - opened_at < tonumber(ARGV[2]) then
+        return {0, 'OPEN'}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'HALF_OPEN', 'probes', 0, 'half_open_at', now)
+    state = 'HALF_OPEN'
+end
+if state == 'HALF_OPEN' then
+    local probes = tonumber(redis.call('HGET', KEYS[1], 'probes') or '0')
+    local since = tonumber(redis.call('HGET', KEYS[1], 'half_open_at') or '0')
+    -- A probe that never reported back (crashed worker) frees its slot
+    if probes >= tonumber(ARGV[3]) and now - since < tonumber(ARGV[2]) then
+        return {0, 'HALF_OPEN'}
+    end
+    if probes >= tonumber(ARGV[3]) then
+        redis.call('HSET', KEYS[1], 'probes', 0, 'half_open_at', now)
+    end
+    redis.call('HINCRBY', KEYS[1], 'probes', 1)
+    return {1, 'HALF_OPEN'}
+end
+return {1, 'CLOSED'}
+"""
+
+# KEYS: state hash, window hash, key registry set
+# ARGV: now, outcome (1 ok / 0 failure / -1 release), probe (1/0), bucket_seconds,
+#       buckets, min_calls, failure_rate, ttl, breaker key
+# Returns the resulting state
+RECORD_LUA = """
+local now = tonumber(ARGV[1])
+local outcome = tonumber(ARGV[2])
+local state = redis.call('HGET', KEYS[1], 'state') or 'CLOSED'
+redis.call('SADD', KEYS[3], ARGV[9])
+
+if ARGV[3] == '1' then
+    if state ~= 'HALF_OPEN' then
+        return state
+    end
+    if outcome == 1 then
+        redis.call('DEL', KEYS[1], KEYS[2])
+        return 'CLOSED'
+    elseif outcome == 0 then
+        redis.call('HSET', KEYS[1], 'state', 'OPEN', 'opened_at', now, 'probes', 0)
+        redis.call('EXPIRE', KEYS[1], ARGV[8])
+        return 'OPEN'
+    end
+    redis.call('HINCRBY', KEYS[1], 'probes', -1)
+    return 'HALF_OPEN'
+end
+
+if outcome == -1 or state ~= 'CLOSED' then
+    return state
+end
+
+local bucket = math.floor(now / tonumber(ARGV[4]))
+local field = bucket .. (outcome == 1 and ':s' or ':f')
+redis.call('HINCRBY', KEYS[2], field, 1)
+redis.call('EXPIRE', KEYS[2], ARGV[8])
+
+local oldest = bucket - tonumber(ARGV[5]) + 1
+local total, failures = 0, 0
+local entries = redis.call('HGETALL', KEYS[2])
+for i = 1, #entries, 2 do
+    local b, kind = string.match(entries[i], '^(%-?%d+):(%a)$')
+    if tonumber(b) < oldest then
+        redis.call('HDEL', KEYS[2], entries[i])
+    else
+        local n = tonumber(entries[i + 1])
+        total = total + n
+        if kind == 'f' then failures = failures + n end
+    end
+end
+
+if total >= tonumber(ARGV[6]) and failures / total >= tonumber(ARGV[7]) then
+    redis.call('HSET', KEYS[1], 'state', 'OPEN', 'opened_at', now, 'probes', 0)
+    redis.call('EXPIRE', KEYS[1], ARGV[8])
+    redis.call('DEL', KEYS[2])
+    return 'OPEN'
+end
+return 'CLOSED'
+"""
+
+
 class CircuitBreakerOpenException(Exception):
     pass
 
+
+class _LocalBreakerStore:
+    """In-process breaker state (same rules as the Lua scripts)"""
+
+    def __init__(self):
+        self._states: Dict[str, Dict[str, Any]] = {}
+
+    def _get(self, key: str) -> Dict[str, Any]:
+        return self._states.setdefault(key, {"state": CLOSED, "opened_at": 0.0, "probes": 0, "half_open_at": 0.0, "buckets": {}})
+
+    def acquire(self, key: str, now: float, recovery_timeout: float, half_open_max: int) -> tuple:
+        s = self._get(key)
+        if s["state"] == OPEN:
+            if now - s["opened_at"] < recovery_timeout:
+                return False, OPEN
+            s.update(state=HALF_OPEN, probes=0, half_open_at=now)
+        if s["state"] == HALF_OPEN:
+            if s["probes"] >= half_open_max:
+                if now - s["half_open_at"] < recovery_timeout:
+                    return False, HALF_OPEN
+                s.update(probes=0, half_open_at=now)
+            s["probes"] += 1
+            return True, HALF_OPEN
+        return True, CLOSED
+
+    def record(self, key: str, now: float, outcome: int, probe: bool, breaker: "CircuitBreaker") -> str:
+        s = self._get(key)
+        if probe:
+            if s["state"] != HALF_OPEN:
+                return s["state"]
+            if outcome == 1:
+                self._states.pop(key, None)
+                return CLOSED
+            if outcome == 0:
+                s.update(state=OPEN, opened_at=now, probes=0)
+                return OPEN
+            s["probes"] -= 1
+            return HALF_OPEN
+
+        if outcome == -1 or s["state"] != CLOSED:
+            return s["state"]
+
+        bucket = math.floor(now / breaker.bucket_seconds)
+        counts = s["buckets"].setdefault(bucket, [0, 0])
+        counts[0 if outcome == 1 else 1] += 1
+
+        oldest = bucket - breaker.buckets + 1
+        for b in [b for b in s["buckets"] if b < oldest]:
+            del s["buckets"][b]
+        total = sum(ok + failed for ok, failed in s["buckets"].values())
+        failures = sum(failed for _, failed in s["buckets"].values())
+        if total >= breaker.min_calls and failures / total >= breaker.failure_rate_threshold:
+            s.update(state=OPEN, opened_at=now, probes=0, buckets={})
+            return OPEN
+        return CLOSED
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {key: self._describe(s) for key, s in self._states.items()}
+
+    @staticmethod
+    def _describe(s: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "state": s["state"],
+            "opened_at": s["opened_at"] or None,
+            "probes": s["probes"],
+            "calls": sum(ok + failed for ok, failed in s["buckets"].values()),
+            "failures": sum(failed for _, failed in s["buckets"].values())
+        }
+
+    def reset(self, key: str):
+        self._states.pop(key, None)
+
+
 class CircuitBreaker:
-    def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 60):
-        self.failure_threshold = failure_threshold
+    def __init__(
+        self,
+        name: str = "default",
+        key_func: Optional[Callable[[Dict[str, Any]], str]] = None,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: int = 60,
+        buckets: int = 6,
+        recovery_timeout: int = 60,
+        half_open_max_calls: int = 1
+    ):
+        """
+        Args:
+            name: Breaker family name (Redis key prefix)
+            key_func: Maps the wrapped call's bound arguments to a breaker key;
+                      all calls share one breaker when omitted
+            failure_rate_threshold: Failure share over the window that opens the breaker
+            min_calls: Calls needed in the window before the rate is trusted
+            window_seconds / buckets: Rolling window, counted in `buckets` slices
+            recovery_timeout: Seconds OPEN before probing
+            half_open_max_calls: Concurrent probe calls allowed while HALF_OPEN
+        """
+        self.name = name
+        self.key_func = key_func
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = max(1, window_seconds // buckets)
         self.recovery_timeout = recovery_timeout
-        self.failures = 0
-        self.last_failure_time = 0
-        self.state = "CLOSED"  # CLOSED, OPEN, HALF-OPEN
+        self.half_open_max_calls = half_open_max_calls
+        self._local = _LocalBreakerStore()
+        self._scripts: Optional[tuple] = None
+
+    # Keys --------------------------------------------------------------
+
+    def key_for(self, **arguments) -> str:
+        return self.key_func(arguments) if self.key_func else "default"
+
+    def _state_key(self, key: str) -> str:
+        return f"cb:{self.name}:{key}"
+
+    def _window_key(self, key: str) -> str:
+        return f"cb:{self.name}:{key}:window"
+
+    def _registry_key(self) -> str:
+        return f"cb:{self.name}:keys"
+
+    async def _redis(self):
+        from app.services.redis_queue_service import get_redis_queue_service
+        redis_service = await get_redis_queue_service()
+        client = redis_service.redis_client
+        if client is None:
+            return None
+        if self._scripts is None:
+            self._scripts = (client.register_script(ACQUIRE_LUA), client.register_script(RECORD_LUA))
+        return client
+
+    # Manual API ----------------------------------------------------------
+
+    async def acquire(self, key: str) -> bool:
+        """
+        Admit a call or raise CircuitBreakerOpenException.
+        Returns True when the call is a HALF_OPEN probe (pass it to record()).
+        """
+        now = time.time()
+        try:
+            client = await self._redis()
+        except Exception:
+            client = None
+
+        if client is not None:
+            try:
+                allowed, state = await self._scripts[0](
+                    keys=[self._state_key(key)],
+                    args=[now, self.recovery_timeout, self.half_open_max_calls]
+                )
+                state = state.decode() if isinstance(state, bytes) else state
+            except Exception as e:
+                logger.warning(f"Circuit breaker {self.name} using local state: {e}")
+                allowed, state = self._local.acquire(key, now, self.recovery_timeout, self.half_open_max_calls)
+        else:
+            allowed, state = self._local.acquire(key, now, self.recovery_timeout, self.half_open_max_calls)
+
+        if not allowed:
+            raise CircuitBreakerOpenException(f"Circuit breaker {self.name}:{key} is {state}")
+        if state == HALF_OPEN:
+            logger.info(f"Circuit breaker {self.name}:{key} HALF-OPEN: probing")
+        return state == HALF_OPEN
+
+    async def record(self, key: str, success: Optional[bool], probe: bool = False) -> str:
+        """
+        Report a call outcome: True / False, or None to just release a probe
+        slot (e.g. the caller went away before we learned anything).
+        """
+        outcome = -1 if success is None else (1 if success else 0)
+        now = time.time()
+        state = None
+        try:
+            client = await self._redis()
+            if client is not None:
+                state = await self._scripts[1](
+                    keys=[self._state_key(key), self._window_key(key), self._registry_key()],
+                    args=[
+                        now, outcome, 1 if probe else 0, self.bucket_seconds, self.buckets,
+                        self.min_calls, self.failure_rate_threshold, self.window_seconds + self.recovery_timeout, key
+                    ]
+                )
+                state = state.decode() if isinstance(state, bytes) else state
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} using local state: {e}")
+        if state is None:
+            state = self._local.record(key, now, outcome, probe, self)
+
+        if state == OPEN and outcome == 0:
+            logger.error(f"Circuit breaker {self.name}:{key} OPENED")
+        elif state == CLOSED and probe and outcome == 1:
+            logger.info(f"Circuit breaker {self.name}:{key} recovered to CLOSED")
+        return state
+
+    # Decorator -----------------------------------------------------------
 
     def __call__(self, func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        def key_from_call(args, kwargs) -> str:
+            if not self.key_func:
+                return "default"
+            bound = signature.bind_partial(*args, **kwargs)
+            return self.key_func(bound.arguments)
+
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def stream_wrapper(*args, **kwargs):
+                key = key_from_call(args, kwargs)
+                probe = await self.acquire(key)
+                stream = func(*args, **kwargs)
+                success: Optional[bool] = None
+                try:
+                    async for item in stream:
+                        yield item
+                    success = True
+                except Exception:
+                    success = False
+                    raise
+                finally:
+                    # Consumer stopped early (success is None): no verdict
+                    await stream.aclose()
+                    await self.record(key, success, probe)
+            return stream_wrapper
+
         @wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
-            if self.state == "OPEN":
-                if time.time() - self.last_failure_time > self.recovery_timeout:
-                    logger.info("Circuit breaker entering HALF-OPEN state")
-                    self.state = "HALF-OPEN"
-                else:
-                    raise CircuitBreakerOpenException("Circuit breaker is OPEN")
-
+            key = key_from_call(args, kwargs)
+            probe = await self.acquire(key)
             try:
                 result = await func(*args, **kwargs)
-                if self.state == "HALF-OPEN":
-                    logger.info("Circuit breaker recovering to CLOSED state")
-                    self.reset()
-                return result
-            except Exception as e:
-                self.failures += 1
-                self.last_failure_time = time.time()
-                logger.warning(f"Circuit breaker failure {self.failures}/{self.failure_threshold}")
-                
-                if self.failures >= self.failure_threshold:
-                    logger.error("Circuit breaker OPENED")
-                    self.state = "OPEN"
-                
-                raise e
+            except Exception:
+                await self.record(key, False, probe)
+                raise
+            except BaseException:
+                # Cancelled: free the probe slot without a verdict
+                await self.record(key, None, probe)
+                raise
+            await self.record(key, True, probe)
+            return result
         return wrapper
 
-    def reset(self):
-        self.failures = 0
-        self.state = "CLOSED"
+    # Admin -----------------------------------------------------------------
+
+    async def get_states(self) -> Dict[str, Dict[str, Any]]:
+        """State of every key this breaker has seen (shared state when Redis is up)"""
+        states = {}
+        try:
+            client = await self._redis()
+        except Exception:
+            client = None
+
+        if client is not None:
+            try:
+                keys: List[str] = sorted(await client.smembers(self._registry_key()))
+                pipe = client.pipeline()
+                for key in keys:
+                    pipe.hgetall(self._state_key(key))
+                    pipe.hgetall(self._window_key(key))
+                results = await pipe.execute()
+                oldest = math.floor(time.time() / self.bucket_seconds) - self.buckets + 1
+                for i, key in enumerate(keys):
+                    state, window = results[2 * i], results[2 * i + 1]
+                    counts = [(int(f.split(":")[0]), f.split(":")[1], int(n)) for f, n in window.items()]
+                    states[key] = {
+                        "state": state.get("state", CLOSED),
+                        "opened_at": float(state["opened_at"]) if state.get("opened_at") else None,
+                        "probes": int(state.get("probes", 0)),
+                        "calls": sum(n for b, _, n in counts if b >= oldest),
+                        "failures": sum(n for b, kind, n in counts if b >= oldest and kind == "f")
+                    }
+                return states
+            except Exception as e:
+                logger.warning(f"Could not read shared breaker state for {self.name}: {e}")
+        return self._local.snapshot()
+
+    async def reset(self, key: str):
+        """Force a key back to CLOSED"""
+        self._local.reset(key)
+        client = await self._redis()
+        if client is not None:
+            await client.delete(self._state_key(key), self._window_key(key))
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "failure_rate_threshold": self.failure_rate_threshold,
+            "min_calls": self.min_calls,
+            "window_seconds": self.window_seconds,
+            "recovery_timeout": self.recovery_timeout,
+            "half_open_max_calls": self.half_open_max_calls
+        }
+
+
+def gateway_breaker_key(arguments: Dict[str, Any]) -> str:
+    """Agent Gateway breakers are per agent type, optionally per customer too"""
+    key = str(arguments.get("agent_type") or "unknown")
+    if settings.GATEWAY_BREAKER_PER_CUSTOMER and arguments.get("customer_id"):
+        key = f"{key}:{arguments['customer_id']}"
+    return key
+
+
+# Circuit breakers for Agent Gateway, keyed by agent type
+agent_gateway_breaker = CircuitBreaker(
+    name="agent_gateway",
+    key_func=gateway_breaker_key,
+    failure_rate_threshold=settings.GATEWAY_BREAKER_FAILURE_RATE,
+    min_calls=settings.GATEWAY_BREAKER_MIN_CALLS,
+    window_seconds=settings.GATEWAY_BREAKER_WINDOW,
+    recovery_timeout=settings.GATEWAY_BREAKER_RECOVERY_TIMEOUT,
+    half_open_max_calls=settings.GATEWAY_BREAKER_HALF_OPEN_PROBES
+)
 
-# Global circuit breaker for Agent Gateway
-agent_gateway_breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=30)
+# Every breaker exposed on the admin endpoint
+circuit_breakers: Dict[str, CircuitBreaker] = {agent_gateway_breaker.name: agent_gateway_breaker}
 
 # Standard retry policy
 standard_retry = retry(
@@ -28,28 +28,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def verify_token(token: str) -> dict:
-    """Verify JWT token"""
+    """Verify an HS256 JWT locally (secret resolved once, see token_verifier)"""
+    from app.core.token_verifier import get_token_verifier
     try:
-        # Try with the secret as provided (string)
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        return payload
-    except JWTError:
-        # If that fails, try decoding the secret from Base64 (common for Supabase)
-        try:
-            import base64
-            decoded_secret = base64.b64decode(settings.JWT_SECRET)
-            payload = jwt.decode(token, decoded_secret, algorithms=[settings.JWT_ALGORITHM])
-            return payload
-        except Exception as e:
-            logger.error(f"Token verification failed (Base64 attempt): {e}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Could not validate credentials: {str(e)}",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    except Exception as e:
-        logger.error(f"Token verification failed (Initial attempt): {e}")
-        # Continue to Base64 attempt
+        return get_token_verifier().verify_hmac(token)
+    except JWTError as e:
+        logger.warning(f"Token verification failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Could not validate credentials: {str(e)}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
@@ -92,9 +81,11 @@ async def get_current_user(
     token = credentials.credentials
     local_e = None
     
-    # Try local verification first (faster, avoids API rate limits)
+    # Local verification (cached claims, pinned secret or JWKS)
+    from app.core.token_verifier import get_token_verifier
+    verifier = get_token_verifier()
     try:
-        payload = verify_token(token)
+        payload = await verifier.verify(token)
         # Construct user data from JWT payload
         user_data = {
             "id": payload.get("sub"),
@@ -108,9 +99,18 @@ async def get_current_user(
         return user_data
     except Exception as e:
         local_e = e
-        logger.warning(f"Local token verification failed: {local_e}. Falling back to Supabase API.")
     
-    # Verify with Supabase (Fallback)
+    # Remote verification with Supabase is opt-in and rate-limited, so a bad
+    # secret can't turn every request into a network call
+    if not verifier.allow_remote_fallback():
+        logger.warning(f"Local token verification failed: {local_e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid authentication credentials: {local_e}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    logger.warning(f"Local token verification failed: {local_e}. Falling back to Supabase API.")
     supabase = get_supabase()
     try:
         logger.info(f"Verifying token with Supabase API: {token[:10]}...")
@@ -158,6 +158,22 @@ async def require_agent_auth(current_user: dict = Depends(get_current_user)) ->
         )
     return current_user
 
+async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    Require an operator: a JWT user with app_metadata.role == "admin"
+    or listed in ADMIN_USER_IDS
+    """
+    is_admin = current_user.get("auth_type") == "jwt" and (
+        (current_user.get("app_metadata") or {}).get("role") == "admin"
+        or current_user.get("id") in settings.ADMIN_USER_IDS
+    )
+    if not is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
 async def verify_service_token(
     authorization: Optional[str] = Header(None)
 ) -> bool:
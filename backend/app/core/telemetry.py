@@ -4,6 +4,7 @@ Provides distributed tracing, metrics, and logs exporting to OpenObserve via OTL
 """
 import logging
 from opentelemetry import trace, metrics
+from opentelemetry.metrics import Observation
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
@@ -76,6 +77,13 @@ def setup_telemetry(app):
     # Instrument HTTPX (for Agent Gateway calls)
     HTTPXClientInstrumentor().instrument(tracer_provider=trace_provider)
     
+    # Shared HTTP connection pool gauges
+    from app.core.http_pool import get_http_pool
+    register_http_pool_metrics(get_http_pool())
+    register_cache_metrics()
+    from app.core.audit_sink import get_audit_sink
+    register_audit_metrics(get_audit_sink())
+    
     logger.info(f"OpenTelemetry initialized (Traces, Metrics, Logs) -> {settings.OTEL_EXPORTER_ENDPOINT}")
 
 def get_tracer():
@@ -85,3 +93,166 @@ def get_tracer():
 def get_meter():
     """Get the meter for manual instrumentation"""
     return metrics.get_meter(__name__)
+
+# HTTP connection pool metrics
+_http_pool_wait_histogram = None
+
+def record_http_pool_wait(pool_name: str, seconds: float):
+    """Record time spent waiting for response headers on a pooled client"""
+    global _http_pool_wait_histogram
+    if _http_pool_wait_histogram is None:
+        _http_pool_wait_histogram = get_meter().create_histogram(
+            "http_pool.wait_time",
+            unit="ms",
+            description="Time from request dispatch to response headers (pool acquire + TTFB)"
+        )
+    _http_pool_wait_histogram.record(seconds * 1000, {"pool": pool_name})
+
+# Delegation decision sources (cache / fast_path / llm)
+_delegation_decision_counter = None
+
+def record_delegation_decision(source: str):
+    """Count a delegation decision by where it came from"""
+    global _delegation_decision_counter
+    if _delegation_decision_counter is None:
+        _delegation_decision_counter = get_meter().create_counter(
+            "delegation.decisions",
+            description="Delegation decisions by source (cache, fast_path, llm)"
+        )
+    _delegation_decision_counter.add(1, {"source": source})
+
+# Centrifugo publisher
+_centrifugo_latency_histogram = None
+_centrifugo_dropped_counter = None
+
+def record_centrifugo_publish(seconds: float):
+    """Record enqueue -> Centrifugo reply latency for one published event"""
+    global _centrifugo_latency_histogram
+    if _centrifugo_latency_histogram is None:
+        _centrifugo_latency_histogram = get_meter().create_histogram(
+            "centrifugo.publish_latency",
+            unit="ms",
+            description="Time from publish() to Centrifugo acknowledging the batch"
+        )
+    _centrifugo_latency_histogram.record(seconds * 1000)
+
+def record_centrifugo_dropped(reason: str):
+    """Count a real-time frame dropped under backpressure"""
+    global _centrifugo_dropped_counter
+    if _centrifugo_dropped_counter is None:
+        _centrifugo_dropped_counter = get_meter().create_counter(
+            "centrifugo.dropped_frames",
+            description="Real-time events dropped because the publish queue was full"
+        )
+    _centrifugo_dropped_counter.add(1, {"reason": reason})
+
+# Security audit sink
+_audit_flush_histogram = None
+
+def record_audit_flush(seconds: float, rows: int):
+    """Record the latency of one multi-row audit insert"""
+    global _audit_flush_histogram
+    if _audit_flush_histogram is None:
+        _audit_flush_histogram = get_meter().create_histogram(
+            "audit.flush_latency",
+            unit="ms",
+            description="Duration of one batched security_audit_log insert"
+        )
+    _audit_flush_histogram.record(seconds * 1000, {"rows": rows})
+
+# Streaming leakage guard
+_leakage_guard_histogram = None
+
+def record_leakage_guard_latency(seconds: float):
+    """Record the scan time added to one streamed agent chunk"""
+    global _leakage_guard_histogram
+    if _leakage_guard_histogram is None:
+        _leakage_guard_histogram = get_meter().create_histogram(
+            "leakage_guard.chunk_latency",
+            unit="us",
+            description="Leakage scan time added per streamed chunk"
+        )
+    _leakage_guard_histogram.record(seconds * 1e6)
+
+def register_audit_metrics(sink):
+    """
+    Register gauges for the security audit sink (queue depth, spilled records)
+    """
+    meter = get_meter()
+    
+    def _observe(field: str):
+        def callback(options):
+            return [Observation(sink.get_stats()[field])]
+        return callback
+    
+    meter.create_observable_gauge(
+        "audit.queue_depth",
+        callbacks=[_observe("queue_depth")],
+        description="Audit records buffered in memory awaiting a flush"
+    )
+    meter.create_observable_gauge(
+        "audit.spilled",
+        callbacks=[_observe("spilled")],
+        description="Audit records written to the local spill file since start"
+    )
+
+def register_http_pool_metrics(pool):
+    """
+    Register observable gauges for a HTTPClientPool (in-use, idle, open connections)
+    """
+    meter = get_meter()
+    
+    def _observe(field: str):
+        def callback(options):
+            return [
+                Observation(stats[field], {"pool": base_url})
+                for base_url, stats in pool.get_stats().items()
+            ]
+        return callback
+    
+    meter.create_observable_gauge(
+        "http_pool.in_use",
+        callbacks=[_observe("in_use")],
+        description="Requests currently in flight on the pool"
+    )
+    meter.create_observable_gauge(
+        "http_pool.idle",
+        callbacks=[_observe("idle")],
+        description="Idle keep-alive connections"
+    )
+    meter.create_observable_gauge(
+        "http_pool.open_connections",
+        callbacks=[_observe("open_connections")],
+        description="Open connections (idle + active)"
+    )
+
+def register_cache_metrics():
+    """
+    Register hit/miss gauges for every TieredCache in the process
+    """
+    from app.core.tiered_cache import get_registered_caches
+    meter = get_meter()
+    
+    def _observe(field: str):
+        def callback(options):
+            return [
+                Observation(cache.get_stats()[field], {"cache": cache.namespace})
+                for cache in get_registered_caches()
+            ]
+        return callback
+    
+    meter.create_observable_gauge(
+        "cache.hits",
+        callbacks=[_observe("hits")],
+        description="Cache hits (local + Redis tier)"
+    )
+    meter.create_observable_gauge(
+        "cache.misses",
+        callbacks=[_observe("misses")],
+        description="Cache misses"
+    )
+    meter.create_observable_gauge(
+        "cache.hit_rate",
+        callbacks=[_observe("hit_rate")],
+        description="Cache hit ratio since process start"
+    )
@@ -0,0 +1,149 @@
+"""
+Two-tier cache: in-process LRU in front of Redis.
+
+The local tier absorbs repeated reads within a process; Redis shares entries
+across API replicas and Temporal workers. Local TTLs are kept short so that an
+invalidation issued on another replica is picked up quickly.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Every TieredCache registers itself here so telemetry can export hit/miss counters
+_registered_caches: List["TieredCache"] = []
+
+
+class LRUCache:
+    """Size-bounded in-process LRU with per-entry TTL"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [k for k in self._data if k.startswith(prefix)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TieredCache:
+    """
+    In-process LRU + Redis cache for JSON-serializable values.
+
+    Keys are namespaced as "<namespace>:<key>" in Redis. Redis is optional:
+    when it is unreachable the cache degrades to the local tier only.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        local_maxsize: int = 1024,
+        local_ttl: float = 30.0,
+        redis_ttl: int = 300
+    ):
+        self.namespace = namespace
+        self.redis_ttl = redis_ttl
+        self.local = LRUCache(maxsize=local_maxsize, ttl=local_ttl)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        _registered_caches.append(self)
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def _redis(self):
+        from app.services.redis_queue_service import get_redis_queue_service
+        return await get_redis_queue_service()
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        redis_service = await self._redis()
+        value = await redis_service.get_cache(self._redis_key(key))
+        if value is not None:
+            self.redis_hits += 1
+            self.local.set(key, value)
+            return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        redis_service = await self._redis()
+        await redis_service.set_cache(self._redis_key(key), value, expire_seconds=self.redis_ttl)
+
+    async def invalidate_prefix(self, prefix: str = "") -> int:
+        """Drop every entry whose key starts with prefix (all entries if empty)"""
+        removed = self.local.delete_prefix(prefix)
+
+        redis_service = await self._redis()
+        if redis_service.redis_client:
+            try:
+                keys = [
+                    k async for k in redis_service.redis_client.scan_iter(
+                        match=f"{self._redis_key(prefix)}*", count=500
+                    )
+                ]
+                if keys:
+                    await redis_service.redis_client.delete(*keys)
+                removed += len(keys)
+            except Exception as e:
+                logger.error(f"Cache invalidation failed for {self.namespace}:{prefix}*: {e}")
+
+        logger.info(f"Invalidated {removed} '{self.namespace}' cache entries (prefix='{prefix}')")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.local_hits + self.redis_hits + self.misses
+        hits = self.local_hits + self.redis_hits
+        return {
+            "namespace": self.namespace,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "hits": hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "local_size": len(self.local)
+        }
+
+
+def get_registered_caches() -> List[TieredCache]:
+    """All TieredCache instances created in this process"""
+    return list(_registered_caches)
@@ -0,0 +1,200 @@
+"""
+JWT Verifier
+Local verification of user access tokens, so authentication normally costs
+no network round trip.
+
+- HMAC (HS256) tokens: the candidate secrets (JWT_SECRET as-is and, in "auto"
+  mode, base64-decoded) are resolved once; the first one that verifies a
+  token is pinned and used alone from then on
+- Asymmetric tokens (RS256 / ES256, Supabase signing keys): verified against
+  the project's JWKS, cached for JWKS_CACHE_TTL and refetched when an unknown
+  "kid" shows up (key rotation), at most once per JWKS_MIN_REFRESH_INTERVAL
+- Validated token -> claims are kept in a short-lived LRU (never past "exp")
+- Remote verification via supabase.auth.get_user is opt-in
+  (JWT_REMOTE_FALLBACK_ENABLED) and rate-limited per process
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Union
+
+import httpx
+from jose import jwt, JWTError
+from jose.exceptions import JWTClaimsError
+
+from app.core.config import settings
+from app.core.tiered_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+
+class TokenVerifier:
+    """Per-process JWT verifier with pinned secret, JWKS and claims caches"""
+
+    def __init__(self):
+        self._secrets = self._secret_candidates()
+        self._pinned: Optional[Union[str, bytes]] = self._secrets[0] if len(self._secrets) == 1 else None
+        self._claims = LRUCache(maxsize=settings.JWT_CLAIMS_CACHE_MAXSIZE, ttl=settings.JWT_CLAIMS_CACHE_TTL)
+        self._jwks: Dict[str, Dict[str, Any]] = {}
+        self._jwks_fetched_at = 0.0
+        self._jwks_attempted_at = float("-inf")
+        self._jwks_lock: Optional[asyncio.Lock] = None
+        self._remote_calls: Deque[float] = deque()
+        self.stats = {"cache_hits": 0, "verified": 0, "rejected": 0, "jwks_fetches": 0, "remote_calls": 0}
+
+    @staticmethod
+    def _secret_candidates() -> List[Union[str, bytes]]:
+        encoding = settings.JWT_SECRET_ENCODING
+        if encoding == "raw":
+            return [settings.JWT_SECRET]
+        try:
+            decoded: Optional[bytes] = base64.b64decode(settings.JWT_SECRET, validate=True)
+        except Exception:
+            decoded = None
+        if encoding == "base64":
+            if decoded is None:
+                raise ValueError("JWT_SECRET_ENCODING is 'base64' but JWT_SECRET is not valid base64")
+            return [decoded]
+        return [settings.JWT_SECRET] + ([decoded] if decoded else [])
+
+    def _decode_kwargs(self) -> Dict[str, Any]:
+        if settings.JWT_AUDIENCE:
+            return {"audience": settings.JWT_AUDIENCE}
+        return {"options": {"verify_aud": False}}
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        # Don't keep bearer tokens in memory longer than the request
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    # Verification ------------------------------------------------------------
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Verify a token and return its claims. Raises JWTError."""
+        cache_key = self._cache_key(token)
+        claims = self._claims.get(cache_key)
+        if claims is not None:
+            self.stats["cache_hits"] += 1
+            return dict(claims)
+
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+        try:
+            if alg in HMAC_ALGORITHMS:
+                claims = self.verify_hmac(token)
+            elif alg in ASYMMETRIC_ALGORITHMS:
+                claims = await self._verify_jwks(token, header)
+            else:
+                raise JWTError(f"Unsupported token algorithm: {alg}")
+        except JWTError:
+            self.stats["rejected"] += 1
+            raise
+
+        self.stats["verified"] += 1
+        self._remember(cache_key, claims)
+        return dict(claims)
+
+    def verify_hmac(self, token: str) -> Dict[str, Any]:
+        """Verify an HS* token with the pinned secret (or each candidate until one is pinned)"""
+        candidates = [self._pinned] if self._pinned is not None else self._secrets
+        error: Optional[JWTError] = None
+        for secret in candidates:
+            try:
+                claims = jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM], **self._decode_kwargs())
+            except JWTClaimsError:
+                # Signature matched, claims didn't (expired, audience): right secret
+                self._pin(secret)
+                raise
+            except JWTError as e:
+                error = e
+                continue
+            self._pin(secret)
+            return claims
+        raise error or JWTError("No JWT secret configured")
+
+    def _pin(self, secret: Union[str, bytes]):
+        if self._pinned is None:
+            self._pinned = secret
+            logger.info(f"JWT secret resolved ({'base64-decoded' if isinstance(secret, bytes) else 'raw'})")
+
+    def _remember(self, cache_key: str, claims: Dict[str, Any]):
+        ttl = settings.JWT_CLAIMS_CACHE_TTL
+        if claims.get("exp"):
+            ttl = min(ttl, float(claims["exp"]) - time.time())
+        if ttl > 0:
+            self._claims.set(cache_key, claims, ttl=ttl)
+
+    async def _verify_jwks(self, token: str, header: Dict[str, Any]) -> Dict[str, Any]:
+        kid = header.get("kid")
+        stale = time.monotonic() - self._jwks_fetched_at > settings.JWKS_CACHE_TTL
+        if kid not in self._jwks or stale:
+            await self._refresh_jwks()
+        key = self._jwks.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key: {kid}")
+        return jwt.decode(token, key, algorithms=[header["alg"]], **self._decode_kwargs())
+
+    def _jwks_url(self) -> str:
+        return settings.SUPABASE_JWKS_URL or f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+    async def _refresh_jwks(self):
+        if self._jwks_lock is None:
+            self._jwks_lock = asyncio.Lock()
+        async with self._jwks_lock:
+            # Unknown kids (rotation or junk tokens) refetch at most this often
+            if time.monotonic() - self._jwks_attempted_at < settings.JWKS_MIN_REFRESH_INTERVAL:
+                return
+            self._jwks_attempted_at = time.monotonic()
+            try:
+                from app.core.http_pool import get_http_pool
+                url = httpx.URL(self._jwks_url())
+                client = get_http_pool().get_client(f"{url.scheme}://{url.netloc.decode()}", timeout=5.0)
+                response = await client.get(url.raw_path.decode())
+                response.raise_for_status()
+                keys = {k["kid"]: k for k in response.json().get("keys", []) if k.get("kid")}
+                self._jwks = keys
+                self._jwks_fetched_at = time.monotonic()
+                self.stats["jwks_fetches"] += 1
+                logger.info(f"Loaded {len(keys)} JWKS signing keys")
+            except Exception as e:
+                # Keep verifying with the keys we already have
+                logger.error(f"Failed to fetch JWKS from {self._jwks_url()}: {e}")
+
+    # Remote fallback ---------------------------------------------------------
+
+    def allow_remote_fallback(self) -> bool:
+        """Whether this request may be verified by the Supabase Auth API"""
+        if not settings.JWT_REMOTE_FALLBACK_ENABLED:
+            return False
+        now = time.monotonic()
+        while self._remote_calls and now - self._remote_calls[0] > 60:
+            self._remote_calls.popleft()
+        if len(self._remote_calls) >= settings.JWT_REMOTE_FALLBACK_PER_MINUTE:
+            return False
+        self._remote_calls.append(now)
+        self.stats["remote_calls"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cached_tokens": len(self._claims),
+            "secret_pinned": self._pinned is not None,
+            "jwks_keys": len(self._jwks)
+        }
+
+
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    global _token_verifier
+    if _token_verifier is None:
+        _token_verifier = TokenVerifier()
+    return _token_verifier
@@ -53,7 +53,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 logger.info("🔄 Loading API routers...")
 try:
     logger.info("  Importing modules...")
-    from app.api import tasks, workflows, workflow_control, discovery, marketplace, auth, customer, messages, billing, webhooks
+    from app.api import tasks, workflows, workflow_control, discovery, marketplace, auth, customer, messages, billing, webhooks, admin
     logger.info("  ✅ All modules imported successfully")
     
     logger.info("  Registering routers...")
@@ -77,6 +77,8 @@ try:
     logger.info("    ✅ billing router")
     app.include_router(webhooks.router)
     logger.info("    ✅ webhooks router")
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+    logger.info("    ✅ admin router")
     
     logger.info("✅ All routers loaded successfully")
 except Exception as e:
@@ -92,6 +94,22 @@ except Exception as e:
     except Exception as e2:
         logger.error(f"❌ Failed to load basic routers: {e2}", exc_info=True)
 
+@app.on_event("shutdown")
+async def close_http_pools():
+    """Drain and close shared keep-alive HTTP pools"""
+    from app.core.http_pool import get_http_pool
+    from app.core.database import reset_async_clients
+    from app.core.centrifugo import get_centrifugo_client
+    from app.services.api_key_service import get_api_key_service
+    from app.core.audit_sink import get_audit_sink
+    from app.services.kagent_service import kagent_service
+    await kagent_service.close()
+    await get_api_key_service().close()
+    await get_audit_sink().close()
+    await get_centrifugo_client().close()
+    await get_http_pool().close_all()
+    reset_async_clients()
+
 @app.get("/")
 async def root():
     return {
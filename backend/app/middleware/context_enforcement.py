@@ -135,19 +135,18 @@ class ContextEnforcementMiddleware:
             request: FastAPI request
             customer_id: Customer UUID
         """
-        from app.core.database import get_supabase_admin
-        
-        supabase = get_supabase_admin()
+        from app.core.audit_sink import get_audit_sink
         
         try:
-            supabase.table("security_audit_log").insert({
+            # Buffered: written in batches off the request path
+            get_audit_sink().record({
                 "timestamp": datetime.utcnow().isoformat(),
                 "customer_id": customer_id,
                 "path": request.url.path,
                 "method": request.method,
                 "context_hash": request.state.context_hash,
                 "ip_address": request.client.host if request.client else None
-            }).execute()
+            })
         except Exception as e:
             # Don't fail request if audit logging fails
-            logger.error(f"Failed to write audit log: {e}")
+            logger.error(f"Failed to queue audit log: {e}")
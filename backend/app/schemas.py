@@ -321,6 +321,11 @@ class KnowledgeBaseItemResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class KnowledgeBulkIngestRequest(BaseModel):
+    items: List[KnowledgeBaseItemCreate] = Field(..., min_length=1)
+    chunk_size: Optional[int] = Field(None, ge=200, le=8000)
+    chunk_overlap: Optional[int] = Field(None, ge=0, le=2000)
+
 class KnowledgeSearchRequest(BaseModel):
     query: str
     limit: Optional[int] = 5
@@ -2,5 +2,6 @@
 Security module initialization
 """
 from app.security.leakage_detector import leakage_detector, ContextLeakageDetector
+from app.security.stream_guard import guard_stream
 
-__all__ = ["leakage_detector", "ContextLeakageDetector"]
+__all__ = ["leakage_detector", "ContextLeakageDetector", "guard_stream"]
@@ -0,0 +1,156 @@
+"""
+Streaming Leakage Guard
+Pipeline stage that enforces ContextLeakageDetector on streamed agent output
+(invoke_agent_stream) without buffering the whole answer.
+
+Each "message" / "artifact" text stream gets its own LeakageStreamScanner.
+Text is forwarded as soon as it has been scanned; only the trailing partial
+token of a chunk is held back until the next chunk (or the end of the
+stream) shows where it ends, so time-to-first-token is unchanged.
+
+On a high / critical finding (secrets, foreign customer IDs):
+- "redact": the matched text is replaced with REDACTION and the stream goes on
+- "abort": an error event is emitted and the upstream is closed
+PII findings (medium) are logged, as in the non-streaming path.
+
+Scan time per chunk is exported as leakage_guard.chunk_latency.
+"""
+import logging
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.security.leakage_detector import (
+    leakage_detector,
+    LeakageStreamScanner,
+    StreamScanResult,
+    PII_PATTERNS
+)
+
+logger = logging.getLogger(__name__)
+
+REDACTION = "[SECURITY REDACTED]"
+ABORT_MESSAGE = "[SECURITY REDACTED] - Response stopped: potential data leakage detected."
+
+# Chunk events carrying agent text
+TEXT_EVENT_TYPES = {"message", "artifact"}
+
+
+def _redact(result: StreamScanResult) -> str:
+    """Replace blocking spans (everything but PII) in the released text"""
+    text, parts, last = result.text, [], 0
+    for start, end, kind in result.spans:
+        if kind in PII_PATTERNS:
+            continue
+        parts.append(text[last:start])
+        parts.append(REDACTION)
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+async def guard_stream(
+    source: AsyncIterator[Dict[str, Any]],
+    customer_id: str,
+    mode: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Re-yield `source` with leakage enforcement applied to its text events"""
+    from app.core.telemetry import record_leakage_guard_latency
+
+    mode = mode or settings.LEAKAGE_STREAM_MODE
+    if mode == "off":
+        async for event in source:
+            yield event
+        return
+
+    scanners: Dict[str, LeakageStreamScanner] = {}
+    stats = {"chunks": 0, "scan_seconds": 0.0, "redactions": 0}
+
+    def scan(event_type: str, chunk: Optional[str]) -> StreamScanResult:
+        scanner = scanners.get(event_type)
+        if scanner is None:
+            scanner = scanners[event_type] = leakage_detector.stream(customer_id)
+        start = time.perf_counter()
+        result = scanner.feed(chunk) if chunk is not None else scanner.close()
+        elapsed = time.perf_counter() - start
+        stats["chunks"] += 1
+        stats["scan_seconds"] += elapsed
+        record_leakage_guard_latency(elapsed)
+        return result
+
+    def blocking(result: StreamScanResult) -> bool:
+        # Every non-PII finding raises a high / critical alert
+        return any(kind not in PII_PATTERNS for _, _, kind in result.spans)
+
+    def release(event_type: str, result: StreamScanResult, template: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Event to forward for scanned text: None to abort, {} if nothing to send"""
+        text = result.text
+        if blocking(result):
+            if mode == "abort":
+                return None
+            stats["redactions"] += 1
+            text = _redact(result)
+        if not text:
+            return {}
+        return {**template, "type": event_type, "content": text}
+
+    def abort_event() -> Dict[str, Any]:
+        logger.critical(
+            f"BLOCKED LEAKAGE (stream aborted): customer {customer_id}, "
+            f"agent {(metadata or {}).get('agent_type')}"
+        )
+        return {"type": "error", "content": ABORT_MESSAGE, "blocked": True}
+
+    def drain() -> Tuple[List[Dict[str, Any]], bool]:
+        """Release held-back text of every stream; returns (events, aborted)"""
+        events = []
+        for event_type in list(scanners):
+            forwarded = release(event_type, scan(event_type, None), {})
+            if forwarded is None:
+                return events, True
+            if forwarded:
+                events.append(forwarded)
+        return events, False
+
+    try:
+        async for event in source:
+            is_text = (
+                isinstance(event, dict)
+                and event.get("type") in TEXT_EVENT_TYPES
+                and isinstance(event.get("content"), str)
+            )
+            if is_text:
+                forwarded = release(event["type"], scan(event["type"], event["content"]), event)
+                if forwarded is None:
+                    yield abort_event()
+                    return
+                if forwarded:
+                    yield forwarded
+                continue
+
+            # Keep ordering: scanned text goes out before a status / error event
+            pending, aborted = drain()
+            for forwarded in pending:
+                yield forwarded
+            if aborted:
+                yield abort_event()
+                return
+            yield event
+
+        pending, aborted = drain()
+        for forwarded in pending:
+            yield forwarded
+        if aborted:
+            yield abort_event()
+    finally:
+        # Aborted or consumer gone: stop reading from the gateway
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        if stats["chunks"]:
+            logger.debug(
+                f"Leakage guard: {stats['chunks']} chunks, "
+                f"{stats['scan_seconds'] * 1e6 / stats['chunks']:.0f}us/chunk, "
+                f"{stats['redactions']} redactions"
+            )
@@ -0,0 +1,421 @@
+"""
+Workflow Admission Control
+Fair-share gate in front of OrchestratorWorkflow starts.
+
+Every customer may have at most its tier's quota of orchestrator workflows
+in flight (ADMISSION_TIER_QUOTAS), and all customers together at most
+ADMISSION_GLOBAL_LIMIT. Requests over the limit wait in a per-customer FIFO
+backlog. When a slot frees up (a task reaches a terminal status or starts
+waiting for a human) the next
+request is taken from the waiting customer with the lowest in-flight /
+weight ratio (ADMISSION_TIER_WEIGHTS), so a tenant submitting 500 tasks
+gets its share without starving everyone else.
+
+State lives in Redis and is updated by Lua scripts, so API replicas and
+Temporal workers see the same counts:
+- admission:inflight:{customer}  ZSET task_id -> admitted at
+- admission:global               ZSET customer|task_id -> admitted at
+- admission:backlog:{customer}   LIST of queued requests (JSON)
+- admission:waiting              SET of customers with a backlog
+- admission:quota / :weight      HASH customer -> tier quota / weight
+
+Only active work holds a slot. A workflow that waits for a human (plan
+approval, clarification) gives its slot up and takes one again when it
+resumes (resume(); a resumed task goes ahead of the backlog but still within
+the limits). Every status update refreshes the slot's timestamp (touch()),
+so ADMISSION_SLOT_TTL only frees slots of workflows that crashed without a
+terminal status; since nothing releases such a slot, pump() also runs every
+ADMISSION_PUMP_INTERVAL (run_pump()). Deleting a task (cancel()) frees its
+slot or drops it from the backlog. Queue positions are stored on the
+task (metadata.queue_position) and pushed to the customer's Centrifugo task
+channel as the backlog moves. Without Redis, requests are admitted directly.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tiered_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "admission:"
+
+# Admit if the customer has no backlog and is under both limits, else queue.
+# Returns 0 when admitted, otherwise the request's position in the backlog.
+SUBMIT_LUA = """
+local p, c, t = ARGV[1], ARGV[2], ARGV[3]
+local quota, limit = tonumber(ARGV[5]), tonumber(ARGV[7])
+local now, ttl = tonumber(ARGV[8]), tonumber(ARGV[9])
+local inflight, backlog = p .. 'inflight:' .. c, p .. 'backlog:' .. c
+redis.call('HSET', p .. 'quota', c, ARGV[5])
+redis.call('HSET', p .. 'weight', c, ARGV[6])
+redis.call('ZREMRANGEBYSCORE', inflight, '-inf', now - ttl)
+redis.call('ZREMRANGEBYSCORE', p .. 'global', '-inf', now - ttl)
+if redis.call('ZSCORE', inflight, t) then
+  return 0
+end
+if redis.call('LLEN', backlog) == 0
+    and redis.call('ZCARD', inflight) < quota
+    and redis.call('ZCARD', p .. 'global') < limit then
+  redis.call('ZADD', inflight, now, t)
+  redis.call('ZADD', p .. 'global', now, c .. '|' .. t)
+  return 0
+end
+redis.call('RPUSH', backlog, ARGV[4])
+redis.call('SADD', p .. 'waiting', c)
+return redis.call('LLEN', backlog)
+"""
+
+# Free a slot (if given), then admit queued requests while there is room,
+# lowest in-flight / weight first. Returns the admitted requests.
+PUMP_LUA = """
+local p = ARGV[1]
+local limit, now, ttl, max_admit = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+if ARGV[6] ~= '' then
+  redis.call('ZREM', p .. 'inflight:' .. ARGV[6], ARGV[7])
+  redis.call('ZREM', p .. 'global', ARGV[6] .. '|' .. ARGV[7])
+end
+redis.call('ZREMRANGEBYSCORE', p .. 'global', '-inf', now - ttl)
+local admitted = {}
+while #admitted < max_admit and redis.call('ZCARD', p .. 'global') < limit do
+  local best, best_share
+  for _, c in ipairs(redis.call('SMEMBERS', p .. 'waiting')) do
+    local inflight = p .. 'inflight:' .. c
+    redis.call('ZREMRANGEBYSCORE', inflight, '-inf', now - ttl)
+    local n = redis.call('ZCARD', inflight)
+    if n < tonumber(redis.call('HGET', p .. 'quota', c) or '1') then
+      local share = n / tonumber(redis.call('HGET', p .. 'weight', c) or '1')
+      if not best or share < best_share then
+        best, best_share = c, share
+      end
+    end
+  end
+  if not best then
+    break
+  end
+  local backlog = p .. 'backlog:' .. best
+  local item = redis.call('LPOP', backlog)
+  if item then
+    local t = cjson.decode(item)['task_id']
+    redis.call('ZADD', p .. 'inflight:' .. best, now, t)
+    redis.call('ZADD', p .. 'global', now, best .. '|' .. t)
+    table.insert(admitted, item)
+  end
+  if redis.call('LLEN', backlog) == 0 then
+    redis.call('SREM', p .. 'waiting', best)
+  end
+end
+return admitted
+"""
+
+# Take a slot for a resumed task if the customer and global limits allow,
+# regardless of the backlog. Returns 1 when the task holds a slot.
+RESUME_LUA = """
+local p, c, t = ARGV[1], ARGV[2], ARGV[3]
+local limit, now, ttl = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+local inflight = p .. 'inflight:' .. c
+redis.call('ZREMRANGEBYSCORE', inflight, '-inf', now - ttl)
+redis.call('ZREMRANGEBYSCORE', p .. 'global', '-inf', now - ttl)
+if redis.call('ZSCORE', inflight, t) then
+  return 1
+end
+if redis.call('ZCARD', inflight) < tonumber(redis.call('HGET', p .. 'quota', c) or ARGV[7])
+    and redis.call('ZCARD', p .. 'global') < limit then
+  redis.call('ZADD', inflight, now, t)
+  redis.call('ZADD', p .. 'global', now, c .. '|' .. t)
+  return 1
+end
+return 0
+"""
+
+# Drop a task's queued request from its customer's backlog. Returns 1 if found.
+CANCEL_LUA = """
+local p, c, t = ARGV[1], ARGV[2], ARGV[3]
+local backlog = p .. 'backlog:' .. c
+for _, item in ipairs(redis.call('LRANGE', backlog, 0, -1)) do
+  if cjson.decode(item)['task_id'] == t then
+    redis.call('LREM', backlog, 1, item)
+    if redis.call('LLEN', backlog) == 0 then
+      redis.call('SREM', p .. 'waiting', c)
+    end
+    return 1
+  end
+end
+return 0
+"""
+
+# Admissions per pump call (the rest go on the next release)
+MAX_ADMIT_PER_PUMP = 50
+
+
+class AdmissionController:
+    def __init__(self):
+        self._tiers = LRUCache(maxsize=10000, ttl=300.0)
+        self._submit_script = None
+        self._pump_script = None
+        self._resume_script = None
+        self._cancel_script = None
+        self.stats = {"admitted": 0, "queued": 0, "released": 0, "resumed": 0, "cancelled": 0, "start_failures": 0}
+
+    async def _redis(self):
+        from app.services.redis_queue_service import get_redis_queue_service
+
+        service = await get_redis_queue_service()
+        client = service.redis_client
+        if client is not None and self._submit_script is None:
+            self._submit_script = client.register_script(SUBMIT_LUA)
+            self._pump_script = client.register_script(PUMP_LUA)
+            self._resume_script = client.register_script(RESUME_LUA)
+            self._cancel_script = client.register_script(CANCEL_LUA)
+        return client
+
+    async def get_tier(self, customer_id: str) -> str:
+        """Customer's subscription tier (cached)"""
+        tier = self._tiers.get(customer_id)
+        if tier is None:
+            from app.core.database import get_async_supabase_admin
+
+            try:
+                supabase = await get_async_supabase_admin()
+                response = await supabase.table("customers").select("subscription_tier").eq("id", customer_id).limit(1).execute()
+                tier = (response.data[0].get("subscription_tier") if response.data else None) or ""
+            except Exception as e:
+                logger.warning(f"Could not load subscription tier for {customer_id}: {e}")
+                return ""
+            self._tiers.set(customer_id, tier)
+        return tier
+
+    def task_queue_for(self, tier: str) -> str:
+        return settings.ADMISSION_TIER_TASK_QUEUES.get(tier, settings.TEMPORAL_TASK_QUEUE)
+
+    async def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Start the orchestrator workflow for `request` now, or queue it
+
+        Args:
+            request: customer_id, task_id, task_description, context
+
+        Returns:
+            {"admitted": bool, "queue_position": int | None, "task_queue": str}
+        """
+        customer_id, task_id = request["customer_id"], request["task_id"]
+        tier = await self.get_tier(customer_id)
+        request = {**request, "task_queue": self.task_queue_for(tier), "enqueued_at": time.time()}
+
+        position = 0
+        client = await self._redis() if settings.ADMISSION_CONTROL_ENABLED else None
+        if client is not None:
+            try:
+                position = await self._submit_script(args=[
+                    KEY_PREFIX, customer_id, task_id, json.dumps(request),
+                    settings.ADMISSION_TIER_QUOTAS.get(tier, settings.ADMISSION_DEFAULT_QUOTA),
+                    settings.ADMISSION_TIER_WEIGHTS.get(tier, 1),
+                    settings.ADMISSION_GLOBAL_LIMIT,
+                    time.time(),
+                    settings.ADMISSION_SLOT_TTL
+                ])
+            except Exception as e:
+                # Fail open: admission control must not block task creation
+                logger.error(f"Admission control unavailable, starting task {task_id} directly: {e}")
+                position = 0
+
+        if position:
+            self.stats["queued"] += 1
+            logger.info(f"Task {task_id} queued for customer {customer_id} at position {position}")
+            await self._record_position(customer_id, task_id, position)
+            return {"admitted": False, "queue_position": position, "task_queue": request["task_queue"]}
+
+        self.stats["admitted"] += 1
+        try:
+            await self._start(request)
+        except Exception:
+            # Give the slot back (and let the next request in)
+            await self.release(customer_id, task_id)
+            raise
+        return {"admitted": True, "queue_position": None, "task_queue": request["task_queue"]}
+
+    async def _start(self, request: Dict[str, Any]):
+        from app.services.orchestrator import start_orchestrator_workflow
+
+        await start_orchestrator_workflow(request)
+
+    async def release(self, customer_id: str, task_id: str) -> int:
+        """Free a task's slot and start queued requests; returns how many were started"""
+        self.stats["released"] += 1
+        return await self.pump(customer_id, task_id)
+
+    async def resume(self, customer_id: str, task_id: str) -> bool:
+        """
+        Take a slot again for a task whose workflow waited for a human
+
+        Returns False while the customer or global limit is reached; the
+        caller retries later.
+        """
+        client = await self._redis() if settings.ADMISSION_CONTROL_ENABLED else None
+        if client is None:
+            return True
+        tier = await self.get_tier(customer_id)
+        try:
+            held = await self._resume_script(args=[
+                KEY_PREFIX, customer_id, task_id, settings.ADMISSION_GLOBAL_LIMIT,
+                time.time(), settings.ADMISSION_SLOT_TTL,
+                settings.ADMISSION_TIER_QUOTAS.get(tier, settings.ADMISSION_DEFAULT_QUOTA)
+            ])
+        except Exception as e:
+            # Fail open, like submit()
+            logger.error(f"Admission control unavailable, resuming task {task_id} directly: {e}")
+            return True
+        if held:
+            self.stats["resumed"] += 1
+        return bool(held)
+
+    async def touch(self, customer_id: str, task_id: str):
+        """Mark a held slot as still in use, so the slot TTL doesn't free it (best-effort)"""
+        client = await self._redis()
+        if client is None:
+            return
+        now = time.time()
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zadd(f"{KEY_PREFIX}inflight:{customer_id}", {task_id: now}, xx=True)
+                pipe.zadd(f"{KEY_PREFIX}global", {f"{customer_id}|{task_id}": now}, xx=True)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to refresh admission slot of task {task_id}: {e}")
+
+    async def cancel(self, customer_id: str, task_id: str) -> int:
+        """A task was deleted: drop it from the backlog or free its slot; returns tasks started"""
+        client = await self._redis()
+        if client is None:
+            return 0
+        try:
+            removed = await self._cancel_script(args=[KEY_PREFIX, customer_id, task_id])
+        except Exception as e:
+            logger.error(f"Failed to remove task {task_id} from the admission backlog: {e}")
+            removed = 0
+        self.stats["cancelled"] += 1
+        if removed:
+            await self._publish_positions(client, customer_id)
+            return 0
+        return await self.release(customer_id, task_id)
+
+    async def run_pump(self, interval: Optional[float] = None):
+        """Pump every ADMISSION_PUMP_INTERVAL: admits work whose slots were freed by the TTL"""
+        interval = interval or settings.ADMISSION_PUMP_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            await self.pump()
+
+    async def pump(self, customer_id: str = "", task_id: str = "") -> int:
+        """Admit queued requests while there is room (best-effort)"""
+        client = await self._redis()
+        if client is None:
+            return 0
+        try:
+            admitted = await self._pump_script(args=[
+                KEY_PREFIX, settings.ADMISSION_GLOBAL_LIMIT, time.time(),
+                settings.ADMISSION_SLOT_TTL, MAX_ADMIT_PER_PUMP, customer_id, task_id
+            ])
+        except Exception as e:
+            logger.error(f"Admission pump failed: {e}")
+            return 0
+
+        started = 0
+        moved = set()
+        for i, item in enumerate(admitted):
+            request = json.loads(item)
+            moved.add(request["customer_id"])
+            try:
+                await self._start(request)
+            except Exception as e:
+                # Temporal unreachable: put this and the rest back at the head
+                self.stats["start_failures"] += 1
+                logger.error(f"Failed to start queued task {request['task_id']}, requeued: {e}")
+                await self._requeue(client, admitted[i:])
+                break
+            started += 1
+            await self._record_position(request["customer_id"], request["task_id"], None)
+            logger.info(
+                f"Admitted queued task {request['task_id']} for customer {request['customer_id']} "
+                f"after {time.time() - request['enqueued_at']:.1f}s"
+            )
+
+        for customer in moved:
+            await self._publish_positions(client, customer)
+        return started
+
+    async def _record_position(self, customer_id: str, task_id: str, position: Optional[int]):
+        """Store the queue position on the task and push it to the UI"""
+        from app.core.database import get_async_supabase_admin
+
+        try:
+            supabase = await get_async_supabase_admin()
+            current = await supabase.table("tasks").select("metadata").eq("id", task_id).execute()
+            metadata = (current.data[0].get("metadata") if current.data else None) or {}
+            if position is None:
+                metadata.pop("queue_position", None)
+            else:
+                metadata["queue_position"] = position
+            await supabase.table("tasks").update({"metadata": metadata}).eq("id", task_id).execute()
+        except Exception as e:
+            logger.warning(f"Failed to record queue position of task {task_id}: {e}")
+        self._publish(customer_id, [(task_id, position)])
+
+    async def _publish_positions(self, client, customer_id: str):
+        try:
+            queued = await client.lrange(f"{KEY_PREFIX}backlog:{customer_id}", 0, settings.ADMISSION_POSITION_UPDATES - 1)
+        except Exception as e:
+            logger.warning(f"Failed to read backlog of customer {customer_id}: {e}")
+            return
+        self._publish(customer_id, [(json.loads(item)["task_id"], i + 1) for i, item in enumerate(queued)])
+
+    def _publish(self, customer_id: str, positions: List[tuple]):
+        from app.core.centrifugo import get_centrifugo_client
+
+        try:
+            centrifugo = get_centrifugo_client()
+            for task_id, position in positions:
+                centrifugo.publish_nowait(f"customer:{customer_id}:tasks", {
+                    "type": "task_queue_position",
+                    "task_id": task_id,
+                    "queue_position": position
+                })
+        except Exception as e:
+            logger.warning(f"Failed to publish queue positions: {e}")
+
+    async def _requeue(self, client, items: List[str]):
+        """Undo admission: free the slots, push the requests back in order"""
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                for item in reversed(items):
+                    request = json.loads(item)
+                    customer_id, task_id = request["customer_id"], request["task_id"]
+                    pipe.zrem(f"{KEY_PREFIX}inflight:{customer_id}", task_id)
+                    pipe.zrem(f"{KEY_PREFIX}global", f"{customer_id}|{task_id}")
+                    pipe.lpush(f"{KEY_PREFIX}backlog:{customer_id}", item)
+                    pipe.sadd(f"{KEY_PREFIX}waiting", customer_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to requeue {len(items)} admitted tasks: {e}")
+
+    async def get_backlog(self, customer_id: str) -> Dict[str, Any]:
+        """In-flight and queued task IDs of a customer"""
+        client = await self._redis()
+        if client is None:
+            return {"in_flight": [], "queued": []}
+        inflight = await client.zrange(f"{KEY_PREFIX}inflight:{customer_id}", 0, -1)
+        queued = await client.lrange(f"{KEY_PREFIX}backlog:{customer_id}", 0, -1)
+        return {"in_flight": list(inflight), "queued": [json.loads(item)["task_id"] for item in queued]}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+admission_controller = AdmissionController()
+
+
+def get_admission_controller() -> AdmissionController:
+    return admission_controller
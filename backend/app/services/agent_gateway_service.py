@@ -8,22 +8,35 @@ import json
 from typing import Dict, Any, Optional, AsyncGenerator
 from app.core.config import settings
 from app.core.resilience import agent_gateway_breaker
+from app.core.http_pool import get_http_pool
 
 logger = logging.getLogger(__name__)
 
+
+class GatewayUpstreamError(Exception):
+    """Agent Gateway answered with a 5xx (counted as a breaker failure)"""
+
+
 class AgentGatewayService:
     """Service for routing messages to KAgent deployments via Agent Gateway"""
     
     def __init__(self):
         self.base_url = settings.AGENT_GATEWAY_URL
         self.auth_token = settings.AGENT_GATEWAY_AUTH_TOKEN
-        self.client = httpx.AsyncClient(
-            base_url=self.base_url,
-            headers={"Authorization": f"Bearer {self.auth_token}"},
-            timeout=10.0
-        )
         logger.info("AgentGatewayService initialized for Agent Gateway routing")
     
+    def _gateway_url(self) -> str:
+        """Resolve the Agent Gateway URL for the current environment"""
+        if settings.ENVIRONMENT == "development":
+            # Local development: use port-forward to Agent Gateway
+            return "http://localhost:8080"
+        # Production: use cluster DNS
+        return "http://agent-gateway.kgateway-system.svc.cluster.local:8080"
+    
+    def _get_client(self, gateway_url: str) -> httpx.AsyncClient:
+        """Shared keep-alive client for the gateway (one pool per URL)"""
+        return get_http_pool().get_client(gateway_url, timeout=60.0)
+    
     async def create_customer_route(
         self,
         customer_id: str,
@@ -72,14 +85,28 @@ class AgentGatewayService:
         Returns:
             Formatted string with available agents and tools
         """
-        from app.services.customer_agent_service import CustomerAgentService
-        from app.core.database import get_supabase_admin
+        from app.services.customer_agent_service import (
+            CustomerAgentService,
+            agent_context_cache,
+            agent_context_cache_key
+        )
+        from app.core.database import get_async_supabase_admin
         
-        supabase = get_supabase_admin()
+        cache_key = agent_context_cache_key(customer_id, current_agent_type)
+        cached = await agent_context_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        supabase = await get_async_supabase_admin()
         customer_agent_service = CustomerAgentService(supabase)
         
         agents = await customer_agent_service.get_customer_agents(customer_id, current_agent_type)
-        return customer_agent_service.format_agent_context(agents)
+        agent_context = customer_agent_service.format_agent_context(agents)
+        
+        # Empty lists may come from a swallowed lookup error; don't pin them in cache
+        if agents:
+            await agent_context_cache.set(cache_key, agent_context)
+        return agent_context
     
     @agent_gateway_breaker
     async def invoke_agent_stream(
@@ -94,19 +121,38 @@ class AgentGatewayService:
         """
         Invoke agent and stream events as they arrive (SSE)
         
+        Text is scanned for leakage in-stream (app/security/stream_guard.py):
+        secrets and foreign customer IDs are redacted or the stream is
+        aborted, per LEAKAGE_STREAM_MODE.
+        
         Yields:
             Dict events: {"type": "thought"|"action"|"result"|"message", "content": str}
         """
+        from app.security.stream_guard import guard_stream
+        
+        events = self._stream_from_gateway(customer_id, agent_type, message, session_id)
+        async for event in guard_stream(
+            events,
+            customer_id=customer_id,
+            metadata={"agent_type": agent_type, "session_id": session_id}
+        ):
+            yield event
+    
+    async def _stream_from_gateway(
+        self,
+        customer_id: str,
+        agent_type: str,
+        message: str,
+        session_id: Optional[str] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Raw A2A event stream from the Agent Gateway"""
         logger.info(f"Streaming agent {agent_type} for customer {customer_id}")
         
         # Get agent context (filtered by current agent's role)
         agent_context = await self.get_customer_agents_context(customer_id, agent_type)
         
         # Use Agent Gateway with A2A protocol
-        if settings.ENVIRONMENT == "development":
-            gateway_url = "http://localhost:8080"
-        else:
-            gateway_url = "http://agent-gateway.kgateway-system.svc.cluster.local:8080"
+        gateway_url = self._gateway_url()
 
         context_id = session_id or f"ctx-{customer_id}"
         message_id = f"msg-{customer_id}-{hash(message)}"
@@ -139,50 +185,54 @@ class AgentGatewayService:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                async with client.stream(
-                    "POST",
-                    f"{gateway_url}/",
-                    json=payload,
-                    headers=headers
-                ) as response:
-                    
-                    if response.status_code != 200:
-                        error_body = await response.aread()
-                        logger.error(f"Agent Gateway error {response.status_code}: {error_body.decode('utf-8', errors='ignore')[:500]}")
-                        yield {"type": "error", "content": f"Gateway error: {response.status_code}"}
-                        return
-                    
-                    # Parse SSE stream
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            try:
-                                data = json.loads(line[6:])
+            client = self._get_client(gateway_url)
+            async with client.stream(
+                "POST",
+                "/",
+                json=payload,
+                headers=headers
+            ) as response:
+                
+                if response.status_code != 200:
+                    error_body = await response.aread()
+                    logger.error(f"Agent Gateway error {response.status_code}: {error_body.decode('utf-8', errors='ignore')[:500]}")
+                    yield {"type": "error", "content": f"Gateway error: {response.status_code}"}
+                    if response.status_code >= 500:
+                        raise GatewayUpstreamError(f"Agent Gateway returned {response.status_code}")
+                    return
+                
+                # Parse SSE stream
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        try:
+                            data = json.loads(line[6:])
+                            
+                            if "result" in data:
+                                result = data["result"]
                                 
-                                if "result" in data:
-                                    result = data["result"]
-                                    
-                                    # Extract message from status update
-                                    if "status" in result and "message" in result["status"]:
-                                        msg = result["status"]["message"]
-                                        if msg.get("role") == "agent" and "parts" in msg:
-                                            for part in msg["parts"]:
-                                                if part.get("kind") == "text":
-                                                    yield {"type": "message", "content": part.get("text", "")}
-                                    
-                                    # Extract artifact update
-                                    elif "artifact" in result and "parts" in result["artifact"]:
-                                        for part in result["artifact"]["parts"]:
+                                # Extract message from status update
+                                if "status" in result and "message" in result["status"]:
+                                    msg = result["status"]["message"]
+                                    if msg.get("role") == "agent" and "parts" in msg:
+                                        for part in msg["parts"]:
                                             if part.get("kind") == "text":
-                                                yield {"type": "artifact", "content": part.get("text", "")}
-                                    
-                                    # Check if final
-                                    if result.get("final") == True:
-                                        break
-                                        
-                            except json.JSONDecodeError:
-                                continue
+                                                yield {"type": "message", "content": part.get("text", "")}
                                 
+                                # Extract artifact update
+                                elif "artifact" in result and "parts" in result["artifact"]:
+                                    for part in result["artifact"]["parts"]:
+                                        if part.get("kind") == "text":
+                                            yield {"type": "artifact", "content": part.get("text", "")}
+                                
+                                # Check if final
+                                if result.get("final") == True:
+                                    break
+                                    
+                        except json.JSONDecodeError:
+                            continue
+                            
+        except GatewayUpstreamError:
+            raise  # Error event already sent
         except httpx.ConnectError as e:
             logger.error(f"Failed to connect to Agent Gateway: {e}")
             yield {"type": "error", "content": "Agent Gateway unavailable"}
@@ -192,7 +242,6 @@ class AgentGatewayService:
             yield {"type": "error", "content": str(e)}
             raise e # Re-raise for circuit breaker
     
-    @agent_gateway_breaker
     async def invoke_agent(
         self,
         customer_id: str,
@@ -217,15 +266,15 @@ class AgentGatewayService:
             Agent response
         """
         logger.info(f"Invoking agent {agent_type} via Agent Gateway for customer {customer_id}")
+
+        # Errors are turned into an apology message below, so the breaker
+        # is driven by hand instead of by decorator
+        breaker_key = agent_gateway_breaker.key_for(customer_id=customer_id, agent_type=agent_type)
+        probe = await agent_gateway_breaker.acquire(breaker_key)
+        gateway_ok = True
         
         # Use Agent Gateway with A2A protocol
-        if settings.ENVIRONMENT == "development":
-            # Local development: use port-forward to Agent Gateway
-            gateway_url = "http://localhost:8080"
-            logger.info(f"Dev Mode: Connecting to Agent Gateway at {gateway_url}")
-        else:
-            # Production: use cluster DNS
-            gateway_url = "http://agent-gateway.kgateway-system.svc.cluster.local:8080"
+        gateway_url = self._gateway_url()
 
         # Agent Gateway routes based on Host header
         agent_path = "/"
@@ -267,70 +316,75 @@ class AgentGatewayService:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                # A2A uses Server-Sent Events (streaming)
-                async with client.stream(
-                    "POST",
-                    f"{gateway_url}{agent_path}",
-                    json=payload,
-                    headers=headers
-                ) as response:
-                    
-                    if response.status_code != 200:
-                        error_body = await response.aread()
-                        logger.error(
-                            f"Agent Gateway returned {response.status_code} for agent '{agent_type}'\n"
-                            f"URL: {gateway_url}{agent_path}\n"
-                            f"Host Header: {agent_type}.local\n"
-                            f"Customer ID: {customer_id}\n"
-                            f"Response Body: {error_body.decode('utf-8', errors='ignore')[:500]}"
-                        )
-                        agent_message = f"I apologize, but I'm currently experiencing technical difficulties. (Gateway error: {response.status_code})"
-                    else:
-                        # Parse SSE stream
-                        agent_message = ""
-                        async for line in response.aiter_lines():
-                            if line.startswith("data: "):
-                                try:
-                                    data = json.loads(line[6:])  # Remove "data: " prefix
+            client = self._get_client(gateway_url)
+            # A2A uses Server-Sent Events (streaming)
+            async with client.stream(
+                "POST",
+                agent_path,
+                json=payload,
+                headers=headers
+            ) as response:
+                
+                if response.status_code != 200:
+                    error_body = await response.aread()
+                    logger.error(
+                        f"Agent Gateway returned {response.status_code} for agent '{agent_type}'\n"
+                        f"URL: {gateway_url}{agent_path}\n"
+                        f"Host Header: {agent_type}.local\n"
+                        f"Customer ID: {customer_id}\n"
+                        f"Response Body: {error_body.decode('utf-8', errors='ignore')[:500]}"
+                    )
+                    agent_message = f"I apologize, but I'm currently experiencing technical difficulties. (Gateway error: {response.status_code})"
+                    gateway_ok = response.status_code < 500
+                else:
+                    # Parse SSE stream
+                    agent_message = ""
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            try:
+                                data = json.loads(line[6:])  # Remove "data: " prefix
+                                
+                                # Extract message from task_status_update or task_artifact_update
+                                if "result" in data:
+                                    result = data["result"]
                                     
-                                    # Extract message from task_status_update or task_artifact_update
-                                    if "result" in data:
-                                        result = data["result"]
-                                        
-                                        # Check for agent message in status update
-                                        if "status" in result and "message" in result["status"]:
-                                            msg = result["status"]["message"]
-                                            if msg.get("role") == "agent" and "parts" in msg:
-                                                for part in msg["parts"]:
-                                                    if part.get("kind") == "text":
-                                                        agent_message = part.get("text", "")
-                                        
-                                        # Check for artifact update
-                                        elif "artifact" in result and "parts" in result["artifact"]:
-                                            for part in result["artifact"]["parts"]:
+                                    # Check for agent message in status update
+                                    if "status" in result and "message" in result["status"]:
+                                        msg = result["status"]["message"]
+                                        if msg.get("role") == "agent" and "parts" in msg:
+                                            for part in msg["parts"]:
                                                 if part.get("kind") == "text":
                                                     agent_message = part.get("text", "")
+                                    
+                                    # Check for artifact update
+                                    elif "artifact" in result and "parts" in result["artifact"]:
+                                        for part in result["artifact"]["parts"]:
+                                            if part.get("kind") == "text":
+                                                agent_message = part.get("text", "")
+                                    
+                                    # Check if task is completed
+                                    if result.get("final") == True:
+                                        break
                                         
-                                        # Check if task is completed
-                                        if result.get("final") == True:
-                                            break
-                                            
-                                except json.JSONDecodeError:
-                                    continue
-                        
-                        if not agent_message:
-                            agent_message = "No response from agent"
-                            
-                        logger.info(f"Agent response: {agent_message[:100]}...")
+                            except json.JSONDecodeError:
+                                continue
                     
+                    if not agent_message:
+                        agent_message = "No response from agent"
+                        
+                    logger.info(f"Agent response: {agent_message[:100]}...")
+                
         except httpx.ConnectError as e:
             logger.error(f"Failed to connect to Agent Gateway at {gateway_url}: {e}")
             agent_message = f"I apologize, but I'm currently unavailable. Please ensure the Agent Gateway is reachable. (Connection error)"
+            gateway_ok = False
                 
         except Exception as e:
             logger.error(f"Error calling Agent Gateway for {agent_type}: {e}")
             agent_message = f"I apologize, but I encountered an error: {str(e)[:100]}"
+            gateway_ok = False
+
+        await agent_gateway_breaker.record(breaker_key, gateway_ok, probe)
         
         # Prepare response
         response_data = {
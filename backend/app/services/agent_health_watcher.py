@@ -0,0 +1,124 @@
+"""
+Agent Health Watcher
+Keeps customer_ves.status in line with the readiness of the shared KAgent
+agents, driven by a Kubernetes watch instead of per-VE polling.
+
+A ResourceInformer follows agents.kagent.dev in KAGENT_NAMESPACE. Agents are
+shared per agent_type (the Agent's name), so a readiness change fans out to
+every customer VE of that type. Only changes are recorded; every
+AGENT_HEALTH_FLUSH_INTERVAL they are written with at most two bulk UPDATEs
+(VEs of types that became unready -> "unhealthy", of types ready again ->
+"active"). Rows in other statuses are never touched.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def agent_ready(obj: Optional[Dict[str, Any]]) -> Optional[bool]:
+    """Readiness of an Agent object; None if it doesn't say"""
+    if obj is None:
+        return False
+    status = obj.get("status") or {}
+    if "ready" in status:
+        return bool(status["ready"])
+    for condition in status.get("conditions") or []:
+        if condition.get("type") == "Ready":
+            return condition.get("status") == "True"
+    return None
+
+
+class AgentHealthWatcher:
+    def __init__(self, informer=None, flush_interval: Optional[float] = None):
+        self.informer = informer
+        self.flush_interval = flush_interval if flush_interval is not None else settings.AGENT_HEALTH_FLUSH_INTERVAL
+        self.running = False
+        # agent_type -> last known readiness
+        self._ready: Dict[str, bool] = {}
+        # agent_type -> readiness not yet written
+        self._changes: Dict[str, bool] = {}
+        self.stats = {"changes": 0, "flushes": 0, "rows_updated": 0}
+        if informer is not None:
+            informer.add_handler(self.on_event)
+
+    def on_event(self, event_type: str, obj: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        agent_type = (obj.get("metadata") or {}).get("name")
+        if not agent_type:
+            return
+        ready = agent_ready(None if event_type == "DELETED" else obj)
+        if ready is None or self._ready.get(agent_type) == ready:
+            return
+        self._ready[agent_type] = ready
+        self._changes[agent_type] = ready
+        self.stats["changes"] += 1
+        logger.info(f"Agent {agent_type} is now {'ready' if ready else 'not ready'}")
+
+    def status(self, agent_type: str) -> Optional[bool]:
+        return self._ready.get(agent_type)
+
+    async def run(self):
+        """Watch agents and flush status changes until stop()"""
+        if self.informer is None:
+            from app.core.k8s_informer import ResourceInformer
+            from app.services.kubernetes_service import get_kubernetes_service
+
+            k8s = get_kubernetes_service()
+            if not k8s.enabled:
+                logger.warning("Kubernetes not configured, agent health watcher disabled")
+                return
+            self.informer = ResourceInformer(
+                k8s.custom_api, "kagent.dev", "v1alpha2", "agents", namespace=settings.KAGENT_NAMESPACE
+            )
+            self.informer.add_handler(self.on_event)
+
+        self.running = True
+        watcher = asyncio.create_task(self.informer.run())
+        try:
+            while self.running:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            self.informer.stop()
+            watcher.cancel()
+
+    def stop(self):
+        self.running = False
+
+    async def flush(self):
+        """Write pending readiness changes in bulk"""
+        if not self._changes:
+            return
+        changes, self._changes = self._changes, {}
+        from app.core.database import get_async_supabase_admin
+
+        # status to set -> (agent types, status it replaces)
+        updates = {
+            "unhealthy": ([t for t, ready in changes.items() if not ready], "active"),
+            "active": ([t for t, ready in changes.items() if ready], "unhealthy"),
+        }
+        try:
+            supabase = await get_async_supabase_admin()
+            for new_status, (agent_types, old_status) in updates.items():
+                if not agent_types:
+                    continue
+                response = await supabase.table("customer_ves").update({
+                    "status": new_status
+                }).in_("agent_type", agent_types).eq("status", old_status).execute()
+                rows = len(response.data or [])
+                self.stats["rows_updated"] += rows
+                logger.info(f"Marked {rows} VEs {new_status} (agent types: {', '.join(sorted(agent_types))})")
+            self.stats["flushes"] += 1
+        except Exception as e:
+            # Keep the changes for the next flush (newer events win)
+            logger.error(f"Failed to write agent health changes: {e}")
+            self._changes = {**changes, **self._changes}
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {**self.stats, "agents": len(self._ready), "pending": len(self._changes)}
+        if self.informer is not None:
+            stats["informer"] = self.informer.get_stats()
+        return stats
@@ -1,22 +1,55 @@
 """
 API Key Service
 Manages API keys for agent authentication
+
+verify_api_key runs on every agent/MCP request, so it avoids the database on
+the hot path:
+- key_hash -> key info is cached in-process for API_KEY_CACHE_TTL; unknown or
+  revoked keys are cached as invalid for API_KEY_NEGATIVE_CACHE_TTL
+- revoke_api_key evicts locally and publishes the hash on API_KEY_REVOKED_CHANNEL
+  so other replicas evict it too (the TTL bounds staleness if Redis is down)
+- last_used_at is buffered and written in one UPDATE per
+  API_KEY_LAST_USED_FLUSH_INTERVAL, so it is accurate to that interval
 """
+import asyncio
 import logging
 import secrets
 import hashlib
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime
-from app.core.database import get_supabase_admin
+from supabase import AsyncClient
+from app.core.config import settings
+from app.core.database import get_async_supabase_admin
+from app.core.tiered_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
+API_KEY_REVOKED_CHANNEL = "api_keys:revoked"
+
+# Seconds between attempts to (re)start the revocation listener
+LISTENER_RETRY_INTERVAL = 30.0
+
 
 class APIKeyService:
     """Service for managing API keys for agent authentication"""
     
-    def __init__(self):
-        self.supabase = get_supabase_admin()
+    def __init__(self, supabase_client: Optional[AsyncClient] = None):
+        self.supabase = supabase_client
+        # key_hash -> key info, or False for a known-invalid key
+        self._cache = LRUCache(maxsize=settings.API_KEY_CACHE_MAXSIZE, ttl=settings.API_KEY_CACHE_TTL)
+        # key id -> last use (ISO timestamp), written behind
+        self._last_used: Dict[str, str] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._listener_started_at = 0.0
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "last_used_writes": 0}
+
+    async def _client(self) -> AsyncClient:
+        """Resolve the shared async admin client on first use"""
+        if self.supabase is None:
+            self.supabase = await get_async_supabase_admin()
+        return self.supabase
     
     def _hash_key(self, api_key: str) -> str:
         """Hash API key for secure storage"""
@@ -34,6 +67,7 @@ class APIKeyService:
         Returns the plain key (only shown once) and key info
         """
         try:
+            supabase = await self._client()
             # Generate secure random key
             plain_key = f"vek_{secrets.token_urlsafe(32)}"
             key_hash = self._hash_key(plain_key)
@@ -50,7 +84,7 @@ class APIKeyService:
                 "last_used_at": None
             }
             
-            response = self.supabase.table("api_keys").insert(data).execute()
+            response = await supabase.table("api_keys").insert(data).execute()
             
             if not response.data:
                 raise Exception("Failed to create API key")
@@ -70,37 +104,100 @@ class APIKeyService:
         Verify API key and return associated customer info
         Returns None if invalid
         """
+        key_hash = self._hash_key(api_key)
+        self._ensure_listener()
+
+        cached = self._cache.get(key_hash)
+        if cached is False:
+            self.stats["negative_hits"] += 1
+            return None
+        if cached is not None:
+            self.stats["hits"] += 1
+            self._touch(cached["id"])
+            return dict(cached)
+
+        self.stats["misses"] += 1
         try:
-            key_hash = self._hash_key(api_key)
+            supabase = await self._client()
             
             # Look up key
-            response = self.supabase.table("api_keys")\
+            response = await supabase.table("api_keys")\
                 .select("*")\
                 .eq("key_hash", key_hash)\
                 .eq("is_active", True)\
                 .execute()
             
             if not response.data:
+                self._cache.set(key_hash, False, ttl=settings.API_KEY_NEGATIVE_CACHE_TTL)
                 return None
             
             key_info = response.data[0]
+            self._cache.set(key_hash, key_info)
             
-            # Update last used timestamp
-            self.supabase.table("api_keys")\
-                .update({"last_used_at": datetime.utcnow().isoformat()})\
-                .eq("id", key_info["id"])\
-                .execute()
+            # Update last used timestamp (written behind)
+            self._touch(key_info["id"])
             
-            return key_info
+            return dict(key_info)
             
         except Exception as e:
+            # Not cached: a database error is not proof the key is invalid
             logger.error(f"Failed to verify API key: {e}")
             return None
+
+    def _touch(self, key_id: str):
+        self._last_used[key_id] = datetime.utcnow().isoformat()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._last_used:
+            await asyncio.sleep(settings.API_KEY_LAST_USED_FLUSH_INTERVAL)
+            await self.flush_last_used()
+
+    async def flush_last_used(self):
+        """Write buffered last_used_at values in one UPDATE"""
+        if not self._last_used:
+            return
+        pending, self._last_used = self._last_used, {}
+        try:
+            supabase = await self._client()
+            await supabase.table("api_keys")\
+                .update({"last_used_at": max(pending.values())})\
+                .in_("id", list(pending))\
+                .execute()
+            self.stats["last_used_writes"] += 1
+        except Exception as e:
+            # Best-effort bookkeeping: keep the newest values for the next flush
+            logger.warning(f"Failed to write last_used_at for {len(pending)} API keys: {e}")
+            for key_id, used_at in pending.items():
+                self._last_used.setdefault(key_id, used_at)
+
+    def _ensure_listener(self):
+        """Subscribe to revocations from other replicas (restarted if Redis drops)"""
+        if self._listener is not None and not self._listener.done():
+            return
+        if time.monotonic() - self._listener_started_at < LISTENER_RETRY_INTERVAL:
+            return
+        self._listener_started_at = time.monotonic()
+        self._listener = asyncio.create_task(self._listen_for_revocations())
+
+    async def _listen_for_revocations(self):
+        from app.services.redis_queue_service import get_redis_queue_service
+        try:
+            redis_service = await get_redis_queue_service()
+            await redis_service.subscribe_to_events(API_KEY_REVOKED_CHANNEL, self._on_revoked)
+        except Exception as e:
+            logger.warning(f"API key revocation listener stopped: {e}")
+
+    async def _on_revoked(self, event: Dict[str, Any]):
+        if event.get("key_hash"):
+            self._cache.delete(event["key_hash"])
     
     async def revoke_api_key(self, key_id: str, customer_id: str) -> bool:
         """Revoke an API key"""
         try:
-            response = self.supabase.table("api_keys")\
+            supabase = await self._client()
+            response = await supabase.table("api_keys")\
                 .update({"is_active": False})\
                 .eq("id", key_id)\
                 .eq("customer_id", customer_id)\
@@ -108,6 +205,7 @@ class APIKeyService:
             
             if response.data:
                 logger.info(f"Revoked API key {key_id}")
+                await self._broadcast_revocation(response.data[0].get("key_hash"))
                 return True
             
             return False
@@ -116,10 +214,32 @@ class APIKeyService:
             logger.error(f"Failed to revoke API key: {e}")
             return False
     
+    async def _broadcast_revocation(self, key_hash: Optional[str]):
+        if not key_hash:
+            return
+        self._cache.delete(key_hash)
+        try:
+            from app.services.redis_queue_service import get_redis_queue_service
+            redis_service = await get_redis_queue_service()
+            await redis_service.publish_event(API_KEY_REVOKED_CHANNEL, {"key_hash": key_hash})
+        except Exception as e:
+            # Other replicas drop the key when their cache entry expires
+            logger.warning(f"Failed to broadcast API key revocation: {e}")
+
+    async def close(self):
+        """Flush buffered last_used_at and stop background tasks (shutdown)"""
+        await self.flush_last_used()
+        if self._listener is not None:
+            self._listener.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "cached": len(self._cache), "pending_last_used": len(self._last_used)}
+
     async def list_api_keys(self, customer_id: str) -> list:
         """List all API keys for a customer (without plain keys)"""
         try:
-            response = self.supabase.table("api_keys")\
+            supabase = await self._client()
+            response = await supabase.table("api_keys")\
                 .select("id, name, key_type, is_active, created_at, last_used_at, metadata")\
                 .eq("customer_id", customer_id)\
                 .order("created_at", desc=True)\
@@ -1,10 +1,10 @@
 from typing import Optional
-from supabase import Client
+from supabase import AsyncClient
 
 class BaseService:
-    """Base service class with Supabase client injection"""
+    """Base service class with (async) Supabase client injection"""
     
-    def __init__(self, supabase_client: Client):
+    def __init__(self, supabase_client: AsyncClient):
         self.supabase = supabase_client
     
     def _handle_error(self, error: Exception, context: str = "") -> None:
@@ -4,17 +4,127 @@ Provides dynamic discovery of customer's hired agents for delegation
 """
 import logging
 from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.core.tiered_cache import TieredCache
 from .base import BaseService
-from .kagent_service import KAgentService
+from .kagent_service import kagent_service
 
 logger = logging.getLogger(__name__)
 
+# Formatted team context keyed by "<customer_id>:<requesting agent_type>"
+agent_context_cache = TieredCache(
+    "agent_ctx",
+    local_maxsize=2048,
+    local_ttl=settings.AGENT_CONTEXT_LOCAL_TTL,
+    redis_ttl=settings.AGENT_CONTEXT_CACHE_TTL
+)
+
+
+def agent_context_cache_key(customer_id: str, current_agent_type: Optional[str]) -> str:
+    return f"{customer_id}:{current_agent_type or '_all'}"
+
+
+async def invalidate_customer_agent_context(customer_id: str):
+    """Drop cached team context for one customer (hire / unhire / update)"""
+    try:
+        await agent_context_cache.invalidate_prefix(f"{customer_id}:")
+    except Exception as e:
+        logger.error(f"Failed to invalidate agent context for customer {customer_id}: {e}")
+
+
+async def invalidate_all_agent_context():
+    """Drop cached team context for every customer (agent import / delete)"""
+    try:
+        await agent_context_cache.invalidate_prefix()
+    except Exception as e:
+        logger.error(f"Failed to invalidate agent context cache: {e}")
+
+
+# Only the columns delegation routing reads: keeps Temporal payloads small
+TEAM_SNAPSHOT_SELECT = (
+    "id, agent_type, persona_name, "
+    "ve_details:virtual_employees(name, role, department, seniority_level, capabilities)"
+)
+
+# Task statuses whose delegation workflow may still be running
+ACTIVE_TASK_STATUSES = ["pending", "planning", "in_progress", "waiting_for_input"]
+
+
+def compact_team_member(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim a customer_ves row to the routing fields (capabilities as a flat list)"""
+    details = row.get("ve_details") or {}
+    capabilities = details.get("capabilities") or []
+    if isinstance(capabilities, dict):
+        capabilities = list(capabilities.keys())
+    return {
+        "id": row.get("id"),
+        "agent_type": row.get("agent_type"),
+        "persona_name": row.get("persona_name"),
+        "ve_details": {
+            "name": details.get("name"),
+            "role": details.get("role"),
+            "department": details.get("department"),
+            "seniority_level": details.get("seniority_level"),
+            "capabilities": [str(c) for c in capabilities],
+        }
+    }
+
+
+async def get_team_snapshot(customer_id: str) -> List[Dict[str, Any]]:
+    """Compact snapshot of a customer's hired team, fetched once per workflow"""
+    from app.core.database import get_async_supabase_admin
+    
+    supabase = await get_async_supabase_admin()
+    response = await supabase.table("customer_ves")\
+        .select(TEAM_SNAPSHOT_SELECT)\
+        .eq("customer_id", customer_id)\
+        .execute()
+    return [compact_team_member(row) for row in response.data or []]
+
+
+async def refresh_running_task_teams(customer_id: str) -> int:
+    """
+    Push a fresh team snapshot to the customer's running delegation workflows
+    (hire / unhire / update). Best-effort: returns the number signalled.
+    """
+    try:
+        from app.core.database import get_async_supabase_admin
+        from app.core.temporal_client import get_temporal_client
+        
+        supabase = await get_async_supabase_admin()
+        tasks = await supabase.table("tasks")\
+            .select("id")\
+            .eq("customer_id", customer_id)\
+            .in_("status", ACTIVE_TASK_STATUSES)\
+            .execute()
+        if not tasks.data:
+            return 0
+        
+        team = await get_team_snapshot(customer_id)
+        client = await get_temporal_client()
+    except Exception as e:
+        logger.error(f"Failed to prepare team refresh for customer {customer_id}: {e}")
+        return 0
+    
+    signalled = 0
+    for task in tasks.data:
+        try:
+            handle = client.get_workflow_handle(f"intelligent-delegation-{task['id']}")
+            await handle.signal("refresh_team", team)
+            signalled += 1
+        except Exception as e:
+            # Workflow already finished or not started yet
+            logger.debug(f"Team refresh skipped for task {task['id']}: {e}")
+    return signalled
+
+
 class CustomerAgentService(BaseService):
     """Service for discovering customer's hired agents and their capabilities"""
     
     def __init__(self, supabase):
         super().__init__(supabase)
-        self.kagent_service = KAgentService()
+        # Shared instance: avoids re-loading kubeconfig on every lookup
+        self.kagent_service = kagent_service
     
     async def get_customer_agents(self, customer_id: str, current_agent_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -30,7 +140,7 @@ class CustomerAgentService(BaseService):
         """
         try:
             # 1. Get customer's hired agents
-            response = self.supabase.table("customer_ves")\
+            response = await self.supabase.table("customer_ves")\
                 .select("id, persona_name, agent_type, ve_details:virtual_employees(role, department, seniority_level)")\
                 .eq("customer_id", customer_id)\
                 .execute()
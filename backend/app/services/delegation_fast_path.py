@@ -0,0 +1,197 @@
+"""
+Delegation Fast Path
+Avoids an LLM round trip per delegation hop:
+
+1. Decision cache keyed by (customer, agent type, team composition hash,
+   normalized task fingerprint). A repeat of the same task for the same
+   customer and team reuses the earlier routing. Only the routing (action +
+   target) is cached, never task-specific subtasks or reasoning, so parallel
+   splits always go back to the LLM.
+2. A local keyword classifier that scores each team member against the task
+   and answers "handle" / "delegate" when one agent clearly dominates.
+   Anything ambiguous (including likely parallel splits) escalates to the LLM.
+"""
+import hashlib
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+# Domain hints shared with the routing fallback (analyze_task_description_activity)
+TASK_KEYWORDS: Dict[str, List[str]] = {
+    "devops": ["code", "deploy", "server", "bug", "fix", "infrastructure", "pipeline", "kubernetes", "outage"],
+    "marketing": ["post", "write", "blog", "social", "campaign", "seo", "content", "newsletter", "brand"],
+    "sales": ["lead", "deal", "prospect", "pipeline", "crm", "quote", "outreach"],
+    "support": ["ticket", "customer", "refund", "complaint", "help"],
+    "finance": ["invoice", "budget", "expense", "forecast", "payroll"],
+}
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "our", "your", "are", "was",
+    "will", "can", "please", "need", "needs", "make", "some", "all", "about", "new", "get",
+}
+
+# Decisions that are safe to replay for an identical task + team; "parallel"
+# carries LLM-written subtasks specific to the original task, so it isn't
+_CACHEABLE_ACTIONS = {"handle", "delegate"}
+
+decision_cache = TieredCache(
+    "delegation_decision",
+    local_maxsize=4096,
+    local_ttl=settings.DELEGATION_DECISION_LOCAL_TTL,
+    redis_ttl=settings.DELEGATION_DECISION_CACHE_TTL
+)
+
+# In-process counters (also exported as the delegation.decisions OTel counter)
+decision_stats: Dict[str, int] = {"cache": 0, "fast_path": 0, "llm": 0}
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z]+", text.lower()) if len(t) > 2 and t not in _STOPWORDS]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def task_fingerprint(task_description: str, user_feedback: Optional[str] = None) -> str:
+    """
+    Normalized fingerprint: only case, punctuation and whitespace are ignored.
+    Numbers, short words and word order are kept ("Q3 2024 report" and
+    "migrate A to B" must not collide with their variants).
+    """
+    text = _normalize(task_description)
+    if user_feedback:
+        text += " |feedback| " + _normalize(user_feedback)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def team_composition_hash(available_agents: Iterable[Dict[str, Any]]) -> str:
+    """Hash of the team's agent types and seniority (order-independent)"""
+    members = sorted(
+        f"{a.get('agent_type')}:{(a.get('ve_details') or {}).get('seniority_level', '')}"
+        for a in available_agents
+    )
+    return hashlib.sha256("|".join(members).encode()).hexdigest()[:16]
+
+
+def decision_cache_key(
+    customer_id: str,
+    agent_type: str,
+    task_description: str,
+    available_agents: List[Dict[str, Any]],
+    user_feedback: Optional[str] = None
+) -> str:
+    return (
+        f"{customer_id}:{agent_type}:{team_composition_hash(available_agents)}:"
+        f"{task_fingerprint(task_description, user_feedback)}"
+    )
+
+
+def is_cacheable(decision: Dict[str, Any]) -> bool:
+    """Only cache real decisions, never error fallbacks or clarification requests"""
+    return (
+        decision.get("action") in _CACHEABLE_ACTIONS
+        and decision.get("method") != "fallback"
+        and not str(decision.get("reason", "")).startswith(("Fallback", "Could not parse", "Error"))
+    )
+
+
+def cached_decision(decision: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a decision that is stored: the routing, not the LLM's task-specific text"""
+    return {"action": decision["action"], "delegated_to": decision.get("delegated_to")}
+
+
+def _agent_vocabulary(agent: Dict[str, Any]) -> Set[str]:
+    details = agent.get("ve_details") or {}
+    capabilities = details.get("capabilities") or []
+    if isinstance(capabilities, dict):
+        capabilities = list(capabilities.keys())
+
+    text = " ".join([
+        str(agent.get("agent_type") or ""),
+        str(details.get("role") or ""),
+        str(details.get("department") or ""),
+        " ".join(str(c) for c in capabilities),
+    ])
+    vocab = set(_tokens(text))
+    for domain, keywords in TASK_KEYWORDS.items():
+        if domain in vocab:
+            vocab.update(keywords)
+    return vocab
+
+
+def classify_delegation(
+    agent_type: str,
+    task_description: str,
+    available_agents: List[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Cheap local decision from keyword overlap between the task and each team
+    member's type / role / department / capabilities.
+
+    Returns a decision dict with a confidence score, or None when nothing
+    matches. Confidence rewards a clear winner with several hits:
+        confidence = best / (best + runner_up) * min(1, best / 2)
+    """
+    task_words = set(_tokens(task_description))
+    if not task_words or not available_agents:
+        return None
+
+    scores = []
+    for agent in available_agents:
+        if agent.get("agent_type"):
+            scores.append((len(task_words & _agent_vocabulary(agent)), agent["agent_type"]))
+    if not scores:
+        return None
+
+    # Stable: prefer the current agent on ties so we never bounce work around
+    scores.sort(key=lambda s: (-s[0], s[1] != agent_type))
+    best_score, best_agent = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else 0
+    if best_score == 0:
+        return None
+
+    confidence = round(best_score / (best_score + runner_up) * min(1.0, best_score / 2), 3)
+
+    if best_agent == agent_type:
+        return {
+            "action": "handle",
+            "delegated_to": None,
+            "subtasks": None,
+            "reason": f"Task matches {agent_type}'s expertise ({best_score} keyword hits)",
+            "confidence": confidence,
+            "method": "fast_path"
+        }
+    return {
+        "action": "delegate",
+        "delegated_to": best_agent,
+        "subtasks": None,
+        "reason": f"Task matches {best_agent}'s expertise ({best_score} keyword hits)",
+        "confidence": confidence,
+        "method": "fast_path"
+    }
+
+
+def record_decision_source(source: str):
+    """Count where a delegation decision came from: cache, fast_path or llm"""
+    decision_stats[source] = decision_stats.get(source, 0) + 1
+
+    from app.core.telemetry import record_delegation_decision
+    record_delegation_decision(source)
+
+
+def get_decision_stats() -> Dict[str, Any]:
+    """Decision source counters plus the share that skipped the LLM"""
+    total = sum(decision_stats.values())
+    skipped = decision_stats.get("cache", 0) + decision_stats.get("fast_path", 0)
+    return {
+        **decision_stats,
+        "total": total,
+        "llm_skip_rate": round(skipped / total, 4) if total else 0.0,
+        "decision_cache": decision_cache.get_stats()
+    }
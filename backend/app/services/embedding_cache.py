@@ -0,0 +1,93 @@
+"""
+Embedding Cache
+Content-addressed cache for embedding vectors, keyed by
+provider + model + output dimensions + sha256(text), so identical texts are
+embedded once and changing EMBEDDING_DIMENSIONS never serves old-size vectors.
+
+Vectors are stored as packed float32 (or float16) bytes rather than JSON
+lists: ~3 KB per 768-d vector in Redis instead of ~15 KB. The in-process LRU
+tier holds NumPy arrays. Redis entries expire after EMBEDDING_CACHE_TTL;
+Redis' own maxmemory policy bounds total size.
+"""
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache(TieredCache):
+    """TieredCache variant that stores vectors as packed bytes"""
+
+    def __init__(self, dtype: str = "float32", **kwargs):
+        super().__init__(**kwargs)
+        self.dtype = np.dtype(dtype)
+        # dtype is part of the key so switching precision never misreads old entries
+        self._dtype_tag = "f16" if self.dtype == np.float16 else "f32"
+
+    def make_key(self, provider: str, model: str, dimensions: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self._dtype_tag}:{provider}:{model}:{dimensions}:{digest}"
+
+    def _encode(self, embedding: List[float]) -> bytes:
+        return np.asarray(embedding, dtype=self.dtype).tobytes()
+
+    def _decode(self, data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype=self.dtype).astype(np.float32)
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        return (await self.get_many([key]))[0]
+
+    async def set(self, key: str, embedding: List[float]):
+        await self.set_many({key: embedding})
+
+    async def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Look up several vectors; Redis misses from the local tier go in one MGET"""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        remote = []
+        for i, key in enumerate(keys):
+            vector = self.local.get(key)
+            if vector is not None:
+                self.local_hits += 1
+                results[i] = vector.tolist()
+            else:
+                remote.append(i)
+
+        if remote:
+            redis_service = await self._redis()
+            values = await redis_service.get_bytes_many([self._redis_key(keys[i]) for i in remote])
+            for i, data in zip(remote, values):
+                if data:
+                    vector = self._decode(data)
+                    self.local.set(keys[i], vector)
+                    self.redis_hits += 1
+                    results[i] = vector.tolist()
+                else:
+                    self.misses += 1
+        return results
+
+    async def set_many(self, embeddings: Dict[str, List[float]]):
+        """Store several vectors (one pipelined Redis round trip)"""
+        payload = {}
+        for key, embedding in embeddings.items():
+            data = self._encode(embedding)
+            self.local.set(key, self._decode(data))
+            payload[self._redis_key(key)] = data
+
+        redis_service = await self._redis()
+        await redis_service.set_bytes_many(payload, expire_seconds=self.redis_ttl)
+
+
+# Shared across EmbeddingsService instances in this process
+embedding_cache = EmbeddingCache(
+    namespace="emb",
+    dtype=settings.EMBEDDING_CACHE_DTYPE,
+    local_maxsize=settings.EMBEDDING_CACHE_LOCAL_MAXSIZE,
+    local_ttl=settings.EMBEDDING_CACHE_LOCAL_TTL,
+    redis_ttl=settings.EMBEDDING_CACHE_TTL
+)
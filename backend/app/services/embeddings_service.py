@@ -3,21 +3,52 @@ Embeddings Service
 Handles generation and management of vector embeddings for RAG
 Supports multiple LLM providers (Gemini, OpenAI, etc.)
 """
+import asyncio
+import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import AsyncGenerator, List, Dict, Any, Optional
 import httpx
+import numpy as np
+from postgrest.exceptions import APIError
 from app.core.config import settings
-from app.core.database import get_supabase_admin
+from app.core.database import get_async_supabase_admin
+from app.core.http_pool import get_http_pool
+from app.services.embedding_cache import embedding_cache
 
 logger = logging.getLogger(__name__)
 
+# pgvector top-k search function (migrations/007_knowledge_vector_search.sql)
+MATCH_KNOWLEDGE_RPC = "match_company_knowledge"
+
+# PostgREST codes for "function not found" / "undefined function"
+RPC_MISSING_CODES = {"PGRST202", "42883"}
+
+# Columns returned by searches (never the embedding itself)
+KNOWLEDGE_COLUMNS = "id, customer_id, content, content_type, metadata, created_at, updated_at"
+
+GEMINI_EMBEDDING_MODEL = "models/text-embedding-004"
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Texts per provider request. Gemini's batchEmbedContents caps at 100;
+# OpenAI accepts 2048 inputs but also caps tokens per request, so stay lower.
+PROVIDER_BATCH_LIMITS = {"gemini": 100, "openai": 256, "mock": 256}
+
+# Postgres "data exception" (e.g. "expected 768 dimensions, not 1536")
+DIMENSION_ERROR_CODES = {"22000"}
+
+
+class EmbeddingDimensionError(Exception):
+    """Embedding size doesn't match EMBEDDING_DIMENSIONS (and the vector column)"""
+
 
 class EmbeddingsService:
     """Service for generating and managing embeddings (LLM-agnostic)"""
     
     def __init__(self):
-        self.dimensions = 768  # Default for most models
+        # Requested from every provider; must match vector(N) in migration 007
+        self.dimensions = settings.EMBEDDING_DIMENSIONS
         self.provider = self._detect_provider()
+        self._rpc_available = True
         
     def _detect_provider(self) -> str:
         """Auto-detect which LLM provider to use based on available API keys"""
@@ -33,26 +64,53 @@ class EmbeddingsService:
         """
         Generate embedding for text using configured LLM provider
         Supports: Gemini, OpenAI, and mock (fallback)
+        
+        Real provider results are cached by provider+model+dimensions+sha256(text).
         """
+        if self.provider == "mock":
+            return self._generate_mock_embedding(text)
+        
+        cache_key = self._cache_key(text)
+        cached = await embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             if self.provider == "gemini":
-                return await self._generate_gemini_embedding(text)
-            elif self.provider == "openai":
-                return await self._generate_openai_embedding(text)
+                embedding = await self._generate_gemini_embedding(text)
             else:
-                return self._generate_mock_embedding(text)
+                embedding = await self._generate_openai_embedding(text)
                 
+        except EmbeddingDimensionError:
+            # Misconfiguration, not a transient failure: don't hide it behind mock vectors
+            raise
         except Exception as e:
             logger.error(f"Failed to generate embedding with {self.provider}: {e}")
-            # Fallback to mock
+            # Fallback to mock (never cached)
             return self._generate_mock_embedding(text)
+        
+        if embedding:
+            await embedding_cache.set(cache_key, embedding)
+        return embedding
+    
+    def _check_dimensions(self, embeddings: List[Optional[List[float]]]):
+        for embedding in embeddings:
+            if embedding and len(embedding) != self.dimensions:
+                raise EmbeddingDimensionError(
+                    f"{self.provider} returned {len(embedding)}-dimensional embeddings, "
+                    f"expected EMBEDDING_DIMENSIONS={self.dimensions}"
+                )
+    
+    def _cache_key(self, text: str) -> str:
+        model = GEMINI_EMBEDDING_MODEL if self.provider == "gemini" else OPENAI_EMBEDDING_MODEL
+        return embedding_cache.make_key(self.provider, model, self.dimensions, text)
     
     async def _generate_gemini_embedding(self, text: str) -> Optional[List[float]]:
         """Generate embedding using Google Gemini API"""
         try:
             async with httpx.AsyncClient() as client:
                 # Gemini embedding model
-                model = "models/text-embedding-004"
+                model = GEMINI_EMBEDDING_MODEL
                 
                 response = await client.post(
                     f"https://generativelanguage.googleapis.com/v1beta/{model}:embedContent",
@@ -68,7 +126,8 @@ class EmbeddingsService:
                             "parts": [{
                                 "text": text
                             }]
-                        }
+                        },
+                        "outputDimensionality": self.dimensions
                     },
                     timeout=30.0
                 )
@@ -79,7 +138,7 @@ class EmbeddingsService:
                 embedding = result.get("embedding", {}).get("values", [])
                 
                 if embedding:
-                    self.dimensions = len(embedding)  # Update dimensions
+                    self._check_dimensions([embedding])
                     logger.info(f"Generated Gemini embedding with {self.dimensions} dimensions")
                     return embedding
                 
@@ -101,7 +160,8 @@ class EmbeddingsService:
                     },
                     json={
                         "input": text,
-                        "model": "text-embedding-3-small"
+                        "model": OPENAI_EMBEDDING_MODEL,
+                        "dimensions": self.dimensions
                     },
                     timeout=30.0
                 )
@@ -110,7 +170,7 @@ class EmbeddingsService:
                 result = response.json()
                 
                 embedding = result["data"][0]["embedding"]
-                self.dimensions = len(embedding)
+                self._check_dimensions([embedding])
                 logger.info(f"Generated OpenAI embedding with {self.dimensions} dimensions")
                 return embedding
                 
@@ -134,6 +194,118 @@ class EmbeddingsService:
         
         return embedding
     
+    def _batch_limit(self) -> int:
+        return PROVIDER_BATCH_LIMITS.get(self.provider, 100)
+    
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for many texts using the provider's batch endpoint
+        
+        Texts are split into provider-sized requests which run with bounded
+        concurrency. Results are returned in input order.
+        """
+        if not texts:
+            return []
+        
+        batch_size = min(batch_size or self._batch_limit(), self._batch_limit())
+        semaphore = asyncio.Semaphore(concurrency or settings.EMBEDDING_BATCH_CONCURRENCY)
+        
+        async def run(batch: List[str]) -> List[Optional[List[float]]]:
+            async with semaphore:
+                return await self._embed_batch(batch)
+        
+        results = await asyncio.gather(*[
+            run(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+        ])
+        return [embedding for batch in results for embedding in batch]
+    
+    async def _embed_batch(self, texts: List[str], fallback: bool = True) -> List[Optional[List[float]]]:
+        """
+        Embed one provider-sized batch, sending only cache misses upstream
+        
+        On provider failure falls back to mock like generate_embedding, unless
+        fallback is False (bulk ingestion must not store mock vectors as
+        knowledge): then the error is raised.
+        """
+        if self.provider == "mock":
+            return [self._generate_mock_embedding(text) for text in texts]
+        
+        keys = [self._cache_key(text) for text in texts]
+        embeddings = await embedding_cache.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+        
+        try:
+            if self.provider == "gemini":
+                fresh = await self._generate_gemini_embeddings_batch([texts[i] for i in missing])
+            else:
+                fresh = await self._generate_openai_embeddings_batch([texts[i] for i in missing])
+                
+        except EmbeddingDimensionError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to generate batch of {len(missing)} embeddings with {self.provider}: {e}")
+            if not fallback:
+                raise
+            fresh = [self._generate_mock_embedding(texts[i]) for i in missing]
+        else:
+            await embedding_cache.set_many({
+                keys[i]: embedding for i, embedding in zip(missing, fresh) if embedding
+            })
+        
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+        return embeddings
+    
+    async def _generate_gemini_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Generate embeddings using Gemini batchEmbedContents"""
+        client = get_http_pool().get_client("https://generativelanguage.googleapis.com", timeout=60.0)
+        response = await client.post(
+            f"/v1beta/{GEMINI_EMBEDDING_MODEL}:batchEmbedContents",
+            params={"key": settings.GOOGLE_API_KEY},
+            json={
+                "requests": [
+                    {
+                        "model": GEMINI_EMBEDDING_MODEL,
+                        "content": {"parts": [{"text": text}]},
+                        "outputDimensionality": self.dimensions
+                    }
+                    for text in texts
+                ]
+            }
+        )
+        response.raise_for_status()
+        
+        embeddings = [item.get("values") or None for item in response.json().get("embeddings", [])]
+        if len(embeddings) != len(texts):
+            raise Exception(f"Gemini returned {len(embeddings)} embeddings for {len(texts)} texts")
+        self._check_dimensions(embeddings)
+        return embeddings
+    
+    async def _generate_openai_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Generate embeddings using OpenAI's list input"""
+        client = get_http_pool().get_client("https://api.openai.com", timeout=60.0)
+        response = await client.post(
+            "/v1/embeddings",
+            headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+            json={"input": texts, "model": OPENAI_EMBEDDING_MODEL, "dimensions": self.dimensions}
+        )
+        response.raise_for_status()
+        
+        # Items carry their input index; don't rely on response order
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        if len(data) != len(texts):
+            raise Exception(f"OpenAI returned {len(data)} embeddings for {len(texts)} texts")
+        embeddings = [item["embedding"] for item in data]
+        self._check_dimensions(embeddings)
+        return embeddings
+    
     async def add_knowledge_with_embedding(
         self,
         customer_id: str,
@@ -152,7 +324,7 @@ class EmbeddingsService:
                 raise Exception("Failed to generate embedding")
             
             # Store in database
-            supabase = get_supabase_admin()
+            supabase = await get_async_supabase_admin()
             
             data = {
                 "customer_id": customer_id,
@@ -162,7 +334,7 @@ class EmbeddingsService:
                 "embeddings": embedding  # pgvector column
             }
             
-            response = supabase.table("company_knowledge").insert(data).execute()
+            response = await supabase.table("company_knowledge").insert(data).execute()
             
             if not response.data:
                 raise Exception("Failed to insert knowledge item")
@@ -174,6 +346,130 @@ class EmbeddingsService:
             logger.error(f"Failed to add knowledge with embedding: {e}")
             raise
     
+    async def ingest_knowledge(
+        self,
+        customer_id: str,
+        items: List[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Bulk-ingest documents: chunk -> batch embed -> multi-row insert
+        
+        Embedding and inserting run as pipelined stages joined by a bounded
+        queue, so rows are written while later batches are still embedding.
+        If either stage fails the other is cancelled, in-flight provider calls
+        included. Yields progress events, then a final 'complete' (or 'error')
+        event; a provider failure is an error, never a mock vector.
+        """
+        chunk_size = chunk_size or settings.KNOWLEDGE_CHUNK_SIZE
+        chunk_overlap = settings.KNOWLEDGE_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        
+        # Stage 1: chunking (CPU-only, cheap)
+        rows = []
+        for doc_index, item in enumerate(items):
+            pieces = chunk_text(item["content"], chunk_size, chunk_overlap)
+            for chunk_index, piece in enumerate(pieces):
+                rows.append({
+                    "customer_id": customer_id,
+                    "content": piece,
+                    "content_type": item.get("content_type") or "text",
+                    "metadata": {
+                        **(item.get("metadata") or {}),
+                        "document_index": doc_index,
+                        "chunk_index": chunk_index,
+                        "chunk_count": len(pieces)
+                    }
+                })
+        
+        total = len(rows)
+        yield {"type": "progress", "stage": "chunked", "documents": len(items), "chunks_total": total}
+        if not rows:
+            yield {"type": "complete", "chunks_total": 0, "rows_inserted": 0}
+            return
+        
+        supabase = await get_async_supabase_admin()
+        batch_size = self._batch_limit()
+        insert_batch_size = settings.KNOWLEDGE_INSERT_BATCH_SIZE
+        concurrency = settings.EMBEDDING_BATCH_CONCURRENCY
+        
+        embedded_batches: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        events: asyncio.Queue = asyncio.Queue()
+        counts = {"embedded": 0, "inserted": 0}
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def embed_stage():
+            async def embed(batch: List[Dict[str, Any]]):
+                async with semaphore:
+                    vectors = await self._embed_batch([row["content"] for row in batch], fallback=False)
+                for row, vector in zip(batch, vectors):
+                    row["embeddings"] = vector
+                counts["embedded"] += len(batch)
+                await events.put({
+                    "type": "progress", "stage": "embedding",
+                    "chunks_embedded": counts["embedded"], "chunks_total": total
+                })
+                await embedded_batches.put(batch)
+            
+            async with asyncio.TaskGroup() as batches:
+                for i in range(0, total, batch_size):
+                    batches.create_task(embed(rows[i:i + batch_size]))
+            await embedded_batches.put(None)
+        
+        async def insert_stage():
+            pending: List[Dict[str, Any]] = []
+            
+            async def flush(batch: List[Dict[str, Any]]):
+                await supabase.table("company_knowledge").insert(batch).execute()
+                counts["inserted"] += len(batch)
+                await events.put({
+                    "type": "progress", "stage": "inserting",
+                    "rows_inserted": counts["inserted"], "chunks_total": total
+                })
+            
+            while True:
+                batch = await embedded_batches.get()
+                if batch is None:
+                    break
+                pending.extend(row for row in batch if row.get("embeddings"))
+                while len(pending) >= insert_batch_size:
+                    await flush(pending[:insert_batch_size])
+                    pending = pending[insert_batch_size:]
+            if pending:
+                await flush(pending)
+        
+        async def run_pipeline():
+            try:
+                # A failing stage cancels the other (TaskGroup), so nothing is left
+                # blocked on the queue or calling the provider
+                async with asyncio.TaskGroup() as stages:
+                    stages.create_task(embed_stage())
+                    stages.create_task(insert_stage())
+                await events.put({"type": "complete", "chunks_total": total, "rows_inserted": counts["inserted"]})
+            except Exception as e:
+                e = _first_error(e)
+                logger.error(f"Knowledge ingestion failed for customer {customer_id}: {e}")
+                await events.put({
+                    "type": "error", "content": str(e),
+                    "chunks_total": total, "rows_inserted": counts["inserted"]
+                })
+            finally:
+                await events.put(None)
+        
+        pipeline = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Client disconnected mid-stream: stop embedding/inserting
+            if not pipeline.done():
+                pipeline.cancel()
+        
+        logger.info(f"Ingested {counts['inserted']}/{total} knowledge chunks for customer {customer_id}")
+    
     async def search_similar_knowledge(
         self,
         customer_id: str,
@@ -183,6 +479,14 @@ class EmbeddingsService:
     ) -> List[Dict[str, Any]]:
         """
         Search for similar knowledge items using vector similarity
+
+        Ranking runs in Postgres via the match_company_knowledge RPC (HNSW
+        index, top-k + threshold server-side). If the RPC isn't deployed,
+        falls back to a NumPy matrix scan over the customer's embeddings.
+        
+        Other failures return no results, except a dimension mismatch between
+        the query embedding and the vector column, which is raised
+        (EmbeddingDimensionError).
         """
         try:
             # Generate embedding for query
@@ -191,52 +495,132 @@ class EmbeddingsService:
             if not query_embedding:
                 raise Exception("Failed to generate query embedding")
             
-            supabase = get_supabase_admin()
+            supabase = await get_async_supabase_admin()
             
-            # Use pgvector similarity search
-            # Note: This requires pgvector extension and proper indexing
-            # For now, we'll use a simple RPC call
+            if self._rpc_available:
+                try:
+                    response = await supabase.rpc(MATCH_KNOWLEDGE_RPC, {
+                        "query_embedding": query_embedding,
+                        "match_customer_id": customer_id,
+                        "match_threshold": similarity_threshold,
+                        "match_count": limit
+                    }).execute()
+                    return response.data or []
+                except APIError as e:
+                    if e.code in DIMENSION_ERROR_CODES:
+                        raise EmbeddingDimensionError(
+                            f"{MATCH_KNOWLEDGE_RPC} rejected a {len(query_embedding)}-dimensional query: {e.message}"
+                        )
+                    if e.code not in RPC_MISSING_CODES:
+                        raise
+                    # Remember for the life of the process; re-checked on restart
+                    self._rpc_available = False
+                    logger.warning(
+                        f"{MATCH_KNOWLEDGE_RPC} RPC not available ({e.code}); "
+                        "using in-process vector search. Apply migrations/007_knowledge_vector_search.sql"
+                    )
             
-            # Fallback: If pgvector RPC not available, fetch all and compute similarity in Python
-            response = supabase.table("company_knowledge")\
-                .select("*")\
+            response = await supabase.table("company_knowledge")\
+                .select(f"{KNOWLEDGE_COLUMNS}, embeddings")\
                 .eq("customer_id", customer_id)\
                 .execute()
             
-            if not response.data:
-                return []
-            
-            # Compute cosine similarity
-            results = []
-            for item in response.data:
-                if item.get("embeddings"):
-                    similarity = self._cosine_similarity(query_embedding, item["embeddings"])
-                    if similarity >= similarity_threshold:
-                        results.append({
-                            **item,
-                            "similarity": similarity
-                        })
-            
-            # Sort by similarity and limit
-            results.sort(key=lambda x: x["similarity"], reverse=True)
-            return results[:limit]
+            return rank_by_similarity(query_embedding, response.data or [], limit, similarity_threshold)
             
+        except EmbeddingDimensionError:
+            raise
         except Exception as e:
             logger.error(f"Failed to search similar knowledge: {e}")
             return []
+
+
+def _first_error(error: BaseException) -> BaseException:
+    """The original exception behind (nested) TaskGroup exception groups"""
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return error
+
+
+def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
+    """
+    Split text into ~chunk_size character pieces with overlap, preferring to
+    break on paragraph, line or word boundaries.
+    """
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
     
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors"""
-        import math
-        
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = math.sqrt(sum(a * a for a in vec1))
-        magnitude2 = math.sqrt(sum(b * b for b in vec2))
-        
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        
-        return dot_product / (magnitude1 * magnitude2)
+    overlap = max(0, min(overlap, chunk_size // 2))
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for separator in ("\n\n", "\n", " "):
+                cut = window.rfind(separator)
+                if cut > chunk_size // 2:
+                    end = start + cut
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def _parse_embedding(value: Any) -> Optional[List[float]]:
+    """PostgREST returns pgvector columns as '[0.1,0.2,...]' strings"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def rank_by_similarity(
+    query_embedding: List[float],
+    rows: List[Dict[str, Any]],
+    limit: int = 5,
+    similarity_threshold: float = 0.7
+) -> List[Dict[str, Any]]:
+    """
+    Rank rows by cosine similarity of their 'embeddings' to the query.
+
+    All candidate vectors are stacked into one float32 matrix and scored with
+    a single matrix-vector product; only the top-k are fully sorted. Returned
+    rows carry a 'similarity' key and no 'embeddings'.
+    """
+    candidates = []
+    vectors = []
+    for row in rows:
+        embedding = _parse_embedding(row.get("embeddings"))
+        if embedding and len(embedding) == len(query_embedding):
+            candidates.append(row)
+            vectors.append(embedding)
+    
+    if not candidates or limit <= 0:
+        return []
+    
+    matrix = np.asarray(vectors, dtype=np.float32)
+    query_vec = np.asarray(query_embedding, dtype=np.float32)
+    
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec)
+    scores = np.divide(matrix @ query_vec, norms, out=np.zeros(len(candidates), dtype=np.float32), where=norms > 0)
+    
+    matches = np.flatnonzero(scores >= similarity_threshold)
+    if len(matches) > limit:
+        matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+    matches = matches[np.argsort(-scores[matches], kind="stable")]
+    
+    results = []
+    for idx in matches:
+        item = {k: v for k, v in candidates[idx].items() if k != "embeddings"}
+        item["similarity"] = float(scores[idx])
+        results.append(item)
+    return results
 
 
 # Singleton instance
@@ -1,12 +1,81 @@
-from typing import List, Dict, Any, Optional
+"""
+KAgent Service
+Read access to the KAgent source of truth (Kubernetes CRDs, v1alpha2).
+
+Agent and MCPServer resources are mirrored into a process-wide in-memory
+index by two ResourceInformers (app/core/k8s_informer.py): one list, then a
+watch that applies every change incrementally, with a relist when the watch
+expires (410) and every K8S_RESYNC_INTERVAL. Reads are dictionary lookups
+(by namespace/name, name, namespace or tool) and never call the Kubernetes
+API on the request path; list views are built once per change. Tool
+discovery queries go through an inverted ToolIndex
+(app/services/tool_index.py) updated from the same events.
+
+The informers start on first use. Until the first list completes, reads
+wait for it for up to KAGENT_INDEX_SYNC_TIMEOUT.
+"""
+from typing import List, Dict, Any, Optional, Set
 import logging
 from kubernetes import client, config
 from app.core.config import settings
-from datetime import datetime, timedelta
+from app.core.k8s_informer import ResourceInformer, object_key
+from app.services.tool_index import ToolIndex
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+
+def _parse_agent(item: Dict[str, Any]) -> Dict[str, Any]:
+    spec = item.get("spec", {})
+    metadata = item.get("metadata", {})
+    
+    # Parse tools from spec
+    tools = []
+    for tool in spec.get("tools", []):
+        if tool.get("type") == "McpServer":
+            tools.extend(tool.get("toolNames", []))
+    
+    return {
+        "id": metadata.get("name"),
+        "name": metadata.get("name"),
+        "namespace": metadata.get("namespace", "default"),
+        "description": spec.get("description", ""),
+        "version": str(metadata.get("generation", 1)),
+        "type": spec.get("type", "Declarative"),
+        "tools": tools,
+        "labels": metadata.get("labels", {}),
+        "annotations": metadata.get("annotations", {}),
+        "created_at": metadata.get("creationTimestamp"),
+        "spec": spec  # Included in get_agent (detailed view) only
+    }
+
+
+def _parse_mcp(item: Dict[str, Any]) -> Dict[str, Any]:
+    spec = item.get("spec", {})
+    metadata = item.get("metadata", {})
+    return {
+        "id": metadata.get("name"),
+        "name": metadata.get("name"),
+        "namespace": metadata.get("namespace", "default"),
+        "description": spec.get("description", ""),
+        "url": spec.get("url", ""),
+        "tools": spec.get("tools", []),
+        "created_at": metadata.get("creationTimestamp"),
+    }
+
+
+def _add(index: Dict[str, Set[str]], value: str, key: str):
+    index.setdefault(value, set()).add(key)
+
+
+def _discard(index: Dict[str, Set[str]], value: str, key: str):
+    keys = index.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+
 class KAgentService:
     """
     Service to interact with the KAgent source of truth (Kubernetes CRDs).
@@ -15,8 +84,21 @@ class KAgentService:
     
     def __init__(self):
         self.k8s_api = None
-        self.cache = {}
-        self.cache_ttl = timedelta(minutes=5)
+        
+        # "namespace/name" -> parsed resource
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._mcps: Dict[str, Dict[str, Any]] = {}
+        # Secondary indexes: value -> set of "namespace/name"
+        self._agents_by_name: Dict[str, Set[str]] = {}
+        self._agents_by_namespace: Dict[str, Set[str]] = {}
+        self._agents_by_tool: Dict[str, Set[str]] = {}
+        self._mcps_by_namespace: Dict[str, Set[str]] = {}
+        # Materialized list views, dropped on any change
+        self._views: Dict[str, List[Dict[str, Any]]] = {}
+        self.tool_index = ToolIndex()
+        self._mock_indexed = False
+        self._informers: List[ResourceInformer] = []
+        self._tasks: List[asyncio.Task] = []
         
         try:
             # Try to load in-cluster config first, then local kubeconfig
@@ -30,80 +112,90 @@ class KAgentService:
         except Exception as e:
             logger.warning(f"Failed to connect to Kubernetes API: {e}. Using mock data.")
             self.k8s_api = None
-        
-    def _get_cache(self, key: str) -> Optional[Any]:
-        """Get cached value if not expired"""
-        if key in self.cache:
-            value, timestamp = self.cache[key]
-            if datetime.now() - timestamp < self.cache_ttl:
-                return value
-        return None
     
-    def _set_cache(self, key: str, value: Any):
-        """Set cache value with timestamp"""
-        self.cache[key] = (value, datetime.now())
+    def _ensure_started(self):
+        """Start the Agent / MCPServer informers on the running loop (once)"""
+        if self._informers or not self.k8s_api:
+            return
+        loop = asyncio.get_running_loop()
+        for plural, handler in (("agents", self._on_agent_event), ("mcpservers", self._on_mcp_event)):
+            informer = ResourceInformer(self.k8s_api, "kagent.dev", "v1alpha2", plural)
+            informer.add_handler(handler)
+            self._informers.append(informer)
+            self._tasks.append(loop.create_task(informer.run()))
+    
+    async def _wait_ready(self):
+        self._ensure_started()
+        for informer in self._informers:
+            if not informer.synced.is_set() and not await informer.wait_synced(settings.KAGENT_INDEX_SYNC_TIMEOUT):
+                logger.warning(f"KAgent index for {informer.resource} not synced yet, serving partial data")
+    
+    async def close(self):
+        """Stop the informers (shutdown)"""
+        for informer in self._informers:
+            informer.stop()
+        for task in self._tasks:
+            task.cancel()
+        self._informers, self._tasks = [], []
+    
+    def _on_agent_event(self, event_type: str, obj: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        key = object_key(obj)
+        previous = self._agents.pop(key, None)
+        if previous is not None:
+            _discard(self._agents_by_name, previous["name"], key)
+            _discard(self._agents_by_namespace, previous["namespace"], key)
+            for tool in previous["tools"]:
+                _discard(self._agents_by_tool, tool, key)
+            self.tool_index.remove_agent(key)
+        if event_type != "DELETED":
+            agent = _parse_agent(obj)
+            self._agents[key] = agent
+            _add(self._agents_by_name, agent["name"], key)
+            _add(self._agents_by_namespace, agent["namespace"], key)
+            for tool in agent["tools"]:
+                _add(self._agents_by_tool, tool, key)
+            self.tool_index.set_agent(key, agent["tools"])
+        self._views.clear()
+    
+    def _on_mcp_event(self, event_type: str, obj: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        key = object_key(obj)
+        previous = self._mcps.pop(key, None)
+        if previous is not None:
+            _discard(self._mcps_by_namespace, previous["namespace"], key)
+        if event_type != "DELETED":
+            mcp = _parse_mcp(obj)
+            self._mcps[key] = mcp
+            _add(self._mcps_by_namespace, mcp["namespace"], key)
+            self.tool_index.set_server(key, mcp)
+        else:
+            self.tool_index.remove_server(key)
+        self._views.clear()
+    
+    def _view(self, name: str, build) -> List[Dict[str, Any]]:
+        view = self._views.get(name)
+        if view is None:
+            view = self._views[name] = build()
+        return view
+    
+    def _agent_list(self, keys) -> List[Dict[str, Any]]:
+        # Summary form: without the full spec
+        return [
+            {k: v for k, v in self._agents[key].items() if k != "spec"}
+            for key in sorted(keys)
+        ]
     
     async def list_agents(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List all available agents from KAgent (Kubernetes CRDs).
-        Uses v1alpha2 API version.
+        Uses v1alpha2 API version. The returned list is shared: don't modify it.
         """
-        cache_key = f"agents_{namespace or 'all'}"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
-        
         if not self.k8s_api:
             return self._get_mock_agents()
-
-        try:
-            # List 'agents.kagent.dev' resources (v1alpha2)
-            if namespace:
-                response = self.k8s_api.list_namespaced_custom_object(
-                    group="kagent.dev",
-                    version="v1alpha2",
-                    namespace=namespace,
-                    plural="agents"
-                )
-            else:
-                response = self.k8s_api.list_cluster_custom_object(
-                    group="kagent.dev",
-                    version="v1alpha2",
-                    plural="agents"
-                )
-            
-            agents = []
-            for item in response.get("items", []):
-                spec = item.get("spec", {})
-                metadata = item.get("metadata", {})
-                
-                # Parse tools from spec
-                tools = []
-                for tool in spec.get("tools", []):
-                    if tool.get("type") == "McpServer":
-                        mcp_server = tool.get("mcpServer", {})
-                        tool_names = tool.get("toolNames", [])
-                        tools.extend(tool_names)
-                
-                agents.append({
-                    "id": metadata.get("name"),
-                    "name": metadata.get("name"),
-                    "namespace": metadata.get("namespace", "default"),
-                    "description": spec.get("description", ""),
-                    "version": str(metadata.get("generation", 1)),
-                    "type": spec.get("type", "Declarative"),
-                    "tools": tools,
-                    "labels": metadata.get("labels", {}),
-                    "annotations": metadata.get("annotations", {}),
-                    "created_at": metadata.get("creationTimestamp"),
-                })
-            
-            self._set_cache(cache_key, agents)
-            return agents
-            
-        except Exception as e:
-            logger.error(f"Error listing KAgent agents from K8s: {e}")
-            return self._get_mock_agents() 
+        
+        await self._wait_ready()
+        if namespace:
+            return self._view(f"agents:{namespace}", lambda: self._agent_list(self._agents_by_namespace.get(namespace, ())))
+        return self._view("agents:*", lambda: self._agent_list(self._agents))
 
     async def get_agent(self, agent_id: str, namespace: str = "kagent") -> Optional[Dict[str, Any]]:
         """
@@ -116,104 +208,80 @@ class KAgentService:
                     return agent
             return None
         
-        try:
-            response = self.k8s_api.get_namespaced_custom_object(
-                group="kagent.dev",
-                version="v1alpha2",
-                namespace=namespace,
-                plural="agents",
-                name=agent_id
-            )
-            
-            spec = response.get("spec", {})
-            metadata = response.get("metadata", {})
-            
-            # Parse tools
-            tools = []
-            for tool in spec.get("tools", []):
-                if tool.get("type") == "McpServer":
-                    tool_names = tool.get("toolNames", [])
-                    tools.extend(tool_names)
-            
-            return {
-                "id": metadata.get("name"),
-                "name": metadata.get("name"),
-                "namespace": metadata.get("namespace", "default"),
-                "description": spec.get("description", ""),
-                "version": str(metadata.get("generation", 1)),
-                "type": spec.get("type", "Declarative"),
-                "tools": tools,
-                "labels": metadata.get("labels", {}),
-                "annotations": metadata.get("annotations", {}),
-                "created_at": metadata.get("creationTimestamp"),
-                "spec": spec  # Include full spec for detailed view
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting agent {agent_id}: {e}")
-            return None
+        await self._wait_ready()
+        agent = self._agents.get(f"{namespace}/{agent_id}")
+        return dict(agent) if agent is not None else None
+    
+    async def find_agents(self, name: Optional[str] = None, tool: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Agents with the given name (any namespace) and/or using the given tool"""
+        if not self.k8s_api:
+            return [
+                a for a in self._get_mock_agents()
+                if (name is None or a["name"] == name) and (tool is None or tool in a["tools"])
+            ]
+        
+        await self._wait_ready()
+        keys = None
+        if name is not None:
+            keys = set(self._agents_by_name.get(name, ()))
+        if tool is not None:
+            by_tool = self._agents_by_tool.get(tool, set())
+            keys = set(by_tool) if keys is None else keys & by_tool
+        return self._agent_list(self._agents if keys is None else keys)
 
     async def list_mcps(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List all available MCP servers from KAgent.
         """
-        cache_key = f"mcps_{namespace or 'all'}"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
-        
         if not self.k8s_api:
             return self._get_mock_mcps()
         
-        try:
-            # List 'mcpservers.kagent.dev' resources
-            if namespace:
-                response = self.k8s_api.list_namespaced_custom_object(
-                    group="kagent.dev",
-                    version="v1alpha2",
-                    namespace=namespace,
-                    plural="mcpservers"
-                )
-            else:
-                response = self.k8s_api.list_cluster_custom_object(
-                    group="kagent.dev",
-                    version="v1alpha2",
-                    plural="mcpservers"
-                )
-            
-            mcps = []
-            for item in response.get("items", []):
-                spec = item.get("spec", {})
-                metadata = item.get("metadata", {})
-                
-                mcps.append({
-                    "id": metadata.get("name"),
-                    "name": metadata.get("name"),
-                    "namespace": metadata.get("namespace", "default"),
-                    "description": spec.get("description", ""),
-                    "url": spec.get("url", ""),
-                    "tools": spec.get("tools", []),
-                    "created_at": metadata.get("creationTimestamp"),
-                })
-            
-            self._set_cache(cache_key, mcps)
-            return mcps
-            
-        except Exception as e:
-            logger.error(f"Error listing MCP servers from K8s: {e}")
-            return self._get_mock_mcps()
+        await self._wait_ready()
+        keys = self._mcps_by_namespace.get(namespace, ()) if namespace else self._mcps
+        return self._view(f"mcps:{namespace or '*'}", lambda: [self._mcps[key] for key in sorted(keys)])
 
     async def list_tools(self) -> List[Dict[str, Any]]:
         """
         List all available tools from all MCP servers.
         """
-        cache_key = "tools_all"
-        cached = self._get_cache(cache_key)
-        if cached:
-            return cached
+        if not self.k8s_api:
+            return self._build_tools(self._get_mock_mcps())
         
-        mcps = await self.list_mcps()
+        await self._wait_ready()
+        return self._view("tools", lambda: self._build_tools(self._mcps[key] for key in sorted(self._mcps)))
+    
+    async def search_tools(
+        self,
+        query: Optional[str] = None,
+        mcp_server: Optional[str] = None,
+        agent: Optional[str] = None,
+        fuzzy: bool = True,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Search tools through the inverted index (see ToolIndex.search)
         
+        Returns:
+            {"items": [...], "total": int, "next_cursor": str | None}
+        """
+        if not self.k8s_api:
+            if not self._mock_indexed:
+                for mcp in self._get_mock_mcps():
+                    self.tool_index.set_server(f"{mcp['namespace']}/{mcp['name']}", mcp)
+                for mock_agent in self._get_mock_agents():
+                    self.tool_index.set_agent(f"{mock_agent['namespace']}/{mock_agent['name']}", mock_agent["tools"])
+                self._mock_indexed = True
+        else:
+            await self._wait_ready()
+        return self.tool_index.search(
+            query=query, mcp_server=mcp_server, agent=agent, fuzzy=fuzzy,
+            cursor=cursor, limit=limit, offset=offset
+        )
+    
+    @staticmethod
+    def _build_tools(mcps) -> List[Dict[str, Any]]:
         tools = []
         for mcp in mcps:
             for tool in mcp.get("tools", []):
@@ -223,9 +291,15 @@ class KAgentService:
                     "mcp_server": mcp["name"],
                     "type": "mcp"
                 })
-        
-        self._set_cache(cache_key, tools)
         return tools
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "agents": len(self._agents),
+            "mcps": len(self._mcps),
+            "tool_index": self.tool_index.get_stats(),
+            "informers": {i.resource: i.get_stats() for i in self._informers}
+        }
 
     def _get_mock_agents(self) -> List[Dict[str, Any]]:
         """Return mock agents for dev/testing"""
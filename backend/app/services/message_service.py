@@ -36,7 +36,7 @@ class MessageService(BaseService):
                 "created_at": datetime.utcnow().isoformat()
             }
             
-            result = self.supabase.table("messages").insert(message_data).execute()
+            result = await self.supabase.table("messages").insert(message_data).execute()
             user_message = result.data[0] if result.data else None
             
             if not user_message:
@@ -44,7 +44,7 @@ class MessageService(BaseService):
                 return
 
             # 2. Get Agent Details
-            ve_record = self.supabase.table("customer_ves").select("agent_type").eq("id", to_ve_id).single().execute()
+            ve_record = await self.supabase.table("customer_ves").select("agent_type").eq("id", to_ve_id).single().execute()
             if not ve_record.data:
                 yield f"data: {json.dumps({'type': 'error', 'content': 'VE not found'})}\n\n"
                 return
@@ -84,7 +84,7 @@ class MessageService(BaseService):
                     "read": False,
                     "created_at": datetime.utcnow().isoformat()
                 }
-                self.supabase.table("messages").insert(response_data).execute()
+                await self.supabase.table("messages").insert(response_data).execute()
                 
             # Send done signal
             yield "data: [DONE]\n\n"
@@ -118,7 +118,7 @@ class MessageService(BaseService):
                 "created_at": datetime.utcnow().isoformat()
             }
             
-            result = self.supabase.table("messages").insert(message_data).execute()
+            result = await self.supabase.table("messages").insert(message_data).execute()
             user_message = result.data[0] if result.data else None
             
             if not user_message:
@@ -128,7 +128,7 @@ class MessageService(BaseService):
             if to_ve_id:
                 try:
                     # Get VE details to find agent_type
-                    ve_record = self.supabase.table("customer_ves").select("agent_type").eq("id", to_ve_id).single().execute()
+                    ve_record = await self.supabase.table("customer_ves").select("agent_type").eq("id", to_ve_id).single().execute()
                     if not ve_record.data:
                         raise Exception("VE not found")
                     
@@ -169,7 +169,7 @@ class MessageService(BaseService):
                         "read": False,
                         "created_at": datetime.utcnow().isoformat()
                     }
-                    self.supabase.table("messages").insert(response_data).execute()
+                    await self.supabase.table("messages").insert(response_data).execute()
                     logger.info(f"Agent response saved for customer {customer_id}")
                     
                 except Exception as agent_error:
@@ -189,7 +189,7 @@ class MessageService(BaseService):
                         "created_at": datetime.utcnow().isoformat()
                     }
                     try:
-                        self.supabase.table("messages").insert(error_response_data).execute()
+                        await self.supabase.table("messages").insert(error_response_data).execute()
                     except Exception as e:
                         logger.error(f"Failed to save error message: {e}")
             
@@ -227,7 +227,7 @@ class MessageService(BaseService):
                 "created_at": datetime.utcnow().isoformat()
             }
             
-            result = self.supabase.table("messages").insert(message_data).execute()
+            result = await self.supabase.table("messages").insert(message_data).execute()
             user_message = result.data[0] if result.data else None
             
             if not user_message:
@@ -240,7 +240,7 @@ class MessageService(BaseService):
             if to_ve_id:
                 try:
                     # Get VE details
-                    ve_record = self.supabase.table("customer_ves").select("agent_type").eq("id", to_ve_id).single().execute()
+                    ve_record = await self.supabase.table("customer_ves").select("agent_type").eq("id", to_ve_id).single().execute()
                     if not ve_record.data:
                         raise Exception("VE not found")
                     
@@ -249,26 +249,29 @@ class MessageService(BaseService):
                         agent_type = "marketing-manager"
                     
                     from app.services.agent_gateway_service import agent_gateway_service
+                    from app.services.stream_coalescer import coalesce_stream
                     
                     logger.info(f"Streaming agent type: {agent_type} for customer: {customer_id}")
                     
-                    # Accumulate full response for saving
-                    full_response = ""
+                    # Accumulate full response for saving (joined once at the end)
+                    response_parts: List[str] = []
                     
-                    # Stream from agent
-                    async for event in agent_gateway_service.invoke_agent_stream(
+                    # Stream from agent, token chunks coalesced into frames
+                    async for event in coalesce_stream(agent_gateway_service.invoke_agent_stream(
                         customer_id=customer_id,
                         agent_type=agent_type,
                         message=content,
                         session_id=thread_id or user_message["id"],
                         user_id=customer_id
-                    ):
+                    )):
                         # Forward event to client
                         yield event
                         
                         # Accumulate message content
                         if event.get("type") in ["message", "artifact"]:
-                            full_response += event.get("content", "")
+                            response_parts.append(event.get("content", ""))
+                    
+                    full_response = "".join(response_parts)
                     
                     # 3. Save final agent response
                     if full_response:
@@ -284,7 +287,7 @@ class MessageService(BaseService):
                             "read": False,
                             "created_at": datetime.utcnow().isoformat()
                         }
-                        result = self.supabase.table("messages").insert(response_data).execute()
+                        result = await self.supabase.table("messages").insert(response_data).execute()
                         agent_message = result.data[0] if result.data else None
                         
                         # Yield final saved message
@@ -314,7 +317,7 @@ class MessageService(BaseService):
                 # Sent = messages FROM customer
                 query = query.eq("from_type", "customer")
             
-            result = query.order("created_at", desc=True).execute()
+            result = await query.order("created_at", desc=True).execute()
             return result.data
         except Exception as e:
             self._handle_error(e, "MessageService.get_inbox")
@@ -326,7 +329,7 @@ class MessageService(BaseService):
     ) -> List[Dict[str, Any]]:
         """Get all messages in a thread"""
         try:
-            result = (
+            result = await (
                 self.supabase.table("messages")
                 .select("*")
                 .eq("thread_id", thread_id)
@@ -345,7 +348,7 @@ class MessageService(BaseService):
     ) -> Dict[str, Any]:
         """Mark a message as read"""
         try:
-            result = (
+            result = await (
                 self.supabase.table("messages")
                 .update({"read": True})
                 .eq("id", message_id)
@@ -5,6 +5,7 @@ Routes customer requests to appropriate VEs via Temporal Workflows
 import logging
 import uuid
 from typing import Dict, Any, Optional
+from app.core.config import settings
 from app.core.database import get_supabase_admin
 from app.core.temporal_client import get_temporal_client
 from app.temporal.workflows import OrchestratorWorkflow
@@ -36,29 +37,31 @@ async def route_request_to_orchestrator(
             }
             supabase.table("tasks").insert(task_data).execute()
         
-        # Start Temporal Workflow
-        client = await get_temporal_client()
+        # Start the workflow now, or queue it behind the customer's in-flight tasks
+        from app.services.admission_control import get_admission_controller
         
         workflow_id = f"orchestrator-{task_id}"
+        admission = await get_admission_controller().submit({
+            "customer_id": customer_id,
+            "task_description": task_description,
+            "task_id": task_id,
+            "context": context
+        })
         
-        await client.start_workflow(
-            OrchestratorWorkflow.run,
-            args=[{
-                "customer_id": customer_id,
-                "task_description": task_description,
+        if not admission["admitted"]:
+            return {
                 "task_id": task_id,
-                "context": context
-            }],
-            id=workflow_id,
-            task_queue="campaign-queue"
-        )
-        
-        logger.info(f"Started OrchestratorWorkflow {workflow_id} for task {task_id}")
+                "workflow_id": workflow_id,
+                "status": "pending",
+                "queue_position": admission["queue_position"],
+                "message": f"Task queued (position {admission['queue_position']})"
+            }
         
         return {
             "task_id": task_id,
             "workflow_id": workflow_id,
             "status": "pending",
+            "queue_position": None,
             "message": "Task routing started via Temporal"
         }
         
@@ -72,6 +75,29 @@ async def route_request_to_orchestrator(
             }).eq("id", task_id).execute()
         raise
 
+async def start_orchestrator_workflow(request: Dict[str, Any]):
+    """
+    Start OrchestratorWorkflow for an admitted request
+    (see app/services/admission_control.py).
+    """
+    client = await get_temporal_client()
+    
+    workflow_id = f"orchestrator-{request['task_id']}"
+    
+    await client.start_workflow(
+        OrchestratorWorkflow.run,
+        args=[{
+            "customer_id": request["customer_id"],
+            "task_description": request["task_description"],
+            "task_id": request["task_id"],
+            "context": request["context"]
+        }],
+        id=workflow_id,
+        task_queue=request.get("task_queue") or settings.TEMPORAL_TASK_QUEUE
+    )
+    
+    logger.info(f"Started OrchestratorWorkflow {workflow_id} for task {request['task_id']} on {request.get('task_queue')}")
+
 async def route_task_to_ve(
     customer_id: str,
     task_id: str,
@@ -98,7 +124,7 @@ async def route_task_to_ve(
                 "task_description": task_description
             }],
             id=workflow_id,
-            task_queue="campaign-queue"
+            task_queue=settings.TEMPORAL_TASK_QUEUE
         )
         
         logger.info(f"Started DirectAssignmentWorkflow {workflow_id} for task {task_id}")
@@ -1,17 +1,28 @@
 """
 Redis Queue Service
 Handles background task queuing and processing using Redis
+
+Tasks go through Redis Streams with a consumer group (acks, reclaim of
+crashed consumers' tasks, bounded retries, dead-letter stream); messages
+and webhooks still use plain lists.
 """
 import logging
 import json
+import os
+import socket
+import time
 import redis.asyncio as redis
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable
 import asyncio
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Highest first
+TASK_PRIORITIES = ("urgent", "high", "medium", "low")
+TASK_CONSUMER_GROUP = "ve:workers"
+
 
 class RedisQueueService:
     """Service for managing Redis-based task queues"""
@@ -19,7 +30,12 @@ class RedisQueueService:
     def __init__(self):
         self.redis_url = settings.REDIS_URL
         self.redis_client: Optional[redis.Redis] = None
+        # Separate connection without response decoding, for raw byte values
+        self.binary_client: Optional[redis.Redis] = None
         self.task_queue_name = "ve:tasks"
+        self.task_dlq_name = "ve:tasks:dead"
+        self.consumer_name = settings.TASK_QUEUE_CONSUMER_NAME or f"{socket.gethostname()}:{os.getpid()}"
+        self._task_groups_ready = False
         self.message_queue_name = "ve:messages"
         self.webhook_queue_name = "ve:webhooks"
     
@@ -32,13 +48,17 @@ class RedisQueueService:
                 decode_responses=True
             )
             await self.redis_client.ping()
+            self.binary_client = redis.from_url(self.redis_url, decode_responses=False)
             logger.info("Connected to Redis")
         except Exception as e:
             logger.warning(f"Could not connect to Redis: {e}. Queue operations will be disabled.")
             self.redis_client = None
+            self.binary_client = None
     
     async def disconnect(self):
         """Disconnect from Redis"""
+        if self.binary_client:
+            await self.binary_client.close()
         if self.redis_client:
             await self.redis_client.close()
             logger.info("Disconnected from Redis")
@@ -48,7 +68,8 @@ class RedisQueueService:
         task_id: str,
         customer_id: str,
         task_data: Dict[str, Any],
-        priority: str = "medium"
+        priority: str = "medium",
+        attempts: int = 0
     ) -> bool:
         """
         Enqueue a task for background processing
@@ -58,6 +79,7 @@ class RedisQueueService:
             customer_id: Customer UUID
             task_data: Task information
             priority: Task priority (low, medium, high, urgent)
+            attempts: Deliveries already used up (set when re-queueing)
             
         Returns:
             bool: True if enqueued successfully
@@ -66,19 +88,27 @@ class RedisQueueService:
             logger.warning("Redis not connected, skipping task enqueue")
             return False
         
+        if priority not in TASK_PRIORITIES:
+            priority = "medium"
+        
         try:
             queue_item = {
                 "task_id": task_id,
                 "customer_id": customer_id,
                 "task_data": task_data,
                 "priority": priority,
-                "enqueued_at": asyncio.get_event_loop().time()
+                "attempts": attempts,
+                # Wall clock: comparable across processes
+                "enqueued_at": time.time()
             }
             
-            # Use different queues based on priority
-            queue_name = f"{self.task_queue_name}:{priority}"
-            
-            await self.redis_client.lpush(queue_name, json.dumps(queue_item))
+            await self._ensure_task_groups()
+            await self.redis_client.xadd(
+                self.task_stream(priority),
+                {"payload": json.dumps(queue_item)},
+                maxlen=settings.TASK_QUEUE_MAXLEN,
+                approximate=True
+            )
             logger.info(f"Enqueued task {task_id} with priority {priority}")
             
             return True
@@ -87,33 +117,350 @@ class RedisQueueService:
             logger.error(f"Failed to enqueue task: {e}")
             return False
     
-    async def dequeue_task(self, priority: str = "medium", timeout: int = 5) -> Optional[Dict[str, Any]]:
+    # ------------------------------------------------------------------
+    # Task streams
+    #
+    # One Redis stream per priority, read through a consumer group. An entry
+    # stays in the group's pending list until the worker acks it, so a task
+    # is not lost when a worker dies mid-task: reclaim_stale_tasks() hands
+    # entries idle for longer than TASK_QUEUE_VISIBILITY_TIMEOUT to another
+    # consumer (XAUTOCLAIM). A worker keeps the tasks it holds from going
+    # idle with extend_tasks() while they run, so only tasks of a dead or
+    # stalled worker are reclaimed. Failed tasks are re-queued until they have
+    # used TASK_QUEUE_MAX_ATTEMPTS deliveries, then moved to the dead-letter
+    # stream.
+    # ------------------------------------------------------------------
+    
+    def task_stream(self, priority: str) -> str:
+        return f"{self.task_queue_name}:stream:{priority}"
+    
+    async def _ensure_task_groups(self):
+        """Create the consumer group on every priority stream (once)"""
+        if self._task_groups_ready:
+            return
+        for priority in TASK_PRIORITIES:
+            try:
+                await self.redis_client.xgroup_create(
+                    self.task_stream(priority), TASK_CONSUMER_GROUP, id="0", mkstream=True
+                )
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        self._task_groups_ready = True
+        await self._migrate_legacy_task_lists()
+    
+    async def _migrate_legacy_task_lists(self):
+        """Move tasks left in the pre-streams LPUSH lists onto the streams"""
+        for priority in TASK_PRIORITIES:
+            legacy = f"{self.task_queue_name}:{priority}"
+            moved = 0
+            while True:
+                item = await self.redis_client.rpop(legacy)
+                if item is None:
+                    break
+                await self.redis_client.xadd(self.task_stream(priority), {"payload": item})
+                moved += 1
+            if moved:
+                logger.info(f"Moved {moved} queued tasks from list {legacy} to stream")
+    
+    def _task_entry(self, stream: str, entry_id: str, fields: Dict[str, str], deliveries: int = 1) -> Dict[str, Any]:
+        item = json.loads(fields["payload"])
+        # Deliveries used so far, this one included
+        item["attempt"] = item.get("attempts", 0) + deliveries
+        item["_stream"] = stream
+        item["_entry_id"] = entry_id
+        return item
+    
+    async def read_tasks(
+        self,
+        priorities: Optional[List[str]] = None,
+        count: int = 10,
+        block_ms: int = 1000,
+        shares: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Dequeue a task from the queue
+        Read up to `count` new tasks in total for this consumer (XREADGROUP)
+        
+        XREADGROUP's COUNT is per stream, so streams are read without blocking,
+        each up to its share of `count` (one pipelined round trip), and any
+        unused share is offered to the other streams in priority order. Only
+        when every stream is empty does one read block on all of them; if it
+        returns more than `count` entries the lowest priority surplus is put
+        back on its stream.
         
         Args:
-            priority: Priority queue to check
-            timeout: Blocking timeout in seconds
+            priorities: Streams to read, highest priority first
+            count: Max entries in total
+            block_ms: Wait this long when every stream is empty
+            shares: Entries to take from each priority first (default: all
+                from the first priority)
             
         Returns:
-            Task data or None if queue is empty
+            Tasks ordered by priority; each must be passed to ack_task() or
+            fail_task() when done
         """
-        if not self.redis_client:
-            return None
+        if not self.redis_client or count <= 0:
+            return []
         
+        priorities = priorities or list(TASK_PRIORITIES)
+        shares = shares if shares is not None else {priorities[0]: count}
+        wanted = {p: min(shares.get(p, 0), count) for p in priorities if shares.get(p, 0) > 0}
+        entries: Dict[str, list] = {p: [] for p in priorities}
         try:
-            queue_name = f"{self.task_queue_name}:{priority}"
-            result = await self.redis_client.brpop(queue_name, timeout=timeout)
+            await self._ensure_task_groups()
+            if wanted:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for p, n in wanted.items():
+                        pipe.xreadgroup(TASK_CONSUMER_GROUP, self.consumer_name, {self.task_stream(p): ">"}, count=n)
+                    results = await pipe.execute()
+                for p, result in zip(wanted, results):
+                    entries[p] = self._stream_entries(result)
             
-            if result:
-                _, task_json = result
-                return json.loads(task_json)
-            
-            return None
+            remaining = count - sum(len(e) for e in entries.values())
+            for p in priorities:
+                if remaining <= 0:
+                    break
+                if p in wanted and len(entries[p]) < wanted[p]:
+                    continue  # drained
+                result = await self.redis_client.xreadgroup(
+                    TASK_CONSUMER_GROUP, self.consumer_name, {self.task_stream(p): ">"}, count=remaining
+                )
+                more = self._stream_entries(result)
+                entries[p].extend(more)
+                remaining -= len(more)
             
+            if remaining == count and block_ms:
+                result = await self.redis_client.xreadgroup(
+                    TASK_CONSUMER_GROUP,
+                    self.consumer_name,
+                    {self.task_stream(p): ">" for p in priorities},
+                    count=count,
+                    block=block_ms
+                )
+                by_stream = {stream: stream_entries for stream, stream_entries in result or []}
+                for p in priorities:
+                    entries[p] = by_stream.get(self.task_stream(p), [])
         except Exception as e:
-            logger.error(f"Failed to dequeue task: {e}")
-            return None
+            logger.error(f"Failed to read tasks: {e}")
+            return []
+        
+        tasks = []
+        for priority in priorities:
+            stream = self.task_stream(priority)
+            for entry_id, fields in entries[priority]:
+                try:
+                    tasks.append(self._task_entry(stream, entry_id, fields))
+                except Exception as e:
+                    # Unparseable: nothing to retry
+                    logger.error(f"Dropping malformed task entry {entry_id}: {e}")
+                    await self._dead_letter(stream, entry_id, fields, f"malformed: {e}")
+        for surplus in tasks[count:]:
+            await self.release_task(surplus)
+        return tasks[:count]
+    
+    @staticmethod
+    def _stream_entries(result) -> list:
+        """Entries of a single-stream XREADGROUP reply"""
+        return result[0][1] if result else []
+    
+    async def dequeue_task(self, priority: str = "medium", timeout: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        Read one task of the given priority (see read_tasks)
+        
+        The task must be acked with ack_task() or failed with fail_task().
+        """
+        tasks = await self.read_tasks([priority], count=1, block_ms=timeout * 1000)
+        return tasks[0] if tasks else None
+    
+    async def ack_task(self, task_item: Dict[str, Any]) -> bool:
+        """Mark a task as done and drop it from its stream"""
+        if not self.redis_client:
+            return False
+        
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.xack(task_item["_stream"], TASK_CONSUMER_GROUP, task_item["_entry_id"])
+                pipe.xdel(task_item["_stream"], task_item["_entry_id"])
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to ack task {task_item.get('task_id')}: {e}")
+            return False
+    
+    async def extend_tasks(self, task_items: List[Dict[str, Any]]) -> int:
+        """
+        Reset the idle time of tasks this consumer holds (XCLAIM ... JUSTID)
+        
+        Called periodically for running and buffered tasks so that
+        reclaim_stale_tasks() doesn't hand them to another consumer. JUSTID
+        leaves the delivery count alone.
+        
+        Returns:
+            Number of entries still pending for this group
+        """
+        if not self.redis_client or not task_items:
+            return 0
+        
+        by_stream: Dict[str, List[str]] = {}
+        for item in task_items:
+            by_stream.setdefault(item["_stream"], []).append(item["_entry_id"])
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for stream, entry_ids in by_stream.items():
+                    pipe.xclaim(stream, TASK_CONSUMER_GROUP, self.consumer_name,
+                                min_idle_time=0, message_ids=entry_ids, justid=True)
+                results = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to extend {len(task_items)} in-flight tasks: {e}")
+            return 0
+        return sum(len(claimed or []) for claimed in results)
+    
+    async def fail_task(self, task_item: Dict[str, Any], error: str = "") -> str:
+        """
+        Handle a failed delivery: re-queue, or dead-letter once out of attempts
+        
+        Returns:
+            "retry", "dead" or "error" (entry left pending; it will be reclaimed)
+        """
+        if not self.redis_client:
+            return "error"
+        
+        stream, entry_id = task_item["_stream"], task_item["_entry_id"]
+        payload = {k: v for k, v in task_item.items() if k not in ("_stream", "_entry_id", "attempt")}
+        payload["attempts"] = task_item["attempt"]
+        payload["last_error"] = error
+        dead = task_item["attempt"] >= settings.TASK_QUEUE_MAX_ATTEMPTS
+        
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                if dead:
+                    payload["failed_at"] = time.time()
+                    pipe.xadd(self.task_dlq_name, {"payload": json.dumps(payload), "source": stream},
+                              maxlen=settings.TASK_QUEUE_MAXLEN, approximate=True)
+                else:
+                    pipe.xadd(stream, {"payload": json.dumps(payload)},
+                              maxlen=settings.TASK_QUEUE_MAXLEN, approximate=True)
+                pipe.xack(stream, TASK_CONSUMER_GROUP, entry_id)
+                pipe.xdel(stream, entry_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to re-queue task {task_item.get('task_id')}: {e}")
+            return "error"
+        
+        if dead:
+            logger.error(f"Task {task_item.get('task_id')} dead-lettered after {task_item['attempt']} attempts: {error}")
+            return "dead"
+        logger.warning(f"Task {task_item.get('task_id')} failed (attempt {task_item['attempt']}), re-queued: {error}")
+        return "retry"
+    
+    async def release_task(self, task_item: Dict[str, Any]) -> bool:
+        """Put a task back at the end of its stream without using up an attempt"""
+        if not self.redis_client:
+            return False
+        
+        stream, entry_id = task_item["_stream"], task_item["_entry_id"]
+        payload = {k: v for k, v in task_item.items() if k not in ("_stream", "_entry_id", "attempt")}
+        payload["attempts"] = task_item["attempt"] - 1
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.xadd(stream, {"payload": json.dumps(payload)},
+                          maxlen=settings.TASK_QUEUE_MAXLEN, approximate=True)
+                pipe.xack(stream, TASK_CONSUMER_GROUP, entry_id)
+                pipe.xdel(stream, entry_id)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to release task {task_item.get('task_id')}: {e}")
+            return False
+    
+    async def _dead_letter(self, stream: str, entry_id: str, fields: Dict[str, str], reason: str):
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.xadd(self.task_dlq_name, {**fields, "source": stream, "reason": reason},
+                          maxlen=settings.TASK_QUEUE_MAXLEN, approximate=True)
+                pipe.xack(stream, TASK_CONSUMER_GROUP, entry_id)
+                pipe.xdel(stream, entry_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to dead-letter entry {entry_id}: {e}")
+    
+    async def reclaim_stale_tasks(self, priority: str, count: int = 10) -> List[Dict[str, Any]]:
+        """
+        Take over tasks whose consumer stopped acking them (XAUTOCLAIM)
+        
+        Entries idle for more than TASK_QUEUE_VISIBILITY_TIMEOUT are claimed
+        by this consumer. Those that have used up their attempts are
+        dead-lettered; the rest are returned for processing.
+        """
+        if not self.redis_client:
+            return []
+        
+        stream = self.task_stream(priority)
+        try:
+            await self._ensure_task_groups()
+            result = await self.redis_client.xautoclaim(
+                stream,
+                TASK_CONSUMER_GROUP,
+                self.consumer_name,
+                min_idle_time=int(settings.TASK_QUEUE_VISIBILITY_TIMEOUT * 1000),
+                start_id="0-0",
+                count=count
+            )
+            claimed = [(entry_id, fields) for entry_id, fields in result[1] if fields]
+            if not claimed:
+                return []
+            # Delivery counts of what we just claimed, in one call
+            pending = await self.redis_client.xpending_range(
+                stream, TASK_CONSUMER_GROUP,
+                min=claimed[0][0], max=claimed[-1][0], count=len(claimed),
+                consumername=self.consumer_name
+            )
+        except Exception as e:
+            logger.error(f"Failed to reclaim tasks from {stream}: {e}")
+            return []
+        
+        deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+        tasks = []
+        for entry_id, fields in claimed:
+            try:
+                # The reclaim itself counted as a delivery; the crashed one is what was used up
+                item = self._task_entry(stream, entry_id, fields, max(1, deliveries.get(entry_id, 2) - 1))
+            except Exception as e:
+                await self._dead_letter(stream, entry_id, fields, f"malformed: {e}")
+                continue
+            if item["attempt"] >= settings.TASK_QUEUE_MAX_ATTEMPTS:
+                await self.fail_task(item, "consumer stopped responding")
+                continue
+            # This delivery is the next attempt
+            item["attempt"] += 1
+            tasks.append(item)
+        if tasks:
+            logger.warning(f"Reclaimed {len(tasks)} stale tasks from {stream}")
+        return tasks
+    
+    async def get_task_queue_stats(self) -> Dict[str, Any]:
+        """Stream length and pending (delivered, unacked) count per priority"""
+        if not self.redis_client:
+            return {}
+        
+        try:
+            await self._ensure_task_groups()
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for priority in TASK_PRIORITIES:
+                    pipe.xlen(self.task_stream(priority))
+                    pipe.xpending(self.task_stream(priority), TASK_CONSUMER_GROUP)
+                pipe.xlen(self.task_dlq_name)
+                results = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to get task queue stats: {e}")
+            return {}
+        
+        stats = {
+            priority: {"length": results[2 * i], "pending": results[2 * i + 1]["pending"]}
+            for i, priority in enumerate(TASK_PRIORITIES)
+        }
+        stats["dead_letter"] = results[-1]
+        return stats
     
     async def enqueue_message(
         self,
@@ -232,6 +579,50 @@ class RedisQueueService:
             logger.error(f"Failed to get cache: {e}")
             return None
     
+    async def get_bytes_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Get raw byte values for several keys in one round trip (MGET)
+        
+        Returns:
+            Values in key order, None for missing keys
+        """
+        if not self.binary_client or not keys:
+            return [None] * len(keys)
+        
+        try:
+            return await self.binary_client.mget(keys)
+        except Exception as e:
+            logger.error(f"Failed to get cached bytes: {e}")
+            return [None] * len(keys)
+    
+    async def set_bytes_many(
+        self,
+        items: Dict[str, bytes],
+        expire_seconds: Optional[int] = None
+    ) -> bool:
+        """
+        Set raw byte values for several keys in one pipelined round trip
+        
+        Args:
+            items: Mapping of cache key to bytes
+            expire_seconds: Optional expiration time
+        """
+        if not self.binary_client or not items:
+            return False
+        
+        try:
+            async with self.binary_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    if expire_seconds:
+                        pipe.setex(key, expire_seconds, value)
+                    else:
+                        pipe.set(key, value)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to set cached bytes: {e}")
+            return False
+    
     async def delete_cache(self, key: str) -> bool:
         """Delete a key from cache"""
         if not self.redis_client:
@@ -0,0 +1,118 @@
+"""
+Stream Coalescer
+Pipeline stage between the Agent Gateway token stream and its consumers
+(the /messages/stream SSE endpoint and the Centrifugo background path).
+
+- Consecutive "message" / "artifact" chunks are merged into one frame, which
+  is emitted once it reaches STREAM_FRAME_MAX_CHARS or has been open for
+  STREAM_FRAME_MAX_DELAY seconds. Other events flush the open frame first, so
+  ordering is preserved.
+- The upstream is read by a producer task into a bounded queue
+  (STREAM_BUFFER_MAX_EVENTS). A slow consumer fills the queue, the producer
+  blocks and we stop reading from the gateway instead of buffering without
+  bound.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Chunk events whose "content" is concatenated into frames
+TOKEN_EVENT_TYPES = {"message", "artifact"}
+
+_END = object()
+
+
+def is_token_event(event: Any) -> bool:
+    return (
+        isinstance(event, dict)
+        and event.get("type") in TOKEN_EVENT_TYPES
+        and isinstance(event.get("content"), str)
+    )
+
+
+async def coalesce_stream(
+    source: AsyncIterator[Dict[str, Any]],
+    max_chars: Optional[int] = None,
+    max_delay: Optional[float] = None,
+    max_buffer: Optional[int] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Re-yield `source` with token chunks merged into frames.
+    Exceptions raised by `source` are re-raised after the open frame is flushed.
+    """
+    max_chars = max_chars or settings.STREAM_FRAME_MAX_CHARS
+    max_delay = max_delay if max_delay is not None else settings.STREAM_FRAME_MAX_DELAY
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer or settings.STREAM_BUFFER_MAX_EVENTS)
+    loop = asyncio.get_running_loop()
+
+    async def pump():
+        try:
+            async for event in source:
+                await queue.put((event, None))
+            await queue.put((_END, None))
+        except Exception as e:
+            await queue.put((_END, e))
+
+    producer = asyncio.create_task(pump())
+
+    parts: List[str] = []
+    frame_type: Optional[str] = None
+    frame_size = 0
+    deadline: Optional[float] = None
+
+    def take_frame() -> Dict[str, Any]:
+        nonlocal parts, frame_type, frame_size, deadline
+        frame = {"type": frame_type, "content": "".join(parts)}
+        parts, frame_type, frame_size, deadline = [], None, 0, None
+        return frame
+
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                event, error = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # Upstream went quiet: don't sit on a partial frame
+                yield take_frame()
+                continue
+
+            if event is _END:
+                if parts:
+                    yield take_frame()
+                if error is not None:
+                    raise error
+                return
+
+            if is_token_event(event):
+                if parts and event["type"] != frame_type:
+                    yield take_frame()
+                if not parts:
+                    frame_type = event["type"]
+                    deadline = loop.time() + max_delay
+                parts.append(event["content"])
+                frame_size += len(event["content"])
+                if frame_size >= max_chars:
+                    yield take_frame()
+            else:
+                if parts:
+                    yield take_frame()
+                yield event
+    finally:
+        # Consumer finished or went away: stop reading upstream
+        producer.cancel()
+        try:
+            await producer
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+async def sse_encode(events: AsyncIterator[Dict[str, Any]]) -> AsyncGenerator[str, None]:
+    """Format dict events as Server-Sent Events, ending with [DONE]"""
+    async for event in events:
+        yield f"data: {json.dumps(event, default=str)}\n\n"
+    yield "data: [DONE]\n\n"
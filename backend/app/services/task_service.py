@@ -27,7 +27,7 @@ class TaskService(BaseService):
                 "created_by_user": True
             }
             
-            result = self.supabase.table("tasks").insert(task_data).execute()
+            result = await self.supabase.table("tasks").insert(task_data).execute()
             created_task = result.data[0] if result.data else None
             
             if created_task:
@@ -66,7 +66,7 @@ class TaskService(BaseService):
             if assigned_to_ve:
                 query = query.eq("assigned_to_ve", assigned_to_ve)
             
-            result = query.order("created_at", desc=True).execute()
+            result = await query.order("created_at", desc=True).execute()
             return result.data
         except Exception as e:
             self._handle_error(e, "TaskService.get_tasks")
@@ -79,7 +79,7 @@ class TaskService(BaseService):
     ) -> Dict[str, Any]:
         """Update a task"""
         try:
-            result = (
+            result = await (
                 self.supabase.table("tasks")
                 .update(updates)
                 .eq("id", task_id)
@@ -107,7 +107,7 @@ class TaskService(BaseService):
                 "created_at": datetime.utcnow().isoformat()
             }
             
-            result = self.supabase.table("task_comments").insert(comment_data).execute()
+            result = await self.supabase.table("task_comments").insert(comment_data).execute()
             return result.data[0] if result.data else None
         except Exception as e:
             self._handle_error(e, "TaskService.add_comment")
@@ -115,7 +115,7 @@ class TaskService(BaseService):
     async def get_comments(self, task_id: str, customer_id: str) -> List[Dict[str, Any]]:
         """Get comments for a task"""
         try:
-            result = (
+            result = await (
                 self.supabase.table("task_comments")
                 .select("*")
                 .eq("task_id", task_id)
@@ -131,13 +131,13 @@ class TaskService(BaseService):
         """Delete a task"""
         try:
             # Verify ownership
-            check = self.supabase.table("tasks").select("id").eq("id", task_id).eq("customer_id", customer_id).execute()
+            check = await self.supabase.table("tasks").select("id").eq("id", task_id).eq("customer_id", customer_id).execute()
             if not check.data:
                 return False
                 
             # Delete task (cascade should handle comments if configured, otherwise might need manual cleanup)
             # Assuming cascade delete is set up in DB for comments
-            result = self.supabase.table("tasks").delete().eq("id", task_id).eq("customer_id", customer_id).execute()
+            result = await self.supabase.table("tasks").delete().eq("id", task_id).eq("customer_id", customer_id).execute()
             return True
         except Exception as e:
             self._handle_error(e, "TaskService.delete_task")
@@ -150,7 +150,7 @@ class TaskService(BaseService):
         await self.add_comment(task_id, customer_id, feedback, "customer")
         
         # 2. Add feedback to task metadata (for persistence context)
-        response = self.supabase.table("tasks").select("metadata").eq("id", task_id).single().execute()
+        response = await self.supabase.table("tasks").select("metadata").eq("id", task_id).single().execute()
         if response.data:
             metadata = response.data.get("metadata") or {}
             feedback_history = metadata.get("feedback_history", [])
@@ -165,7 +165,7 @@ class TaskService(BaseService):
             # Note: We let the workflow update the status back to 'in_progress', 
             # but we canoptimistically set it to "processing_feedback" here if we wanted.
             
-            self.supabase.table("tasks").update(update_data).eq("id", task_id).execute()
+            await self.supabase.table("tasks").update(update_data).eq("id", task_id).execute()
             
         # 3. Signal Temporal Workflow
         try:
@@ -194,11 +194,11 @@ class TaskService(BaseService):
         # 1. Update Plan Status in DB
         # Find the latest draft plan
         try:
-            plan_res = self.supabase.table("task_plans").select("id").eq("task_id", task_id).eq("status", "draft").order("created_at", desc=True).limit(1).execute()
+            plan_res = await self.supabase.table("task_plans").select("id").eq("task_id", task_id).eq("status", "draft").order("created_at", desc=True).limit(1).execute()
             
             if plan_res.data:
                 plan_id = plan_res.data[0]["id"]
-                self.supabase.table("task_plans").update({"status": "approved"}).eq("id", plan_id).execute()
+                await self.supabase.table("task_plans").update({"status": "approved"}).eq("id", plan_id).execute()
                 
             # 2. Signal Workflow
             from app.core.temporal_client import get_temporal_client
@@ -220,12 +220,12 @@ class TaskService(BaseService):
         """Get the latest plan for a task"""
         try:
             # Check ownership via task
-            task_check = self.supabase.table("tasks").select("id").eq("id", task_id).eq("customer_id", customer_id).execute()
+            task_check = await self.supabase.table("tasks").select("id").eq("id", task_id).eq("customer_id", customer_id).execute()
             if not task_check.data:
                 return None
                 
             # specific plan
-            result = (
+            result = await (
                 self.supabase.table("task_plans")
                 .select("*")
                 .eq("task_id", task_id)
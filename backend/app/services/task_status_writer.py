@@ -0,0 +1,287 @@
+"""
+Task Status Writer
+Coalescing, batched writer behind update_task_status_activity.
+
+Workflows report status 3-6 times per delegation hop. Instead of
+SELECT + lookup + UPDATE per report, the writer:
+
+1. Caches task -> customer and (customer, agent_type) -> customer_ves.id
+2. Publishes each update to Centrifugo immediately (the Kanban stays live)
+3. Coalesces updates for the same task within TASK_STATUS_COALESCE_WINDOW:
+   last write wins on status, progress messages are appended
+4. Flushes all pending tasks in one apply_task_status_updates RPC
+   (migrations/008_task_status_batch.sql), falling back to per-row updates
+
+Ordering: updates for a task are applied in submission order, flushes never
+overlap, and once a task reaches a terminal status later non-terminal updates
+are dropped (the RPC enforces the same rule across workers). Terminal updates
+are flushed before submit() returns so the activity still fails - and is
+retried by Temporal - if the write fails or the row wasn't updated.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from postgrest.exceptions import APIError
+
+from app.core.config import settings
+from app.core.database import get_async_supabase_admin
+from app.core.tiered_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+APPLY_STATUS_UPDATES_RPC = "apply_task_status_updates"
+
+# PostgREST codes for "function not found" / "undefined function"
+RPC_MISSING_CODES = {"PGRST202", "42883"}
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+# Progress messages kept in tasks.metadata.progress_history
+PROGRESS_HISTORY_LIMIT = 20
+
+
+def _applied_ids(rows) -> Set[str]:
+    """Task ids returned by the RPC (PostgREST returns SETOF uuid as bare values)"""
+    return {str(next(iter(row.values())) if isinstance(row, dict) else row) for row in rows or []}
+
+
+class TaskStatusWriter:
+    """Per-process coalescing writer for task status updates"""
+
+    def __init__(
+        self,
+        window: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.window = window if window is not None else settings.TASK_STATUS_COALESCE_WINDOW
+        self.batch_size = batch_size or settings.TASK_STATUS_BATCH_SIZE
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._task_customers = LRUCache(maxsize=10000, ttl=3600.0)
+        self._team_ids = LRUCache(maxsize=2048, ttl=settings.TASK_STATUS_VE_MAP_TTL)
+        # Tasks already written with a terminal status (drop late updates)
+        self._finished = LRUCache(maxsize=10000, ttl=3600.0)
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._rpc_available = True
+        self._sequence = 0
+        self.stats = {"submitted": 0, "coalesced": 0, "dropped": 0, "flushes": 0, "rows_written": 0}
+
+    async def _resolve_customer(self, task_id: str) -> str:
+        customer_id = self._task_customers.get(task_id)
+        if customer_id is None:
+            supabase = await get_async_supabase_admin()
+            response = await supabase.table("tasks").select("customer_id").eq("id", task_id).execute()
+            if not response.data:
+                raise Exception(f"Task {task_id} not found")
+            customer_id = response.data[0]["customer_id"]
+            self._task_customers.set(task_id, customer_id)
+        return customer_id
+
+    async def _load_team_ids(self, customer_id: str) -> Dict[str, Optional[str]]:
+        supabase = await get_async_supabase_admin()
+        response = await supabase.table("customer_ves").select("id, agent_type").eq("customer_id", customer_id).execute()
+        team_ids = {row["agent_type"]: row["id"] for row in response.data or [] if row.get("agent_type")}
+        self._team_ids.set(customer_id, team_ids)
+        return team_ids
+
+    async def _resolve_ve_id(self, customer_id: str, agent_type: str) -> Optional[str]:
+        team_ids = self._team_ids.get(customer_id)
+        if team_ids is None or agent_type not in team_ids:
+            # First lookup, or hired since the map was cached
+            team_ids = await self._load_team_ids(customer_id)
+            # Remember unknown agent types too, so they don't reload every time
+            team_ids.setdefault(agent_type, None)
+        return team_ids[agent_type]
+
+    def invalidate_customer(self, customer_id: str):
+        """Forget the cached agent_type -> customer_ves.id map (team changed)"""
+        self._team_ids.delete(customer_id)
+
+    async def submit(
+        self,
+        task_id: str,
+        status: str,
+        assigned_to_agent_type: Optional[str] = None,
+        progress_message: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a status update and publish it. Returns the resolved
+        customer_id / assigned_to_ve_id and whether the update was applied.
+        """
+        self.stats["submitted"] += 1
+        customer_id = await self._resolve_customer(task_id)
+        assigned_to_ve_id = None
+        if assigned_to_agent_type:
+            assigned_to_ve_id = await self._resolve_ve_id(customer_id, assigned_to_agent_type)
+
+        now = datetime.utcnow().isoformat()
+        terminal = status in TERMINAL_STATUSES
+        pending = self._pending.get(task_id)
+
+        if not terminal and (self._finished.get(task_id) or (pending and pending["status"] in TERMINAL_STATUSES)):
+            # Never move a finished task back to an earlier column
+            self.stats["dropped"] += 1
+            logger.debug(f"Dropped late '{status}' update for finished task {task_id}")
+            return {"customer_id": customer_id, "assigned_to_ve_id": assigned_to_ve_id, "updated_at": now, "applied": False}
+
+        self._sequence += 1
+        if pending is None:
+            pending = {"id": task_id, "progress_messages": [], "assigned_to_ve": None, "completed_at": None}
+            self._pending[task_id] = pending
+        else:
+            self.stats["coalesced"] += 1
+
+        pending["status"] = status
+        pending["updated_at"] = now
+        if assigned_to_ve_id:
+            pending["assigned_to_ve"] = assigned_to_ve_id
+        if progress_message:
+            pending["progress_messages"].append(progress_message)
+        if status == "completed":
+            pending["completed_at"] = now
+
+        self._publish(customer_id, {
+            "type": "task_update",
+            "task_id": task_id,
+            "status": status,
+            "assigned_to_agent_type": assigned_to_agent_type,
+            "assigned_to_ve_id": assigned_to_ve_id,
+            "progress_message": progress_message,
+            "updated_at": now,
+            "sequence": self._sequence
+        })
+
+        if terminal:
+            failed = await self.flush()
+            if task_id in failed:
+                raise Exception(f"Failed to update task {task_id}")
+        elif len(self._pending) >= self.batch_size:
+            await self.flush()
+        else:
+            self._ensure_flusher()
+
+        return {"customer_id": customer_id, "assigned_to_ve_id": assigned_to_ve_id, "updated_at": now, "applied": True}
+
+    def _publish(self, customer_id: str, data: Dict[str, Any]):
+        from app.core.centrifugo import get_centrifugo_client
+
+        try:
+            centrifugo = get_centrifugo_client()
+            if centrifugo:
+                centrifugo.publish_nowait(f"customer:{customer_id}:tasks", data)
+        except Exception as e:
+            # Real-time delivery is best-effort; the DB write still happens
+            logger.warning(f"Failed to publish to Centrifugo: {e}")
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._pending:
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Task status flush failed: {e}")
+
+    async def flush(self) -> Set[str]:
+        """Write every pending update. Returns the task ids that failed."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        # One flush at a time keeps per-task writes in submission order
+        async with self._flush_lock:
+            if not self._pending:
+                return set()
+            updates = list(self._pending.values())
+            self._pending = {}
+
+            failed: Set[str] = set()
+            for start in range(0, len(updates), self.batch_size):
+                failed |= await self._write(updates[start:start + self.batch_size])
+
+            self.stats["flushes"] += 1
+            for update in updates:
+                if update["status"] in TERMINAL_STATUSES and update["id"] not in failed:
+                    self._finished.set(update["id"], True)
+            return failed
+
+    async def _write(self, updates: List[Dict[str, Any]]) -> Set[str]:
+        supabase = await get_async_supabase_admin()
+
+        if self._rpc_available:
+            try:
+                response = await supabase.rpc(APPLY_STATUS_UPDATES_RPC, {"updates": updates}).execute()
+                applied = _applied_ids(response.data)
+                self.stats["rows_written"] += len(applied)
+                # Non-terminal updates of finished tasks are skipped on purpose;
+                # a terminal update that wasn't applied is a failure
+                missed = {u["id"] for u in updates if u["status"] in TERMINAL_STATUSES and u["id"] not in applied}
+                for task_id in missed:
+                    logger.error(f"Terminal status update for task {task_id} was not applied")
+                return missed
+            except APIError as e:
+                if e.code in RPC_MISSING_CODES:
+                    # Remember for the life of the process; re-checked on restart
+                    self._rpc_available = False
+                    logger.warning(
+                        f"{APPLY_STATUS_UPDATES_RPC} RPC not available ({e.code}); "
+                        "writing task status row by row. Apply migrations/008_task_status_batch.sql"
+                    )
+                else:
+                    # One bad row fails the whole statement: retry row by row
+                    logger.error(f"Batched task status update failed, retrying per task: {e}")
+            except Exception as e:
+                logger.error(f"Batched task status update failed, retrying per task: {e}")
+
+        results = await asyncio.gather(*(self._write_one(supabase, u) for u in updates))
+        return {u["id"] for u, ok in zip(updates, results) if not ok}
+
+    async def _write_one(self, supabase, update: Dict[str, Any]) -> bool:
+        """Per-task fallback with the same semantics as the RPC"""
+        try:
+            data: Dict[str, Any] = {"status": update["status"], "updated_at": update["updated_at"]}
+            if update["assigned_to_ve"]:
+                data["assigned_to_ve"] = update["assigned_to_ve"]
+            if update["completed_at"]:
+                data["completed_at"] = update["completed_at"]
+
+            if update["progress_messages"]:
+                current = await supabase.table("tasks").select("metadata").eq("id", update["id"]).execute()
+                metadata = (current.data[0].get("metadata") if current.data else None) or {}
+                history = list(metadata.get("progress_history") or []) + update["progress_messages"]
+                metadata["last_progress_message"] = update["progress_messages"][-1]
+                metadata["last_progress_timestamp"] = update["updated_at"]
+                metadata["progress_history"] = history[-PROGRESS_HISTORY_LIMIT:]
+                data["metadata"] = metadata
+
+            query = supabase.table("tasks").update(data).eq("id", update["id"])
+            if update["status"] not in TERMINAL_STATUSES:
+                query = query.not_.in_("status", sorted(TERMINAL_STATUSES))
+            response = await query.execute()
+            if update["status"] in TERMINAL_STATUSES and not response.data:
+                logger.error(f"Terminal status update for task {update['id']} was not applied")
+                return False
+            self.stats["rows_written"] += 1
+            return True
+        except Exception as e:
+            logger.error(f"Failed to update task {update['id']}: {e}")
+            return False
+
+    async def close(self):
+        """Flush whatever is pending (worker shutdown)"""
+        if self._pending:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._pending), "batch_rpc": self._rpc_available}
+
+
+task_status_writer = TaskStatusWriter()
+
+
+def get_task_status_writer() -> TaskStatusWriter:
+    return task_status_writer
@@ -0,0 +1,228 @@
+"""
+Tool Index
+Inverted index over the tools exposed by KAgent MCP servers.
+
+Maintained incrementally by KAgentService from Agent / MCPServer watch
+events (set_server / remove_server / set_agent / remove_agent), so discovery
+queries never rescan the catalog:
+- by MCP server    server name -> tool ids
+- by agent         agent "namespace/name" -> tool names it uses,
+                   tool name -> tool ids (agents are watched cluster-wide, so
+                   same-named agents in different namespaces are distinct)
+- by token         token of the tool's name / description -> tool ids
+
+Tool ids are "namespace/server/tool" and are kept in sorted order; results
+are returned in that order and paginated with an opaque cursor holding the
+last id seen, so pages stay stable while tools are added or removed.
+
+Search terms match tokens by prefix ("sen" finds send_email); a term
+with no prefix match falls back to close spellings of known tokens
+(difflib, TOOL_SEARCH_FUZZY_CUTOFF). All terms must match.
+"""
+import base64
+import bisect
+import difflib
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+
+CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens; splits snake_case, kebab-case and camelCase"""
+    return TOKEN.findall(CAMEL_BOUNDARY.sub(r"\1 \2", text or "").lower())
+
+
+def encode_cursor(last_id: str) -> str:
+    return base64.urlsafe_b64encode(last_id.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Last id of the previous page; ValueError if the cursor is malformed"""
+    try:
+        last_id = base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except Exception:
+        last_id = ""
+    if not last_id:
+        raise ValueError("invalid cursor")
+    return last_id
+
+
+def _add(index: Dict[str, Set[str]], value: str, item: str):
+    index.setdefault(value, set()).add(item)
+
+
+def _discard(index: Dict[str, Set[str]], value: str, item: str):
+    items = index.get(value)
+    if items is not None:
+        items.discard(item)
+        if not items:
+            del index[value]
+
+
+class ToolIndex:
+    def __init__(self):
+        self._tools: Dict[str, Dict[str, Any]] = {}  # tool id -> tool
+        self._ids: List[str] = []  # sorted tool ids
+        self._server_tools: Dict[str, List[str]] = {}  # "namespace/server" -> tool ids
+        self._by_server: Dict[str, Set[str]] = {}
+        self._by_name: Dict[str, Set[str]] = {}
+        self._by_token: Dict[str, Set[str]] = {}
+        self._tokens: List[str] = []  # sorted vocabulary, for prefix search
+        self._agent_tools: Dict[str, Set[str]] = {}  # "namespace/name" -> tool names
+        self._tool_agents: Dict[str, Set[str]] = {}  # tool name -> agent keys
+        self._agent_keys: Dict[str, Set[str]] = {}  # agent name -> agent keys
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def set_server(self, server_key: str, mcp: Dict[str, Any]):
+        """Index (or re-index) the tools of one MCP server"""
+        self.remove_server(server_key)
+        ids = []
+        for tool in mcp.get("tools", []):
+            name = tool if isinstance(tool, str) else tool.get("name")
+            if not name:
+                continue
+            tool_id = f"{server_key}/{name}"
+            if tool_id in self._tools:
+                continue
+            description = tool.get("description", "") if isinstance(tool, dict) else ""
+            self._tools[tool_id] = {
+                "id": tool_id,
+                "name": name,
+                "description": description,
+                "mcp_server": mcp["name"],
+                "namespace": mcp.get("namespace"),
+                "type": "mcp"
+            }
+            bisect.insort(self._ids, tool_id)
+            _add(self._by_server, mcp["name"], tool_id)
+            _add(self._by_name, name, tool_id)
+            for token in set(tokenize(name) + tokenize(description)):
+                if token not in self._by_token:
+                    bisect.insort(self._tokens, token)
+                _add(self._by_token, token, tool_id)
+            ids.append(tool_id)
+        self._server_tools[server_key] = ids
+
+    def remove_server(self, server_key: str):
+        for tool_id in self._server_tools.pop(server_key, []):
+            tool = self._tools.pop(tool_id, None)
+            if tool is None:
+                continue
+            i = bisect.bisect_left(self._ids, tool_id)
+            if i < len(self._ids) and self._ids[i] == tool_id:
+                del self._ids[i]
+            _discard(self._by_server, tool["mcp_server"], tool_id)
+            _discard(self._by_name, tool["name"], tool_id)
+            for token in set(tokenize(tool["name"]) + tokenize(tool["description"])):
+                _discard(self._by_token, token, tool_id)
+                if token not in self._by_token:
+                    j = bisect.bisect_left(self._tokens, token)
+                    if j < len(self._tokens) and self._tokens[j] == token:
+                        del self._tokens[j]
+
+    def set_agent(self, agent_key: str, tool_names: Iterable[str]):
+        """Record which tools an agent ("namespace/name") uses"""
+        self.remove_agent(agent_key)
+        names = set(tool_names)
+        if names:
+            self._agent_tools[agent_key] = names
+            _add(self._agent_keys, agent_key.rsplit("/", 1)[-1], agent_key)
+            for name in names:
+                _add(self._tool_agents, name, agent_key)
+
+    def remove_agent(self, agent_key: str):
+        names = self._agent_tools.pop(agent_key, None)
+        if names is None:
+            return
+        _discard(self._agent_keys, agent_key.rsplit("/", 1)[-1], agent_key)
+        for name in names:
+            _discard(self._tool_agents, name, agent_key)
+
+    def _resolve_agent(self, agent: str) -> Set[str]:
+        """Agent keys for an "agent" filter: "namespace/name", or a bare name (any namespace)"""
+        if "/" in agent:
+            return {agent} if agent in self._agent_tools else set()
+        return self._agent_keys.get(agent, set())
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _term_ids(self, term: str, fuzzy: bool) -> Set[str]:
+        """Tool ids with a token starting with term (or close to it)"""
+        ids: Set[str] = set()
+        start = bisect.bisect_left(self._tokens, term)
+        for token in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            ids |= self._by_token[token]
+        if not ids and fuzzy:
+            for token in difflib.get_close_matches(term, self._tokens, n=5, cutoff=settings.TOOL_SEARCH_FUZZY_CUTOFF):
+                ids |= self._by_token[token]
+        return ids
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        mcp_server: Optional[str] = None,
+        agent: Optional[str] = None,
+        fuzzy: bool = True,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Matching tools in id order, one page at a time
+
+        Returns:
+            {"items": [...], "total": int, "next_cursor": str | None}
+        """
+        candidates: Optional[Set[str]] = None
+
+        def narrow(ids: Set[str]):
+            nonlocal candidates
+            candidates = set(ids) if candidates is None else candidates & ids
+
+        if mcp_server is not None:
+            narrow(self._by_server.get(mcp_server, set()))
+        if agent is not None:
+            ids = set()
+            for agent_key in self._resolve_agent(agent):
+                for name in self._agent_tools[agent_key]:
+                    ids |= self._by_name.get(name, set())
+            narrow(ids)
+        for term in tokenize(query or ""):
+            narrow(self._term_ids(term, fuzzy))
+            if not candidates:
+                break
+
+        ordered = self._ids if candidates is None else sorted(candidates)
+        start = bisect.bisect_right(ordered, decode_cursor(cursor)) if cursor else offset
+        page = ordered[start:start + limit]
+        has_more = start + limit < len(ordered)
+        return {
+            "items": [self._with_agents(self._tools[tool_id]) for tool_id in page],
+            "total": len(ordered),
+            "next_cursor": encode_cursor(page[-1]) if page and has_more else None
+        }
+
+    def _with_agents(self, tool: Dict[str, Any]) -> Dict[str, Any]:
+        return {**tool, "agents": sorted(self._tool_agents.get(tool["name"], ()))}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tools": len(self._tools),
+            "servers": len(self._server_tools),
+            "tokens": len(self._tokens),
+            "agents": len(self._agent_tools)
+        }
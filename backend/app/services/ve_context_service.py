@@ -5,7 +5,8 @@ Manages VE memory and context persistence
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
-from app.core.database import get_supabase_admin
+from supabase import AsyncClient
+from app.core.database import get_async_supabase_admin
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +14,14 @@ logger = logging.getLogger(__name__)
 class VEContextService:
     """Service for managing VE context and memory"""
     
-    def __init__(self):
-        self.supabase = get_supabase_admin()
+    def __init__(self, supabase_client: Optional[AsyncClient] = None):
+        self.supabase = supabase_client
+
+    async def _client(self) -> AsyncClient:
+        """Resolve the shared async admin client on first use"""
+        if self.supabase is None:
+            self.supabase = await get_async_supabase_admin()
+        return self.supabase
     
     async def get_context(self, customer_ve_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -22,7 +29,8 @@ class VEContextService:
         Returns the context_data JSON or None if not found
         """
         try:
-            response = self.supabase.table("ve_contexts")\
+            supabase = await self._client()
+            response = await supabase.table("ve_contexts")\
                 .select("*")\
                 .eq("customer_ve_id", customer_ve_id)\
                 .execute()
@@ -54,6 +62,7 @@ class VEContextService:
             True if successful
         """
         try:
+            supabase = await self._client()
             if merge:
                 # Get existing context
                 existing = await self.get_context(customer_ve_id)
@@ -63,7 +72,7 @@ class VEContextService:
                     context_data = merged_context
             
             # Check if context exists
-            existing_response = self.supabase.table("ve_contexts")\
+            existing_response = await supabase.table("ve_contexts")\
                 .select("id")\
                 .eq("customer_ve_id", customer_ve_id)\
                 .execute()
@@ -75,14 +84,14 @@ class VEContextService:
             
             if existing_response.data:
                 # Update
-                self.supabase.table("ve_contexts")\
+                await supabase.table("ve_contexts")\
                     .update(data)\
                     .eq("customer_ve_id", customer_ve_id)\
                     .execute()
             else:
                 # Insert
                 data["customer_ve_id"] = customer_ve_id
-                self.supabase.table("ve_contexts").insert(data).execute()
+                await supabase.table("ve_contexts").insert(data).execute()
             
             logger.info(f"Updated context for VE {customer_ve_id}")
             return True
@@ -212,8 +221,9 @@ class VEContextService:
             Number of VEs updated
         """
         try:
+            supabase = await self._client()
             # Get all VEs for customer
-            ves_response = self.supabase.table("customer_ves")\
+            ves_response = await supabase.table("customer_ves")\
                 .select("id")\
                 .eq("customer_id", customer_id)\
                 .execute()
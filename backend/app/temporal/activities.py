@@ -5,7 +5,7 @@ from temporalio import activity
 from typing import Dict, Any, List, Optional
 from app.services.agent_gateway_service import get_agent_gateway_service
 from app.core.centrifugo import get_centrifugo_client
-from app.core.database import get_supabase_admin
+from app.core.database import get_async_supabase_admin
 from datetime import datetime
 
 @activity.defn
@@ -58,85 +58,68 @@ async def update_task_status_activity(
         assigned_to_agent_type: Agent type (e.g., "devops-manager") - will be converted to customer_ves ID
         progress_message: Optional progress message to display
     """
-    supabase = get_supabase_admin()
-    centrifugo = get_centrifugo_client()
+    from app.services.task_status_writer import get_task_status_writer, TERMINAL_STATUSES
     
     try:
-        task_response = supabase.table("tasks").select("customer_id, metadata").eq("id", task_id).execute()
-        if not task_response.data:
-            raise Exception(f"Task {task_id} not found")
-        
-        customer_id = task_response.data[0]["customer_id"]
-        current_metadata = task_response.data[0].get("metadata") or {}
-        
-        # Update task in database
-        update_data = {
-            "status": status,
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        
-        # Add progress message to metadata if provided
-        if progress_message:
-            current_metadata["last_progress_message"] = progress_message
-            current_metadata["last_progress_timestamp"] = datetime.utcnow().isoformat()
-            update_data["metadata"] = current_metadata
-        
-        # If agent_type provided, lookup the customer_ves ID
-        assigned_to_ve_id = None
-        if assigned_to_agent_type:
-            ve_response = supabase.table("customer_ves").select("id").eq(
-                "customer_id", customer_id
-            ).eq(
-                "agent_type", assigned_to_agent_type
-            ).limit(1).execute()
-            
-            if ve_response.data:
-                assigned_to_ve_id = ve_response.data[0]["id"]
-                update_data["assigned_to_ve"] = assigned_to_ve_id
-        
-        if status == "completed":
-            update_data["completed_at"] = datetime.utcnow().isoformat()
-        
-        response = supabase.table("tasks").update(update_data).eq("id", task_id).execute()
-        
-        if not response.data:
-            raise Exception(f"Failed to update task {task_id}")
-        
-        task_data = response.data[0]
-        
-        # Send real-time update to frontend via Centrifugo
-        if centrifugo:
-            try:
-                centrifugo.publish(
-                    channel=f"customer:{customer_id}:tasks",
-                    data={
-                        "type": "task_update",
-                        "task_id": task_id,
-                        "status": status,
-                        "assigned_to_agent_type": assigned_to_agent_type,
-                        "assigned_to_ve_id": assigned_to_ve_id,
-                        "progress_message": progress_message,
-                        "updated_at": update_data["updated_at"]
-                    }
-                )
-            except Exception as e:
-                activity.logger.warning(f"Failed to publish to Centrifugo: {e}")
-                # Don't fail the activity if Centrifugo fails
+        # Coalesced + batched DB write; Centrifugo publish happens immediately
+        update = await get_task_status_writer().submit(
+            task_id, status, assigned_to_agent_type, progress_message
+        )
         
         activity.logger.info(f"✅ Task {task_id} updated: status={status}, assigned_to={assigned_to_agent_type}")
         
+        from app.services.admission_control import get_admission_controller
+        if status in TERMINAL_STATUSES:
+            # Frees the task's admission slot and starts the next queued task
+            await get_admission_controller().release(update["customer_id"], task_id)
+        else:
+            # Still working: keep the slot from expiring
+            await get_admission_controller().touch(update["customer_id"], task_id)
+        
         return {
             "success": True,
             "task_id": task_id,
             "status": status,
             "assigned_to_agent_type": assigned_to_agent_type,
-            "assigned_to_ve_id": assigned_to_ve_id
+            "assigned_to_ve_id": update["assigned_to_ve_id"]
         }
         
     except Exception as e:
         activity.logger.error(f"Error updating task status: {e}")
         raise
 
+@activity.defn
+async def suspend_admission_activity(customer_id: str, task_id: str) -> int:
+    """
+    Give up the task's admission slot while its workflow waits for a human.
+    Returns the number of queued tasks started in its place.
+    """
+    from app.services.admission_control import get_admission_controller
+    
+    return await get_admission_controller().release(customer_id, task_id)
+
+@activity.defn
+async def resume_admission_activity(customer_id: str, task_id: str) -> bool:
+    """
+    Take an admission slot again once the human has answered.
+    Raises while the customer is at its limit, so the retry policy waits.
+    """
+    from app.services.admission_control import get_admission_controller
+    
+    if not await get_admission_controller().resume(customer_id, task_id):
+        raise RuntimeError(f"No admission slot free to resume task {task_id}")
+    return True
+
+@activity.defn
+async def release_admission_activity(customer_id: str, task_id: str) -> int:
+    """
+    Free the task's admission slot when its workflow ends, however it ended.
+    Safe to repeat; returns the number of queued tasks started in its place.
+    """
+    from app.services.admission_control import get_admission_controller
+    
+    return await get_admission_controller().release(customer_id, task_id)
+
 @activity.defn
 async def save_task_result_activity(
     task_id: str,
@@ -146,11 +129,11 @@ async def save_task_result_activity(
     """
     Activity to save task result and add system comment.
     """
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     
     try:
         # Get task to find customer_id
-        task_response = supabase.table("tasks").select("customer_id").eq("id", task_id).execute()
+        task_response = await supabase.table("tasks").select("customer_id").eq("id", task_id).execute()
         if not task_response.data:
             raise Exception(f"Task {task_id} not found")
         
@@ -168,7 +151,7 @@ async def save_task_result_activity(
                 "content": f"Task {status}. Result: {result['message'][:500]}",
                 "created_at": datetime.utcnow().isoformat()
             }
-            supabase.table("task_comments").insert(comment_data).execute()
+            await supabase.table("task_comments").insert(comment_data).execute()
         
         activity.logger.info(f"✅ Task {task_id} result saved")
         
@@ -177,6 +160,24 @@ async def save_task_result_activity(
         activity.logger.error(f"Error saving task result: {e}")
         raise
 
+@activity.defn
+async def get_parallel_branch_limit_activity(customer_id: str) -> int:
+    """
+    Max concurrent branches for a parallel delegation, from the customer's
+    subscription tier.
+    """
+    from app.core.config import settings
+    
+    try:
+        supabase = await get_async_supabase_admin()
+        response = await supabase.table("customers").select("subscription_tier").eq("id", customer_id).limit(1).execute()
+        tier = response.data[0].get("subscription_tier") if response.data else None
+    except Exception as e:
+        activity.logger.warning(f"Could not load subscription tier for {customer_id}: {e}")
+        tier = None
+    
+    return settings.PARALLEL_BRANCH_LIMITS.get(tier or "", settings.PARALLEL_BRANCH_DEFAULT_LIMIT)
+
 @activity.defn
 async def get_campaign_performance_activity(
     campaign_id: str
@@ -263,10 +264,10 @@ async def get_customer_ves_activity(
 ) -> List[Dict[str, Any]]:
     """
     Activity to fetch customer's VEs for routing logic.
+    Returns a compact team snapshot; workflows fetch it once and pass it down.
     """
-    supabase = get_supabase_admin()
-    response = supabase.table("customer_ves").select("*, ve_details:virtual_employees(*)").eq("customer_id", customer_id).execute()
-    return response.data
+    from app.services.customer_agent_service import get_team_snapshot
+    return await get_team_snapshot(customer_id)
 
 @activity.defn
 async def analyze_task_description_activity(
@@ -296,7 +297,55 @@ async def analyze_and_decide_delegation_activity(
 ) -> Dict[str, Any]:
     """
     Activity where an agent decides delegation strategy.
-    Invokes the specific Agent via Gateway to make the decision.
+    
+    Order of precedence:
+    1. Cached routing for the same customer + task fingerprint + agent + team shape
+    2. Local fast-path classifier, if confident enough
+    3. The agent itself via Gateway (LLM)
+    """
+    from app.core.config import settings
+    from app.services.delegation_fast_path import (
+        cached_decision,
+        classify_delegation,
+        decision_cache,
+        decision_cache_key,
+        is_cacheable,
+        record_decision_source
+    )
+    
+    cache_key = decision_cache_key(
+        context.get("customer_id"), agent_type, task_description, available_agents, context.get("user_feedback")
+    )
+    cached = await decision_cache.get(cache_key)
+    if cached is not None:
+        record_decision_source("cache")
+        return {**cached, "subtasks": None, "reason": "Same routing as an identical earlier task", "method": "cache"}
+    
+    if settings.DELEGATION_FAST_PATH_ENABLED:
+        fast = classify_delegation(agent_type, task_description, available_agents)
+        if fast and fast["confidence"] >= settings.DELEGATION_FAST_PATH_CONFIDENCE:
+            activity.logger.info(
+                f"Fast-path delegation decision by {agent_type}: {fast['action']} "
+                f"(confidence: {fast['confidence']:.2f})"
+            )
+            record_decision_source("fast_path")
+            return fast
+    
+    decision = await _decide_delegation_with_llm(agent_type, task_description, context, available_agents)
+    record_decision_source("llm")
+    if is_cacheable(decision):
+        await decision_cache.set(cache_key, cached_decision(decision))
+    return decision
+
+
+async def _decide_delegation_with_llm(
+    agent_type: str,
+    task_description: str,
+    context: Dict[str, Any],
+    available_agents: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Ask the agent itself (via Gateway) for a delegation decision.
     """
     service = get_agent_gateway_service()
     customer_id = context.get("customer_id")
@@ -309,13 +358,14 @@ async def analyze_and_decide_delegation_activity(
 You are managing a task. Decide if you can handle it or need to delegate.
 Task: {task_description}
 
-Available Agents: {[a['name'] for a in available_agents]}
+Available Agents: {[a['agent_type'] for a in available_agents]}
 
 Return JSON:
 {{
   "decision": {{
-    "action": "handle" | "delegate",
-    "delegated_to": "agent_name" (if delegating)
+    "action": "handle" | "delegate" | "parallel",
+    "delegated_to": "agent_name" (if delegating),
+    "subtasks": [{{"agent_type": "agent_name", "description": "..."}}] (if splitting in parallel)
   }}
 }}
 """,
@@ -332,6 +382,7 @@ Return JSON:
             return {
                 "action": decision.get("action", "handle"),
                 "delegated_to": decision.get("delegated_to"),
+                "subtasks": decision.get("subtasks"),
                 "reason": data.get("thought_process", "Agent decision")
             }
             
@@ -475,7 +526,7 @@ async def create_task_plan_activity(
     """
     Activity to generate a structured execution plan using the assigned Agent via Gateway.
     """
-    supabase = get_supabase_admin()
+    supabase = await get_async_supabase_admin()
     service = get_agent_gateway_service()
     customer_id = context.get("customer_id")
     
@@ -536,10 +587,10 @@ Return JSON with a 'plan' object containing:
             "created_at": datetime.utcnow().isoformat()
         }
         
-        plan_res = supabase.table("task_plans").insert(plan_data).execute()
+        plan_res = await supabase.table("task_plans").insert(plan_data).execute()
         
         # Update Task Phase
-        supabase.table("tasks").update({
+        await supabase.table("tasks").update({
             "current_phase": "planning",
             "metadata": {
                 **context, 
@@ -13,6 +13,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "../../.."))
 from temporalio.client import Client
 from temporalio.worker import Worker
 from app.core.config import settings
+from app.core.http_pool import get_http_pool
+from app.core.database import reset_async_clients
 from app.temporal.workflows import (
     ProductLaunchCampaignWorkflow,
     ContentCreationWorkflow,
@@ -52,7 +54,7 @@ async def run_worker():
         
         worker = Worker(
             client,
-            task_queue="campaign-queue",
+            task_queue=settings.TEMPORAL_TASK_QUEUE,
             workflows=[
                 ProductLaunchCampaignWorkflow,
                 ContentCreationWorkflow,
@@ -77,11 +79,21 @@ async def run_worker():
             ]
         )
         
-        logger.info("Starting Temporal Worker on queue 'campaign-queue'...")
+        logger.info(f"Starting Temporal Worker on queue '{settings.TEMPORAL_TASK_QUEUE}'...")
         await worker.run()
     except Exception as e:
         logger.error(f"Failed to start worker: {e}")
         sys.exit(1)
+    finally:
+        # Write any coalesced task status updates before the pools go away
+        from app.services.task_status_writer import get_task_status_writer
+        await get_task_status_writer().close()
+        from app.core.centrifugo import get_centrifugo_client
+        await get_centrifugo_client().close()
+        
+        # Close shared Agent Gateway / PostgREST connection pools
+        await get_http_pool().close_all()
+        reset_async_clients()
 
 if __name__ == "__main__":
     asyncio.run(run_worker())
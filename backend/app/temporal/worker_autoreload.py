@@ -14,6 +14,7 @@ import time
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from app.core.config import settings
 from app.temporal.workflows import (
     OrchestratorWorkflow,
     IntelligentDelegationWorkflow
@@ -25,8 +26,13 @@ from app.temporal.activities import (
     analyze_and_decide_delegation_activity,
     update_task_status_activity,
     save_task_result_activity,
-    create_task_plan_activity
+    create_task_plan_activity,
+    get_parallel_branch_limit_activity,
+    suspend_admission_activity,
+    resume_admission_activity,
+    release_admission_activity
 )
+from app.services.admission_control import get_admission_controller
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -48,6 +54,8 @@ async def run_worker():
     """Run the Temporal worker with all workflows and activities"""
     global worker_instance
     
+    # Admits queued tasks whose slots were freed by the slot TTL
+    pump = asyncio.create_task(get_admission_controller().run_pump())
     try:
         # Connect to Temporal
         logger.info("Connecting to Temporal Server at localhost:7233...")
@@ -55,10 +63,10 @@ async def run_worker():
         logger.info("Connected to Temporal Server.")
         
         # Create worker
-        logger.info("Starting Temporal Worker on queue 'campaign-queue'...")
+        logger.info(f"Starting Temporal Worker on queue '{settings.TEMPORAL_TASK_QUEUE}'...")
         worker_instance = Worker(
             client,
-            task_queue="campaign-queue",
+            task_queue=settings.TEMPORAL_TASK_QUEUE,
             workflows=[
                 OrchestratorWorkflow,
                 IntelligentDelegationWorkflow
@@ -70,12 +78,16 @@ async def run_worker():
                 analyze_and_decide_delegation_activity,
                 update_task_status_activity,
                 save_task_result_activity,
-                create_task_plan_activity
+                create_task_plan_activity,
+                get_parallel_branch_limit_activity,
+                suspend_admission_activity,
+                resume_admission_activity,
+                release_admission_activity
             ],
         )
         
         logger.info("✅ Temporal worker started successfully")
-        logger.info("📊 Polling for tasks on task queue: campaign-queue")
+        logger.info(f"📊 Polling for tasks on task queue: {settings.TEMPORAL_TASK_QUEUE}")
         logger.info("🔄 Auto-reload enabled - watching for code changes...")
         
         # Run worker
@@ -86,6 +98,21 @@ async def run_worker():
     except Exception as e:
         logger.error(f"Worker error: {e}", exc_info=True)
         raise
+    finally:
+        pump.cancel()
+        
+        # Runs on every code-change restart too: write coalesced task status
+        # updates and queued publishes before the pools go away
+        from app.services.task_status_writer import get_task_status_writer
+        await get_task_status_writer().close()
+        from app.core.centrifugo import get_centrifugo_client
+        await get_centrifugo_client().close()
+        
+        # Close shared Agent Gateway / PostgREST connection pools
+        from app.core.http_pool import get_http_pool
+        from app.core.database import reset_async_clients
+        await get_http_pool().close_all()
+        reset_async_clients()
 
 async def main_with_autoreload():
     """Main function with auto-reload capability"""
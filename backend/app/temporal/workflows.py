@@ -2,7 +2,9 @@
 Temporal Workflows for VE Platform
 Production-ready workflows with real-time status updates and intelligent delegation
 """
+import asyncio
 from datetime import timedelta
+from typing import Any, Dict, List, Optional
 from temporalio import workflow
 from temporalio.common import RetryPolicy
 
@@ -19,17 +21,117 @@ with workflow.unsafe.imports_passed_through():
         analyze_and_decide_delegation_activity,
         analyze_and_decide_delegation_activity,
         update_task_status_activity,
-        create_task_plan_activity
+        create_task_plan_activity,
+        get_parallel_branch_limit_activity,
+        suspend_admission_activity,
+        resume_admission_activity,
+        release_admission_activity
     )
 
+# How a parallel fan-out treats failed branches:
+# - fail_fast: first failure cancels the remaining branches and fails the task
+# - best_effort: run every branch; succeed if at least one did
+# - quorum: succeed once `quorum` branches succeed (default: majority)
+PARALLEL_FAILURE_POLICIES = ("fail_fast", "best_effort", "quorum")
+DEFAULT_PARALLEL_FAILURE_POLICY = "best_effort"
+
+# workflow.patched() ids for commands added to running code paths: histories
+# recorded before them replay without the new activities
+ADMISSION_SUSPEND_PATCH = "admission-suspend-on-human-wait"
+ADMISSION_RELEASE_PATCH = "admission-release-on-exit"
+
+
+def normalize_subtasks(subtasks: Optional[List[Any]], default_agent_type: str) -> List[Dict[str, str]]:
+    """Coerce LLM-produced subtasks into [{"agent_type", "description"}]"""
+    normalized = []
+    for subtask in subtasks or []:
+        if isinstance(subtask, str):
+            subtask = {"description": subtask}
+        if not isinstance(subtask, dict):
+            continue
+        description = subtask.get("description") or subtask.get("task") or subtask.get("title")
+        if not description:
+            continue
+        agent_type = (
+            subtask.get("agent_type")
+            or subtask.get("assigned_to")
+            or subtask.get("delegated_to")
+            or default_agent_type
+        )
+        normalized.append({"agent_type": agent_type, "description": description})
+    return normalized
+
+
+def parallel_verdict(policy: str, succeeded: int, failed: int, total: int, quorum: int) -> Optional[str]:
+    """
+    Decide a fan-out's outcome from branch counts so far.
+    Returns "completed" / "failed", or None while still undecided.
+    """
+    remaining = total - succeeded - failed
+    if policy == "fail_fast":
+        if failed:
+            return "failed"
+        return "completed" if remaining == 0 else None
+    if policy == "quorum":
+        if succeeded >= quorum:
+            return "completed"
+        if succeeded + remaining < quorum:
+            return "failed"
+        return None
+    # best_effort
+    if remaining:
+        return None
+    return "completed" if succeeded else "failed"
+
 @workflow.defn
 class OrchestratorWorkflow:
     """
     Main workflow to orchestrate task routing and execution.
     Uses intelligent agent-driven delegation with real-time status updates.
+    
+    ADMISSION: however the task ends (failed, cancelled, raised), its
+    admission slot is released and a terminal status written on the way out.
     """
     @workflow.run
     async def run(self, request: dict) -> dict:
+        status, reason = "failed", None
+        try:
+            result = await self._orchestrate(request)
+            status, reason = result.get("status"), result.get("reason")
+            return result
+        except asyncio.CancelledError:
+            status, reason = "cancelled", "Workflow cancelled"
+            raise
+        except Exception as e:
+            reason = str(e)
+            raise
+        finally:
+            await self._finish(request["customer_id"], request["task_id"], status, reason)
+    
+    async def _finish(self, customer_id: str, task_id: str, status: Optional[str], reason: Optional[str]):
+        """Write a terminal status unless the task completed, then free its admission slot"""
+        if not workflow.patched(ADMISSION_RELEASE_PATCH):
+            return
+        if status != "completed":
+            terminal = "cancelled" if status == "cancelled" else "failed"
+            try:
+                await workflow.execute_activity(
+                    update_task_status_activity,
+                    args=[task_id, terminal, None, reason or f"Task {terminal}"],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=3)
+                )
+            except Exception as e:
+                workflow.logger.error(f"Could not mark task {task_id} {terminal}: {e}")
+        # Idempotent: a terminal status update has usually released it already
+        await workflow.execute_activity(
+            release_admission_activity,
+            args=[customer_id, task_id],
+            start_to_close_timeout=timedelta(seconds=30),
+            retry_policy=RetryPolicy(maximum_attempts=5)
+        )
+    
+    async def _orchestrate(self, request: dict) -> dict:
         customer_id = request["customer_id"]
         task_description = request["task_description"]
         task_id = request["task_id"]
@@ -98,7 +200,9 @@ class OrchestratorWorkflow:
                 "task_description": task_description,
                 "current_agent_type": initial_agent_type,
                 "context": context,
-                "delegation_depth": 0
+                "delegation_depth": 0,
+                # Team snapshot travels with the request: no re-fetch per hop
+                "team": ves
             }],
             id=f"intelligent-delegation-{task_id}",
             parent_close_policy=workflow.ParentClosePolicy.TERMINATE
@@ -114,8 +218,11 @@ class IntelligentDelegationWorkflow:
     Agent uses LLM reasoning to decide: handle, delegate, or parallel execution.
     
     REAL-TIME: Updates task status at every stage for live Kanban updates
-    SIGNALS: pause_delegation, resume_delegation, cancel_delegation
+    SIGNALS: pause_delegation, resume_delegation, cancel_delegation, refresh_team
     QUERIES: get_delegation_status, get_delegation_chain
+    
+    TEAM: the customer's team snapshot is passed in request["team"] and handed
+    to every child; refresh_team replaces it and forwards it down the chain.
     """
     
     def __init__(self):
@@ -135,6 +242,8 @@ class IntelligentDelegationWorkflow:
         self._feedback_received = False
         self._last_feedback = None
         self._plan_approved = False
+        self._team: Optional[List[dict]] = None
+        self._active_children: set = set()
     
     @workflow.signal
     async def approve_plan(self):
@@ -165,6 +274,20 @@ class IntelligentDelegationWorkflow:
         self._delegation_status["last_update"] = workflow.now().isoformat()
         workflow.logger.info(f"Feedback signal received: {message}")
     
+    @workflow.signal
+    async def refresh_team(self, team: List[dict]):
+        """Signal with a new team snapshot (customer hired / unhired mid-flight)"""
+        self._team = team
+        self._delegation_status["last_update"] = workflow.now().isoformat()
+        workflow.logger.info(f"Team snapshot refreshed ({len(team)} members)")
+        
+        # Running children hold their own copy: pass it on
+        for child_id in list(self._active_children):
+            try:
+                await workflow.get_external_workflow_handle(child_id).signal("refresh_team", team)
+            except Exception as e:
+                workflow.logger.warning(f"Could not forward team refresh to {child_id}: {e}")
+    
     @workflow.signal
     async def cancel_delegation(self):
         """Signal to cancel delegation workflow"""
@@ -254,12 +377,18 @@ class IntelligentDelegationWorkflow:
                 start_to_close_timeout=timedelta(seconds=30)
             )
 
-            # Wait for approval signal
+            # Wait for approval signal (without holding an admission slot)
             workflow.logger.info(f"Waiting for plan approval for task {task_id}")
+            # Runs that were already waiting here before the patch keep their slot
+            suspend = workflow.patched(ADMISSION_SUSPEND_PATCH)
+            if suspend:
+                await self._suspend_admission(customer_id, task_id, context)
             await workflow.wait_condition(lambda: self._plan_approved or self._cancelled)
             
             if self._cancelled:
                 return {"status": "cancelled", "reason": "Workflow cancelled during planning"}
+            if suspend:
+                await self._resume_admission(customer_id, task_id, context)
             
             # Plan Approved! Update context and proceed
             context["plan_approved"] = True
@@ -278,12 +407,16 @@ class IntelligentDelegationWorkflow:
         delegation_chain.append(current_agent_type)
         context["delegation_chain"] = delegation_chain
         
-        # Step 1: Get available team members
-        ves = await workflow.execute_activity(
-            get_customer_ves_activity,
-            args=[customer_id],
-            start_to_close_timeout=timedelta(minutes=1)
-        )
+        # Step 1: Get available team members (snapshot from the parent, or fetch once)
+        if self._team is None:
+            self._team = request.get("team")
+        if self._team is None:
+            self._team = await workflow.execute_activity(
+                get_customer_ves_activity,
+                args=[customer_id],
+                start_to_close_timeout=timedelta(minutes=1)
+            )
+        ves = self._team
         
         if not ves:
             return {"status": "failed", "reason": "No VEs available"}
@@ -352,13 +485,14 @@ class IntelligentDelegationWorkflow:
                 retry_policy=RetryPolicy(maximum_attempts=2)
             )
             
-            # 🔔 REAL-TIME UPDATE: Task completed
-            await workflow.execute_activity(
-                save_task_result_activity,
-                args=[task_id, {"message": response.get("message", "Task completed")}, "completed"],
-                start_to_close_timeout=timedelta(seconds=30),
-                retry_policy=RetryPolicy(maximum_attempts=2)
-            )
+            # 🔔 REAL-TIME UPDATE: Task completed (parallel branches report to their parent instead)
+            if not context.get("parallel_branch"):
+                await workflow.execute_activity(
+                    save_task_result_activity,
+                    args=[task_id, {"message": response.get("message", "Task completed")}, "completed"],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
             
             return {
                 "status": "completed",
@@ -392,10 +526,15 @@ class IntelligentDelegationWorkflow:
             self._last_feedback = None
             
             workflow.logger.info(f"Workflow paused, waiting for feedback on task {task_id}")
+            suspend = workflow.patched(ADMISSION_SUSPEND_PATCH)
+            if suspend:
+                await self._suspend_admission(customer_id, task_id, context)
             await workflow.wait_condition(lambda: self._feedback_received or self._cancelled)
             
             if self._cancelled:
                 return {"status": "cancelled", "reason": "Workflow cancelled during feedback"}
+            if suspend:
+                await self._resume_admission(customer_id, task_id, context)
             
             workflow.logger.info(f"Feedback received: {self._last_feedback}")
             
@@ -414,18 +553,16 @@ class IntelligentDelegationWorkflow:
                 start_to_close_timeout=timedelta(seconds=30)
             )
             
-            return await workflow.execute_child_workflow(
-                IntelligentDelegationWorkflow.run,
-                args=[{
+            return await self._execute_child(
+                {
                     "customer_id": customer_id,
                     "task_id": task_id,
                     "task_description": task_description,
                     "current_agent_type": current_agent_type,
                     "context": context,
                     "delegation_depth": delegation_depth 
-                }],
-                id=f"intelligent-delegation-{task_id}-retry-{workflow.now().timestamp()}",
-                parent_close_policy=workflow.ParentClosePolicy.TERMINATE
+                },
+                f"intelligent-delegation-{task_id}-retry-{workflow.now().timestamp()}"
             )
 
         elif decision["action"] == "delegate":
@@ -434,7 +571,7 @@ class IntelligentDelegationWorkflow:
             
             if not target_agent_type:
                 # Fallback: handle it themselves
-                return await self._handle_task_directly(customer_id, task_id, task_description, current_agent, delegation_chain)
+                return await self._handle_task_directly(customer_id, task_id, task_description, current_agent, delegation_chain, context)
             
             workflow.logger.info(f"{current_agent_type} delegating to {target_agent_type}")
             
@@ -447,18 +584,19 @@ class IntelligentDelegationWorkflow:
             )
             
             # Recursive call: delegated agent now makes THEIR OWN decision
-            result = await workflow.execute_child_workflow(
-                IntelligentDelegationWorkflow.run,
-                args=[{
+            result = await self._execute_child(
+                {
                     "customer_id": customer_id,
                     "task_id": task_id,
                     "task_description": task_description,
                     "current_agent_type": target_agent_type,
                     "context": context,
                     "delegation_depth": delegation_depth + 1
-                }],
-                id=f"delegation-{task_id}-{delegation_depth + 1}",
-                parent_close_policy=workflow.ParentClosePolicy.TERMINATE
+                },
+                # Sibling parallel branches can't share the depth-based id
+                f"{workflow.info().workflow_id}-delegation-{delegation_depth + 1}"
+                if context.get("parallel_branch")
+                else f"delegation-{task_id}-{delegation_depth + 1}"
             )
             
             return {
@@ -467,11 +605,199 @@ class IntelligentDelegationWorkflow:
                 "delegation_chain": delegation_chain
             }
         
+        elif decision["action"] == "parallel":
+            subtasks = normalize_subtasks(decision.get("subtasks"), current_agent_type)
+            
+            if len(subtasks) < 2:
+                # Nothing to fan out: handle it themselves
+                return await self._handle_task_directly(customer_id, task_id, task_description, current_agent, delegation_chain, context)
+            
+            return await self._execute_parallel(
+                customer_id, task_id, current_agent, subtasks, context, delegation_chain, delegation_depth,
+                policy=context.get("parallel_failure_policy") or decision.get("failure_policy"),
+                quorum=context.get("parallel_quorum") or decision.get("quorum")
+            )
+        
         else:
             # Unknown action, fallback to self-execution
-            return await self._handle_task_directly(customer_id, task_id, task_description, current_agent, delegation_chain)
+            return await self._handle_task_directly(customer_id, task_id, task_description, current_agent, delegation_chain, context)
+    
+    async def _execute_parallel(
+        self,
+        customer_id: str,
+        task_id: str,
+        agent: dict,
+        subtasks: List[Dict[str, str]],
+        context: dict,
+        delegation_chain: list,
+        delegation_depth: int,
+        policy: Optional[str] = None,
+        quorum: Optional[int] = None
+    ) -> dict:
+        """
+        Fan out one child IntelligentDelegationWorkflow per subtask and fan in
+        the results as they finish. Concurrency is capped per customer.
+        """
+        total = len(subtasks)
+        policy = policy if policy in PARALLEL_FAILURE_POLICIES else DEFAULT_PARALLEL_FAILURE_POLICY
+        quorum = min(max(int(quorum or total // 2 + 1), 1), total)
+        
+        max_parallel = context.get("max_parallel_branches") or await workflow.execute_activity(
+            get_parallel_branch_limit_activity,
+            args=[customer_id],
+            start_to_close_timeout=timedelta(seconds=30),
+            retry_policy=RetryPolicy(maximum_attempts=2)
+        )
+        slots = asyncio.Semaphore(max(1, int(max_parallel)))
+        
+        workflow.logger.info(
+            f"{agent.get('agent_type')} splitting task {task_id} into {total} branches "
+            f"(policy={policy}, max_parallel={max_parallel})"
+        )
+        
+        # 🔔 REAL-TIME UPDATE: Fan-out
+        await workflow.execute_activity(
+            update_task_status_activity,
+            args=[task_id, "in_progress", agent.get("agent_type"), f"Splitting into {total} parallel subtasks..."],
+            start_to_close_timeout=timedelta(seconds=30),
+            retry_policy=RetryPolicy(maximum_attempts=2)
+        )
+        
+        async def run_branch(index: int, subtask: Dict[str, str]) -> dict:
+            label = f"[{index + 1}/{total}] {subtask['agent_type']}"
+            async with slots:
+                # 🔔 REAL-TIME UPDATE: Branch started
+                await workflow.execute_activity(
+                    update_task_status_activity,
+                    args=[task_id, "in_progress", subtask["agent_type"], f"{label} started: {subtask['description'][:100]}"],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
+                try:
+                    result = await self._execute_child(
+                        {
+                            "customer_id": customer_id,
+                            "task_id": task_id,
+                            "task_description": subtask["description"],
+                            "current_agent_type": subtask["agent_type"],
+                            "context": {
+                                **context,
+                                "delegation_chain": list(delegation_chain),
+                                "parallel_branch": {"index": index, "total": total}
+                            },
+                            "delegation_depth": delegation_depth + 1
+                        },
+                        f"{workflow.info().workflow_id}-branch-{index}"
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    result = {"status": "failed", "reason": str(e)}
+                
+                succeeded = result.get("status") == "completed"
+                # 🔔 REAL-TIME UPDATE: Branch finished
+                await workflow.execute_activity(
+                    update_task_status_activity,
+                    args=[task_id, "in_progress", subtask["agent_type"],
+                          f"{label} {'completed' if succeeded else 'failed: ' + str(result.get('reason', ''))[:100]}"],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
+                return {
+                    "index": index,
+                    "agent_type": subtask["agent_type"],
+                    "description": subtask["description"],
+                    "status": "completed" if succeeded else "failed",
+                    "result": result.get("result", ""),
+                    "reason": result.get("reason")
+                }
+        
+        pending = [asyncio.create_task(run_branch(i, subtask)) for i, subtask in enumerate(subtasks)]
+        branches: List[dict] = []
+        verdict = None
+        for next_done in workflow.as_completed(pending):
+            branch = await next_done
+            branches.append(branch)
+            succeeded = sum(1 for b in branches if b["status"] == "completed")
+            verdict = parallel_verdict(policy, succeeded, len(branches) - succeeded, total, quorum)
+            if verdict:
+                break
+        
+        # Decided early (fail-fast / quorum): stop branches still running
+        for task in pending:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+        branches.sort(key=lambda b: b["index"])
+        succeeded_branches = [b for b in branches if b["status"] == "completed"]
+        combined = "\n\n".join(
+            f"### {b['agent_type']}: {b['description']}\n{b['result']}" for b in succeeded_branches
+        )
+        summary = f"{len(succeeded_branches)}/{total} parallel subtasks completed ({policy})"
+        
+        if not context.get("parallel_branch"):
+            # 🔔 REAL-TIME UPDATE: Fan-in result
+            await workflow.execute_activity(
+                save_task_result_activity,
+                args=[task_id, {"message": f"{summary}\n\n{combined}"}, verdict],
+                start_to_close_timeout=timedelta(seconds=30),
+                retry_policy=RetryPolicy(maximum_attempts=2)
+            )
+        
+        return {
+            "status": verdict,
+            "handled_by": agent["persona_name"],
+            "delegation_type": "parallel",
+            "delegation_chain": delegation_chain,
+            "failure_policy": policy,
+            "branches": branches,
+            "reason": None if verdict == "completed" else summary,
+            "result": combined
+        }
+    
+    async def _suspend_admission(self, customer_id: str, task_id: str, context: dict):
+        """Free the task's admission slot for a human wait (parallel branches share their parent's)"""
+        if context.get("parallel_branch"):
+            return
+        await workflow.execute_activity(
+            suspend_admission_activity,
+            args=[customer_id, task_id],
+            start_to_close_timeout=timedelta(seconds=30),
+            retry_policy=RetryPolicy(maximum_attempts=3)
+        )
+    
+    async def _resume_admission(self, customer_id: str, task_id: str, context: dict):
+        """Wait for an admission slot before continuing after a human wait"""
+        if context.get("parallel_branch"):
+            return
+        await workflow.execute_activity(
+            resume_admission_activity,
+            args=[customer_id, task_id],
+            start_to_close_timeout=timedelta(seconds=30),
+            # Retried until a slot frees up
+            retry_policy=RetryPolicy(
+                initial_interval=timedelta(seconds=5),
+                backoff_coefficient=1.5,
+                maximum_interval=timedelta(minutes=1),
+                maximum_attempts=0
+            )
+        )
     
-    async def _handle_task_directly(self, customer_id, task_id, task_description, agent, delegation_chain):
+    async def _execute_child(self, request: dict, child_id: str) -> dict:
+        """Run a child delegation hop with the current team snapshot"""
+        self._active_children.add(child_id)
+        try:
+            return await workflow.execute_child_workflow(
+                IntelligentDelegationWorkflow.run,
+                args=[{**request, "team": self._team}],
+                id=child_id,
+                parent_close_policy=workflow.ParentClosePolicy.TERMINATE
+            )
+        finally:
+            self._active_children.discard(child_id)
+    
+    async def _handle_task_directly(self, customer_id, task_id, task_description, agent, delegation_chain, context=None):
         """Helper method for direct task execution with status updates"""
         
         # 🔔 REAL-TIME UPDATE: Fallback execution
@@ -487,16 +813,18 @@ class IntelligentDelegationWorkflow:
             start_to_close_timeout=timedelta(minutes=10)
         )
         
-        # 🔔 REAL-TIME UPDATE: Completed
-        await workflow.execute_activity(
-            save_task_result_activity,
-            args=[task_id, {"message": response.get("message", "")}, "completed"],
-            start_to_close_timeout=timedelta(seconds=30)
-        )
+        # 🔔 REAL-TIME UPDATE: Completed (parallel branches report to their parent instead)
+        if not (context or {}).get("parallel_branch"):
+            await workflow.execute_activity(
+                save_task_result_activity,
+                args=[task_id, {"message": response.get("message", "")}, "completed"],
+                start_to_close_timeout=timedelta(seconds=30)
+            )
         
         return {
             "status": "completed",
             "handled_by": agent["persona_name"],
             "delegation_type": "fallback_execution",
-            "delegation_chain": delegation_chain
+            "delegation_chain": delegation_chain,
+            "result": response.get("message", "")
         }
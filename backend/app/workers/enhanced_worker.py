@@ -4,13 +4,16 @@ Processes tasks using Redis queues, Agent Gateway, and Kubernetes services
 """
 import asyncio
 import os
+import signal
 import logging
 from datetime import datetime
 from supabase import create_client
 
-from app.services.redis_queue_service import get_redis_queue_service
+from app.services.redis_queue_service import get_redis_queue_service, TASK_PRIORITIES
 from app.services.agent_gateway_service import get_agent_gateway_service
 from app.services.kubernetes_service import get_kubernetes_service
+from app.services.agent_health_watcher import AgentHealthWatcher
+from app.workers.task_scheduler import TaskScheduler
 from app.core.config import settings
 
 # Configure logging
@@ -31,6 +34,8 @@ class EnhancedTaskWorker:
     def __init__(self):
         self.supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
         self.redis_queue = None
+        self.scheduler = None
+        self.health_watcher = AgentHealthWatcher()
         self.agent_gateway = get_agent_gateway_service()
         self.k8s_service = get_kubernetes_service()
         self.running = False
@@ -44,11 +49,12 @@ class EnhancedTaskWorker:
         
         self.running = True
         
-        # Start multiple worker tasks
+        # One reader feeding a bounded pool of task executors
+        self.scheduler = TaskScheduler(self.redis_queue, self.handle_task)
+        
         await asyncio.gather(
-            self.process_high_priority_tasks(),
-            self.process_medium_priority_tasks(),
-            self.process_low_priority_tasks(),
+            self.scheduler.run(),
+            self.reclaim_stale_tasks(),
             self.monitor_agent_health(),
             self.process_webhooks()
         )
@@ -57,188 +63,130 @@ class EnhancedTaskWorker:
         """Stop the worker"""
         logger.info("Stopping worker...")
         self.running = False
+        self.health_watcher.stop()
+        if self.scheduler:
+            await self.scheduler.stop()
         if self.redis_queue:
             await self.redis_queue.disconnect()
     
-    async def process_high_priority_tasks(self):
-        """Process high and urgent priority tasks"""
-        logger.info("📌 High priority task processor started")
+    async def reclaim_stale_tasks(self):
+        """Pick up tasks left unacked by crashed workers"""
+        logger.info("♻️ Stale task reclaimer started")
         
         while self.running:
             try:
-                # Check urgent queue first
-                task = await self.redis_queue.dequeue_task(priority="urgent", timeout=1)
-                if not task:
-                    # Then check high priority
-                    task = await self.redis_queue.dequeue_task(priority="high", timeout=1)
-                
-                if task:
-                    await self.process_task(task)
-                else:
-                    await asyncio.sleep(1)
-                    
+                for priority in TASK_PRIORITIES:
+                    tasks = await self.redis_queue.reclaim_stale_tasks(priority)
+                    if tasks:
+                        await self.scheduler.submit(tasks)
             except Exception as e:
-                logger.error(f"Error in high priority processor: {e}")
-                await asyncio.sleep(5)
+                logger.error(f"Error in stale task reclaimer: {e}")
+            await asyncio.sleep(max(5.0, settings.TASK_QUEUE_VISIBILITY_TIMEOUT / 4))
     
-    async def process_medium_priority_tasks(self):
-        """Process medium priority tasks"""
-        logger.info("📋 Medium priority task processor started")
-        
-        while self.running:
-            try:
-                task = await self.redis_queue.dequeue_task(priority="medium", timeout=5)
-                
-                if task:
-                    await self.process_task(task)
-                else:
-                    await asyncio.sleep(2)
-                    
-            except Exception as e:
-                logger.error(f"Error in medium priority processor: {e}")
-                await asyncio.sleep(5)
-    
-    async def process_low_priority_tasks(self):
-        """Process low priority tasks"""
-        logger.info("📝 Low priority task processor started")
-        
-        while self.running:
-            try:
-                task = await self.redis_queue.dequeue_task(priority="low", timeout=10)
-                
-                if task:
-                    await self.process_task(task)
-                else:
-                    await asyncio.sleep(5)
-                    
-            except Exception as e:
-                logger.error(f"Error in low priority processor: {e}")
-                await asyncio.sleep(5)
+    async def handle_task(self, task_item: dict):
+        """Process a task, then ack it or hand it back for retry"""
+        try:
+            await self.process_task(task_item)
+        except Exception as e:
+            logger.error(f"Task {task_item.get('task_id')} failed: {e}")
+            outcome = await self.redis_queue.fail_task(task_item, str(e))
+            if outcome == "dead":
+                try:
+                    self.supabase.table("tasks").update({
+                        "status": "cancelled"
+                    }).eq("id", task_item["task_id"]).execute()
+                except Exception as update_error:
+                    logger.error(f"Failed to cancel task {task_item.get('task_id')}: {update_error}")
+            return
+        await self.redis_queue.ack_task(task_item)
     
     async def process_task(self, task_item: dict):
-        """Process a single task"""
+        """Process a single task (raises if it should be retried)"""
+        task_id = task_item["task_id"]
+        customer_id = task_item["customer_id"]
+        task_data = task_item["task_data"]
+        
+        logger.info(f"🔄 Processing task {task_id}")
+        
+        # Get task details from database
+        task_response = self.supabase.table("tasks").select(
+            "*, customer_ves(*, virtual_employees(*))"
+        ).eq("id", task_id).single().execute()
+        
+        if not task_response.data:
+            logger.error(f"Task {task_id} not found")
+            return
+        
+        task = task_response.data
+        assigned_ve = task.get("customer_ves")
+        
+        if not assigned_ve:
+            logger.error(f"No VE assigned to task {task_id}")
+            return
+        
+        # Update task status
+        self.supabase.table("tasks").update({
+            "status": "in_progress",
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", task_id).execute()
+        
+        # Invoke agent via Agent Gateway
+        namespace = f"{settings.K8S_NAMESPACE_PREFIX}{customer_id}"
+        
         try:
-            task_id = task_item["task_id"]
-            customer_id = task_item["customer_id"]
-            task_data = task_item["task_data"]
-            
-            logger.info(f"🔄 Processing task {task_id}")
-            
-            # Get task details from database
-            task_response = self.supabase.table("tasks").select(
-                "*, customer_ves(*, virtual_employees(*))"
-            ).eq("id", task_id).single().execute()
-            
-            if not task_response.data:
-                logger.error(f"Task {task_id} not found")
-                return
-            
-            task = task_response.data
-            assigned_ve = task.get("customer_ves")
-            
-            if not assigned_ve:
-                logger.error(f"No VE assigned to task {task_id}")
-                return
+            response = await self.agent_gateway.invoke_agent(
+                namespace=namespace,
+                agent_name=assigned_ve["agent_name"],
+                request_data={
+                    "task_id": task_id,
+                    "task": task["title"],
+                    "description": task["description"],
+                    "priority": task.get("priority", "medium"),
+                    "context": task_data.get("context", {})
+                },
+                customer_id=customer_id
+            )
             
-            # Update task status
-            self.supabase.table("tasks").update({
-                "status": "in_progress",
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("id", task_id).execute()
-            
-            # Invoke agent via Agent Gateway
-            namespace = f"{settings.K8S_NAMESPACE_PREFIX}{customer_id}"
-            
-            try:
-                response = await self.agent_gateway.invoke_agent(
-                    namespace=namespace,
-                    agent_name=assigned_ve["agent_name"],
-                    request_data={
-                        "task_id": task_id,
-                        "task": task["title"],
-                        "description": task["description"],
-                        "priority": task.get("priority", "medium"),
-                        "context": task_data.get("context", {})
-                    },
-                    customer_id=customer_id
-                )
+            # Process agent response
+            if response.get("status") == "success":
+                # Task completed successfully
+                self.supabase.table("tasks").update({
+                    "status": "completed",
+                    "completed_at": datetime.utcnow().isoformat()
+                }).eq("id", task_id).execute()
                 
-                # Process agent response
-                if response.get("status") == "success":
-                    # Task completed successfully
-                    self.supabase.table("tasks").update({
-                        "status": "completed",
-                        "completed_at": datetime.utcnow().isoformat()
-                    }).eq("id", task_id).execute()
-                    
-                    # Create completion message
-                    self.supabase.table("messages").insert({
-                        "task_id": task_id,
-                        "customer_id": customer_id,
-                        "from_type": "ve",
-                        "from_ve_id": assigned_ve["id"],
-                        "to_type": "customer",
-                        "to_user_id": customer_id,
-                        "subject": f"Task Completed: {task['title']}",
-                        "content": response.get("response", {}).get("message", "Task completed successfully"),
-                        "message_type": "email",
-                        "read": False
-                    }).execute()
-                    
-                    logger.info(f"✅ Task {task_id} completed successfully")
-                else:
-                    # Task failed
-                    self.supabase.table("tasks").update({
-                        "status": "cancelled"
-                    }).eq("id", task_id).execute()
-                    
-                    logger.error(f"❌ Task {task_id} failed")
-                    
-            except Exception as e:
-                logger.error(f"Agent invocation failed for task {task_id}: {e}")
+                # Create completion message
+                self.supabase.table("messages").insert({
+                    "task_id": task_id,
+                    "customer_id": customer_id,
+                    "from_type": "ve",
+                    "from_ve_id": assigned_ve["id"],
+                    "to_type": "customer",
+                    "to_user_id": customer_id,
+                    "subject": f"Task Completed: {task['title']}",
+                    "content": response.get("response", {}).get("message", "Task completed successfully"),
+                    "message_type": "email",
+                    "read": False
+                }).execute()
                 
-                # Update task status to error
+                logger.info(f"✅ Task {task_id} completed successfully")
+            else:
+                # Task failed
                 self.supabase.table("tasks").update({
                     "status": "cancelled"
                 }).eq("id", task_id).execute()
                 
+                logger.error(f"❌ Task {task_id} failed")
+                
         except Exception as e:
-            logger.error(f"Error processing task: {e}")
+            # Retried by handle_task; cancelled once out of attempts
+            logger.error(f"Agent invocation failed for task {task_id}: {e}")
+            raise
     
     async def monitor_agent_health(self):
-        """Monitor health of deployed agents"""
+        """Keep VE status in line with agent readiness (Kubernetes watch)"""
         logger.info("🏥 Agent health monitor started")
-        
-        while self.running:
-            try:
-                # Get all active customer VEs
-                ves_response = self.supabase.table("customer_ves").select("*").eq("status", "active").execute()
-                
-                for ve in ves_response.data:
-                    try:
-                        # Check agent status in Kubernetes
-                        namespace = ve["namespace"]
-                        agent_name = ve["agent_name"]
-                        
-                        status = await self.k8s_service.get_agent_status(namespace, agent_name)
-                        
-                        if status and not status.get("ready", True):
-                            logger.warning(f"Agent {agent_name} is not ready")
-                            
-                            # Update VE status
-                            self.supabase.table("customer_ves").update({
-                                "status": "unhealthy"
-                            }).eq("id", ve["id"]).execute()
-                        
-                    except Exception as e:
-                        logger.error(f"Error checking agent {ve['agent_name']}: {e}")
-                
-                # Check every 30 seconds
-                await asyncio.sleep(30)
-                
-            except Exception as e:
-                logger.error(f"Error in health monitor: {e}")
-                await asyncio.sleep(60)
+        await self.health_watcher.run()
     
     async def process_webhooks(self):
         """Process webhook events from queue"""
@@ -259,14 +207,23 @@ async def main():
     """Main entry point"""
     worker = EnhancedTaskWorker()
     
-    try:
-        await worker.start()
-    except KeyboardInterrupt:
+    # SIGTERM / SIGINT: drain in-flight tasks before exiting
+    shutdown = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, shutdown.set)
+    
+    runner = asyncio.create_task(worker.start())
+    waiter = asyncio.create_task(shutdown.wait())
+    await asyncio.wait({runner, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    
+    if runner.done() and not runner.cancelled() and runner.exception():
+        logger.error(f"Worker error: {runner.exception()}")
+    else:
         logger.info("Received shutdown signal")
-        await worker.stop()
-    except Exception as e:
-        logger.error(f"Worker error: {e}")
-        await worker.stop()
+    await worker.stop()
+    runner.cancel()
+    waiter.cancel()
 
 
 if __name__ == "__main__":
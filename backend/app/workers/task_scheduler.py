@@ -0,0 +1,250 @@
+"""
+Task Scheduler
+Feeds queued tasks to a bounded pool of concurrent executors.
+
+One loop reads batches from the priority streams into per-priority buffers,
+never more tasks than there are free executor slots (unread tasks stay in
+the stream for other workers rather than sitting unacked here). In weighted
+mode the slots are shared out between the streams by weight. Whenever an
+executor slot is free the next task is picked:
+- "weighted": smooth weighted round-robin over the non-empty priorities
+  (TASK_PRIORITY_WEIGHTS), so low priority work keeps moving under load
+- "strict": always the highest non-empty priority
+
+No customer holds more than TASK_CUSTOMER_CONCURRENCY tasks (running or
+buffered) in a worker; extra tasks go back to the end of their stream for
+another worker or a later read, so one tenant can't fill every slot. When
+nothing in a read was accepted the loop waits for one of this worker's tasks
+to finish (at most IDLE_BACKOFF, doubling up to MAX_IDLE_BACKOFF) before
+reading again, instead of re-reading and re-queueing the same tasks.
+
+Every task the worker holds (buffered or running) has its idle time reset
+every TASK_QUEUE_HEARTBEAT_INTERVAL, so the stale-task reclaimer of this or
+another worker never takes over a task that is merely slow. A reclaimed task
+that is already held here is ignored.
+
+stop() stops reading, puts buffered tasks back on the queue and waits up to
+TASK_WORKER_DRAIN_TIMEOUT for in-flight tasks to finish.
+"""
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.redis_queue_service import TASK_PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+# Wait after a read that yielded nothing runnable (every task over its customer cap)
+IDLE_BACKOFF = 0.5
+MAX_IDLE_BACKOFF = 10.0
+
+
+def _entry_key(task: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    if "_entry_id" not in task:
+        return None
+    return task.get("_stream"), task["_entry_id"]
+
+
+class TaskScheduler:
+    def __init__(
+        self,
+        queue,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        concurrency: Optional[int] = None,
+        customer_concurrency: Optional[int] = None,
+        mode: Optional[str] = None,
+        weights: Optional[Dict[str, int]] = None,
+        block_ms: int = 5000
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency or settings.TASK_WORKER_CONCURRENCY
+        self.customer_concurrency = customer_concurrency or settings.TASK_CUSTOMER_CONCURRENCY
+        self.mode = mode or settings.TASK_SCHEDULER_MODE
+        self.weights = weights or settings.TASK_PRIORITY_WEIGHTS
+        self.block_ms = block_ms
+        self.running = False
+
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._buffers: Dict[str, Deque[Dict[str, Any]]] = {p: deque() for p in TASK_PRIORITIES}
+        self._credit: Dict[str, int] = {p: 0 for p in TASK_PRIORITIES}
+        self._read_credit: Dict[str, int] = {p: 0 for p in TASK_PRIORITIES}
+        self._hold_dropped = asyncio.Event()
+        self._backoff = IDLE_BACKOFF
+        self._held: Dict[str, int] = defaultdict(int)  # customer -> running + buffered
+        self._inflight: Set[asyncio.Task] = set()
+        self._local: Dict[Tuple[str, str], Dict[str, Any]] = {}  # stream entry -> buffered / running task
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.stats = {"started": 0, "released": 0, "duplicates": 0}
+
+    def buffered(self) -> int:
+        return sum(len(b) for b in self._buffers.values())
+
+    async def submit(self, tasks: List[Dict[str, Any]]) -> int:
+        """Buffer tasks (e.g. reclaimed ones); returns how many were accepted"""
+        accepted = 0
+        for task in tasks:
+            key = _entry_key(task)
+            if key is not None and key in self._local:
+                # Reclaimed while we still hold it: already buffered or running
+                self.stats["duplicates"] += 1
+                continue
+            customer_id = task.get("customer_id")
+            if self._held[customer_id] >= self.customer_concurrency:
+                # Over the customer's share: hand it back to the queue
+                self.stats["released"] += 1
+                await self.queue.release_task(task)
+                continue
+            self._held[customer_id] += 1
+            if key is not None:
+                self._local[key] = task
+            priority = task.get("priority")
+            self._buffers[priority if priority in self._buffers else "medium"].append(task)
+            accepted += 1
+        return accepted
+
+    def _select(self) -> Optional[Dict[str, Any]]:
+        ready = [p for p in TASK_PRIORITIES if self._buffers[p]]
+        if not ready:
+            return None
+        if self.mode == "strict":
+            return self._buffers[ready[0]].popleft()
+        # Smooth weighted round-robin: credit every ready priority by its
+        # weight, serve the largest, charge it the total
+        total = 0
+        for p in ready:
+            weight = self.weights.get(p, 1)
+            self._credit[p] += weight
+            total += weight
+        chosen = max(ready, key=lambda p: self._credit[p])
+        self._credit[chosen] -= total
+        return self._buffers[chosen].popleft()
+
+    def _read_shares(self, free: int) -> Optional[Dict[str, int]]:
+        """Free slots per priority stream for the next read (weighted mode)"""
+        if self.mode == "strict":
+            return None
+        shares = {p: 0 for p in TASK_PRIORITIES}
+        total = sum(self.weights.get(p, 1) for p in TASK_PRIORITIES)
+        for _ in range(free):
+            for p in TASK_PRIORITIES:
+                self._read_credit[p] += self.weights.get(p, 1)
+            chosen = max(TASK_PRIORITIES, key=lambda p: self._read_credit[p])
+            self._read_credit[chosen] -= total
+            shares[chosen] += 1
+        return shares
+
+    async def _wait_for_capacity(self):
+        """Nothing read was runnable: wait for a task here to finish, backing off"""
+        self._hold_dropped.clear()
+        try:
+            await asyncio.wait_for(self._hold_dropped.wait(), self._backoff)
+        except asyncio.TimeoutError:
+            pass
+        self._backoff = min(self._backoff * 2, MAX_IDLE_BACKOFF)
+
+    async def run(self):
+        """Read and dispatch tasks until stop()"""
+        self.running = True
+        logger.info(
+            f"Task scheduler started: {self.concurrency} executors, "
+            f"{self.customer_concurrency} per customer, {self.mode} priority"
+        )
+        self._heartbeat = asyncio.create_task(self._extend_held())
+        while self.running:
+            await self._slots.acquire()
+            try:
+                if not self.buffered():
+                    free = min(self.concurrency - len(self._inflight), settings.TASK_QUEUE_BATCH_SIZE)
+                    tasks = await self.queue.read_tasks(
+                        list(TASK_PRIORITIES), count=free, block_ms=self.block_ms, shares=self._read_shares(free)
+                    )
+                    if tasks:
+                        if await self.submit(tasks):
+                            self._backoff = IDLE_BACKOFF
+                        else:
+                            await self._wait_for_capacity()
+                task = self._select() if self.running else None
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"Task scheduler error: {e}")
+                await asyncio.sleep(IDLE_BACKOFF)
+                continue
+            if task is None:
+                self._slots.release()
+                continue
+            self._start(task)
+        # A read in progress when stop() was called
+        await self._release_buffered()
+
+    async def _extend_held(self):
+        """Keep held tasks from looking stale to reclaimers (until stop() has drained)"""
+        while True:
+            await asyncio.sleep(settings.TASK_QUEUE_HEARTBEAT_INTERVAL)
+            if self._local:
+                try:
+                    await self.queue.extend_tasks(list(self._local.values()))
+                except Exception as e:
+                    logger.error(f"Failed to extend held tasks: {e}")
+
+    def _start(self, task: Dict[str, Any]):
+        self.stats["started"] += 1
+        execution = asyncio.create_task(self._execute(task))
+        self._inflight.add(execution)
+        execution.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, task: Dict[str, Any]):
+        try:
+            await self.handler(task)
+        except Exception as e:
+            logger.error(f"Task {task.get('task_id')} handler error: {e}")
+        finally:
+            self._drop_hold(task)
+            self._slots.release()
+
+    def _drop_hold(self, task: Dict[str, Any]):
+        key = _entry_key(task)
+        if key is not None:
+            self._local.pop(key, None)
+        customer_id = task.get("customer_id")
+        self._held[customer_id] -= 1
+        if self._held[customer_id] <= 0:
+            del self._held[customer_id]
+        self._hold_dropped.set()
+
+    async def _release_buffered(self):
+        for buffer in self._buffers.values():
+            while buffer:
+                task = buffer.popleft()
+                self._drop_hold(task)
+                self.stats["released"] += 1
+                await self.queue.release_task(task)
+
+    async def stop(self, drain_timeout: Optional[float] = None):
+        """Stop reading, requeue buffered tasks, wait for in-flight ones"""
+        self.running = False
+        drain_timeout = drain_timeout if drain_timeout is not None else settings.TASK_WORKER_DRAIN_TIMEOUT
+
+        await self._release_buffered()
+
+        if self._inflight:
+            logger.info(f"Draining {len(self._inflight)} in-flight tasks")
+            done, pending = await asyncio.wait(set(self._inflight), timeout=drain_timeout)
+            for execution in pending:
+                # Left unacked: another worker reclaims it after the visibility timeout
+                execution.cancel()
+            if pending:
+                logger.warning(f"{len(pending)} tasks still running after {drain_timeout}s, cancelled")
+
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": len(self._inflight),
+            "buffered": {p: len(b) for p, b in self._buffers.items()},
+            "customers": len(self._held)
+        }
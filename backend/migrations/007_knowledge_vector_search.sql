@@ -0,0 +1,64 @@
+-- Vector search for company knowledge
+-- Moves similarity ranking into Postgres (pgvector) so a search returns only
+-- the top-k matching rows instead of every embedding for the customer.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- HNSW needs a fixed dimension. 768 is the backend's EMBEDDING_DIMENSIONS
+-- setting, which is requested from every provider (Gemini
+-- outputDimensionality, OpenAI dimensions), so Gemini and OpenAI embeddings
+-- both fit. If EMBEDDING_DIMENSIONS is changed, change the column and the
+-- function signature below to the same value.
+ALTER TABLE company_knowledge
+    ALTER COLUMN embeddings TYPE vector(768) USING embeddings::vector(768);
+
+-- Approximate nearest-neighbour index (cosine distance)
+CREATE INDEX IF NOT EXISTS idx_company_knowledge_embeddings_hnsw
+    ON company_knowledge USING hnsw (embeddings vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- Tenant filter applied alongside the ANN scan
+CREATE INDEX IF NOT EXISTS idx_company_knowledge_customer_id
+    ON company_knowledge(customer_id);
+
+-- Top-k search for one customer. Threshold and limit are applied server-side
+-- and the embedding column is never returned.
+CREATE OR REPLACE FUNCTION match_company_knowledge(
+    query_embedding vector(768),
+    match_customer_id uuid,
+    match_threshold float DEFAULT 0.7,
+    match_count int DEFAULT 5
+)
+RETURNS TABLE (
+    id uuid,
+    customer_id uuid,
+    content text,
+    content_type text,
+    metadata jsonb,
+    created_at timestamptz,
+    updated_at timestamptz,
+    similarity float
+)
+LANGUAGE sql STABLE
+-- A wider candidate list keeps recall up after the customer_id filter
+-- (pgvector >= 0.8 also supports SET hnsw.iterative_scan = relaxed_order)
+SET hnsw.ef_search = 100
+AS $$
+    SELECT
+        ck.id,
+        ck.customer_id,
+        ck.content,
+        ck.content_type,
+        ck.metadata,
+        ck.created_at,
+        ck.updated_at,
+        1 - (ck.embeddings <=> query_embedding) AS similarity
+    FROM company_knowledge ck
+    WHERE ck.customer_id = match_customer_id
+      AND ck.embeddings IS NOT NULL
+      AND 1 - (ck.embeddings <=> query_embedding) >= match_threshold
+    ORDER BY ck.embeddings <=> query_embedding
+    LIMIT match_count;
+$$;
+
+COMMENT ON FUNCTION match_company_knowledge IS 'Cosine top-k knowledge search for a customer (HNSW-backed)';
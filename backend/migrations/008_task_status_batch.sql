@@ -0,0 +1,58 @@
+-- Batched task status updates
+-- Applies many coalesced status updates (one row per task) in a single
+-- statement, so the Temporal worker issues one round trip per flush instead
+-- of SELECT + UPDATE per update_task_status_activity call.
+--
+-- Ordering guarantee: a task that reached a terminal status (completed,
+-- failed, cancelled) is never moved back to a non-terminal one. This keeps the
+-- Kanban board from regressing when several workers flush out of order.
+-- Updates are not compared by timestamp: updated_at comes from each worker's
+-- clock, and any skew would silently drop updates (terminal ones included).
+--
+-- Returns the ids of the rows it updated; the writer treats a terminal update
+-- whose id is missing as failed.
+
+CREATE OR REPLACE FUNCTION apply_task_status_updates(updates jsonb)
+RETURNS SETOF uuid
+LANGUAGE sql
+AS $$
+    UPDATE tasks t
+    SET
+        status = u.status,
+        updated_at = u.updated_at,
+        assigned_to_ve = COALESCE(u.assigned_to_ve, t.assigned_to_ve),
+        completed_at = COALESCE(u.completed_at, t.completed_at),
+        metadata = CASE
+            WHEN jsonb_array_length(COALESCE(u.progress_messages, '[]'::jsonb)) = 0 THEN t.metadata
+            ELSE COALESCE(t.metadata, '{}'::jsonb) || jsonb_build_object(
+                'last_progress_message', u.progress_messages -> -1,
+                'last_progress_timestamp', u.updated_at,
+                -- Keep the most recent 20 progress messages
+                'progress_history', (
+                    SELECT COALESCE(jsonb_agg(h.e ORDER BY h.i), '[]'::jsonb)
+                    FROM (
+                        SELECT e, i
+                        FROM jsonb_array_elements(
+                            COALESCE(t.metadata -> 'progress_history', '[]'::jsonb) || u.progress_messages
+                        ) WITH ORDINALITY AS x(e, i)
+                        ORDER BY i DESC
+                        LIMIT 20
+                    ) h
+                )
+            )
+        END
+    FROM jsonb_to_recordset(updates) AS u(
+        id uuid,
+        status text,
+        assigned_to_ve uuid,
+        progress_messages jsonb,
+        updated_at timestamptz,
+        completed_at timestamptz
+    )
+    WHERE t.id = u.id
+      AND NOT (
+          t.status IN ('completed', 'failed', 'cancelled')
+          AND u.status NOT IN ('completed', 'failed', 'cancelled')
+      )
+    RETURNING t.id;
+$$;
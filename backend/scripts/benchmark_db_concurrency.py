@@ -0,0 +1,97 @@
+"""
+Database Concurrency Benchmark
+Compares the blocking supabase-py client against the async (pooled httpx)
+client when many requests hit the event loop at once.
+
+For each mode it fires N concurrent "request handlers" that each run a small
+read query, and reports throughput, latency percentiles and the worst
+event-loop stall observed by a heartbeat task. With the sync client every
+query blocks the loop, so handlers serialize and the stall grows with N.
+
+Usage (needs SUPABASE_URL / SUPABASE_SERVICE_KEY in the environment):
+    python scripts/benchmark_db_concurrency.py --concurrency 10 50 100 --table tasks
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import get_supabase_admin, get_async_supabase_admin  # noqa: E402
+from app.core.http_pool import get_http_pool  # noqa: E402
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float, stalls: list):
+    """Measure how late the loop wakes us up (event-loop lag)"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _sync_handler(table: str) -> float:
+    start = time.perf_counter()
+    get_supabase_admin().table(table).select("id").limit(1).execute()
+    return time.perf_counter() - start
+
+
+async def _async_handler(table: str) -> float:
+    start = time.perf_counter()
+    supabase = await get_async_supabase_admin()
+    await supabase.table(table).select("id").limit(1).execute()
+    return time.perf_counter() - start
+
+
+async def run_mode(mode: str, concurrency: int, table: str) -> dict:
+    handler = _sync_handler if mode == "sync" else _async_handler
+
+    # Warm up clients / connections so setup cost isn't measured
+    await handler(table)
+
+    stop = asyncio.Event()
+    stalls: list = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, 0.01, stalls))
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[handler(table) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await heartbeat
+
+    latencies = sorted(latencies)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "total_s": elapsed,
+        "rps": concurrency / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        "max_loop_stall_ms": max(stalls, default=0.0) * 1000,
+    }
+
+
+async def main(levels: list, table: str):
+    print(f"{'mode':<6} {'conc':>5} {'total s':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'loop stall ms':>14}")
+    try:
+        for concurrency in levels:
+            for mode in ("sync", "async"):
+                r = await run_mode(mode, concurrency, table)
+                print(
+                    f"{r['mode']:<6} {r['concurrency']:>5} {r['total_s']:>9.2f} {r['rps']:>9.1f} "
+                    f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['max_loop_stall_ms']:>14.1f}"
+                )
+    finally:
+        await get_http_pool().close_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--table", default="tasks", help="Table to read from (only 'id' is selected)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.concurrency, args.table))
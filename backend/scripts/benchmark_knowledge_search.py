@@ -0,0 +1,125 @@
+"""
+Knowledge Search Benchmark
+Latency of company-knowledge similarity search at 1k / 10k / 100k items per
+customer.
+
+Offline (default): compares the previous pure-Python cosine loop with the
+NumPy matrix fallback (rank_by_similarity) on synthetic 768-d embeddings.
+Transfer time for the rows is not included, so this understates the gap to
+the server-side RPC, which never ships embeddings over the wire.
+
+Live (--rpc CUSTOMER_ID): times the match_company_knowledge RPC end-to-end
+for a customer that already has knowledge rows (needs SUPABASE_* env vars).
+
+Usage:
+    python scripts/benchmark_knowledge_search.py --sizes 1000 10000 100000
+    python scripts/benchmark_knowledge_search.py --rpc <customer-uuid> --runs 20
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.embeddings_service import rank_by_similarity  # noqa: E402
+
+DIMENSIONS = 768
+
+
+def legacy_search(query, rows, limit, threshold):
+    """The original per-row zip loop, kept here for comparison"""
+    results = []
+    for item in rows:
+        vec = item["embeddings"]
+        dot = sum(a * b for a, b in zip(query, vec))
+        m1 = math.sqrt(sum(a * a for a in query))
+        m2 = math.sqrt(sum(b * b for b in vec))
+        similarity = dot / (m1 * m2) if m1 and m2 else 0.0
+        if similarity >= threshold:
+            results.append({**item, "similarity": similarity})
+    results.sort(key=lambda x: x["similarity"], reverse=True)
+    return results[:limit]
+
+
+def make_rows(n: int, rng: np.random.Generator):
+    vectors = rng.standard_normal((n, DIMENSIONS), dtype=np.float32)
+    return [
+        {"id": str(i), "content": f"item {i}", "embeddings": vectors[i].tolist()}
+        for i in range(n)
+    ]
+
+
+def time_call(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run_offline(sizes, runs: int, legacy_max: int):
+    rng = np.random.default_rng(42)
+    print(f"{'items':>8} {'legacy ms':>11} {'numpy ms':>10} {'speedup':>9}")
+    for n in sizes:
+        rows = make_rows(n, rng)
+        query = rows[0]["embeddings"]
+
+        numpy_ms = time_call(lambda: rank_by_similarity(query, rows, 5, 0.1), runs)
+        if n <= legacy_max:
+            legacy_ms = time_call(lambda: legacy_search(query, rows, 5, 0.1), max(1, runs // 5))
+            print(f"{n:>8} {legacy_ms:>11.1f} {numpy_ms:>10.1f} {legacy_ms / numpy_ms:>8.1f}x")
+        else:
+            print(f"{n:>8} {'(skipped)':>11} {numpy_ms:>10.1f} {'-':>9}")
+
+
+async def run_rpc(customer_id: str, runs: int):
+    from app.core.database import get_async_supabase_admin
+    from app.core.http_pool import get_http_pool
+    from app.services.embeddings_service import MATCH_KNOWLEDGE_RPC
+
+    supabase = await get_async_supabase_admin()
+    count = await supabase.table("company_knowledge")\
+        .select("id", count="exact")\
+        .eq("customer_id", customer_id)\
+        .limit(1)\
+        .execute()
+
+    query = np.random.default_rng(7).standard_normal(DIMENSIONS).tolist()
+    samples = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            await supabase.rpc(MATCH_KNOWLEDGE_RPC, {
+                "query_embedding": query,
+                "match_customer_id": customer_id,
+                "match_threshold": 0.0,
+                "match_count": 5
+            }).execute()
+            samples.append(time.perf_counter() - start)
+    finally:
+        await get_http_pool().close_all()
+
+    samples.sort()
+    print(f"RPC over {count.count} items: p50={statistics.median(samples) * 1000:.1f}ms "
+          f"p95={samples[max(0, int(len(samples) * 0.95) - 1)] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--legacy-max", type=int, default=10_000, help="Skip the slow legacy loop above this size")
+    parser.add_argument("--rpc", metavar="CUSTOMER_ID", help="Benchmark the pgvector RPC for this customer")
+    args = parser.parse_args()
+
+    if args.rpc:
+        asyncio.run(run_rpc(args.rpc, args.runs))
+    else:
+        run_offline(args.sizes, args.runs, args.legacy_max)
@@ -0,0 +1,102 @@
+"""
+Leakage Scanner Benchmark
+Throughput (MB/s) of ContextLeakageDetector on synthetic agent responses.
+
+Compares the previous per-pattern scan (six re.search / re.findall passes)
+with the single-pass candidate-token scan (two combined patterns per token),
+and measures incremental streaming scans at several chunk sizes (token-sized
+chunks are the realistic case for invoke_agent_stream).
+
+Usage:
+    python scripts/benchmark_leakage_scanner.py --size-kb 256 --runs 20
+    python scripts/benchmark_leakage_scanner.py --leak-rate 0.01 --chunks 4 32 512
+"""
+import argparse
+import logging
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.security.leakage_detector import ContextLeakageDetector  # noqa: E402
+
+CUSTOMER_ID = "11111111-1111-1111-1111-111111111111"
+WORDS = (
+    "the campaign plan covers audience research content calendar budget review "
+    "and weekly reporting for the marketing team with clear owners and dates"
+).split()
+LEAKS = [
+    "jane.doe@example.com",
+    "555-123-4567",
+    "22222222-2222-2222-2222-222222222222",
+    "sk-" + "Ab3" * 12,
+    CUSTOMER_ID,
+]
+
+
+def legacy_scan(content: str, customer_id: str):
+    """The original scan: one regex pass per pattern"""
+    p = ContextLeakageDetector.PATTERNS
+    pii = bool(re.search(p["email"], content)) or bool(re.search(p["phone"], content)) or bool(re.search(p["ssn"], content))
+    secrets = bool(re.search(p["api_key"], content)) or bool(re.search(p["jwt"], content))
+    uuids = [u for u in re.findall(p["uuid"], content) if u != customer_id]
+    return pii, secrets, uuids
+
+
+def make_text(size: int, leak_rate: float, rng: random.Random) -> str:
+    parts, length = [], 0
+    while length < size:
+        word = rng.choice(LEAKS) if rng.random() < leak_rate else rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)[:size]
+
+
+def mb_per_s(fn, size: int, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return size / statistics.median(samples) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--leak-rate", type=float, default=0.001, help="share of words that are leaks")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[4, 32, 512], help="stream chunk sizes (chars)")
+    args = parser.parse_args()
+    # Measure scanning, not alert logging
+    logging.disable(logging.WARNING)
+
+    detector = ContextLeakageDetector()
+    size = args.size_kb * 1024
+    text = make_text(size, args.leak_rate, random.Random(42))
+
+    legacy = mb_per_s(lambda: legacy_scan(text, CUSTOMER_ID), size, args.runs)
+    single = mb_per_s(lambda: detector.scan(text, CUSTOMER_ID), size, args.runs)
+    print(f"{'scanner':<24} {'MB/s':>8}")
+    print(f"{'legacy (6 passes)':<24} {legacy:>8.1f}")
+    print(f"{'single pass':<24} {single:>8.1f}   {single / legacy:.1f}x")
+
+    for chunk_size in args.chunks:
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+        def run_stream():
+            scanner = detector.stream(CUSTOMER_ID)
+            for chunk in chunks:
+                scanner.feed(chunk)
+            scanner.close()
+
+        streamed = mb_per_s(run_stream, size, max(1, args.runs // 4))
+        print(f"{f'stream, {chunk_size}-char chunks':<24} {streamed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
+from tests.conftest import AsyncQueryMock
 
-@patch("app.api.tasks.get_supabase_admin")
-def test_create_task_simple(mock_get_supabase, client, mock_supabase):
-    mock_get_supabase.return_value = mock_supabase
+@patch("app.api.tasks.get_async_supabase_admin", new_callable=AsyncMock)
+def test_create_task_simple(mock_get_supabase, client, mock_async_supabase):
+    mock_get_supabase.return_value = mock_async_supabase
     
     # Mock insert response
     mock_task = {
@@ -15,7 +16,7 @@ def test_create_task_simple(mock_get_supabase, client, mock_supabase):
         "priority": "medium",
         "created_at": "2023-01-01T00:00:00"
     }
-    mock_supabase.table.return_value.insert.return_value.execute.return_value.data = [mock_task]
+    mock_async_supabase.table.return_value.insert.return_value.execute.return_value.data = [mock_task]
     
     payload = {
         "title": "Test Task",
@@ -30,10 +31,10 @@ def test_create_task_simple(mock_get_supabase, client, mock_supabase):
     assert data["id"] == "task-1"
     assert data["title"] == "Test Task"
 
-@patch("app.api.tasks.get_supabase_admin")
+@patch("app.api.tasks.get_async_supabase_admin", new_callable=AsyncMock)
 @patch("app.services.agent_gateway_service.agent_gateway_service.invoke_agent")
-def test_create_task_assigned_to_ve(mock_invoke_agent, mock_get_supabase, client, mock_supabase):
-    mock_get_supabase.return_value = mock_supabase
+def test_create_task_assigned_to_ve(mock_invoke_agent, mock_get_supabase, client, mock_async_supabase):
+    mock_get_supabase.return_value = mock_async_supabase
     
     # Mock insert response for task
     mock_task = {
@@ -56,7 +57,7 @@ def test_create_task_assigned_to_ve(mock_invoke_agent, mock_get_supabase, client
     
     # Configure mocks for sequential calls
     def table_side_effect(table_name):
-        mock_table = MagicMock()
+        mock_table = AsyncQueryMock()
         if table_name == "tasks":
             mock_table.insert.return_value.execute.return_value.data = [mock_task]
         elif table_name == "customer_ves":
@@ -65,7 +66,7 @@ def test_create_task_assigned_to_ve(mock_invoke_agent, mock_get_supabase, client
             mock_table.insert.return_value.execute.return_value.data = [{"id": "comment-1"}]
         return mock_table
         
-    mock_supabase.table.side_effect = table_side_effect
+    mock_async_supabase.table.side_effect = table_side_effect
     
     # Mock agent invocation response
     mock_invoke_agent.return_value = {
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from app.main import app
 from app.core.database import get_supabase_admin
@@ -25,6 +25,23 @@ def mock_supabase():
     mock.table.return_value.delete.return_value.eq.return_value.execute.return_value.data = [{"id": "deleted-id"}]
     return mock
 
+class AsyncQueryMock(MagicMock):
+    """MagicMock whose .execute() is awaitable, like the async PostgREST builders"""
+
+    def _get_child_mock(self, **kw):
+        if kw.get("name") == "execute":
+            return AsyncMock(**kw)
+        return AsyncQueryMock(**kw)
+
+@pytest.fixture
+def mock_async_supabase():
+    mock = AsyncQueryMock()
+    mock.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
+    mock.table.return_value.insert.return_value.execute.return_value.data = [{"id": "new-id"}]
+    mock.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [{"id": "updated-id"}]
+    mock.table.return_value.delete.return_value.eq.return_value.execute.return_value.data = [{"id": "deleted-id"}]
+    return mock
+
 @pytest.fixture
 def client(mock_supabase):
     # Override dependencies
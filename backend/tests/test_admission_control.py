@@ -0,0 +1,256 @@
+"""
+Test suite for orchestrator workflow admission control:
+- Admitted requests start a workflow on the tier's Temporal task queue
+- Queued requests record their position and don't start a workflow
+- A failed start gives the slot back
+- Releasing a slot starts the requests the pump admits; failed starts are requeued
+- Without Redis, requests are started directly
+- Human waits give the slot up; resuming takes one only within the limits
+- Deleting a task drops it from the backlog or frees its slot
+- However an orchestrator workflow ends, its slot is released and a failed /
+  cancelled task gets a terminal status
+- Runs recorded before the human-wait suspension shipped replay without it
+"""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.config import settings
+from app.services.admission_control import AdmissionController
+from app.temporal import activities, workflows
+
+REQUEST = {"customer_id": "c1", "task_id": "t1", "task_description": "do it", "context": {}}
+
+
+class FakePipeline:
+    def __init__(self):
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args))
+
+    async def execute(self):
+        return []
+
+
+def make_controller(submit_result=0, pumped=None, tier="pro"):
+    controller = AdmissionController()
+    controller._tiers.set("c1", tier)
+    client = MagicMock()
+    client.lrange = AsyncMock(return_value=[])
+    client.pipeline = MagicMock(return_value=FakePipeline())
+    controller._submit_script = AsyncMock(return_value=submit_result)
+    controller._pump_script = AsyncMock(return_value=pumped or [])
+    controller._resume_script = AsyncMock(return_value=1)
+    controller._cancel_script = AsyncMock(return_value=0)
+    controller._redis = AsyncMock(return_value=client)
+    controller._start = AsyncMock()
+    controller._record_position = AsyncMock()
+    return controller, client
+
+
+class TestAdmissionControl:
+
+    def test_admitted_request_starts_on_tier_queue(self):
+        controller, _ = make_controller(submit_result=0, tier="enterprise")
+        with patch.object(settings, "ADMISSION_TIER_TASK_QUEUES", {"enterprise": "premium-queue"}):
+            result = asyncio.run(controller.submit(dict(REQUEST)))
+        assert result["admitted"] is True
+        assert controller._start.await_args.args[0]["task_queue"] == "premium-queue"
+        args = controller._submit_script.await_args.kwargs["args"]
+        assert args[4] == settings.ADMISSION_TIER_QUOTAS["enterprise"]
+        assert args[5] == settings.ADMISSION_TIER_WEIGHTS["enterprise"]
+
+    def test_queued_request_records_position(self):
+        controller, _ = make_controller(submit_result=3)
+        result = asyncio.run(controller.submit(dict(REQUEST)))
+        assert result == {"admitted": False, "queue_position": 3, "task_queue": settings.TEMPORAL_TASK_QUEUE}
+        controller._start.assert_not_awaited()
+        controller._record_position.assert_awaited_once_with("c1", "t1", 3)
+
+    def test_failed_start_releases_slot(self):
+        controller, _ = make_controller(submit_result=0)
+        controller._start.side_effect = Exception("temporal down")
+        try:
+            asyncio.run(controller.submit(dict(REQUEST)))
+        except Exception:
+            pass
+        args = controller._pump_script.await_args.kwargs["args"]
+        assert args[-2:] == ["c1", "t1"]
+
+    def test_release_starts_admitted_requests(self):
+        queued = [json.dumps({**REQUEST, "task_id": f"q{i}", "enqueued_at": 0}) for i in range(2)]
+        controller, client = make_controller(pumped=queued)
+        started = asyncio.run(controller.release("c1", "t1"))
+        assert started == 2
+        assert [c.args[0]["task_id"] for c in controller._start.await_args_list] == ["q0", "q1"]
+        # Position cleared on the admitted tasks, remaining backlog re-published
+        controller._record_position.assert_any_await("c1", "q0", None)
+        client.lrange.assert_awaited()
+
+    def test_pump_requeues_when_start_fails(self):
+        queued = [json.dumps({**REQUEST, "task_id": f"q{i}", "enqueued_at": 0}) for i in range(3)]
+        controller, client = make_controller(pumped=queued)
+        controller._start.side_effect = [None, Exception("temporal down")]
+        started = asyncio.run(controller.release("c1", "t1"))
+        assert started == 1
+        pushed = [json.loads(args[1])["task_id"] for name, args in client.pipeline.return_value.calls if name == "lpush"]
+        # Pushed back in reverse so q1 ends up first again
+        assert pushed == ["q2", "q1"]
+
+    def test_without_redis_requests_start_directly(self):
+        controller, _ = make_controller()
+        controller._redis = AsyncMock(return_value=None)
+        result = asyncio.run(controller.submit(dict(REQUEST)))
+        assert result["admitted"] is True
+        controller._start.assert_awaited_once()
+
+    def test_resume_waits_for_a_slot(self):
+        from app.temporal.activities import resume_admission_activity
+
+        controller, _ = make_controller()
+        controller._resume_script.return_value = 0
+        assert asyncio.run(controller.resume("c1", "t1")) is False
+        assert controller._resume_script.await_args.kwargs["args"][-1] == settings.ADMISSION_TIER_QUOTAS["pro"]
+
+        # The activity raises so its retry policy waits for a slot
+        with patch("app.services.admission_control.get_admission_controller", return_value=controller):
+            try:
+                asyncio.run(resume_admission_activity("c1", "t1"))
+                raised = False
+            except RuntimeError:
+                raised = True
+        assert raised
+
+        controller._resume_script.return_value = 1
+        assert asyncio.run(controller.resume("c1", "t1")) is True
+
+    def test_touch_refreshes_held_slot_only(self):
+        controller, client = make_controller()
+        asyncio.run(controller.touch("c1", "t1"))
+        calls = client.pipeline.return_value.calls
+        assert [(name, list(args[1])) for name, args in calls] == [
+            ("zadd", ["t1"]), ("zadd", ["c1|t1"])
+        ]
+
+    def test_cancel_queued_task_drops_it_from_backlog(self):
+        controller, client = make_controller()
+        controller._cancel_script.return_value = 1
+        assert asyncio.run(controller.cancel("c1", "t1")) == 0
+        assert controller._cancel_script.await_args.kwargs["args"][1:] == ["c1", "t1"]
+        # Not holding a slot: nothing to free
+        controller._pump_script.assert_not_awaited()
+        client.lrange.assert_awaited()
+
+    def test_cancel_running_task_frees_its_slot(self):
+        controller, _ = make_controller()
+        asyncio.run(controller.cancel("c1", "t1"))
+        assert controller._pump_script.await_args.kwargs["args"][-2:] == ["c1", "t1"]
+
+
+class TestOrchestratorExit:
+
+    TEAM = [{"id": "ve-1", "agent_type": "marketing-manager", "ve_details": {"seniority_level": "manager"}}]
+
+    def run_orchestrator(self, child):
+        calls = []
+
+        async def execute_activity(fn, args=(), **kwargs):
+            calls.append((fn, list(args)))
+            if fn is activities.get_customer_ves_activity:
+                return self.TEAM
+            if fn is activities.analyze_routing_activity:
+                return {}
+            return None
+
+        async def run():
+            return await workflows.OrchestratorWorkflow().run(REQUEST)
+
+        with patch.object(workflows.workflow, "execute_activity", execute_activity), \
+             patch.object(workflows.workflow, "execute_child_workflow", AsyncMock(side_effect=child)), \
+             patch.object(workflows.workflow, "patched", return_value=True), \
+             patch.object(workflows.workflow, "logger", MagicMock()):
+            try:
+                result = asyncio.run(run())
+            except BaseException as e:
+                result = e
+        exit_calls = [(fn, args) for fn, args in calls if fn is activities.release_admission_activity
+                      or (fn is activities.update_task_status_activity and args[1] != "in_progress")]
+        return result, exit_calls
+
+    def test_failed_child_releases_slot_and_marks_task_failed(self):
+        result, calls = self.run_orchestrator(Exception("invoke_agent_activity out of retries"))
+
+        assert isinstance(result, Exception)
+        assert calls == [
+            (activities.update_task_status_activity, ["t1", "failed", None, "invoke_agent_activity out of retries"]),
+            (activities.release_admission_activity, ["c1", "t1"]),
+        ]
+
+    def test_cancelled_child_marks_task_cancelled(self):
+        result, calls = self.run_orchestrator(
+            lambda *a, **k: {"status": "cancelled", "reason": "Workflow cancelled during planning"}
+        )
+
+        assert result["status"] == "cancelled"
+        assert calls == [
+            (activities.update_task_status_activity, ["t1", "cancelled", None, "Workflow cancelled during planning"]),
+            (activities.release_admission_activity, ["c1", "t1"]),
+        ]
+
+    def test_completed_child_only_releases(self):
+        result, calls = self.run_orchestrator(lambda *a, **k: {"status": "completed", "result": "done"})
+
+        assert result["status"] == "completed"
+        assert calls == [(activities.release_admission_activity, ["c1", "t1"])]
+
+
+class TestPlanApprovalWait:
+
+    TEAM = [{"id": "ve-1", "agent_type": "marketing-manager", "persona_name": "Alice"}]
+
+    def run_delegation(self, patched):
+        calls = []
+        instance = workflows.IntelligentDelegationWorkflow()
+
+        async def execute_activity(fn, args=(), **kwargs):
+            calls.append(fn)
+            if fn is activities.create_task_plan_activity:
+                return {"success": True}
+            if fn is activities.analyze_and_decide_delegation_activity:
+                return {"action": "handle"}
+            if fn is activities.invoke_agent_activity:
+                return {"message": "done"}
+            return None
+
+        async def wait_condition(condition):
+            instance._plan_approved = True
+
+        request = {**REQUEST, "current_agent_type": "marketing-manager", "team": self.TEAM}
+        with patch.object(workflows.workflow, "execute_activity", execute_activity), \
+             patch.object(workflows.workflow, "wait_condition", wait_condition), \
+             patch.object(workflows.workflow, "patched", return_value=patched), \
+             patch.object(workflows.workflow, "now", MagicMock()), \
+             patch.object(workflows.workflow, "logger", MagicMock()):
+            result = asyncio.run(instance.run(request))
+        return result, calls
+
+    def test_new_runs_give_up_the_slot_while_waiting(self):
+        result, calls = self.run_delegation(patched=True)
+
+        assert result["status"] == "completed"
+        assert activities.suspend_admission_activity in calls
+        assert calls.index(activities.suspend_admission_activity) < calls.index(activities.resume_admission_activity)
+
+    def test_runs_recorded_before_the_patch_replay_without_it(self):
+        result, calls = self.run_delegation(patched=False)
+
+        assert result["status"] == "completed"
+        assert activities.suspend_admission_activity not in calls
+        assert activities.resume_admission_activity not in calls
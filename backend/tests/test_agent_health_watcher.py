@@ -0,0 +1,104 @@
+"""
+Test suite for the watch-driven agent health monitor:
+- The informer delivers list differences and watch events to handlers
+- A 410 from the watch triggers a relist
+- Only readiness changes are recorded, keyed by agent type
+- Changes are written as at most two bulk UPDATEs fanned out by agent_type
+- A failed write keeps the changes for the next flush
+"""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.k8s_informer import ResourceInformer, ResourceGone
+from app.services.agent_health_watcher import AgentHealthWatcher, agent_ready
+from tests.conftest import AsyncQueryMock
+
+
+def agent(name, ready=None, version="1"):
+    obj = {"metadata": {"name": name, "namespace": "kagent", "resourceVersion": version}}
+    if ready is not None:
+        obj["status"] = {"conditions": [{"type": "Ready", "status": "True" if ready else "False"}]}
+    return obj
+
+
+def make_informer(items, version="100"):
+    api = MagicMock()
+    api.list_namespaced_custom_object.return_value = {"items": items, "metadata": {"resourceVersion": version}}
+    return ResourceInformer(api, "kagent.dev", "v1alpha2", "agents", namespace="kagent"), api
+
+
+class TestAgentHealthWatcher:
+
+    def test_relist_delivers_differences(self):
+        informer, api = make_informer([agent("a", True), agent("b", True)])
+        events = []
+        informer.add_handler(lambda t, obj, old: events.append((t, obj["metadata"]["name"])))
+
+        asyncio.run(informer._relist())
+        api.list_namespaced_custom_object.return_value = {
+            "items": [agent("a", False, version="2")], "metadata": {"resourceVersion": "101"}
+        }
+        asyncio.run(informer._relist())
+
+        assert events == [("ADDED", "a"), ("ADDED", "b"), ("DELETED", "b"), ("MODIFIED", "a")]
+        assert informer.resource_version == "101"
+        assert informer.get("kagent", "a")["metadata"]["resourceVersion"] == "2"
+
+    def test_watch_gone_raises_for_relist(self):
+        informer, _ = make_informer([])
+        stream = [{"type": "ERROR", "object": {"code": 410, "message": "too old"}}]
+        with patch("kubernetes.watch.Watch") as watch:
+            watch.return_value.stream.return_value = iter(stream)
+            with pytest.raises(ResourceGone):
+                informer._watch_blocking(MagicMock())
+
+    def test_watch_events_update_version(self):
+        informer, _ = make_informer([])
+        loop = MagicMock()
+        stream = [{"type": "MODIFIED", "object": agent("a", False, version="7")}]
+        informer.running = True
+        with patch("kubernetes.watch.Watch") as watch:
+            watch.return_value.stream.return_value = iter(stream)
+            informer._watch_blocking(loop)
+        assert informer.resource_version == "7"
+        loop.call_soon_threadsafe.assert_called_once()
+
+    def test_only_changes_are_recorded(self):
+        watcher = AgentHealthWatcher(informer=MagicMock())
+        watcher.on_event("ADDED", agent("a", True), None)
+        watcher.on_event("MODIFIED", agent("a", True), None)
+        watcher.on_event("MODIFIED", agent("b"), None)  # no readiness info
+        watcher.on_event("MODIFIED", agent("a", False), None)
+        assert watcher.stats["changes"] == 2
+        assert watcher._changes == {"a": False}
+        assert agent_ready(None) is False
+
+    def test_flush_bulk_updates_by_agent_type(self):
+        watcher = AgentHealthWatcher(informer=MagicMock())
+        watcher._changes = {"a": False, "b": False, "c": True}
+        supabase = AsyncQueryMock()
+
+        async def admin():
+            return supabase
+
+        with patch("app.core.database.get_async_supabase_admin", admin):
+            asyncio.run(watcher.flush())
+
+        updates = supabase.table.return_value.update.call_args_list
+        assert [c.args[0] for c in updates] == [{"status": "unhealthy"}, {"status": "active"}]
+        in_calls = supabase.table.return_value.update.return_value.in_.call_args_list
+        assert [c.args for c in in_calls] == [("agent_type", ["a", "b"]), ("agent_type", ["c"])]
+        assert watcher._changes == {}
+
+    def test_failed_flush_keeps_changes(self):
+        watcher = AgentHealthWatcher(informer=MagicMock())
+        watcher._changes = {"a": False}
+
+        async def admin():
+            raise Exception("db down")
+
+        with patch("app.core.database.get_async_supabase_admin", admin):
+            asyncio.run(watcher.flush())
+        assert watcher._changes == {"a": False}
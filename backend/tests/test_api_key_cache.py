@@ -0,0 +1,110 @@
+"""
+Test suite for cached API key verification:
+- Valid keys are looked up once per TTL
+- Unknown keys are negatively cached
+- Revocation evicts locally and is broadcast; broadcasts evict on other replicas
+- last_used_at is written behind in one batched UPDATE
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.api_key_service import APIKeyService, API_KEY_REVOKED_CHANNEL
+from tests.conftest import AsyncQueryMock
+
+KEY_ROW = {"id": "key-1", "customer_id": "cust-1", "key_type": "agent", "name": "mcp", "key_hash": None}
+
+
+def make_service(rows):
+    supabase = AsyncQueryMock()
+    supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value.data = rows
+    service = APIKeyService(supabase)
+    service._ensure_listener = MagicMock()
+    return service, supabase
+
+
+def lookups(supabase):
+    return supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.await_count
+
+
+class TestAPIKeyCache:
+
+    def test_valid_key_is_cached(self):
+        service, supabase = make_service([dict(KEY_ROW)])
+
+        async def run():
+            first = await service.verify_api_key("vek_abc")
+            second = await service.verify_api_key("vek_abc")
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first["customer_id"] == second["customer_id"] == "cust-1"
+        assert lookups(supabase) == 1
+        assert service.stats["hits"] == 1
+        # No synchronous last_used_at UPDATE on the request path
+        supabase.table.return_value.update.assert_not_called()
+
+    def test_unknown_key_is_negatively_cached(self):
+        service, supabase = make_service([])
+
+        async def run():
+            return [await service.verify_api_key("vek_bad") for _ in range(3)]
+
+        assert asyncio.run(run()) == [None, None, None]
+        assert lookups(supabase) == 1
+        assert service.stats["negative_hits"] == 2
+
+    def test_lookup_errors_are_not_cached(self):
+        service, supabase = make_service([])
+        query = supabase.table.return_value.select.return_value.eq.return_value.eq.return_value
+        query.execute.side_effect = [Exception("db down"), MagicMock(data=[dict(KEY_ROW)])]
+
+        async def run():
+            return await service.verify_api_key("vek_abc"), await service.verify_api_key("vek_abc")
+
+        first, second = asyncio.run(run())
+        assert first is None and second["id"] == "key-1"
+
+    def test_revocation_evicts_and_broadcasts(self):
+        key_hash = APIKeyService()._hash_key("vek_abc")
+        service, supabase = make_service([dict(KEY_ROW, key_hash=key_hash)])
+        supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute.return_value.data = [
+            dict(KEY_ROW, key_hash=key_hash, is_active=False)
+        ]
+        redis_service = MagicMock(publish_event=AsyncMock(return_value=True))
+
+        async def run():
+            await service.verify_api_key("vek_abc")
+            with patch("app.services.redis_queue_service.get_redis_queue_service", AsyncMock(return_value=redis_service)):
+                assert await service.revoke_api_key("key-1", "cust-1")
+
+        asyncio.run(run())
+        assert service._cache.get(key_hash) is None
+        redis_service.publish_event.assert_awaited_once_with(API_KEY_REVOKED_CHANNEL, {"key_hash": key_hash})
+
+    def test_broadcast_evicts_on_other_replicas(self):
+        service, _ = make_service([dict(KEY_ROW)])
+        key_hash = service._hash_key("vek_abc")
+
+        async def run():
+            await service.verify_api_key("vek_abc")
+            await service._on_revoked({"key_hash": key_hash})
+
+        asyncio.run(run())
+        assert service._cache.get(key_hash) is None
+
+    def test_last_used_is_written_behind_in_one_update(self):
+        service, supabase = make_service([])
+        service._cache.set(service._hash_key("vek_a"), dict(KEY_ROW, id="key-a"))
+        service._cache.set(service._hash_key("vek_b"), dict(KEY_ROW, id="key-b"))
+
+        async def run():
+            for key in ["vek_a", "vek_b", "vek_a"]:
+                await service.verify_api_key(key)
+            await service.close()
+
+        asyncio.run(run())
+        update = supabase.table.return_value.update
+        update.assert_called_once()
+        ids = update.return_value.in_.call_args.args[1]
+        assert sorted(ids) == ["key-a", "key-b"]
+        assert service.stats["last_used_writes"] == 1
@@ -0,0 +1,90 @@
+"""
+Test suite for the batched security audit sink:
+- Records are written in one multi-row insert, off the request path
+- Failed inserts spill to the local file and are replayed after recovery
+- Buffer overflow spills the oldest records instead of dropping them
+"""
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.audit_sink import AuditSink
+from tests.conftest import AsyncQueryMock
+
+
+def entry(i):
+    return {"customer_id": f"cust-{i}", "path": "/agents/x", "method": "POST", "context_hash": str(i)}
+
+
+@pytest.fixture
+def supabase():
+    mock = AsyncQueryMock()
+    with patch("app.core.database.get_async_supabase_admin", AsyncMock(return_value=mock)):
+        yield mock
+
+
+def inserted_rows(supabase):
+    return [c.args[0] for c in supabase.table.return_value.insert.call_args_list]
+
+
+class TestAuditSink:
+
+    def test_records_are_batched(self, supabase, tmp_path):
+        sink = AuditSink(batch_size=100, flush_interval=60, spill_path=str(tmp_path / "spill.jsonl"))
+
+        async def run():
+            for i in range(5):
+                sink.record(entry(i))
+            # Nothing written inline
+            assert supabase.table.return_value.insert.call_count == 0
+            await sink.close()
+
+        asyncio.run(run())
+        assert [len(rows) for rows in inserted_rows(supabase)] == [5]
+        assert sink.get_stats()["queue_depth"] == 0
+
+    def test_full_batch_wakes_the_flusher(self, supabase, tmp_path):
+        sink = AuditSink(batch_size=3, flush_interval=60, spill_path=str(tmp_path / "spill.jsonl"))
+
+        async def run():
+            for i in range(3):
+                sink.record(entry(i))
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        assert [len(rows) for rows in inserted_rows(supabase)] == [3]
+
+    def test_failed_insert_spills_and_replays(self, supabase, tmp_path):
+        spill = tmp_path / "spill.jsonl"
+        sink = AuditSink(batch_size=2, flush_interval=0, spill_path=str(spill))
+        insert = supabase.table.return_value.insert.return_value
+        insert.execute.side_effect = Exception("db down")
+
+        async def run():
+            for i in range(3):
+                sink.record(entry(i))
+            await sink.flush()
+            assert len(spill.read_text().splitlines()) == 3
+
+            insert.execute.side_effect = None
+            sink.record(entry(3))
+            await sink.flush()
+
+        asyncio.run(run())
+        written = [row["context_hash"] for rows in inserted_rows(supabase)[-3:] for row in rows]
+        assert sorted(written) == ["0", "1", "2", "3"]
+        assert not spill.exists()
+        assert sink.stats["replayed"] == 3
+
+    def test_overflow_spills_oldest(self, supabase, tmp_path):
+        spill = tmp_path / "spill.jsonl"
+        sink = AuditSink(batch_size=100, flush_interval=60, max_buffer=4, spill_path=str(spill))
+
+        for i in range(5):
+            sink.record(entry(i))
+
+        spilled = [json.loads(line)["context_hash"] for line in spill.read_text().splitlines()]
+        assert spilled == ["0", "1"]
+        assert sink.get_stats()["queue_depth"] == 3
@@ -0,0 +1,86 @@
+"""
+Test suite for the async Centrifugo publisher:
+- Token events merged into frames without reordering
+- Batch API payloads
+- Drop / evict policy when the queue is full
+"""
+import asyncio
+import json
+
+import httpx
+
+from app.core.centrifugo import CentrifugoClient
+
+
+def make_client(**kwargs):
+    client = CentrifugoClient(api_url="http://centrifugo/api", api_key="k", **kwargs)
+    client.requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        client.requests.append((request, body))
+        return httpx.Response(200, json={"replies": [{} for _ in body["commands"]]})
+
+    http = httpx.AsyncClient(base_url="http://centrifugo/api", transport=httpx.MockTransport(handler))
+    client._http = lambda: http
+    return client
+
+
+class TestCentrifugoClient:
+
+    def test_tokens_merge_into_frames_in_order(self):
+        client = make_client(frame_interval=60)
+
+        async def run():
+            for token in ["Hel", "lo", " wor"]:
+                await client.publish("chat:1", {"type": "message", "content": token})
+            await client.publish("chat:2", {"type": "message", "content": "other"})
+            await client.publish("chat:1", {"type": "status", "content": "thinking"})
+            await client.publish("chat:1", {"type": "message", "content": "ld"})
+            await client.broadcast(["a", "b"], {"type": "notice"})
+            await client.flush()
+
+        asyncio.run(run())
+
+        request, body = client.requests[0]
+        assert len(client.requests) == 1
+        assert request.url.path == "/api/batch"
+        assert [c.get("publish", c.get("broadcast"))["data"] for c in body["commands"]] == [
+            {"type": "message", "content": "Hello wor"},
+            {"type": "message", "content": "other"},
+            {"type": "status", "content": "thinking"},
+            {"type": "message", "content": "ld"},
+            {"type": "notice"},
+        ]
+        assert client.stats["merged"] == 2
+        assert client.stats["published"] == 5
+
+    def test_background_sender_batches_within_frame(self):
+        client = make_client(frame_interval=0.01, batch_size=2)
+
+        async def run():
+            for i in range(3):
+                await client.publish(f"customer:{i}:tasks", {"type": "task_update", "n": i})
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+
+        assert [len(body["commands"]) for _, body in client.requests] == [2, 1]
+        assert client.get_stats()["queued"] == 0
+
+    def test_full_queue_drops_tokens_first(self):
+        client = make_client(frame_interval=60, max_queue=2)
+        client._ensure_sender = lambda: None
+
+        client.publish_nowait("chat:1", {"type": "message", "content": "a"})
+        client.publish_nowait("chat:2", {"type": "task_update"})
+        # Full: incoming token is dropped
+        client.publish_nowait("chat:3", {"type": "message", "content": "b"})
+        # Full: a non-token event evicts the queued token frame
+        client.publish_nowait("chat:4", {"type": "task_update"})
+
+        assert client.stats["dropped"] == 2
+        assert [e["command"]["publish"]["channel"] for e in client._queue] == ["chat:2", "chat:4"]
+        # The evicted frame can no longer be merged into
+        client.publish_nowait("chat:1", {"type": "message", "content": "c"})
+        assert client.stats["merged"] == 0
@@ -0,0 +1,65 @@
+"""
+Test suite for the sliding-window DelegationCircuitBreaker:
+- Depth limit
+- Redis Lua script keys / arguments
+- Local fallback sliding window
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.circuit_breaker import DelegationCircuitBreaker
+
+
+def make_breaker(redis_client=None):
+    breaker = DelegationCircuitBreaker()
+    breaker._redis_client = AsyncMock(return_value=redis_client)
+    return breaker
+
+
+class TestDelegationCircuitBreaker:
+
+    def test_depth_limit(self):
+        breaker = make_breaker()
+        allowed, reason = asyncio.run(breaker.check_and_record("wf", "cust", "agent", 6))
+        assert not allowed and "depth" in reason
+
+    def test_redis_script_is_shared_sliding_window(self):
+        script = AsyncMock(side_effect=[[1, 0, 1], [0, 2, 50]])
+        client = MagicMock()
+        client.register_script.return_value = script
+        breaker = make_breaker(client)
+
+        first = asyncio.run(breaker.check_and_record("wf-1", "cust-1", "seo-specialist", 1))
+        second = asyncio.run(breaker.check_and_record("wf-1", "cust-1", "seo-specialist", 1))
+
+        assert first == (True, None)
+        assert second[0] is False and "seo-specialist" in second[1]
+        client.register_script.assert_called_once()
+
+        call = script.await_args_list[0].kwargs
+        assert call["keys"] == ["delegation_cb:customer:cust-1", "delegation_cb:agent:seo-specialist"]
+        now_ms, window_ms, customer_limit, agent_limit, member = call["args"]
+        assert window_ms == 3600 * 1000
+        assert (customer_limit, agent_limit) == (100, 50)
+        # Members are unique even for the same workflow
+        assert member != script.await_args_list[1].kwargs["args"][4]
+
+    def test_local_fallback_slides_instead_of_resetting(self):
+        breaker = make_breaker(redis_client=None)
+        breaker.MAX_CUSTOMER_DELEGATIONS = 2
+
+        with patch("app.core.circuit_breaker.time.time", return_value=1000.0):
+            assert asyncio.run(breaker.check_and_record("wf", "cust", "a", 0))[0]
+        with patch("app.core.circuit_breaker.time.time", return_value=2000.0):
+            assert asyncio.run(breaker.check_and_record("wf", "cust", "a", 0))[0]
+            allowed, reason = asyncio.run(breaker.check_and_record("wf", "cust", "a", 0))
+            assert not allowed and "Customer" in reason
+
+        # The first delegation has left the window; the second hasn't
+        with patch("app.core.circuit_breaker.time.time", return_value=1000.0 + 3600.5):
+            assert asyncio.run(breaker.check_and_record("wf", "cust", "a", 0))[0]
+            assert not asyncio.run(breaker.check_and_record("wf", "cust", "a", 0))[0]
+            stats = asyncio.run(breaker.get_stats("cust", "a"))
+
+        assert stats["backend"] == "local"
+        assert stats["customer_count"] == 2
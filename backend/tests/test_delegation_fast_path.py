@@ -0,0 +1,122 @@
+"""
+Test suite for the delegation fast path:
+- Task fingerprint / team composition keys, scoped per customer
+- Local keyword classifier
+- Cache -> fast path -> LLM precedence in the decision activity
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.core.tiered_cache import TieredCache
+from app.services.delegation_fast_path import (
+    classify_delegation,
+    cached_decision,
+    decision_cache_key,
+    is_cacheable,
+    task_fingerprint,
+    team_composition_hash,
+)
+from app.temporal import activities
+
+TEAM = [
+    {"agent_type": "marketing-manager", "ve_details": {"role": "Marketing Manager", "department": "Marketing"}},
+    {"agent_type": "devops-engineer", "ve_details": {"role": "DevOps Engineer", "department": "Engineering"}},
+]
+
+
+class FakeRedisService:
+    """Stand-in for RedisQueueService cache helpers"""
+
+    def __init__(self):
+        self.store = {}
+        self.redis_client = None
+
+    async def get_cache(self, key):
+        return self.store.get(key)
+
+    async def set_cache(self, key, value, expire_seconds=None):
+        self.store[key] = value
+        return True
+
+
+class TestKeys:
+
+    def test_fingerprint_ignores_case_and_punctuation_only(self):
+        assert task_fingerprint("Write a blog post!") == task_fingerprint("write a BLOG   post")
+        assert task_fingerprint("Write a blog post") != task_fingerprint("Fix the server")
+        assert task_fingerprint("Write a blog post", "shorter") != task_fingerprint("Write a blog post")
+        # Numbers, short words and word order matter
+        assert task_fingerprint("Q3 2024 report") != task_fingerprint("Q4 2025 report")
+        assert task_fingerprint("migrate A to B") != task_fingerprint("migrate B to A")
+
+    def test_key_is_scoped_per_customer(self):
+        assert decision_cache_key("c1", "ops", "Fix it", TEAM) != decision_cache_key("c2", "ops", "Fix it", TEAM)
+
+    def test_team_hash_is_order_independent(self):
+        assert team_composition_hash(TEAM) == team_composition_hash(list(reversed(TEAM)))
+        assert team_composition_hash(TEAM) != team_composition_hash(TEAM[:1])
+
+    def test_only_real_decisions_are_cacheable(self):
+        assert is_cacheable({"action": "delegate", "reason": "best fit"})
+        assert not is_cacheable({"action": "clarify", "reason": "unclear"})
+        assert not is_cacheable({"action": "handle", "reason": "Fallback: invalid JSON"})
+        assert not is_cacheable({"action": "parallel", "subtasks": [{"description": "order #123"}]})
+
+    def test_only_routing_is_stored(self):
+        decision = {"action": "delegate", "delegated_to": "devops-engineer", "reason": "Order #123 is broken"}
+        assert cached_decision(decision) == {"action": "delegate", "delegated_to": "devops-engineer"}
+
+
+class TestClassifier:
+
+    def test_delegates_to_clear_winner(self):
+        decision = classify_delegation("marketing-manager", "Fix the deploy pipeline bug on the server", TEAM)
+        assert decision["action"] == "delegate"
+        assert decision["delegated_to"] == "devops-engineer"
+        assert decision["confidence"] >= 0.8
+
+    def test_handles_own_domain(self):
+        decision = classify_delegation("marketing-manager", "Write a social campaign blog post", TEAM)
+        assert decision["action"] == "handle"
+
+    def test_no_match_returns_none(self):
+        assert classify_delegation("marketing-manager", "Organize the offsite", TEAM) is None
+
+
+class TestDecisionActivity:
+
+    def run_activity(self, cache, llm, task, customer_id="customer-1"):
+        with patch("app.services.delegation_fast_path.decision_cache", cache), \
+             patch.object(activities, "_decide_delegation_with_llm", llm), \
+             patch("app.services.delegation_fast_path.record_decision_source"):
+            return asyncio.run(activities.analyze_and_decide_delegation_activity(
+                "marketing-manager", task, {"customer_id": customer_id}, TEAM
+            ))
+
+    def make_cache(self):
+        cache = TieredCache("delegation-test", local_maxsize=10, local_ttl=30, redis_ttl=60)
+        cache._redis = AsyncMock(return_value=FakeRedisService())
+        return cache
+
+    def test_ambiguous_task_goes_to_llm_once_then_hits_cache(self):
+        cache = self.make_cache()
+        llm = AsyncMock(return_value={"action": "handle", "delegated_to": None, "reason": "mine"})
+
+        first = self.run_activity(cache, llm, "Plan the quarterly offsite")
+        second = self.run_activity(cache, llm, "plan the QUARTERLY offsite.")
+
+        assert llm.await_count == 1
+        assert first["action"] == second["action"] == "handle"
+        assert second["method"] == "cache"
+        assert second["reason"] != "mine"
+
+        # Another customer with the same team and task asks the LLM itself
+        self.run_activity(cache, llm, "Plan the quarterly offsite", customer_id="customer-2")
+        assert llm.await_count == 2
+
+    def test_confident_fast_path_skips_llm(self):
+        llm = AsyncMock()
+        decision = self.run_activity(self.make_cache(), llm, "Fix the deploy pipeline bug on the server")
+
+        assert decision["method"] == "fast_path"
+        llm.assert_not_awaited()
@@ -0,0 +1,126 @@
+"""
+Test suite for the content-addressed embedding cache:
+- Packed byte storage and key layout
+- Local / Redis tiers and hit-rate counters
+- EmbeddingsService only calls the provider on misses
+- Vectors cached at another EMBEDDING_DIMENSIONS are never served
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embeddings_service import EmbeddingsService
+
+
+class FakeBytesRedisService:
+    """Stand-in for RedisQueueService byte helpers"""
+
+    def __init__(self):
+        self.store = {}
+        self.redis_client = None
+
+    async def get_bytes_many(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    async def set_bytes_many(self, items, expire_seconds=None):
+        self.store.update(items)
+        return True
+
+
+def make_cache(dtype="float32"):
+    cache = EmbeddingCache(dtype=dtype, namespace="emb-test", local_maxsize=10, local_ttl=30, redis_ttl=60)
+    cache.fake = FakeBytesRedisService()
+    cache._redis = AsyncMock(return_value=cache.fake)
+    return cache
+
+
+class TestEmbeddingCache:
+
+    def test_key_is_content_addressed(self):
+        cache = make_cache()
+        a = cache.make_key("openai", "text-embedding-3-small", 768, "hello")
+        assert a == cache.make_key("openai", "text-embedding-3-small", 768, "hello")
+        assert a != cache.make_key("gemini", "text-embedding-3-small", 768, "hello")
+        assert a != cache.make_key("openai", "text-embedding-3-small", 768, "hello!")
+        # Vectors of another output size are never served
+        assert a != cache.make_key("openai", "text-embedding-3-small", 1536, "hello")
+
+    def test_stores_packed_bytes_and_falls_back_to_redis(self):
+        cache = make_cache()
+        vector = [0.25, -0.5, 1.0]
+
+        asyncio.run(cache.set("k", vector))
+        stored = cache.fake.store["emb-test:k"]
+        assert isinstance(stored, bytes) and len(stored) == 3 * 4
+
+        cache.local.clear()
+        assert asyncio.run(cache.get("k")) == vector
+        assert asyncio.run(cache.get("k")) == vector
+        assert asyncio.run(cache.get("missing")) is None
+
+        stats = cache.get_stats()
+        assert (stats["redis_hits"], stats["local_hits"], stats["misses"]) == (1, 1, 1)
+
+    def test_float16_halves_storage(self):
+        cache = make_cache("float16")
+        asyncio.run(cache.set("k", [0.1] * 768))
+
+        assert len(cache.fake.store["emb-test:k"]) == 768 * 2
+        cache.local.clear()
+        assert np.allclose(asyncio.run(cache.get("k")), [0.1] * 768, atol=1e-3)
+
+
+class TestEmbeddingsServiceCaching:
+
+    @pytest.fixture
+    def service(self):
+        service = EmbeddingsService()
+        service.provider = "openai"
+        return service
+
+    def test_single_embedding_calls_provider_once(self, service):
+        cache = make_cache()
+        provider = AsyncMock(return_value=[0.5, 0.5])
+
+        with patch("app.services.embeddings_service.embedding_cache", cache), \
+             patch.object(service, "_generate_openai_embedding", provider):
+            first = asyncio.run(service.generate_embedding("same text"))
+            second = asyncio.run(service.generate_embedding("same text"))
+
+        assert first == second == [0.5, 0.5]
+        assert provider.await_count == 1
+
+    def test_changing_dimensions_misses_old_vectors(self, service):
+        cache = make_cache()
+        provider = AsyncMock(side_effect=[[0.5, 0.5], [0.5, 0.5, 0.5]])
+
+        with patch("app.services.embeddings_service.embedding_cache", cache), \
+             patch.object(service, "_generate_openai_embedding", provider):
+            service.dimensions = 2
+            asyncio.run(service.generate_embedding("same text"))
+            service.dimensions = 3
+            resized = asyncio.run(service.generate_embedding("same text"))
+
+        assert resized == [0.5, 0.5, 0.5]
+        assert provider.await_count == 2
+
+    def test_batch_sends_only_misses_and_skips_failed_fallbacks(self, service):
+        cache = make_cache()
+        provider = AsyncMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+
+        with patch("app.services.embeddings_service.embedding_cache", cache), \
+             patch.object(service, "_generate_openai_embeddings_batch", provider):
+            asyncio.run(service.generate_embeddings_batch(["a", "bb"]))
+            result = asyncio.run(service.generate_embeddings_batch(["a", "bb", "ccc"]))
+
+            assert result == [[1.0], [2.0], [3.0]]
+            assert provider.call_args_list[1].args[0] == ["ccc"]
+
+            # Mock fallbacks from a failed provider call are not cached
+            provider.side_effect = Exception("rate limited")
+            asyncio.run(service.generate_embeddings_batch(["dddd"]))
+
+        assert len(cache.fake.store) == 3
@@ -0,0 +1,129 @@
+"""
+Test suite for knowledge similarity search:
+- NumPy ranking (top-k, threshold, pgvector string parsing)
+- RPC path and fallback when the RPC is not deployed
+- Dimension mismatches are raised, not returned as "no results"
+- Providers are asked for EMBEDDING_DIMENSIONS and checked against it
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.core.config import settings
+from app.services.embeddings_service import EmbeddingDimensionError, EmbeddingsService, rank_by_similarity
+
+
+class TestRankBySimilarity:
+
+    def test_top_k_above_threshold_in_order(self):
+        rows = [
+            {"id": "a", "embeddings": [1.0, 0.0]},
+            {"id": "b", "embeddings": [0.7, 0.7]},
+            {"id": "c", "embeddings": [0.0, 1.0]},
+            {"id": "d", "embeddings": [0.9, 0.1]},
+        ]
+
+        results = rank_by_similarity([1.0, 0.0], rows, limit=2, similarity_threshold=0.5)
+
+        assert [r["id"] for r in results] == ["a", "d"]
+        assert results[0]["similarity"] > results[1]["similarity"]
+        assert "embeddings" not in results[0]
+
+    def test_parses_pgvector_strings_and_skips_bad_rows(self):
+        rows = [
+            {"id": "a", "embeddings": "[1,0]"},
+            {"id": "b", "embeddings": None},
+            {"id": "c", "embeddings": [1.0, 0.0, 0.0]},
+            {"id": "d", "embeddings": [0.0, 0.0]},
+        ]
+
+        results = rank_by_similarity([1.0, 0.0], rows, limit=5, similarity_threshold=0.0)
+
+        assert [r["id"] for r in results] == ["a", "d"]
+        assert results[1]["similarity"] == 0.0
+
+
+class TestSearchSimilarKnowledge:
+
+    def _service(self, supabase):
+        service = EmbeddingsService()
+        service.generate_embedding = AsyncMock(return_value=[1.0, 0.0])
+        patcher = patch(
+            "app.services.embeddings_service.get_async_supabase_admin",
+            AsyncMock(return_value=supabase)
+        )
+        return service, patcher
+
+    def test_uses_rpc_results(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": "a", "similarity": 0.9}]))
+        service, patcher = self._service(supabase)
+
+        with patcher:
+            results = asyncio.run(service.search_similar_knowledge("cust-1", "q", limit=3))
+
+        assert results == [{"id": "a", "similarity": 0.9}]
+        params = supabase.rpc.call_args.args[1]
+        assert params["match_customer_id"] == "cust-1"
+        assert params["match_count"] == 3
+        supabase.table.assert_not_called()
+
+    def test_falls_back_when_rpc_missing(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute = AsyncMock(
+            side_effect=APIError({"code": "PGRST202", "message": "function not found"})
+        )
+        supabase.table.return_value.select.return_value.eq.return_value.execute = AsyncMock(
+            return_value=MagicMock(data=[{"id": "a", "embeddings": "[1,0]"}])
+        )
+        service, patcher = self._service(supabase)
+
+        with patcher:
+            first = asyncio.run(service.search_similar_knowledge("cust-1", "q"))
+            asyncio.run(service.search_similar_knowledge("cust-1", "q"))
+
+        assert [r["id"] for r in first] == ["a"]
+        # RPC is not retried once known to be missing
+        assert supabase.rpc.call_count == 1
+        assert "embeddings" in supabase.table.return_value.select.call_args.args[0]
+
+    def test_dimension_mismatch_is_raised(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute = AsyncMock(
+            side_effect=APIError({"code": "22000", "message": "expected 768 dimensions, not 1536"})
+        )
+        service, patcher = self._service(supabase)
+
+        with patcher, pytest.raises(EmbeddingDimensionError, match="expected 768 dimensions"):
+            asyncio.run(service.search_similar_knowledge("cust-1", "q"))
+        assert service._rpc_available is True
+
+
+class TestProviderDimensions:
+
+    def _openai(self, vector_size):
+        service = EmbeddingsService()
+        service.provider = "openai"
+        client = MagicMock()
+        response = MagicMock()
+        response.json.return_value = {"data": [{"index": 0, "embedding": [0.0] * vector_size}]}
+        client.post = AsyncMock(return_value=response)
+        pool = MagicMock()
+        pool.get_client.return_value = client
+        return service, client, patch("app.services.embeddings_service.get_http_pool", return_value=pool)
+
+    def test_openai_is_asked_for_configured_dimensions(self):
+        service, client, patcher = self._openai(settings.EMBEDDING_DIMENSIONS)
+        with patcher:
+            embeddings = asyncio.run(service._generate_openai_embeddings_batch(["a"]))
+        assert client.post.await_args.kwargs["json"]["dimensions"] == settings.EMBEDDING_DIMENSIONS
+        assert len(embeddings[0]) == settings.EMBEDDING_DIMENSIONS
+
+    def test_wrong_size_is_an_error_not_a_mock_fallback(self):
+        service, _, patcher = self._openai(1536)
+        cache = MagicMock(get_many=AsyncMock(return_value=[None]), make_key=lambda *parts: "k")
+        with patcher, patch("app.services.embeddings_service.embedding_cache", cache), \
+             pytest.raises(EmbeddingDimensionError):
+            asyncio.run(service.generate_embeddings_batch(["a"]))
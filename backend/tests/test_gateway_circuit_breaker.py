@@ -0,0 +1,178 @@
+"""
+Test suite for the keyed gateway CircuitBreaker (local state, no Redis):
+- Opens on failure rate over the rolling window, after min_calls
+- Old buckets fall out of the window
+- HALF_OPEN admits a limited number of probes; probe outcome closes / re-opens
+- Keys are isolated
+- Async generators are guarded (acquire on first item, record on completion)
+- Redis scripts receive the breaker keys
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.resilience import CircuitBreaker, CircuitBreakerOpenException
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(**kwargs):
+    options = dict(
+        name="test", key_func=lambda a: a["agent_type"], failure_rate_threshold=0.5,
+        min_calls=4, window_seconds=60, recovery_timeout=30, half_open_max_calls=1
+    )
+    options.update(kwargs)
+    breaker = CircuitBreaker(**options)
+    breaker._redis = AsyncMock(return_value=None)
+    return breaker
+
+
+async def run(breaker, key, outcomes):
+    for ok in outcomes:
+        probe = await breaker.acquire(key)
+        await breaker.record(key, ok, probe)
+
+
+class TestGatewayCircuitBreaker:
+
+    def test_opens_on_failure_rate_after_min_calls(self):
+        breaker = make_breaker()
+        clock = Clock()
+
+        async def scenario():
+            await run(breaker, "seo", [False, False, False])  # below min_calls
+            await breaker.acquire("seo")
+            await run(breaker, "seo", [True])  # 3/4 failed
+            with pytest.raises(CircuitBreakerOpenException):
+                await breaker.acquire("seo")
+
+        with patch("app.core.resilience.time.time", clock):
+            asyncio.run(scenario())
+
+    def test_rate_below_threshold_stays_closed(self):
+        breaker = make_breaker()
+        with patch("app.core.resilience.time.time", Clock()):
+            asyncio.run(run(breaker, "seo", [True, True, True, False, True, False]))
+            states = asyncio.run(breaker.get_states())
+        assert states["seo"]["state"] == "CLOSED"
+        assert states["seo"]["calls"] == 6 and states["seo"]["failures"] == 2
+
+    def test_old_buckets_leave_the_window(self):
+        breaker = make_breaker()
+        clock = Clock()
+        with patch("app.core.resilience.time.time", clock):
+            asyncio.run(run(breaker, "seo", [False, False, False]))
+            clock.now += 120
+            asyncio.run(run(breaker, "seo", [False, True, True, True]))
+            states = asyncio.run(breaker.get_states())
+        assert states["seo"]["state"] == "CLOSED"
+
+    def test_half_open_limits_probes_and_closes_on_success(self):
+        breaker = make_breaker()
+        clock = Clock()
+
+        async def scenario():
+            await run(breaker, "seo", [False] * 4)
+            clock.now += 31
+            probe = await breaker.acquire("seo")
+            assert probe is True
+            # Second caller while the probe is in flight fails fast
+            with pytest.raises(CircuitBreakerOpenException):
+                await breaker.acquire("seo")
+            assert await breaker.record("seo", True, probe) == "CLOSED"
+            assert await breaker.acquire("seo") is False
+
+        with patch("app.core.resilience.time.time", clock):
+            asyncio.run(scenario())
+
+    def test_failed_probe_reopens(self):
+        breaker = make_breaker()
+        clock = Clock()
+
+        async def scenario():
+            await run(breaker, "seo", [False] * 4)
+            clock.now += 31
+            probe = await breaker.acquire("seo")
+            assert await breaker.record("seo", False, probe) == "OPEN"
+            clock.now += 10
+            with pytest.raises(CircuitBreakerOpenException):
+                await breaker.acquire("seo")
+
+        with patch("app.core.resilience.time.time", clock):
+            asyncio.run(scenario())
+
+    def test_keys_are_isolated(self):
+        breaker = make_breaker()
+        with patch("app.core.resilience.time.time", Clock()):
+            asyncio.run(run(breaker, "seo", [False] * 4))
+            assert asyncio.run(breaker.acquire("legal")) is False
+            with pytest.raises(CircuitBreakerOpenException):
+                asyncio.run(breaker.acquire("seo"))
+
+    def test_async_generator_is_guarded(self):
+        breaker = make_breaker()
+
+        @breaker
+        async def stream(agent_type, fail=False):
+            yield "a"
+            if fail:
+                raise ConnectionError("gateway down")
+            yield "b"
+
+        async def consume(**kwargs):
+            return [item async for item in stream(**kwargs)]
+
+        async def scenario():
+            assert await consume(agent_type="seo") == ["a", "b"]
+            for _ in range(3):
+                with pytest.raises(ConnectionError):
+                    await consume(agent_type="seo", fail=True)
+            with pytest.raises(CircuitBreakerOpenException):
+                await consume(agent_type="seo")
+            assert await consume(agent_type="legal") == ["a", "b"]
+
+        with patch("app.core.resilience.time.time", Clock()):
+            asyncio.run(scenario())
+
+    def test_abandoned_stream_releases_probe(self):
+        breaker = make_breaker()
+        clock = Clock()
+
+        @breaker
+        async def stream(agent_type):
+            yield "a"
+            yield "b"
+
+        async def scenario():
+            await run(breaker, "seo", [False] * 4)
+            clock.now += 31
+            gen = stream(agent_type="seo")
+            assert await gen.__anext__() == "a"
+            await gen.aclose()
+            # No verdict: the slot is free for the next probe
+            assert await breaker.acquire("seo") is True
+
+        with patch("app.core.resilience.time.time", clock):
+            asyncio.run(scenario())
+
+    def test_redis_scripts_use_breaker_keys(self):
+        acquire_script = AsyncMock(return_value=[1, "CLOSED"])
+        record_script = AsyncMock(return_value="CLOSED")
+        client = MagicMock()
+        client.register_script.side_effect = [acquire_script, record_script]
+        breaker = make_breaker()
+        breaker._redis = CircuitBreaker._redis.__get__(breaker)
+
+        redis_service = MagicMock(redis_client=client)
+        with patch("app.services.redis_queue_service.get_redis_queue_service", AsyncMock(return_value=redis_service)):
+            asyncio.run(run(breaker, "seo", [True]))
+
+        assert acquire_script.await_args.kwargs["keys"] == ["cb:test:seo"]
+        assert record_script.await_args.kwargs["keys"] == ["cb:test:seo", "cb:test:seo:window", "cb:test:keys"]
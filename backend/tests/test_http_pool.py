@@ -0,0 +1,74 @@
+"""
+Test suite for shared HTTP connection pools:
+- One client per base URL
+- In-flight / wait-time accounting
+- Graceful close
+"""
+import asyncio
+import httpx
+from app.core.http_pool import HTTPClientPool, InstrumentedTransport
+
+
+class TestHTTPClientPool:
+    """Test pooled client registry"""
+
+    def test_same_url_reuses_client(self):
+        pool = HTTPClientPool()
+        a = pool.get_client("http://gateway-a:8080")
+        b = pool.get_client("http://gateway-a:8080")
+        c = pool.get_client("http://gateway-b:8080")
+
+        assert a is b
+        assert a is not c
+        assert set(pool.get_stats()) == {"http://gateway-a:8080", "http://gateway-b:8080"}
+
+    def test_close_all_recreates_on_next_use(self):
+        pool = HTTPClientPool()
+        first = pool.get_client("http://gateway:8080")
+        asyncio.run(pool.close_all())
+
+        assert first.is_closed
+        assert pool.get_stats() == {}
+        assert pool.get_client("http://gateway:8080") is not first
+
+
+class TestInstrumentedTransport:
+    """Test request accounting on the wrapped transport"""
+
+    def test_stream_counts_in_flight_until_closed(self):
+        class SSEStream(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                yield b"data: ok\n"
+
+        class StreamingTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                return httpx.Response(200, stream=SSEStream())
+
+        transport = InstrumentedTransport("test", StreamingTransport())
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                async with client.stream("POST", "/") as response:
+                    assert transport.in_flight == 1
+                    await response.aread()
+                assert transport.in_flight == 0
+
+        asyncio.run(run())
+        assert transport.total_requests == 1
+        assert transport.max_wait_seconds >= 0
+
+    def test_failed_request_releases_slot(self):
+        def fail(request):
+            raise httpx.ConnectError("refused")
+
+        transport = InstrumentedTransport("test", httpx.MockTransport(fail))
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                try:
+                    await client.get("/")
+                except httpx.ConnectError:
+                    pass
+
+        asyncio.run(run())
+        assert transport.in_flight == 0
@@ -0,0 +1,92 @@
+"""
+Test suite for the watch-driven KAgent CRD index:
+- Agent / MCPServer events update the name, namespace and tool indexes
+- Reads come from the index without Kubernetes API calls
+- List views are reused until the next change
+- An informer relist feeds the index
+"""
+import asyncio
+from unittest.mock import MagicMock
+
+from app.core.k8s_informer import ResourceInformer
+from app.services.kagent_service import KAgentService
+
+
+def agent(name, tools=(), namespace="kagent", version="1"):
+    return {
+        "metadata": {"name": name, "namespace": namespace, "resourceVersion": version},
+        "spec": {"description": f"{name} agent", "tools": [{"type": "McpServer", "toolNames": list(tools)}]},
+    }
+
+
+def mcp(name, tools=(), namespace="kagent"):
+    return {"metadata": {"name": name, "namespace": namespace}, "spec": {"tools": list(tools)}}
+
+
+def make_service():
+    service = KAgentService()
+    service.k8s_api = MagicMock()
+    service._ensure_started = lambda: None
+    return service
+
+
+class TestKAgentIndex:
+
+    def test_events_maintain_indexes(self):
+        service = make_service()
+        service._on_agent_event("ADDED", agent("writer", ["send_email"]), None)
+        service._on_agent_event("ADDED", agent("seo", ["send_email", "crawl"], namespace="other"), None)
+
+        async def run():
+            found = await service.find_agents(tool="send_email")
+            detail = await service.get_agent("writer")
+            in_other = await service.list_agents(namespace="other")
+            return found, detail, in_other
+
+        found, detail, in_other = asyncio.run(run())
+        assert [a["name"] for a in found] == ["writer", "seo"]
+        assert detail["spec"]["description"] == "writer agent"
+        assert [a["name"] for a in in_other] == ["seo"] and "spec" not in in_other[0]
+        assert service.k8s_api.method_calls == []
+
+    def test_modify_and_delete_update_tool_index(self):
+        service = make_service()
+        service._on_agent_event("ADDED", agent("writer", ["send_email"]), None)
+        service._on_agent_event("MODIFIED", agent("writer", ["post_social"], version="2"), None)
+        assert "send_email" not in service._agents_by_tool
+        assert service._agents_by_tool["post_social"] == {"kagent/writer"}
+
+        service._on_agent_event("DELETED", agent("writer", ["post_social"]), None)
+        assert service._agents == {} and service._agents_by_tool == {} and service._agents_by_name == {}
+        assert asyncio.run(service.get_agent("writer")) is None
+
+    def test_views_reused_until_change(self):
+        service = make_service()
+        service._on_mcp_event("ADDED", mcp("email-mcp", ["send_email", "read_inbox"]), None)
+
+        async def tools():
+            return await service.list_tools()
+
+        first, second = asyncio.run(tools()), asyncio.run(tools())
+        assert first is second
+        assert [t["name"] for t in first] == ["send_email", "read_inbox"]
+
+        service._on_mcp_event("ADDED", mcp("calendar-mcp", ["create_event"]), None)
+        third = asyncio.run(tools())
+        assert third is not first and len(third) == 3
+
+    def test_informer_relist_feeds_index(self):
+        service = make_service()
+        api = MagicMock()
+        api.list_cluster_custom_object.return_value = {
+            "items": [agent("writer"), agent("seo")], "metadata": {"resourceVersion": "5"}
+        }
+        informer = ResourceInformer(api, "kagent.dev", "v1alpha2", "agents")
+        informer.add_handler(service._on_agent_event)
+        service._informers = [informer]
+
+        async def run():
+            await informer._relist()
+            return await service.list_agents()
+
+        assert [a["name"] for a in asyncio.run(run())] == ["seo", "writer"]
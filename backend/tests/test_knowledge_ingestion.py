@@ -0,0 +1,143 @@
+"""
+Test suite for batch embeddings and bulk knowledge ingestion:
+- Chunking
+- Provider batching with preserved order
+- Pipelined embed -> multi-row insert with progress events
+- A failed stage cancels the other; provider failures never store mock vectors
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.embeddings_service import EmbeddingsService, chunk_text
+
+
+class TestChunkText:
+
+    def test_short_text_is_single_chunk(self):
+        assert chunk_text("hello world", chunk_size=100) == ["hello world"]
+        assert chunk_text("   ", chunk_size=100) == []
+
+    def test_long_text_splits_on_words_with_overlap(self):
+        text = " ".join(f"word{i}" for i in range(500))
+        chunks = chunk_text(text, chunk_size=300, overlap=50)
+
+        assert len(chunks) > 1
+        assert all(len(c) <= 300 for c in chunks)
+        # Words are never cut in half
+        assert all(c.split()[-1].startswith("word") for c in chunks)
+        # Consecutive chunks overlap
+        assert chunks[0].split()[-1] in chunks[1]
+
+
+class TestGenerateEmbeddingsBatch:
+
+    def test_batches_to_provider_limit_and_keeps_order(self):
+        service = EmbeddingsService()
+        calls = []
+
+        async def fake_batch(texts):
+            calls.append(len(texts))
+            await asyncio.sleep(0.001 * (5 - len(calls)))  # finish out of order
+            return [[float(t)] for t in texts]
+
+        service._embed_batch = fake_batch
+        texts = [str(i) for i in range(10)]
+
+        result = asyncio.run(service.generate_embeddings_batch(texts, batch_size=3, concurrency=2))
+
+        assert calls == [3, 3, 3, 1]
+        assert result == [[float(i)] for i in range(10)]
+
+
+class TestIngestKnowledge:
+
+    def test_pipeline_inserts_all_chunks_in_multi_row_batches(self):
+        service = EmbeddingsService()
+        service._embed_batch = AsyncMock(side_effect=lambda texts, fallback=True: [[0.1, 0.2] for _ in texts])
+
+        supabase = MagicMock()
+        insert = supabase.table.return_value.insert
+        insert.return_value.execute = AsyncMock()
+
+        items = [{"content": f"document {i}", "metadata": {"source": f"doc-{i}"}} for i in range(25)]
+
+        async def collect():
+            return [e async for e in service.ingest_knowledge("cust-1", items)]
+
+        with patch("app.services.embeddings_service.get_async_supabase_admin", AsyncMock(return_value=supabase)), \
+             patch("app.services.embeddings_service.settings.KNOWLEDGE_INSERT_BATCH_SIZE", 10):
+            events = asyncio.run(collect())
+
+        assert events[0]["stage"] == "chunked"
+        assert events[-1] == {"type": "complete", "chunks_total": 25, "rows_inserted": 25}
+        assert [len(c.args[0]) for c in insert.call_args_list] == [10, 10, 5]
+
+        row = insert.call_args_list[0].args[0][0]
+        assert row["customer_id"] == "cust-1"
+        assert row["metadata"]["source"] == "doc-0"
+        assert row["embeddings"] == [0.1, 0.2]
+
+    def test_insert_failure_reports_error_event(self):
+        service = EmbeddingsService()
+        service._embed_batch = AsyncMock(side_effect=lambda texts, fallback=True: [[0.1] for _ in texts])
+
+        supabase = MagicMock()
+        supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=Exception("db down"))
+
+        async def collect():
+            return [e async for e in service.ingest_knowledge("cust-1", [{"content": "a"}])]
+
+        with patch("app.services.embeddings_service.get_async_supabase_admin", AsyncMock(return_value=supabase)):
+            events = asyncio.run(collect())
+
+        assert events[-1]["type"] == "error"
+        assert "db down" in events[-1]["content"]
+
+    def test_insert_failure_cancels_embedding(self):
+        service = EmbeddingsService()
+        embedding_calls = []
+
+        async def slow_embed(texts, fallback=True):
+            embedding_calls.append(len(texts))
+            await asyncio.sleep(0 if len(embedding_calls) == 1 else 10)
+            return [[0.1] for _ in texts]
+
+        service._embed_batch = slow_embed
+        service._batch_limit = lambda: 1
+
+        supabase = MagicMock()
+        supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=Exception("db down"))
+        items = [{"content": f"document {i}"} for i in range(5)]
+
+        async def collect():
+            events = [e async for e in service.ingest_knowledge("cust-1", items)]
+            await asyncio.sleep(0)
+            others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task() and not t.done()]
+            return events, others
+
+        with patch("app.services.embeddings_service.get_async_supabase_admin", AsyncMock(return_value=supabase)), \
+             patch("app.services.embeddings_service.settings.KNOWLEDGE_INSERT_BATCH_SIZE", 1):
+            events, leftover = asyncio.run(collect())
+
+        assert events[-1]["type"] == "error" and events[-1]["content"] == "db down"
+        assert leftover == []
+
+    def test_provider_failure_is_an_error_not_mock_vectors(self):
+        service = EmbeddingsService()
+        service.provider = "openai"
+        service._generate_openai_embeddings_batch = AsyncMock(side_effect=Exception("rate limited"))
+
+        supabase = MagicMock()
+        insert = supabase.table.return_value.insert
+        insert.return_value.execute = AsyncMock()
+
+        async def collect():
+            return [e async for e in service.ingest_knowledge("cust-1", [{"content": "a"}])]
+
+        cache = MagicMock(get_many=AsyncMock(return_value=[None]), make_key=lambda *parts: "k")
+        with patch("app.services.embeddings_service.get_async_supabase_admin", AsyncMock(return_value=supabase)), \
+             patch("app.services.embeddings_service.embedding_cache", cache):
+            events = asyncio.run(collect())
+
+        assert events[-1]["type"] == "error" and "rate limited" in events[-1]["content"]
+        insert.assert_not_called()
@@ -0,0 +1,45 @@
+"""
+Test suite for parallel delegation fan-out helpers:
+- Subtask normalization
+- Failure policies (fail-fast, best-effort, quorum)
+"""
+from app.temporal.workflows import normalize_subtasks, parallel_verdict
+
+
+class TestNormalizeSubtasks:
+
+    def test_accepts_common_shapes(self):
+        subtasks = normalize_subtasks([
+            {"agent_type": "seo-specialist", "description": "Keyword research"},
+            {"assigned_to": "copywriter", "task": "Draft landing page"},
+            "Review analytics",
+            {"agent_type": "designer"},  # no description: dropped
+            42,
+        ], default_agent_type="marketing-manager")
+
+        assert subtasks == [
+            {"agent_type": "seo-specialist", "description": "Keyword research"},
+            {"agent_type": "copywriter", "description": "Draft landing page"},
+            {"agent_type": "marketing-manager", "description": "Review analytics"},
+        ]
+
+    def test_none_is_empty(self):
+        assert normalize_subtasks(None, "marketing-manager") == []
+
+
+class TestParallelVerdict:
+
+    def test_fail_fast_fails_on_first_failure(self):
+        assert parallel_verdict("fail_fast", succeeded=1, failed=0, total=3, quorum=2) is None
+        assert parallel_verdict("fail_fast", succeeded=1, failed=1, total=3, quorum=2) == "failed"
+        assert parallel_verdict("fail_fast", succeeded=3, failed=0, total=3, quorum=2) == "completed"
+
+    def test_best_effort_waits_for_all(self):
+        assert parallel_verdict("best_effort", succeeded=0, failed=2, total=3, quorum=2) is None
+        assert parallel_verdict("best_effort", succeeded=1, failed=2, total=3, quorum=2) == "completed"
+        assert parallel_verdict("best_effort", succeeded=0, failed=3, total=3, quorum=2) == "failed"
+
+    def test_quorum_decides_early(self):
+        assert parallel_verdict("quorum", succeeded=2, failed=0, total=4, quorum=2) == "completed"
+        assert parallel_verdict("quorum", succeeded=1, failed=1, total=4, quorum=3) is None
+        assert parallel_verdict("quorum", succeeded=0, failed=2, total=4, quorum=3) == "failed"
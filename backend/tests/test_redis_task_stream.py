@@ -0,0 +1,168 @@
+"""
+Test suite for the Redis Streams task queue:
+- Tasks are XADDed to per-priority streams with a wall-clock enqueue time
+- Reads never return more tasks than asked for, in total across priorities
+- Failed tasks are re-queued until out of attempts, then dead-lettered
+- Tasks of crashed consumers are reclaimed (XAUTOCLAIM) or dead-lettered
+- Held tasks have their idle time reset (XCLAIM JUSTID) without a new delivery
+"""
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.config import settings
+from app.services.redis_queue_service import RedisQueueService, TASK_CONSUMER_GROUP
+
+
+class FakePipeline:
+    """Records queued commands; execute() returns canned results"""
+
+    def __init__(self, results=None):
+        self.calls = []
+        self.results = results or []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        return self.results
+
+
+def make_service(pipeline=None):
+    service = RedisQueueService()
+    client = MagicMock()
+    for command in ("xadd", "xgroup_create", "xreadgroup", "xautoclaim", "xpending_range"):
+        setattr(client, command, AsyncMock())
+    client.rpop = AsyncMock(return_value=None)
+    pipeline = pipeline or FakePipeline()
+    client.pipeline = MagicMock(return_value=pipeline)
+    service.redis_client = client
+    return service, client, pipeline
+
+
+def entry(task_id, attempts=0):
+    return {"payload": json.dumps({"task_id": task_id, "customer_id": "c", "task_data": {}, "attempts": attempts})}
+
+
+class TestRedisTaskStream:
+
+    def test_enqueue_adds_to_priority_stream(self):
+        service, client, _ = make_service()
+
+        async def run():
+            await service.enqueue_task("t1", "c", {}, priority="high")
+            await service.enqueue_task("t2", "c", {}, priority="low")
+
+        asyncio.run(run())
+        # Group created once per priority stream
+        assert client.xgroup_create.await_count == 4
+        stream, fields = client.xadd.await_args_list[0].args
+        assert stream == "ve:tasks:stream:high"
+        assert abs(json.loads(fields["payload"])["enqueued_at"] - time.time()) < 60
+
+    def test_read_is_capped_in_total(self):
+        # Share reads: urgent has one entry left, low fills the rest
+        service, client, pipeline = make_service(FakePipeline(results=[
+            [["ve:tasks:stream:urgent", [("1-0", entry("urgent-1"))]]],
+            [["ve:tasks:stream:low", [("2-0", entry("low-1"))]]],
+        ]))
+        client.xreadgroup.return_value = [["ve:tasks:stream:low", [("2-1", entry("low-2"))]]]
+
+        tasks = asyncio.run(service.read_tasks(["urgent", "low"], count=3, shares={"urgent": 2, "low": 1}))
+        assert [(c[0], c[1][2], c[2]["count"]) for c in pipeline.calls] == [
+            ("xreadgroup", {"ve:tasks:stream:urgent": ">"}, 2),
+            ("xreadgroup", {"ve:tasks:stream:low": ">"}, 1),
+        ]
+        # Urgent is drained, so only low is asked for the one remaining slot
+        assert client.xreadgroup.await_count == 1
+        assert client.xreadgroup.await_args.args[2] == {"ve:tasks:stream:low": ">"}
+        assert client.xreadgroup.await_args.kwargs["count"] == 1
+        assert [t["task_id"] for t in tasks] == ["urgent-1", "low-1", "low-2"]
+        assert tasks[0]["attempt"] == 1
+
+    def test_blocking_read_surplus_is_put_back(self):
+        service, client, pipeline = make_service(FakePipeline(results=[[]]))
+        client.xreadgroup.side_effect = [
+            [],  # nothing without blocking
+            [
+                ["ve:tasks:stream:low", [("2-0", entry("low-1"))]],
+                ["ve:tasks:stream:urgent", [("1-0", entry("urgent-1"))]],
+            ],
+        ]
+
+        tasks = asyncio.run(service.read_tasks(["urgent", "low"], count=1))
+        group, consumer, streams = client.xreadgroup.await_args.args
+        assert group == TASK_CONSUMER_GROUP and streams == {"ve:tasks:stream:urgent": ">", "ve:tasks:stream:low": ">"}
+        assert [t["task_id"] for t in tasks] == ["urgent-1"]
+        # low-1 went back on its stream
+        assert [c[1][0] for c in pipeline.calls if c[0] == "xadd"] == ["ve:tasks:stream:low"]
+        assert ("xack", ("ve:tasks:stream:low", TASK_CONSUMER_GROUP, "2-0"), {}) in pipeline.calls
+
+    def test_failed_task_is_requeued_then_dead_lettered(self):
+        service, client, pipeline = make_service()
+        client.xreadgroup.return_value = [["ve:tasks:stream:medium", [("1-0", entry("t1"))]]]
+
+        async def run():
+            task = (await service.read_tasks(["medium"]))[0]
+            return await service.fail_task(task, "boom")
+
+        assert asyncio.run(run()) == "retry"
+        added = [c for c in pipeline.calls if c[0] == "xadd"]
+        assert added[0][1][0] == "ve:tasks:stream:medium"
+        assert json.loads(added[0][1][1]["payload"])["attempts"] == 1
+        assert ("xack", ("ve:tasks:stream:medium", TASK_CONSUMER_GROUP, "1-0"), {}) in pipeline.calls
+
+        pipeline.calls.clear()
+        last = settings.TASK_QUEUE_MAX_ATTEMPTS - 1
+        client.xreadgroup.return_value = [["ve:tasks:stream:medium", [("2-0", entry("t1", attempts=last))]]]
+
+        async def run_last():
+            task = (await service.read_tasks(["medium"]))[0]
+            return await service.fail_task(task, "boom")
+
+        assert asyncio.run(run_last()) == "dead"
+        added = [c for c in pipeline.calls if c[0] == "xadd"]
+        assert added[0][1][0] == service.task_dlq_name
+        assert json.loads(added[0][1][1]["payload"])["last_error"] == "boom"
+
+    def test_reclaim_stale_tasks(self):
+        service, client, pipeline = make_service()
+        client.xautoclaim.return_value = ["0-0", [("1-0", entry("fresh")), ("1-1", entry("spent"))], []]
+        client.xpending_range.return_value = [
+            {"message_id": "1-0", "times_delivered": 2},
+            {"message_id": "1-1", "times_delivered": settings.TASK_QUEUE_MAX_ATTEMPTS + 1},
+        ]
+
+        with patch.object(settings, "TASK_QUEUE_VISIBILITY_TIMEOUT", 30.0):
+            tasks = asyncio.run(service.reclaim_stale_tasks("medium"))
+        assert client.xautoclaim.await_args.kwargs["min_idle_time"] == 30000
+        assert [t["task_id"] for t in tasks] == ["fresh"]
+        assert tasks[0]["attempt"] == 2
+        # Out of attempts: moved to the dead-letter stream
+        assert [c[1][0] for c in pipeline.calls if c[0] == "xadd"] == [service.task_dlq_name]
+
+    def test_ack_removes_entry(self):
+        service, _, pipeline = make_service()
+        asyncio.run(service.ack_task({"task_id": "t1", "_stream": "s", "_entry_id": "1-0"}))
+        assert [c[0] for c in pipeline.calls] == ["xack", "xdel"]
+
+    def test_extend_resets_idle_time_per_stream(self):
+        service, _, pipeline = make_service(FakePipeline(results=[["1-0", "1-1"], ["2-0"]]))
+        held = [
+            {"task_id": "a", "_stream": "s1", "_entry_id": "1-0"},
+            {"task_id": "b", "_stream": "s2", "_entry_id": "2-0"},
+            {"task_id": "c", "_stream": "s1", "_entry_id": "1-1"},
+        ]
+
+        assert asyncio.run(service.extend_tasks(held)) == 3
+        assert [(c[0], c[1][0], c[2]["message_ids"], c[2]["justid"], c[2]["min_idle_time"]) for c in pipeline.calls] == [
+            ("xclaim", "s1", ["1-0", "1-1"], True, 0),
+            ("xclaim", "s2", ["2-0"], True, 0),
+        ]
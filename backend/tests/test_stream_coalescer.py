@@ -0,0 +1,91 @@
+"""
+Test suite for the token stream coalescer:
+- Frames on size / time thresholds, ordering around other events
+- Bounded read-ahead (backpressure)
+- SSE encoding
+"""
+import asyncio
+
+import pytest
+
+from app.services.stream_coalescer import coalesce_stream, sse_encode
+
+
+async def agent_stream(events, delay=0.0):
+    for event in events:
+        if delay:
+            await asyncio.sleep(delay)
+        yield event
+
+
+async def collect(gen):
+    return [e async for e in gen]
+
+
+def tokens(*chunks, type_="message"):
+    return [{"type": type_, "content": c} for c in chunks]
+
+
+class TestCoalesceStream:
+
+    def test_merges_chunks_and_keeps_order(self):
+        events = tokens("Hel", "lo") + [{"type": "tool_call", "name": "search"}] + tokens("a", "b", type_="artifact")
+
+        frames = asyncio.run(collect(coalesce_stream(agent_stream(events), max_chars=100, max_delay=10)))
+
+        assert frames == [
+            {"type": "message", "content": "Hello"},
+            {"type": "tool_call", "name": "search"},
+            {"type": "artifact", "content": "ab"},
+        ]
+
+    def test_flushes_on_size(self):
+        frames = asyncio.run(collect(coalesce_stream(agent_stream(tokens("aa", "bb", "cc")), max_chars=4, max_delay=10)))
+
+        assert [f["content"] for f in frames] == ["aabb", "cc"]
+
+    def test_flushes_on_time_when_upstream_is_slow(self):
+        frames = asyncio.run(collect(coalesce_stream(
+            agent_stream(tokens("a", "b", "c"), delay=0.05), max_chars=100, max_delay=0.01
+        )))
+
+        assert [f["content"] for f in frames] == ["a", "b", "c"]
+
+    def test_slow_consumer_limits_read_ahead(self):
+        produced = []
+
+        async def counting_stream():
+            for i in range(100):
+                produced.append(i)
+                yield {"type": "status", "n": i}
+
+        async def run():
+            stream = coalesce_stream(counting_stream(), max_buffer=5)
+            await stream.__anext__()
+            await asyncio.sleep(0.05)  # consumer stalls
+            in_flight = len(produced)
+            await stream.aclose()
+            return in_flight
+
+        # One delivered + queue capacity + one blocked in put()
+        assert asyncio.run(run()) <= 7
+
+    def test_upstream_error_after_flushing(self):
+        async def failing():
+            yield {"type": "message", "content": "partial"}
+            raise ConnectionError("gateway down")
+
+        async def run():
+            frames = []
+            with pytest.raises(ConnectionError):
+                async for frame in coalesce_stream(failing(), max_delay=10):
+                    frames.append(frame)
+            return frames
+
+        assert asyncio.run(run()) == [{"type": "message", "content": "partial"}]
+
+
+def test_sse_encode():
+    lines = asyncio.run(collect(sse_encode(agent_stream([{"type": "message", "content": "hi"}]))))
+
+    assert lines == ['data: {"type": "message", "content": "hi"}\n\n', "data: [DONE]\n\n"]
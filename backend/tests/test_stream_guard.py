@@ -0,0 +1,104 @@
+"""
+Test suite for streaming leakage enforcement (app/security/stream_guard.py):
+- A secret split across chunks is redacted before it is forwarded, also when
+  it sits inside an email address
+- Abort mode emits an error event and closes the upstream
+- PII passes through; clean text is forwarded unchanged and in order
+- Held-back text is flushed before status events
+- Per-chunk scan latency is recorded
+"""
+import pytest
+from unittest.mock import patch
+
+from app.security.stream_guard import guard_stream, REDACTION
+
+CUSTOMER = "11111111-1111-1111-1111-111111111111"
+API_KEY = "sk-" + "a1" * 20
+
+
+class Source:
+    """Async iterator over fixed events that records aclose()"""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or not self.events:
+            raise StopAsyncIteration
+        return self.events.pop(0)
+
+    async def aclose(self):
+        self.closed = True
+
+
+def chunks(text, size=5, event_type="message"):
+    return [{"type": event_type, "content": text[i:i + size]} for i in range(0, len(text), size)]
+
+
+async def collect(source, **kwargs):
+    with patch("app.core.telemetry.record_leakage_guard_latency") as latency:
+        events = [e async for e in guard_stream(source, customer_id=CUSTOMER, **kwargs)]
+    return events, latency
+
+
+def text_of(events, event_type="message"):
+    return "".join(e["content"] for e in events if e["type"] == event_type)
+
+
+class TestStreamGuard:
+
+    @pytest.mark.asyncio
+    async def test_split_secret_is_redacted(self):
+        events, _ = await collect(Source(chunks(f"the key is {API_KEY} ok")), mode="redact")
+        text = text_of(events)
+        assert API_KEY[:8] not in text
+        assert text == f"the key is {REDACTION} ok"
+
+    @pytest.mark.asyncio
+    async def test_secret_inside_email_is_redacted(self):
+        key = "sk-" + "A" * 40
+        events, _ = await collect(Source(chunks(f"mail my{key}@x.com now")), mode="redact")
+        assert text_of(events) == f"mail my{REDACTION}@x.com now"
+
+    @pytest.mark.asyncio
+    async def test_abort_stops_stream_and_closes_source(self):
+        source = Source(chunks(f"the key is {API_KEY} and more text after it"))
+        events, _ = await collect(source, mode="abort")
+        assert events[-1]["type"] == "error" and events[-1]["blocked"] is True
+        assert "sk-" not in text_of(events)
+        assert source.closed
+        assert source.events  # upstream was not read to the end
+
+    @pytest.mark.asyncio
+    async def test_clean_text_and_pii_pass_through(self):
+        text = "contact a.b@example.org about the campaign"
+        events, _ = await collect(Source(chunks(text, size=3)), mode="redact")
+        assert text_of(events) == text
+
+    @pytest.mark.asyncio
+    async def test_held_back_text_precedes_status_event(self):
+        source = Source([
+            {"type": "message", "content": "hello wor"},
+            {"type": "status", "content": "done"},
+        ])
+        events, _ = await collect(source, mode="redact")
+        assert [e["type"] for e in events] == ["message", "message", "status"]
+        assert text_of(events) == "hello wor"
+
+    @pytest.mark.asyncio
+    async def test_latency_recorded_per_chunk(self):
+        source = Source(chunks("one two three", size=4))
+        _, latency = await collect(source, mode="redact")
+        # 4 chunks + the final flush
+        assert latency.call_count == 5
+
+    @pytest.mark.asyncio
+    async def test_off_mode_forwards_untouched(self):
+        source = Source(chunks(f"key {API_KEY}"))
+        events, latency = await collect(source, mode="off")
+        assert text_of(events) == f"key {API_KEY}"
+        assert latency.call_count == 0
@@ -0,0 +1,192 @@
+"""
+Test suite for the worker task scheduler:
+- Weighted-fair selection serves every priority in proportion to its weight
+- Strict mode always serves the highest priority first
+- In-flight tasks never exceed the executor count
+- Per-customer caps hand excess tasks back to the queue
+- Reads ask for no more than the free slots, shared out by weight, and back
+  off when nothing read was runnable
+- stop() requeues buffered tasks and drains in-flight ones
+- Held tasks are kept visible; reclaimed copies of them are ignored
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.core.config import settings
+from app.workers.task_scheduler import TaskScheduler
+
+WEIGHTS = {"urgent": 8, "high": 4, "medium": 2, "low": 1}
+
+
+class FakeQueue:
+    def __init__(self, batches=None):
+        self.batches = list(batches or [])
+        self.release_task = AsyncMock()
+        self.extend_tasks = AsyncMock(return_value=0)
+        self.reads = []
+
+    async def read_tasks(self, priorities, count=10, block_ms=1000, shares=None):
+        self.reads.append((count, shares))
+        if self.batches:
+            return self.batches.pop(0)
+        await asyncio.sleep(0.01)
+        return []
+
+
+def task(task_id, priority="medium", customer="c1"):
+    return {"task_id": task_id, "priority": priority, "customer_id": customer}
+
+
+def scheduler(queue=None, handler=None, **kwargs):
+    kwargs.setdefault("concurrency", 4)
+    kwargs.setdefault("customer_concurrency", 100)
+    kwargs.setdefault("weights", WEIGHTS)
+    return TaskScheduler(queue or FakeQueue(), handler or AsyncMock(), **kwargs)
+
+
+class TestTaskScheduler:
+
+    def test_weighted_selection_is_proportional(self):
+        s = scheduler(mode="weighted")
+
+        async def run():
+            await s.submit([task(f"{p}-{i}", p) for p in WEIGHTS for i in range(30)])
+            return [s._select()["priority"] for _ in range(15)]
+
+        order = asyncio.run(run())
+        assert {p: order.count(p) for p in WEIGHTS} == {"urgent": 8, "high": 4, "medium": 2, "low": 1}
+        # Interleaved, not one block per priority
+        assert order[:3] != ["urgent"] * 3
+
+    def test_strict_selection(self):
+        s = scheduler(mode="strict")
+
+        async def run():
+            await s.submit([task("l", "low"), task("h", "high"), task("u", "urgent")])
+            return [s._select()["task_id"] for _ in range(3)]
+
+        assert asyncio.run(run()) == ["u", "h", "l"]
+
+    def test_concurrency_is_bounded(self):
+        running, peak = 0, 0
+
+        async def handler(t):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+
+        queue = FakeQueue([[task(f"t{i}", customer=f"c{i}") for i in range(10)]])
+        s = scheduler(queue, handler, concurrency=3)
+
+        async def run():
+            runner = asyncio.create_task(s.run())
+            await asyncio.sleep(0.2)
+            await s.stop()
+            await runner
+
+        asyncio.run(run())
+        assert peak == 3
+        assert s.stats["started"] == 10
+
+    def test_customer_cap_releases_excess(self):
+        s = scheduler(customer_concurrency=2)
+
+        async def run():
+            return await s.submit([task(f"a{i}", customer="a") for i in range(5)] + [task("b0", customer="b")])
+
+        assert asyncio.run(run()) == 3
+        released = [c.args[0]["task_id"] for c in s.queue.release_task.await_args_list]
+        assert released == ["a2", "a3", "a4"]
+
+    def test_stop_drains_in_flight_and_requeues_buffered(self):
+        finished = []
+
+        async def handler(t):
+            await asyncio.sleep(0.05)
+            finished.append(t["task_id"])
+
+        queue = FakeQueue([[task("t1", customer="a"), task("t2", customer="b"), task("t3", customer="c")]])
+        s = scheduler(queue, handler, concurrency=1)
+
+        async def run():
+            runner = asyncio.create_task(s.run())
+            await asyncio.sleep(0.01)
+            await s.stop(drain_timeout=1.0)
+            await runner
+
+        asyncio.run(run())
+        assert finished == ["t1"]
+        assert [c.args[0]["task_id"] for c in queue.release_task.await_args_list] == ["t2", "t3"]
+        assert s.get_stats()["customers"] == 0
+
+    def test_held_tasks_are_extended_and_not_run_twice(self):
+        started = []
+
+        async def run():
+            release = asyncio.Event()
+
+            async def handler(t):
+                started.append(t["task_id"])
+                await release.wait()
+
+            running = {"task_id": "t1", "customer_id": "a", "_stream": "s", "_entry_id": "1-0"}
+            queue = FakeQueue([[running]])
+            s = scheduler(queue, handler)
+            runner = asyncio.create_task(s.run())
+            await asyncio.sleep(0.05)
+            # The reclaimer hands back the entry this worker is still running
+            accepted = await s.submit([dict(running, attempt=2)])
+            await asyncio.sleep(0.05)
+            release.set()
+            await s.stop()
+            await runner
+            return s, queue, accepted
+
+        with patch.object(settings, "TASK_QUEUE_HEARTBEAT_INTERVAL", 0.02):
+            s, queue, accepted = asyncio.run(run())
+        assert accepted == 0 and started == ["t1"]
+        assert s.stats["duplicates"] == 1
+        extended = queue.extend_tasks.await_args_list[0].args[0]
+        assert [t["_entry_id"] for t in extended] == ["1-0"]
+        assert s._local == {}
+
+    def test_reads_are_capped_and_shared_by_weight(self):
+        s = scheduler(concurrency=15, weights=WEIGHTS)
+        assert s._read_shares(15) == {"urgent": 8, "high": 4, "medium": 2, "low": 1}
+        # One slot at a time still reaches every priority
+        picks = [max(s._read_shares(1).items(), key=lambda kv: kv[1])[0] for _ in range(15)]
+        assert {p: picks.count(p) for p in WEIGHTS} == {"urgent": 8, "high": 4, "medium": 2, "low": 1}
+        assert scheduler(mode="strict")._read_shares(4) is None
+
+        queue = FakeQueue()
+        s = scheduler(queue, concurrency=3)
+
+        async def run():
+            runner = asyncio.create_task(s.run())
+            await asyncio.sleep(0.03)
+            await s.stop()
+            await runner
+
+        asyncio.run(run())
+        assert queue.reads and all(count == 3 and sum(shares.values()) == 3 for count, shares in queue.reads)
+
+    def test_backs_off_when_nothing_read_is_runnable(self):
+        async def handler(t):
+            await asyncio.sleep(1)
+
+        # Customer "a" is at its cap; every later read brings only more of "a"
+        queue = FakeQueue([[task("a0", customer="a")]] + [[task(f"a{i}", customer="a")] for i in range(1, 50)])
+        s = scheduler(queue, handler, customer_concurrency=1)
+
+        async def run():
+            runner = asyncio.create_task(s.run())
+            await asyncio.sleep(0.6)
+            await s.stop(drain_timeout=0)
+            await runner
+
+        asyncio.run(run())
+        # 0.5s, then 1s: a single re-read in 0.6s rather than one per IDLE_BACKOFF
+        assert len(queue.reads) <= 3
+        assert queue.release_task.await_count <= 2
@@ -0,0 +1,135 @@
+"""
+Test suite for the coalescing task status writer:
+- Coalescing within the window (last status wins, progress appended)
+- Cached customer / agent_type lookups
+- No regression after a terminal status
+- Per-row fallback when the batch RPC is missing
+- A terminal update the database didn't apply fails the write
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.services.task_status_writer import TaskStatusWriter
+from tests.conftest import AsyncQueryMock
+
+
+def make_supabase():
+    tasks = AsyncQueryMock()
+    tasks.select.return_value.eq.return_value.execute.return_value.data = [{"customer_id": "cust-1", "metadata": {}}]
+    ves = AsyncQueryMock()
+    ves.select.return_value.eq.return_value.execute.return_value.data = [
+        {"id": "ve-1", "agent_type": "marketing-manager"},
+        {"id": "ve-2", "agent_type": "devops-engineer"},
+    ]
+    tasks.update.return_value.eq.return_value.execute.return_value.data = [{"id": "t1"}]
+    supabase = AsyncQueryMock()
+    supabase.rpc.return_value.execute.return_value.data = ["t1"]
+    supabase.table.side_effect = lambda name: {"tasks": tasks, "customer_ves": ves}[name]
+    supabase.tasks, supabase.ves = tasks, ves
+    return supabase
+
+
+@pytest.fixture
+def env():
+    supabase = make_supabase()
+    centrifugo = MagicMock()
+    with patch("app.services.task_status_writer.get_async_supabase_admin", AsyncMock(return_value=supabase)), \
+         patch("app.core.centrifugo.get_centrifugo_client", return_value=centrifugo):
+        yield supabase, centrifugo
+
+
+class TestTaskStatusWriter:
+
+    def test_coalesces_updates_into_one_row(self, env):
+        supabase, centrifugo = env
+        writer = TaskStatusWriter(window=60)
+
+        async def run():
+            await writer.submit("t1", "in_progress", "marketing-manager", "Routing...")
+            await writer.submit("t1", "in_progress", "devops-engineer", "Delegating...")
+            await writer.submit("t1", "waiting_for_input", None, "Question?")
+            await writer.flush()
+
+        asyncio.run(run())
+
+        # Published immediately, once per update
+        assert centrifugo.publish_nowait.call_count == 3
+        sequences = [c.args[1]["sequence"] for c in centrifugo.publish_nowait.call_args_list]
+        assert sequences == sorted(sequences)
+
+        # Written once, coalesced
+        updates = supabase.rpc.call_args.args[1]["updates"]
+        assert len(updates) == 1
+        assert updates[0]["status"] == "waiting_for_input"
+        assert updates[0]["assigned_to_ve"] == "ve-2"
+        assert updates[0]["progress_messages"] == ["Routing...", "Delegating...", "Question?"]
+
+        # One lookup each for the task's customer and the team map
+        assert supabase.tasks.select.call_count == 1
+        assert supabase.ves.select.call_count == 1
+        assert writer.stats["coalesced"] == 2
+
+    def test_terminal_status_flushes_and_blocks_regression(self, env):
+        supabase, centrifugo = env
+        writer = TaskStatusWriter(window=60)
+
+        async def run():
+            await writer.submit("t1", "completed")
+            late = await writer.submit("t1", "in_progress", None, "late branch update")
+            return late
+
+        late = asyncio.run(run())
+
+        assert supabase.rpc.call_count == 1  # terminal write didn't wait for the window
+        assert supabase.rpc.call_args.args[1]["updates"][0]["completed_at"]
+        assert late["applied"] is False
+        assert centrifugo.publish_nowait.call_count == 1
+        assert writer.stats["dropped"] == 1
+
+    def test_falls_back_to_row_updates_when_rpc_missing(self, env):
+        supabase, _ = env
+        supabase.rpc.return_value.execute.side_effect = APIError({"code": "PGRST202", "message": "not found"})
+        writer = TaskStatusWriter(window=60)
+
+        async def run():
+            await writer.submit("t1", "in_progress", None, "Working")
+            return await writer.flush()
+
+        failed = asyncio.run(run())
+
+        assert failed == set()
+        assert writer._rpc_available is False
+        data = supabase.tasks.update.call_args.args[0]
+        assert data["status"] == "in_progress"
+        assert data["metadata"]["last_progress_message"] == "Working"
+        assert data["metadata"]["progress_history"] == ["Working"]
+        # Non-terminal row updates never overwrite a finished task
+        supabase.tasks.update.return_value.eq.return_value.not_.in_.assert_called_once_with(
+            "status", ["cancelled", "completed", "failed"]
+        )
+
+    def test_failed_terminal_write_raises(self, env):
+        supabase, _ = env
+        supabase.rpc.return_value.execute.side_effect = Exception("db down")
+        supabase.tasks.update.return_value.eq.return_value.execute.side_effect = Exception("db down")
+        writer = TaskStatusWriter(window=60)
+
+        with pytest.raises(Exception, match="Failed to update task t1"):
+            asyncio.run(writer.submit("t1", "failed"))
+
+    def test_unapplied_terminal_update_raises(self, env):
+        supabase, _ = env
+        # The RPC ran but didn't update the row
+        supabase.rpc.return_value.execute.return_value.data = []
+        writer = TaskStatusWriter(window=60)
+
+        with pytest.raises(Exception, match="Failed to update task t1"):
+            asyncio.run(writer.submit("t1", "completed"))
+        assert writer._finished.get("t1") is None
+
+        # A skipped non-terminal update is not an error
+        assert asyncio.run(writer.submit("t2", "in_progress")) is not None
+        assert asyncio.run(writer.flush()) == set()
@@ -0,0 +1,68 @@
+"""
+Test suite for the workflow team snapshot:
+- Compact routing fields only
+- Refresh signal sent to running delegation workflows
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.customer_agent_service import compact_team_member, refresh_running_task_teams
+
+
+class TestCompactTeamMember:
+
+    def test_keeps_only_routing_fields(self):
+        row = {
+            "id": "ve-1",
+            "customer_id": "cust-1",
+            "agent_type": "marketing-manager",
+            "persona_name": "Alice",
+            "agent_gateway_route": "/agents/cust-1/marketing-manager",
+            "ve_details": {
+                "name": "Marketing Manager",
+                "role": "Marketing Manager",
+                "department": "Marketing",
+                "seniority_level": "manager",
+                "capabilities": {"seo": True, "campaigns": True},
+                "description": "A very long description" * 50,
+                "pricing_monthly": 99,
+            }
+        }
+
+        assert compact_team_member(row) == {
+            "id": "ve-1",
+            "agent_type": "marketing-manager",
+            "persona_name": "Alice",
+            "ve_details": {
+                "name": "Marketing Manager",
+                "role": "Marketing Manager",
+                "department": "Marketing",
+                "seniority_level": "manager",
+                "capabilities": ["seo", "campaigns"],
+            }
+        }
+
+
+class TestRefreshRunningTaskTeams:
+
+    def test_signals_each_running_task(self):
+        supabase = MagicMock()
+        supabase.table.return_value.select.return_value.eq.return_value.in_.return_value.execute = AsyncMock(
+            return_value=MagicMock(data=[{"id": "t1"}, {"id": "t2"}])
+        )
+        handle = MagicMock()
+        handle.signal = AsyncMock(side_effect=[None, Exception("workflow not found")])
+        client = MagicMock()
+        client.get_workflow_handle.return_value = handle
+        team = [{"id": "ve-1", "agent_type": "marketing-manager"}]
+
+        with patch("app.core.database.get_async_supabase_admin", AsyncMock(return_value=supabase)), \
+             patch("app.core.temporal_client.get_temporal_client", AsyncMock(return_value=client)), \
+             patch("app.services.customer_agent_service.get_team_snapshot", AsyncMock(return_value=team)):
+            signalled = asyncio.run(refresh_running_task_teams("cust-1"))
+
+        assert signalled == 1
+        assert [c.args[0] for c in client.get_workflow_handle.call_args_list] == [
+            "intelligent-delegation-t1", "intelligent-delegation-t2"
+        ]
+        handle.signal.assert_any_await("refresh_team", team)
@@ -0,0 +1,111 @@
+"""
+Test suite for the two-tier (LRU + Redis) cache and agent-context caching
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.core.tiered_cache import LRUCache, TieredCache
+
+
+class FakeRedisService:
+    """Stand-in for RedisQueueService cache helpers"""
+
+    def __init__(self):
+        self.store = {}
+        self.redis_client = None
+
+    async def get_cache(self, key):
+        return self.store.get(key)
+
+    async def set_cache(self, key, value, expire_seconds=None):
+        self.store[key] = value
+        return True
+
+
+@pytest.fixture
+def cache():
+    cache = TieredCache("test", local_maxsize=2, local_ttl=30, redis_ttl=60)
+    fake = FakeRedisService()
+    cache._redis = AsyncMock(return_value=fake)
+    cache.fake = fake
+    return cache
+
+
+class TestLRUCache:
+
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2, ttl=30)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        assert lru.get("a") == 1
+        assert lru.get("b") is None
+        assert lru.get("c") == 3
+
+    def test_expired_entries_are_dropped(self):
+        lru = LRUCache(maxsize=10, ttl=30)
+        lru.set("a", 1, ttl=-1)
+        assert lru.get("a") is None
+        assert len(lru) == 0
+
+
+class TestTieredCache:
+
+    def test_miss_then_local_hit(self, cache):
+        async def run():
+            assert await cache.get("k") is None
+            await cache.set("k", "v")
+            assert await cache.get("k") == "v"
+
+        asyncio.run(run())
+        stats = cache.get_stats()
+        assert stats["misses"] == 1
+        assert stats["local_hits"] == 1
+
+    def test_redis_hit_populates_local(self, cache):
+        cache.fake.store["test:k"] = "from-redis"
+
+        async def run():
+            assert await cache.get("k") == "from-redis"
+            assert await cache.get("k") == "from-redis"
+
+        asyncio.run(run())
+        stats = cache.get_stats()
+        assert stats["redis_hits"] == 1
+        assert stats["local_hits"] == 1
+
+    def test_invalidate_prefix_only_drops_matching(self, cache):
+        async def run():
+            await cache.set("cust-1:a", "x")
+            await cache.set("cust-2:a", "y")
+            await cache.invalidate_prefix("cust-1:")
+            cache.fake.store.clear()
+            return await cache.get("cust-1:a"), await cache.get("cust-2:a")
+
+        assert asyncio.run(run()) == (None, "y")
+
+
+class TestAgentContextCache:
+
+    def test_context_served_from_cache_on_repeat(self):
+        from app.services.agent_gateway_service import AgentGatewayService
+        from app.services import customer_agent_service as cas
+
+        fake = FakeRedisService()
+        agents = [{"id": "ve-1", "name": "Ava", "role": "Manager", "tools": []}]
+
+        with patch.object(cas.agent_context_cache, "_redis", AsyncMock(return_value=fake)), \
+             patch.object(cas.CustomerAgentService, "get_customer_agents", AsyncMock(return_value=agents)) as lookup, \
+             patch("app.core.database.get_async_supabase_admin", new_callable=AsyncMock):
+            service = AgentGatewayService()
+            first = asyncio.run(service.get_customer_agents_context("cust-ctx", "marketing-manager"))
+            second = asyncio.run(service.get_customer_agents_context("cust-ctx", "marketing-manager"))
+            asyncio.run(cas.invalidate_customer_agent_context("cust-ctx"))
+            fake.store.clear()
+            asyncio.run(service.get_customer_agents_context("cust-ctx", "marketing-manager"))
+
+        assert first == second
+        assert "Ava" in first
+        assert lookup.await_count == 2
@@ -0,0 +1,117 @@
+"""
+Test suite for the local JWT verifier:
+- Supabase audience accepted; base64 secret resolved once and pinned
+- Validated claims are cached
+- RS256 tokens verified against a cached JWKS, refetched for a new kid
+- Remote fallback is off by default and rate-limited when enabled
+"""
+import asyncio
+import base64
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt, JWTError
+
+from app.core.config import settings
+from app.core.token_verifier import TokenVerifier
+
+RAW_SECRET = b"super-secret-signing-key-0123456"
+B64_SECRET = base64.b64encode(RAW_SECRET).decode()
+
+
+def claims(**extra):
+    return {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 600, **extra}
+
+
+def rsa_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public = jwk.construct(private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ), "RS256").to_dict()
+    public["kid"] = kid
+    return pem, public
+
+
+def make_verifier(secret=B64_SECRET):
+    with patch.object(settings, "JWT_SECRET", secret):
+        return TokenVerifier()
+
+
+class TestTokenVerifier:
+
+    def test_base64_secret_is_pinned_and_audience_accepted(self):
+        verifier = make_verifier()
+        assert verifier._pinned is None
+        token = jwt.encode(claims(), RAW_SECRET, algorithm="HS256")
+
+        assert asyncio.run(verifier.verify(token))["sub"] == "user-1"
+        assert verifier._pinned == RAW_SECRET
+
+        with patch("app.core.token_verifier.jwt.decode", wraps=jwt.decode) as decode:
+            other = jwt.encode(claims(sub="user-2"), RAW_SECRET, algorithm="HS256")
+            asyncio.run(verifier.verify(other))
+        # One attempt with the pinned secret, no raw-then-base64 retries
+        assert decode.call_count == 1
+
+    def test_claims_are_cached(self):
+        verifier = make_verifier()
+        token = jwt.encode(claims(), RAW_SECRET, algorithm="HS256")
+
+        async def run():
+            await verifier.verify(token)
+            with patch("app.core.token_verifier.jwt.decode", side_effect=AssertionError("decoded twice")):
+                return await verifier.verify(token)
+
+        assert asyncio.run(run())["sub"] == "user-1"
+        assert verifier.stats["cache_hits"] == 1
+
+    def test_bad_signature_is_rejected(self):
+        verifier = make_verifier()
+        token = jwt.encode(claims(), b"wrong-secret", algorithm="HS256")
+        with pytest.raises(JWTError):
+            asyncio.run(verifier.verify(token))
+
+    def test_jwks_keys_are_cached_and_rotated(self):
+        old_pem, old_public = rsa_key("k1")
+        new_pem, new_public = rsa_key("k2")
+        published = {"keys": [old_public]}
+        fetches = []
+
+        def handler(request):
+            fetches.append(request.url.path)
+            return httpx.Response(200, json=published)
+
+        http = httpx.AsyncClient(base_url="https://mock.supabase.co", transport=httpx.MockTransport(handler))
+        pool = MagicMock()
+        pool.get_client.return_value = http
+        verifier = make_verifier()
+
+        async def run():
+            with patch("app.core.http_pool.get_http_pool", return_value=pool), \
+                 patch.object(settings, "JWKS_MIN_REFRESH_INTERVAL", 0):
+                for sub in ["a", "b"]:
+                    token = jwt.encode(claims(sub=sub), old_pem, algorithm="RS256", headers={"kid": "k1"})
+                    assert (await verifier.verify(token))["sub"] == sub
+                published["keys"].append(new_public)
+                token = jwt.encode(claims(sub="c"), new_pem, algorithm="RS256", headers={"kid": "k2"})
+                assert (await verifier.verify(token))["sub"] == "c"
+
+        asyncio.run(run())
+        assert fetches == ["/auth/v1/.well-known/jwks.json"] * 2
+
+    def test_remote_fallback_disabled_by_default(self):
+        assert make_verifier().allow_remote_fallback() is False
+
+    def test_remote_fallback_rate_limited(self):
+        verifier = make_verifier()
+        with patch.object(settings, "JWT_REMOTE_FALLBACK_ENABLED", True), \
+             patch.object(settings, "JWT_REMOTE_FALLBACK_PER_MINUTE", 2):
+            results = [verifier.allow_remote_fallback() for _ in range(3)]
+        assert results == [True, True, False]
@@ -0,0 +1,106 @@
+"""
+Test suite for the inverted tool index:
+- Filters by MCP server, by agent and by prefix / fuzzy search terms
+- Same-named agents in different namespaces are indexed separately
+- Incremental updates: re-indexing or removing a server drops its old tools
+- Cursor pages are stable while tools are added
+- The discovery endpoint serves pages and cursors from the index
+"""
+import asyncio
+
+import pytest
+
+from app.services.kagent_service import KAgentService
+from app.services.tool_index import ToolIndex
+
+EMAIL = {"name": "email-mcp", "namespace": "kagent", "tools": [
+    {"name": "send_email", "description": "Send an email message"},
+    {"name": "read_inbox", "description": "Read recent emails"},
+]}
+CALENDAR = {"name": "calendar-mcp", "namespace": "kagent", "tools": ["createEvent", "list_events"]}
+
+
+def make_index():
+    index = ToolIndex()
+    index.set_server("kagent/email-mcp", EMAIL)
+    index.set_server("kagent/calendar-mcp", CALENDAR)
+    index.set_agent("kagent/assistant", ["send_email", "createEvent"])
+    return index
+
+
+def names(result):
+    return [t["name"] for t in result["items"]]
+
+
+class TestToolIndex:
+
+    def test_filters(self):
+        index = make_index()
+        assert names(index.search(mcp_server="email-mcp")) == ["read_inbox", "send_email"]
+        assert names(index.search(agent="assistant")) == ["createEvent", "send_email"]
+        # Prefix on name and description tokens; camelCase is split
+        assert names(index.search(query="sen")) == ["send_email"]
+        assert names(index.search(query="event")) == ["createEvent", "list_events"]
+        assert names(index.search(query="email", mcp_server="email-mcp", agent="assistant")) == ["send_email"]
+        assert index.search(agent="assistant")["items"][0]["agents"] == ["kagent/assistant"]
+
+    def test_same_named_agents_in_other_namespaces_are_distinct(self):
+        index = make_index()
+        index.set_agent("team-b/assistant", ["read_inbox"])
+        assert names(index.search(agent="kagent/assistant")) == ["createEvent", "send_email"]
+        assert names(index.search(agent="team-b/assistant")) == ["read_inbox"]
+        assert names(index.search(agent="assistant")) == ["createEvent", "read_inbox", "send_email"]
+
+        index.remove_agent("team-b/assistant")
+        assert names(index.search(agent="assistant")) == ["createEvent", "send_email"]
+        assert index.search(query="send")["items"][0]["agents"] == ["kagent/assistant"]
+        assert names(index.search(agent="team-b/assistant")) == []
+
+    def test_fuzzy_fallback(self):
+        index = make_index()
+        assert names(index.search(query="inbx")) == ["read_inbox"]
+        assert names(index.search(query="inbx", fuzzy=False)) == []
+
+    def test_reindex_and_remove_server(self):
+        index = make_index()
+        index.set_server("kagent/email-mcp", {**EMAIL, "tools": ["archive_email"]})
+        assert names(index.search(mcp_server="email-mcp")) == ["archive_email"]
+        assert names(index.search(query="inbox")) == []
+
+        index.remove_server("kagent/email-mcp")
+        assert len(index) == 2
+        assert "archive" not in index._tokens and "email" not in index._by_token
+
+    def test_cursor_pages_are_stable(self):
+        index = ToolIndex()
+        index.set_server("kagent/a", {"name": "a", "tools": [f"tool_{i:02d}" for i in range(0, 10, 2)]})
+        first = index.search(limit=2)
+        assert names(first) == ["tool_00", "tool_02"] and first["total"] == 5
+
+        # A tool inserted before the cursor doesn't shift the next page
+        index.set_server("kagent/0", {"name": "zero", "tools": ["early"]})
+        second = index.search(limit=2, cursor=first["next_cursor"])
+        assert names(second) == ["tool_04", "tool_06"]
+        last = index.search(limit=2, cursor=second["next_cursor"])
+        assert names(last) == ["tool_08"] and last["next_cursor"] is None
+
+    def test_bad_cursor(self):
+        with pytest.raises(ValueError):
+            make_index().search(cursor="%%%")
+
+    def test_discovery_endpoint_uses_index(self):
+        from app.api import discovery
+
+        service = KAgentService()
+        service.k8s_api = None  # mock catalog
+        original = discovery.kagent_service
+        discovery.kagent_service = service
+        try:
+            first = asyncio.run(discovery.list_tools(search=None, mcp_server=None, agent=None, fuzzy=True,
+                                                     cursor=None, page=1, page_size=4))
+            second = asyncio.run(discovery.list_tools(search=None, mcp_server=None, agent=None, fuzzy=True,
+                                                      cursor=first["next_cursor"], page=1, page_size=4))
+        finally:
+            discovery.kagent_service = original
+        assert first["total"] == 9 and len(first["items"]) == 4
+        assert {t["id"] for t in first["items"]}.isdisjoint(t["id"] for t in second["items"])